@@ -8,9 +8,12 @@ PdkBot - 电商客服聚合接待工具
 import sys
 import os
 import json
+import shutil
+import argparse
+import tempfile
 from pathlib import Path
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import Qt, QDir
+from PyQt6.QtCore import Qt, QDir, QTimer
 from PyQt6.QtGui import QIcon
 
 # 添加项目根目录到Python路径
@@ -18,12 +21,41 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from src.windows.main_window import MainWindow
-from src.core.application import PdkBotApplication
+from src.core.application import DEFAULT_DATA_DIR, PdkBotApplication
+from src.core.bridge_recorder import BridgeReplayer
+from src.core.resource_mode import DEFAULT_MODE, apply_chromium_flags
+
+# 回放时复制到临时数据目录的配置和规则，决定消息的处理流程；
+# 消息、统计、会话和店铺列表等都写入临时目录，不影响真实数据
+REPLAY_INPUTS = ("config.json", "auto_reply_rules.json", "compliance", "quick_replies", "knowledge_base")
+
+
+def prepare_replay_data_dir(data_dir: Path, replay_dir: Path) -> Path:
+    """把配置和规则复制到回放用的临时数据目录"""
+    replay_dir.mkdir(parents=True, exist_ok=True)
+    for name in REPLAY_INPUTS:
+        source = data_dir / name
+        if source.is_dir():
+            shutil.copytree(source, replay_dir / name)
+        elif source.is_file():
+            shutil.copy2(source, replay_dir / name)
+    return replay_dir
 
 def main():
     """主入口函数"""
+    parser = argparse.ArgumentParser(description="PdkBot 电商客服聚合接待工具")
+    parser.add_argument("--record", action="store_true", help="录制平台消息到 data/recordings/")
+    parser.add_argument("--replay", metavar="FILE", help="回放录制的平台消息，不加载真实网页")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速，0 表示尽快回放")
+    args, qt_args = parser.parse_known_args()
+    
+    # 资源模式的Chromium参数需在创建QApplication之前设置，此时只读取配置文件，
+    # 应用实例（日志、配置监视、事件总线）在QApplication之后创建，且只创建一个
+    startup_config = PdkBotApplication.read_startup_config()
+    apply_chromium_flags(startup_config.get("resource_mode", {}).get("mode", DEFAULT_MODE))
+    
     # 创建应用程序
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setApplicationName("PdkBot")
     app.setApplicationDisplayName("电商客服聚合接待工具")
     app.setApplicationVersion("1.0.0")
@@ -34,15 +66,35 @@ def main():
     if icon_path.exists():
         app.setWindowIcon(QIcon(str(icon_path)))
     
-    # 创建应用程序实例
-    pdk_app = PdkBotApplication()
+    # 创建应用程序实例和主窗口，回放时数据目录和店铺配置文件目录都使用临时目录，结束后删除；
+    # 配置文件清理只会扫描临时目录，不会把真实店铺的配置文件当作孤立目录移走
+    replay_dir = None
+    if args.replay:
+        replay_dir = Path(tempfile.mkdtemp(prefix="pdkbot-replay-"))
+        pdk_app = PdkBotApplication(prepare_replay_data_dir(DEFAULT_DATA_DIR, replay_dir / "data"),
+                                    replay_dir / "webview_profiles")
+    else:
+        pdk_app = PdkBotApplication()
+    main_window = MainWindow(pdk_app)
+    
+    if args.replay:
+        # 回放时不录制，店铺页面改用回放WebView
+        main_window.stop_bridge_recording()
+        replayer = BridgeReplayer(main_window.platform_pages, Path(args.replay), args.speed, main_window)
+        replayer.finished.connect(lambda report: print(report.format()))
+        QTimer.singleShot(0, replayer.start)
+    elif args.record:
+        main_window.start_bridge_recording()
     
-    # 创建主窗口
-    main_window = MainWindow()
     main_window.show()
     
     # 运行应用程序
-    return app.exec()
+    try:
+        return app.exec()
+    finally:
+        if replay_dir is not None:
+            # 数据库文件可能仍被占用，删除失败时留给系统清理临时目录
+            shutil.rmtree(replay_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     sys.exit(main()) 
\ No newline at end of file
@@ -25,7 +25,7 @@ def check_python_version():
 
 def check_dependencies():
     """检查依赖包"""
-    required_packages = ['PyQt6', 'PyQt6-WebEngine', 'requests', 'beautifulsoup4', 'plyer']
+    required_packages = ['PyQt6', 'PyQt6-WebEngine', 'requests', 'beautifulsoup4', 'plyer', 'numpy']
     missing_packages = []
     
     for package in required_packages:
@@ -40,6 +40,8 @@ def check_dependencies():
                 import bs4
             elif package == 'plyer':
                 import plyer
+            elif package == 'numpy':
+                import numpy
         except ImportError:
             missing_packages.append(package)
     
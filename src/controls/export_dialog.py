@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+聊天记录导出窗口
+"""
+
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QComboBox, QDateEdit, QCheckBox,
+                             QLineEdit, QPushButton, QListWidget, QListWidgetItem, QProgressBar, QLabel,
+                             QFileDialog, QMessageBox)
+from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal
+
+from ..db.entities import PlatformShop
+from ..db.message_store import MessageStore
+from ..services.history_export import (ExportOptions, ExportProgress, HistoryExporter, format_progress,
+                                       parquet_available)
+
+
+class ExportThread(QThread):
+    """在后台线程中执行导出，进度最多每200毫秒通知一次"""
+
+    progress = pyqtSignal(object)        # ExportProgress
+    export_finished = pyqtSignal(object)  # ExportProgress
+
+    def __init__(self, exporter: HistoryExporter, restart: bool = False, parent=None):
+        super().__init__(parent)
+        self.exporter = exporter
+        self.restart = restart
+        self._notified_at = 0.0
+
+    def _on_progress(self, state: ExportProgress):
+        now = time.monotonic()
+        if now - self._notified_at >= 0.2:
+            self._notified_at = now
+            self.progress.emit(replace(state))
+
+    def run(self):
+        state = self.exporter.run(self._on_progress, self.restart)
+        self.export_finished.emit(state)
+
+    def cancel(self):
+        self.exporter.cancel()
+
+
+class ExportDialog(QDialog):
+    """选择时间范围、平台、店铺和格式后导出聊天记录"""
+
+    def __init__(self, store: MessageStore, platform_names: Dict[str, str],
+                 shops: Dict[str, List[PlatformShop]],
+                 shop_of: Callable[[str, str], Optional[PlatformShop]] = None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.shop_of = shop_of
+        self.export_thread: Optional[ExportThread] = None
+
+        self.setWindowTitle("导出聊天记录")
+        self.resize(560, 620)
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        self.format_combo = QComboBox()
+        self.format_combo.addItem("CSV", "csv")
+        self.format_combo.addItem("Parquet" if parquet_available() else "Parquet（需安装pyarrow）", "parquet")
+        self.format_combo.model().item(1).setEnabled(parquet_available())
+        self.format_combo.currentIndexChanged.connect(lambda index: self.output_edit.clear())
+        form.addRow("格式", self.format_combo)
+
+        days = store.list_days()
+        today = QDate.currentDate()
+        self.all_days_check = QCheckBox("全部日期")
+        self.all_days_check.setChecked(True)
+        self.start_edit = QDateEdit(QDate.fromString(days[0], "yyyy-MM-dd") if days else today)
+        self.end_edit = QDateEdit(today)
+        date_row = QHBoxLayout()
+        for edit in (self.start_edit, self.end_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+            edit.setEnabled(False)
+        self.all_days_check.toggled.connect(lambda checked: [edit.setEnabled(not checked)
+                                                             for edit in (self.start_edit, self.end_edit)])
+        date_row.addWidget(self.all_days_check)
+        date_row.addWidget(self.start_edit)
+        date_row.addWidget(QLabel("至"))
+        date_row.addWidget(self.end_edit)
+        form.addRow("日期", date_row)
+
+        # 不勾选表示全部
+        self.platform_list = QListWidget()
+        self.platform_list.setMaximumHeight(100)
+        for platform, name in platform_names.items():
+            self._add_check_item(self.platform_list, name, platform)
+        form.addRow("平台", self.platform_list)
+
+        self.shop_list = QListWidget()
+        for platform, platform_shops in shops.items():
+            for shop in platform_shops:
+                name = shop.user_name or shop.mall_name or shop.webview_id[:8]
+                self._add_check_item(self.shop_list, f"{platform_names.get(platform, platform)} - {name}",
+                                     shop.webview_id)
+        form.addRow("店铺", self.shop_list)
+
+        output_row = QHBoxLayout()
+        self.output_edit = QLineEdit()
+        browse_button = QPushButton("浏览...")
+        browse_button.clicked.connect(self.browse_output)
+        output_row.addWidget(self.output_edit)
+        output_row.addWidget(browse_button)
+        form.addRow("导出到", output_row)
+
+        self.restart_check = QCheckBox("忽略上次未完成的进度，重新导出")
+        form.addRow("", self.restart_check)
+        layout.addLayout(form)
+
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel("未勾选平台或店铺时导出全部；中断后以相同条件再次导出会从断点继续")
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        self.start_button = QPushButton("开始导出")
+        self.start_button.clicked.connect(self.start_export)
+        self.cancel_button = QPushButton("停止")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_export)
+        buttons.addWidget(self.start_button)
+        buttons.addWidget(self.cancel_button)
+        layout.addLayout(buttons)
+
+    @staticmethod
+    def _add_check_item(widget: QListWidget, text: str, data: str):
+        item = QListWidgetItem(text)
+        item.setData(Qt.ItemDataRole.UserRole, data)
+        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+        item.setCheckState(Qt.CheckState.Unchecked)
+        widget.addItem(item)
+
+    @staticmethod
+    def _checked(widget: QListWidget) -> List[str]:
+        return [widget.item(i).data(Qt.ItemDataRole.UserRole) for i in range(widget.count())
+                if widget.item(i).checkState() == Qt.CheckState.Checked]
+
+    def browse_output(self):
+        if self.format_combo.currentData() == "csv":
+            path, _ = QFileDialog.getSaveFileName(self, "导出到", "聊天记录.csv", "CSV 文件 (*.csv)")
+        else:
+            path = QFileDialog.getExistingDirectory(self, "导出到（每天一个Parquet文件）")
+        if path:
+            self.output_edit.setText(path)
+
+    def options(self) -> ExportOptions:
+        all_days = self.all_days_check.isChecked()
+        return ExportOptions(
+            output=self.output_edit.text().strip(),
+            format=self.format_combo.currentData(),
+            start_day="" if all_days else self.start_edit.date().toString("yyyy-MM-dd"),
+            end_day="" if all_days else self.end_edit.date().toString("yyyy-MM-dd"),
+            platforms=self._checked(self.platform_list),
+            shops=self._checked(self.shop_list),
+        )
+
+    def start_export(self):
+        if self.export_thread is not None:
+            return
+        options = self.options()
+        if not options.output:
+            QMessageBox.warning(self, "导出聊天记录", "请选择导出位置")
+            return
+        if options.format == "parquet" and Path(options.output).is_file():
+            QMessageBox.warning(self, "导出聊天记录", "Parquet 需要导出到目录")
+            return
+        try:
+            exporter = HistoryExporter(self.store, options, self.shop_of)
+        except Exception as e:
+            QMessageBox.warning(self, "导出聊天记录", str(e))
+            return
+        self.export_thread = ExportThread(exporter, self.restart_check.isChecked(), self)
+        self.export_thread.progress.connect(self.on_progress)
+        self.export_thread.export_finished.connect(self.on_finished)
+        self.start_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText("正在导出...")
+        self.export_thread.start()
+
+    def cancel_export(self):
+        if self.export_thread is not None:
+            self.export_thread.cancel()
+            self.cancel_button.setEnabled(False)
+
+    def on_progress(self, state: ExportProgress):
+        self.progress_bar.setMaximum(max(state.days_total, 1))
+        self.progress_bar.setValue(state.days_done)
+        self.status_label.setText(f"正在导出 {state.day}：{format_progress(state)}")
+
+    def on_finished(self, state: ExportProgress):
+        self.export_thread.wait()
+        self.export_thread = None
+        self.on_progress(state)
+        if state.error:
+            message = f"导出失败：{state.error}"
+        elif state.cancelled:
+            message = f"已停止：{format_progress(state)}。以相同条件再次导出会从断点继续"
+        else:
+            message = f"导出完成：{format_progress(state)}，耗时 {state.elapsed:.1f} 秒"
+        self.status_label.setText(message)
+        self.start_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def shutdown(self):
+        """程序退出时停止导出，已完成的天数保留在断点中"""
+        if self.export_thread is not None:
+            self.export_thread.cancel()
+            self.export_thread.wait()
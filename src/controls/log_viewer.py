@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+日志窗口，查看内存中最近的日志
+"""
+
+from typing import List
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QCheckBox, QPushButton,
+                             QPlainTextEdit, QLabel)
+from PyQt6.QtCore import QTimer, QUrl
+from PyQt6.QtGui import QDesktopServices, QFont, QTextCursor
+
+from ..core.log_setup import LEVELS, LogEntry, LogService
+
+# 刷新间隔(毫秒)
+REFRESH_INTERVAL = 500
+
+
+class LogViewerDialog(QDialog):
+    """按级别和关键字筛选最近的日志，窗口可见时定时增量刷新"""
+
+    def __init__(self, log_service: LogService, parent=None):
+        super().__init__(parent)
+        self.log_service = log_service
+        self._last_seq = 0
+
+        self.setWindowTitle("日志")
+        self.resize(900, 560)
+        layout = QVBoxLayout(self)
+
+        filters = QHBoxLayout()
+        filters.addWidget(QLabel("级别"))
+        self.level_combo = QComboBox()
+        for level in LEVELS:
+            self.level_combo.addItem(level)
+        self.level_combo.setCurrentText("INFO")
+        self.level_combo.currentIndexChanged.connect(self.reload)
+        filters.addWidget(self.level_combo)
+        self.keyword_edit = QLineEdit()
+        self.keyword_edit.setPlaceholderText("子系统或内容包含...")
+        self.keyword_edit.textChanged.connect(self.reload)
+        filters.addWidget(self.keyword_edit, 1)
+        self.pause_check = QCheckBox("暂停")
+        filters.addWidget(self.pause_check)
+        layout.addLayout(filters)
+
+        self.text_edit = QPlainTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.text_edit.setFont(QFont("Consolas", 9))
+        layout.addWidget(self.text_edit)
+
+        buttons = QHBoxLayout()
+        self.status_label = QLabel()
+        buttons.addWidget(self.status_label)
+        buttons.addStretch()
+        open_button = QPushButton("打开日志目录")
+        open_button.clicked.connect(
+            lambda: QDesktopServices.openUrl(QUrl.fromLocalFile(str(self.log_service.log_dir))))
+        clear_button = QPushButton("清空")
+        clear_button.clicked.connect(self.clear)
+        buttons.addWidget(open_button)
+        buttons.addWidget(clear_button)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def _matches(self, entry: LogEntry, min_level: int, keyword: str) -> bool:
+        if entry.level < min_level:
+            return False
+        return not keyword or keyword in entry.subsystem.lower() or keyword in entry.message.lower()
+
+    def _append(self, entries: List[LogEntry]):
+        if not entries:
+            return
+        self._last_seq = entries[-1].seq
+        min_level = (self.level_combo.currentIndex() + 1) * 10
+        keyword = self.keyword_edit.text().strip().lower()
+        lines = [entry.format() for entry in entries if self._matches(entry, min_level, keyword)]
+        if not lines:
+            return
+        scrollbar = self.text_edit.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.text_edit.setMaximumBlockCount(self.log_service.config["buffer_size"])
+        cursor = self.text_edit.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        if not self.text_edit.document().isEmpty():
+            cursor.insertText("\n")
+        cursor.insertText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def refresh(self):
+        """追加上次刷新之后的新日志"""
+        if not self.pause_check.isChecked():
+            self._append(self.log_service.buffer.entries(self._last_seq))
+        self.status_label.setText(f"限流已省略 {self.log_service.rate_limit.suppressed_total} 条  "
+                                  f"日志文件: {self.log_service.log_file}")
+
+    def reload(self):
+        """筛选条件变化后重新显示缓冲区中的全部日志"""
+        self.text_edit.clear()
+        self._last_seq = 0
+        self._append(self.log_service.buffer.entries())
+
+    def clear(self):
+        self.log_service.buffer.clear()
+        self.text_edit.clear()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.reload()
+        self.refresh_timer.start(REFRESH_INTERVAL)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+快速切换面板
+"""
+
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem
+from PyQt6.QtCore import pyqtSignal, Qt
+
+from ..services.switcher_index import SwitcherEntry, SwitcherIndex
+
+
+class QuickSwitcher(QDialog):
+    """输入店铺名、用户名、拼音首字母或平台名，回车切换到对应店铺"""
+
+    entry_selected = pyqtSignal(object)  # SwitcherEntry
+
+    def __init__(self, index: SwitcherIndex, limit: int = 20, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.limit = limit
+
+        self.setWindowFlags(Qt.WindowType.Popup | Qt.WindowType.FramelessWindowHint)
+        self.setFixedWidth(520)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #ffffff;
+                border: 1px solid #d2d2d7;
+                border-radius: 8px;
+            }
+            QLineEdit {
+                border: none;
+                border-bottom: 1px solid #d2d2d7;
+                padding: 10px 12px;
+                font-size: 16px;
+            }
+            QListWidget {
+                border: none;
+                font-size: 14px;
+            }
+            QListWidget::item {
+                padding: 6px 12px;
+            }
+            QListWidget::item:selected {
+                background-color: #007acc;
+                color: white;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索店铺、用户名、拼音首字母，可加 pdd/抖店/未读/已打开 筛选")
+        self.search_input.textChanged.connect(self.refresh)
+        self.search_input.returnPressed.connect(self.accept_current)
+        self.search_input.installEventFilter(self)
+        layout.addWidget(self.search_input)
+
+        self.result_list = QListWidget()
+        self.result_list.setFixedHeight(360)
+        self.result_list.itemActivated.connect(lambda item: self.accept_current())
+        layout.addWidget(self.result_list)
+
+    def popup(self):
+        """在父窗口上方居中弹出"""
+        self.search_input.clear()
+        self.refresh("")
+        parent = self.parentWidget()
+        if parent is not None:
+            center = parent.mapToGlobal(parent.rect().center())
+            self.move(center.x() - self.width() // 2, parent.mapToGlobal(parent.rect().topLeft()).y() + 80)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.search_input.setFocus()
+
+    def refresh(self, text: str):
+        """按输入重新检索"""
+        self.result_list.clear()
+        for entry in self.index.search(text, self.limit):
+            item = QListWidgetItem(f"{entry.title}    {entry.subtitle}")
+            item.setData(Qt.ItemDataRole.UserRole, entry)
+            self.result_list.addItem(item)
+        if self.result_list.count():
+            self.result_list.setCurrentRow(0)
+
+    def accept_current(self):
+        """切换到选中的店铺"""
+        item = self.result_list.currentItem()
+        if item is None:
+            return
+        entry: SwitcherEntry = item.data(Qt.ItemDataRole.UserRole)
+        self.hide()
+        self.entry_selected.emit(entry)
+
+    def eventFilter(self, obj, event):
+        """输入框中的上下键移动选中项"""
+        if obj is self.search_input and event.type() == event.Type.KeyPress:
+            key = event.key()
+            count = self.result_list.count()
+            if key in (Qt.Key.Key_Down, Qt.Key.Key_Up) and count:
+                step = 1 if key == Qt.Key.Key_Down else -1
+                self.result_list.setCurrentRow((self.result_list.currentRow() + step) % count)
+                return True
+            if key == Qt.Key.Key_Escape:
+                self.hide()
+                return True
+        return super().eventFilter(obj, event)
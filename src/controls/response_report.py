@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+回复时效报表窗口
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QLabel, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt6.QtCore import Qt, QTimer
+
+from ..services.response_analytics import (DIMENSION_NAMES, METRIC_NAMES, ResponseAnalytics, SummaryRow,
+                                           day_index, format_seconds)
+
+# 时间范围：名称 -> (起始日偏移, 结束日偏移)，相对今天；None 表示全部
+RANGES = {
+    "今天": (0, 1),
+    "昨天": (-1, 0),
+    "近7天": (-6, 1),
+    "近30天": (-29, 1),
+    "全部": None,
+}
+COLUMNS = ["名称", "次数", "平均", "p50", "p90", "p99"]
+
+
+class ResponseReportDialog(QDialog):
+    """按平台、店铺、客服查看回复时效，选中一行后显示当天每小时的统计"""
+
+    def __init__(self, get_analytics: Callable[[], ResponseAnalytics], label_of: Callable[[str, str], str],
+                 rebuild: Callable[[], None] = None, parent=None):
+        super().__init__(parent)
+        self.get_analytics = get_analytics
+        self.label_of = label_of
+        self.rebuild = rebuild
+        self._rows: List[SummaryRow] = []
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+        self.setWindowTitle("回复时效")
+        self.resize(820, 640)
+        layout = QVBoxLayout(self)
+
+        filters = QHBoxLayout()
+        self.metric_combo = QComboBox()
+        for metric, name in METRIC_NAMES.items():
+            self.metric_combo.addItem(name, metric)
+        self.dimension_combo = QComboBox()
+        for dimension, name in DIMENSION_NAMES.items():
+            self.dimension_combo.addItem(name, dimension)
+        self.dimension_combo.setCurrentIndex(self.dimension_combo.findData("platform"))
+        self.range_combo = QComboBox()
+        self.range_combo.addItems(list(RANGES))
+        for combo in (self.metric_combo, self.dimension_combo, self.range_combo):
+            combo.currentIndexChanged.connect(self.refresh)
+            filters.addWidget(combo)
+        filters.addStretch()
+        self.rebuild_button = QPushButton("从历史重新统计")
+        self.rebuild_button.setEnabled(rebuild is not None)
+        self.rebuild_button.clicked.connect(self.start_rebuild)
+        filters.addWidget(self.rebuild_button)
+        layout.addLayout(filters)
+
+        self.summary_table = self._create_table()
+        self.summary_table.currentCellChanged.connect(lambda row, *args: self.refresh_hourly())
+        layout.addWidget(self.summary_table, 3)
+
+        self.hourly_label = QLabel()
+        layout.addWidget(self.hourly_label)
+        self.hourly_table = self._create_table()
+        layout.addWidget(self.hourly_table, 4)
+
+        self._poll_timer = QTimer(self)
+        self._poll_timer.timeout.connect(self._check_rebuild)
+
+        self.refresh()
+
+    @staticmethod
+    def _create_table() -> QTableWidget:
+        table = QTableWidget(0, len(COLUMNS))
+        table.setHorizontalHeaderLabels(COLUMNS)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().hide()
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        return table
+
+    @staticmethod
+    def _fill_row(table: QTableWidget, index: int, label: str, row: Optional[SummaryRow]):
+        values = [label]
+        if row is None:
+            values += ["0", "-", "-", "-", "-"]
+        else:
+            values += [str(row.count), format_seconds(row.mean), format_seconds(row.p50),
+                       format_seconds(row.p90), format_seconds(row.p99)]
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            if column:
+                item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            table.setItem(index, column, item)
+
+    def _day_range(self):
+        offsets = RANGES[self.range_combo.currentText()]
+        if offsets is None:
+            return None, None
+        today = day_index(time.time())
+        return today + offsets[0], today + offsets[1]
+
+    def refresh(self):
+        """按所选指标、维度和时间范围刷新汇总表"""
+        metric = self.metric_combo.currentData()
+        dimension = self.dimension_combo.currentData()
+        start_day, end_day = self._day_range()
+        self._rows = self.get_analytics().summary(metric, dimension, start_day, end_day)
+        self.summary_table.setRowCount(len(self._rows))
+        for index, row in enumerate(self._rows):
+            self._fill_row(self.summary_table, index, self.label_of(dimension, row.key), row)
+        if self._rows:
+            self.summary_table.setCurrentCell(0, 0)
+        self.refresh_hourly()
+
+    def refresh_hourly(self):
+        """显示选中行在所选范围最后一天的每小时统计"""
+        index = self.summary_table.currentRow()
+        if not 0 <= index < len(self._rows):
+            self.hourly_label.setText("")
+            self.hourly_table.setRowCount(0)
+            return
+        dimension = self.dimension_combo.currentData()
+        key = self._rows[index].key
+        _, end_day = self._day_range()
+        day = (end_day if end_day is not None else day_index(time.time()) + 1) - 1
+        self.hourly_label.setText(
+            f"{self.label_of(dimension, key)} {time.strftime('%Y-%m-%d', time.localtime(day * 86400 + 43200))} 每小时")
+        rows = self.get_analytics().hourly(self.metric_combo.currentData(), dimension, key, day)
+        self.hourly_table.setRowCount(len(rows))
+        for hour, row in enumerate(rows):
+            self._fill_row(self.hourly_table, hour, f"{hour:02d}:00", row)
+
+    def start_rebuild(self):
+        """在后台线程中重新统计，完成后刷新"""
+        if self._rebuild_thread is not None:
+            return
+        self.rebuild_button.setEnabled(False)
+        self.rebuild_button.setText("正在统计...")
+        self._rebuild_thread = threading.Thread(target=self.rebuild, name="response_rebuild", daemon=True)
+        self._rebuild_thread.start()
+        self._poll_timer.start(200)
+
+    def _check_rebuild(self):
+        if self._rebuild_thread is None or self._rebuild_thread.is_alive():
+            return
+        self._poll_timer.stop()
+        self._rebuild_thread = None
+        self.rebuild_button.setText("从历史重新统计")
+        self.rebuild_button.setEnabled(True)
+        self.refresh()
@@ -3,6 +3,7 @@
 店铺列表控件
 """
 
+import logging
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                            QLabel, QScrollArea, QFrame, QGridLayout, QSizePolicy)
 from PyQt6.QtCore import pyqtSignal, Qt
@@ -13,6 +14,8 @@ from io import BytesIO
 
 from ..db.entities import PlatformShop
 
+logger = logging.getLogger(__name__)
+
 
 class ShopCard(QFrame):
     """店铺卡片"""
@@ -89,7 +92,7 @@ class ShopCard(QFrame):
                     self.avatar_label.setPixmap(scaled_pixmap)
                     return
             except Exception as e:
-                print(f"加载头像失败: {e}")
+                logger.error("加载头像失败: %s", e)
         
         # 默认头像
         self.avatar_label.setText("👤")
@@ -4,15 +4,51 @@ WebView控件，用于嵌入电商平台网页
 """
 
 import json
+import logging
+import shutil
+import time
 import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, List
 
 from PyQt6.QtCore import QUrl, pyqtSignal, QTimer
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineScript, QWebEngineProfile, QWebEnginePage
 
 from ..db.entities import PlatformShop, NewMessage, PlatformResponse
+from ..core.resource_mode import DEFAULT_MODE, apply_web_settings
+
+logger = logging.getLogger(__name__)
+
+# 页面请求上传后须在此时间内打开文件选择框，过期的待上传文件不再提供(秒)
+UPLOAD_CHOOSER_TIMEOUT = 10.0
+
+
+class PlatformWebPage(QWebEnginePage):
+    """平台页面，支持由程序提供待上传的文件"""
+    
+    def __init__(self, profile: QWebEngineProfile, parent=None):
+        super().__init__(profile, parent)
+        # 请求ID -> (文件, 过期时间)，页面每次请求上传时加入一项，打开文件选择框时取出
+        self.pending_upload_files: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    def expect_upload(self, request_id: str, file: str):
+        """页面即将为该请求打开文件选择框"""
+        self.pending_upload_files[request_id] = (file, time.monotonic() + UPLOAD_CHOOSER_TIMEOUT)
+    
+    def discard_upload(self, request_id: str):
+        """请求已回执或放弃，不再提供其文件"""
+        self.pending_upload_files.pop(request_id, None)
+    
+    def chooseFiles(self, mode, old_files, accepted_mime_types):
+        """页面打开文件选择框时，优先使用待上传的文件；超时未取走的丢弃"""
+        now = time.monotonic()
+        while self.pending_upload_files:
+            _, (file, deadline) = self.pending_upload_files.popitem(last=False)
+            if deadline >= now:
+                return [file]
+        return super().chooseFiles(mode, old_files, accepted_mime_types)
 
 
 class PlatformWebView(QWebEngineView):
@@ -22,63 +58,134 @@ class PlatformWebView(QWebEngineView):
     user_info_received = pyqtSignal(PlatformShop)  # 用户信息接收
     new_message_received = pyqtSignal(NewMessage)  # 新消息接收
     message_received = pyqtSignal(dict)  # 普通消息接收
+    page_ready = pyqtSignal(str, float)  # 就绪触发条件, 就绪耗时(毫秒)
+    render_process_crashed = pyqtSignal(str, int)  # 终止状态, 退出码
+    send_ack_received = pyqtSignal(dict)  # 发送回执
+    conversations_changed = pyqtSignal(dict)  # 待回复会话变化
+    compliance_check_requested = pyqtSignal(int, str)  # 请求序号, 输入框文本
+    quick_reply_query_requested = pyqtSignal(int, str)  # 请求序号, “/”之后的检索文本
+    quick_reply_selected = pyqtSignal(str, dict)  # 模板ID, 当前会话的买家 {id, name}
+    
+    # 配置文件根目录与HTTP缓存上限(字节，0表示由Chromium自动决定)，由主窗口按配置设置
+    profiles_dir = Path.cwd() / "webview_profiles"
+    http_cache_max_bytes = 0
+    # 资源模式（见 core/resource_mode.py），决定页面设置
+    resource_mode = DEFAULT_MODE
+    # 平台消息录制器（BridgeRecorder），为None时不录制
+    recorder = None
+    # 是否在页面中启用发送前违禁词检查
+    compliance_enabled = False
     
     def __init__(self, platform: str, webview_id: str = None, parent=None):
         super().__init__(parent)
         
         self.platform = platform
         self.webview_id = webview_id or str(uuid.uuid4()).replace("-", "")
-        self._script_injected = False
+        self.is_ready = False
+        self.time_to_ready_ms: Optional[float] = None
+        self._load_started_at: Optional[float] = None
+        
+        # 看门狗使用的存活与活跃度信息
+        self.last_heartbeat_at = time.monotonic()
+        self.last_activity_at = time.monotonic()
+        self.unread_count = 0
+        
+        # 发送中的图片/视频：请求ID -> 待上传文件，收到回执后移除
+        self._upload_files: Dict[str, str] = {}
         
         # 设置WebEngine配置文件
         self._setup_profile()
         
         # 设置页面
         self._setup_page()
-        
-        # 连接信号
-        self.page().loadFinished.connect(self._on_load_finished)
     
     def _setup_profile(self):
         """设置WebEngine配置文件"""
         # 为每个WebView创建独立的配置文件
-        profile_path = Path.cwd() / "webview_profiles" / self.webview_id
+        profile_path = self.profiles_dir / self.webview_id
         profile_path.mkdir(parents=True, exist_ok=True)
         
-        # 创建配置文件
+        # 创建配置文件，缓存也放在店铺目录下，便于统计和清理磁盘占用
         profile = QWebEngineProfile(str(profile_path), self)
-        page = QWebEnginePage(profile, self)
+        self._migrate_legacy_storage(Path(profile.persistentStoragePath()), profile_path)
+        profile.setPersistentStoragePath(str(profile_path))
+        profile.setCachePath(str(profile_path / "cache"))
+        page = PlatformWebPage(profile, self)
         self.setPage(page)
+        self.apply_resource_mode()
+    
+    def apply_resource_mode(self):
+        """按当前资源模式设置页面属性和HTTP缓存上限，切换模式时对已打开的页面再次调用"""
+        profile = self.page().profile()
+        profile.setHttpCacheMaximumSize(self.http_cache_max_bytes)
+        apply_web_settings(profile.settings(), self.resource_mode)
+    
+    @staticmethod
+    def _migrate_legacy_storage(legacy_path: Path, profile_path: Path):
+        """旧版本按存储名把数据放在系统数据目录下，迁移到店铺目录以保留登录状态"""
+        if legacy_path == profile_path or not legacy_path.is_dir():
+            return
+        try:
+            for child in legacy_path.iterdir():
+                target = profile_path / child.name
+                if not target.exists():
+                    shutil.move(str(child), str(target))
+            shutil.rmtree(legacy_path, ignore_errors=True)
+        except Exception as e:
+            logger.error("迁移配置文件失败: %s", e)
     
     def _setup_page(self):
         """设置页面"""
-        # 添加JavaScript桥接对象
-        self.page().runJavaScript("""
-            window.pywebview = {
-                api: {
-                    post_message: function(data) {
-                        // 通过控制台输出消息，然后在Python中捕获
-                        console.log('PYWEBVIEW_MESSAGE:' + JSON.stringify(data));
-                    }
-                }
-            };
-        """)
+        # 桥接对象需在页面脚本之前创建，并在每次导航后自动重建
+        self._add_user_script("pdkbot_bridge", Path(__file__).parent.parent / "platform" / "bridge.js",
+                              QWebEngineScript.InjectionPoint.DocumentCreation)
+        self._inject_platform_script()
         
         # 监听控制台消息
         self.page().javaScriptConsoleMessage = self._handle_console_message
+        
+        # 连接信号
+        self.page().loadStarted.connect(self._on_load_started)
+        self.page().renderProcessTerminated.connect(self._on_render_process_terminated)
+    
+    def _add_user_script(self, name: str, script_path: Path,
+                         injection_point: QWebEngineScript.InjectionPoint) -> bool:
+        """以用户脚本方式注册脚本"""
+        if not script_path.exists():
+            logger.error("平台脚本不存在: %s", script_path)
+            return False
+        
+        try:
+            with open(script_path, 'r', encoding='utf-8') as f:
+                script_content = f.read()
+        except Exception as e:
+            logger.error("读取平台脚本失败: %s", e)
+            return False
+        
+        script = QWebEngineScript()
+        script.setName(name)
+        script.setSourceCode(script_content)
+        script.setInjectionPoint(injection_point)
+        script.setWorldId(QWebEngineScript.ScriptWorldId.MainWorld)
+        script.setRunsOnSubFrames(False)
+        self.page().scripts().insert(script)
+        return True
     
     def _handle_console_message(self, level, message, line, source):
         """处理控制台消息"""
         if message.startswith('PYWEBVIEW_MESSAGE:'):
+            self.last_heartbeat_at = time.monotonic()
             try:
                 data_json = message[18:]  # 去除前缀
                 data = json.loads(data_json)
                 self._handle_platform_message(data)
             except Exception as e:
-                print(f"处理平台消息失败: {e}")
+                logger.error("%s[%s] 处理平台消息失败: %s", self.platform, self.webview_id, e)
     
     def _handle_platform_message(self, data: Dict[str, Any]):
         """处理平台消息"""
+        if self.recorder is not None:
+            self.recorder.record(self.platform, self.webview_id, data)
         try:
             message_type = data.get('type', '')
             response_str = data.get('response', '{}')
@@ -103,50 +210,177 @@ class PlatformWebView(QWebEngineView):
                     has_new_message=response_data.get('hasNewMessage', False),
                     new_message_count=response_data.get('newMessageCount', 0)
                 )
+                if new_msg.new_message_count != self.unread_count:
+                    self.unread_count = new_msg.new_message_count
+                    self.last_activity_at = time.monotonic()
                 self.new_message_received.emit(new_msg)
                 
             elif message_type == 'receiveMessage':
                 # 接收消息
+                self.last_activity_at = time.monotonic()
                 self.message_received.emit(response_data)
                 
-        except Exception as e:
-            print(f"处理平台消息失败: {e}")
+            elif message_type == 'bridgeReady':
+                # 桥接脚本已注入（每次导航后）
+                self._on_bridge_ready()
+                
+            elif message_type == 'ready':
+                # 页面就绪
+                self._on_page_ready(response_data)
+                
+            elif message_type == 'uploadRequest':
+                # 即将打开文件选择框，准备该条消息的文件
+                self._on_upload_request(str(response_data.get('id', '')))
+                
+            elif message_type == 'sendAck':
+                # 发送回执
+                request_id = str(response_data.get('id', ''))
+                self._upload_files.pop(request_id, None)
+                self.page().discard_upload(request_id)
+                self.send_ack_received.emit(response_data)
+                
+            elif message_type == 'conversations':
+                # 待回复会话变化
+                self.conversations_changed.emit(response_data)
+                
+            elif message_type == 'complianceCheck':
+                # 输入框内容变化，请求违禁词检查
+                self.compliance_check_requested.emit(int(response_data.get('seq', 0)),
+                                                     str(response_data.get('text', '')))
+                
+            elif message_type == 'quickReplyQuery':
+                # 输入框中输入了“/”，检索快捷回复
+                self.quick_reply_query_requested.emit(int(response_data.get('seq', 0)),
+                                                      str(response_data.get('query', '')))
+                
+            elif message_type == 'quickReplySelect':
+                # 选中快捷回复，替换变量后写回输入框
+                self.quick_reply_selected.emit(str(response_data.get('id', '')),
+                                               response_data.get('buyer') or {})
+                
+            elif message_type == 'heartbeat':
+                # 心跳，存活时间已在控制台消息处理中更新
+                pass
+                
+        except Exception:
+            logger.exception("%s[%s] 处理平台消息 %s 失败", self.platform, self.webview_id, data.get('type'))
     
-    def _on_load_finished(self, success: bool):
-        """页面加载完成"""
-        if success and not self._script_injected:
-            self._inject_platform_script()
+    def _on_load_started(self):
+        """页面开始加载"""
+        self.is_ready = False
+        # 导航会中断页面中正在进行的发送，未完成的上传由发送队列超时重试
+        self._upload_files.clear()
+        self.page().pending_upload_files.clear()
+        self._load_started_at = time.monotonic()
     
-    def _inject_platform_script(self):
-        """注入平台脚本"""
-        script_path = Path(__file__).parent.parent / "platform" / f"{self.platform}.js"
-        if not script_path.exists():
-            print(f"平台脚本不存在: {script_path}")
+    def _on_render_process_terminated(self, status, exit_code: int):
+        """渲染进程终止"""
+        if status == QWebEnginePage.RenderProcessTerminationStatus.NormalTerminationStatus:
             return
-        
-        try:
-            with open(script_path, 'r', encoding='utf-8') as f:
-                script_content = f.read()
-            
-            # 延迟注入脚本
-            QTimer.singleShot(2000, lambda: self._do_inject_script(script_content))
-            
-        except Exception as e:
-            print(f"读取平台脚本失败: {e}")
+        logger.error("%s[%s] 渲染进程异常终止: %s, 退出码 %s", self.platform, self.webview_id,
+                     status.name, exit_code)
+        self.is_ready = False
+        self.render_process_crashed.emit(status.name, exit_code)
     
-    def _do_inject_script(self, script_content: str):
-        """执行脚本注入"""
+    def loading_seconds(self) -> Optional[float]:
+        """页面开始加载至今的秒数，已就绪或尚未开始加载时返回None"""
+        if self.is_ready or self._load_started_at is None:
+            return None
+        return time.monotonic() - self._load_started_at
+    
+    def renderer_pid(self) -> Optional[int]:
+        """获取渲染进程PID，进程不存在时返回None"""
         try:
-            self.page().runJavaScript(script_content)
-            self._script_injected = True
-            print(f"已注入{self.platform}平台脚本")
-        except Exception as e:
-            print(f"注入平台脚本失败: {e}")
+            pid = self.page().renderProcessPid()
+        except Exception:
+            return None
+        return pid or None
+    
+    def _on_bridge_ready(self):
+        """桥接脚本注入后按当前设置开启违禁词检查；页面未就绪(如等待超时)时同样生效"""
+        if self.compliance_enabled:
+            self.execute_script("window.pywebview && window.pywebview.setCompliance(true);")
+    
+    def _on_page_ready(self, data: Dict[str, Any]):
+        """平台脚本上报就绪条件已满足"""
+        trigger = data.get('trigger', '')
+        if self._load_started_at is not None:
+            elapsed_ms = (time.monotonic() - self._load_started_at) * 1000
+        else:
+            elapsed_ms = float(data.get('elapsed', 0))
+        
+        self.is_ready = True
+        self.time_to_ready_ms = elapsed_ms
+        if data.get('degraded', False):
+            # 就绪条件超时未满足，平台脚本已按降级模式启动
+            logger.warning("%s[%s] 等待页面就绪超时，按降级模式继续，耗时 %.0f ms",
+                           self.platform, self.webview_id, elapsed_ms)
+        else:
+            logger.info("%s[%s] 页面就绪(%s)，耗时 %.0f ms", self.platform, self.webview_id, trigger, elapsed_ms)
+        self.page_ready.emit(trigger, elapsed_ms)
+    
+    def _inject_platform_script(self):
+        """注入平台脚本"""
+        script_path = Path(__file__).parent.parent / "platform" / f"{self.platform}.js"
+        # 在DOM解析完成后执行，脚本自行等待平台声明的就绪条件
+        if self._add_user_script(f"pdkbot_{self.platform}", script_path,
+                                 QWebEngineScript.InjectionPoint.DocumentReady):
+            logger.debug("已注入%s平台脚本", self.platform)
     
     def load_platform_url(self, url: str):
         """加载平台URL"""
         self.load(QUrl(url))
     
+    def recycle(self):
+        """重新加载页面以回收渲染进程内存"""
+        self.is_ready = False
+        self.last_heartbeat_at = time.monotonic()
+        self.reload()
+    
+    def open_conversation(self, conversation_id: str):
+        """在页面中打开指定会话"""
+        script = (f"window.pywebview && window.pywebview.openConversation("
+                  f"{json.dumps(conversation_id, ensure_ascii=False)})"
+                  f".catch(e => console.error('打开会话失败:', e));")
+        self.execute_script(script)
+    
+    def send_batch(self, items: List[Dict[str, Any]]):
+        """批量发送消息，每条消息由页面通过sendAck回执"""
+        # 需要上传的文件在页面请求上传时交给文件选择框，由浏览器直接从磁盘读取；
+        # 重试时同一ID只保留一项，已发送过的ID页面不会请求上传
+        for item in items:
+            if item.get("file"):
+                self._upload_files[item["id"]] = item["file"]
+        script = (f"window.pywebview && window.pywebview.sendBatch("
+                  f"{json.dumps(items, ensure_ascii=False)})"
+                  f".catch(e => console.error('发送消息失败:', e));")
+        self.execute_script(script)
+    
+    def _on_upload_request(self, request_id: str):
+        """页面请求上传某条消息的文件，准备好后通知页面打开文件选择框"""
+        file = self._upload_files.get(request_id, "")
+        if file:
+            self.page().expect_upload(request_id, file)
+        self.execute_script(f"window.pywebview && window.pywebview.uploadReady("
+                            f"{json.dumps(request_id)}, {json.dumps(bool(file))});")
+    
+    def show_compliance(self, seq: int, hits: List[Dict[str, Any]], block: bool):
+        """把违禁词检查结果交给页面提示，block为True时页面拦截含禁止发送词语的消息"""
+        script = (f"window.pywebview && window.pywebview.showCompliance("
+                  f"{seq}, {json.dumps(hits, ensure_ascii=False)}, {json.dumps(block)});")
+        self.execute_script(script)
+    
+    def show_quick_replies(self, seq: int, items: List[Dict[str, Any]]):
+        """把快捷回复检索结果交给页面在输入框上方列出"""
+        script = (f"window.pywebview && window.pywebview.showQuickReplies("
+                  f"{seq}, {json.dumps(items, ensure_ascii=False)});")
+        self.execute_script(script)
+    
+    def insert_text(self, text: str):
+        """把文本写入聊天输入框（替换原有内容），不发送"""
+        script = f"window.pywebview && window.pywebview.insertText({json.dumps(text, ensure_ascii=False)});"
+        self.execute_script(script)
+    
     def execute_script(self, script: str, callback: Callable = None):
         """执行JavaScript脚本"""
         if callback:
@@ -3,64 +3,252 @@
 应用程序核心类，管理全局状态和配置
 """
 
+import logging
 import os
 import json
 from pathlib import Path
 from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 from typing import Dict, List, Optional
 
+from .event_bus import EventBus
+from .config_watcher import ConfigWatcher, diff_config, validate_config
+from .log_setup import LogService
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).parent.parent.parent
+DEFAULT_DATA_DIR = APP_DIR / "data"
+
+# 内置平台，可通过 config.json 中的 "platforms" 覆盖名称、地址或停用
+DEFAULT_PLATFORMS = {
+    "pdd": {
+        "name": "拼多多",
+        "url": "https://mms.pinduoduo.com/chat-merchant/index.html#/",
+        "icon": "🛍️",
+        "enabled": True
+    },
+    "doudian": {
+        "name": "抖店",
+        "url": "https://fxg.jinritemai.com/ffa/mshop/shopIndex",
+        "icon": "📱",
+        "enabled": True
+    },
+    "kuaishou": {
+        "name": "快手",
+        "url": "https://s.kwaixiaodian.com/zone/settles/chat",
+        "icon": "⚡",
+        "enabled": True
+    },
+    "jd": {
+        "name": "京东",
+        "url": "https://dongdong.jd.com/",
+        "icon": "🛒",
+        "enabled": True
+    }
+}
+
 class PdkBotApplication(QObject):
     """PdkBot应用程序核心类"""
     
     # 信号
     new_message_received = pyqtSignal(str, dict)  # 平台名, 消息数据
     shop_updated = pyqtSignal(str, dict)  # 平台名, 店铺数据
+    config_reloaded = pyqtSignal(dict, list)  # 旧配置, 变化的配置项
+    config_rejected = pyqtSignal(str)  # 错误信息
     
-    def __init__(self):
+    def __init__(self, data_dir: Optional[Path] = None, profiles_dir: Optional[Path] = None):
+        """data_dir 为数据目录，默认为程序目录下的 data/；profiles_dir 为店铺配置文件目录，
+        默认为程序目录下的 webview_profiles/。回放时两者都使用临时目录"""
         super().__init__()
-        self.app_dir = Path(__file__).parent.parent.parent
-        self.data_dir = self.app_dir / "data"
-        self.profiles_dir = self.app_dir / "webview_profiles"
+        self.app_dir = APP_DIR
+        self.data_dir = Path(data_dir) if data_dir else DEFAULT_DATA_DIR
+        self.profiles_dir = Path(profiles_dir) if profiles_dir else self.app_dir / "webview_profiles"
         self.platform_dir = self.app_dir / "src" / "platform"
+        self.config_file = self.data_dir / "config.json"
         
         # 确保目录存在
         self.data_dir.mkdir(exist_ok=True)
         self.profiles_dir.mkdir(exist_ok=True)
         
+        # 先以默认设置启动日志，加载配置过程中的错误也能写入日志文件
+        self.log_service = LogService(self.data_dir / "logs")
+        self.log_service.start()
+        
         # 初始化配置
         self.config = self._load_config()
+        for error in self.validate_config(self.config):
+            logger.warning("配置错误: %s", error)
+        logging_config = self.config.get("logging", {})
+        if not validate_config({"logging": logging_config}):
+            self.log_service.update_config(logging_config)
+        
+        # 配置文件被外部修改后，校验通过再整体替换并通知各模块
+        self.config_watcher = ConfigWatcher(self.config_file, self)
+        self.config_watcher.file_changed.connect(self.reload_config)
+        self.config_watcher.load_failed.connect(self.on_config_load_failed)
+        
+        # 事件总线，供日志、存储等订阅者在后台线程处理事件
+        self.event_bus = EventBus(self.config.get("event_bus", {}))
         
+    @staticmethod
+    def read_startup_config(data_dir: Optional[Path] = None) -> dict:
+        """创建 QApplication 之前读取配置（如Chromium参数），不创建应用实例，读取失败时返回空配置"""
+        config_file = Path(data_dir or DEFAULT_DATA_DIR) / "config.json"
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except Exception:
+            return {}
+        return config if isinstance(config, dict) else {}
+    
     def _load_config(self) -> dict:
         """加载应用配置"""
-        config_file = self.data_dir / "config.json"
-        if config_file.exists():
+        if self.config_file.exists():
             try:
-                with open(config_file, 'r', encoding='utf-8') as f:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
-                print(f"加载配置失败: {e}")
+                logger.error("加载配置失败: %s", e)
         
         # 默认配置
         return {
             "auto_reply": False,
+            "auto_reply_cooldown": 60,
             "notification": True,
             "theme": "light",
+            "knowledge_base": {
+                "top_k": 3
+            },
+            "order_lookup": {
+                "enabled": False,
+                "ttl": 300,
+                "apis": {}
+            },
+            "catalog_sync": {
+                "interval": 600,
+                "apis": {}
+            },
+            "transfer_router": {
+                "idle_seconds": 600,
+                "agents": {}
+            },
+            "conversation_queue": {
+                "hotkey": "Ctrl+J",
+                "sla_seconds": {}
+            },
+            "quick_switcher": {
+                "hotkey": "Ctrl+K",
+                "limit": 20
+            },
+            "session_restore": {
+                "enabled": True,
+                "background_concurrency": 1
+            },
+            "event_bus": {
+                "workers": 4,
+                "max_queue": 1000
+            },
+            "bridge_recorder": {
+                "enabled": False
+            },
+            "local_api": {
+                "enabled": False,
+                "port": 17890,
+                "token": ""
+            },
+            "poll_scheduler": {
+                "min_interval": 1.0,
+                "max_interval": 30.0,
+                "budget_per_second": 10
+            },
+            "compliance": {
+                "enabled": True,
+                "block_send": True
+            },
+            "quick_replies": {
+                "limit": 8
+            },
+            "response_analytics": {
+                "session_gap": 1800,
+                "hours": 48,
+                "days": 30,
+                "save_interval": 600
+            },
+            "resource_mode": {
+                "mode": "default",
+                "sample_interval": 60
+            },
+            "profile_janitor": {
+                "enabled": True,
+                "http_cache_mb": 64,
+                "quota_mb": 512
+            },
+            "watchdog": {
+                "enabled": True,
+                "memory_budget_mb": 1024,
+                "heartbeat_timeout": 180
+            },
+            "logging": {
+                "level": "INFO",
+                "levels": {},
+                "console": True,
+                "max_mb": 5,
+                "backup_count": 5,
+                "buffer_size": 2000
+            },
             "platforms": {
-                "pdd": {"enabled": True, "name": "拼多多"},
-                "doudian": {"enabled": True, "name": "抖店"},
-                "kuaishou": {"enabled": True, "name": "快手"},
-                "jd": {"enabled": True, "name": "京东"}
+                platform: {"enabled": True} for platform in DEFAULT_PLATFORMS
             }
         }
     
     def save_config(self):
-        """保存应用配置"""
-        config_file = self.data_dir / "config.json"
+        """保存应用配置，先写临时文件再替换，避免中途退出留下不完整的配置"""
+        data = json.dumps(self.config, ensure_ascii=False, indent=2).encode('utf-8')
+        temp_file = self.config_file.with_name(self.config_file.name + ".tmp")
         try:
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            with open(temp_file, 'wb') as f:
+                f.write(data)
+            self.config_watcher.mark_saved(data)
+            os.replace(temp_file, self.config_file)
         except Exception as e:
-            print(f"保存配置失败: {e}")
+            logger.error("保存配置失败: %s", e)
+    
+    def platform_configs(self, config: dict = None) -> Dict[str, dict]:
+        """内置平台与配置中的覆盖项合并后的平台表"""
+        platforms = {platform: dict(defaults) for platform, defaults in DEFAULT_PLATFORMS.items()}
+        for platform, overrides in (config or self.config).get("platforms", {}).items():
+            platforms.setdefault(platform, {"name": platform, "url": "", "icon": "🌐", "enabled": True})
+            platforms[platform].update(overrides)
+        return platforms
+    
+    def validate_config(self, config: dict) -> List[str]:
+        """校验配置，另外要求每个平台都有地址和对应的平台脚本"""
+        errors = validate_config(config)
+        if errors:
+            return errors
+        for platform, platform_config in self.platform_configs(config).items():
+            if not platform_config["url"]:
+                errors.append(f"platforms.{platform}.url 不能为空")
+            if self.get_platform_script_path(platform) is None:
+                errors.append(f"平台 {platform} 没有对应的平台脚本")
+        return errors
+    
+    def reload_config(self, config: dict):
+        """校验新配置，全部通过后整体替换，再通知各模块应用变化的配置项"""
+        errors = self.validate_config(config)
+        if errors:
+            self.on_config_load_failed("；".join(errors))
+            return
+        sections = diff_config(self.config, config)
+        if not sections:
+            return
+        old_config, self.config = self.config, config
+        self.config_reloaded.emit(old_config, sections)
+    
+    def on_config_load_failed(self, error: str):
+        """配置文件有误时保留当前配置"""
+        logger.warning("配置未应用: %s", error)
+        self.config_rejected.emit(error)
     
     def get_platform_script_path(self, platform: str) -> Optional[Path]:
         """获取平台脚本路径"""
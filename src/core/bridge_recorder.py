@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+平台消息录制与回放
+
+录制：PlatformWebView 处理的每条平台消息连同时间、平台和 webview_id 追加写入
+gzip 压缩的 JSON Lines 文件（data/recordings/），写入在后台线程中进行。
+
+回放：用不加载网页的 ReplayWebView 代替真实页面，把录制的消息按原始间隔
+（可加速，或尽快）送回 PlatformWebView._handle_platform_message，经过与真实
+页面相同的 PlatformPage/MainWindow 信号路径，并统计每条消息占用界面线程的时间。
+"""
+
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from ..controls.webview_widget import PlatformWebView
+from ..db.entities import PlatformShop
+
+logger = logging.getLogger(__name__)
+
+# 录制文件刷新到磁盘的间隔(秒)
+FLUSH_INTERVAL = 1.0
+# 尽快回放时每次定时器回调最多占用的时间(秒)，之后让出界面线程处理绘制等事件
+MAX_SPEED_SLICE = 0.05
+
+
+class BridgeRecorder:
+    """平台消息录制器，record() 只入队，由后台线程压缩写入"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+        self._queue: "queue.SimpleQueue[Optional[Tuple]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name="bridge_recorder", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def default_path(data_dir: Path) -> Path:
+        return data_dir / "recordings" / f"bridge-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+
+    def record(self, platform: str, webview_id: str, data: Dict):
+        self.count += 1
+        self._queue.put((time.time(), platform, webview_id, data))
+
+    def _write_loop(self):
+        try:
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                last_flush = time.monotonic()
+                while True:
+                    try:
+                        item = self._queue.get(timeout=FLUSH_INTERVAL)
+                    except queue.Empty:
+                        item = ()
+                    if item is None:
+                        break
+                    if item:
+                        t, platform, webview_id, data = item
+                        f.write(json.dumps({"t": round(t, 3), "p": platform, "w": webview_id, "m": data},
+                                           ensure_ascii=False, separators=(",", ":")) + "\n")
+                    # 定期同步刷新，程序异常退出时已写入的部分仍可读取
+                    if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                        f.flush()
+                        last_flush = time.monotonic()
+        except Exception as e:
+            logger.error("录制平台消息失败: %s", e)
+
+    def close(self):
+        """写完已入队的消息后关闭文件"""
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+
+def iter_recording(path: Path) -> Iterator[Dict]:
+    """逐条读取录制文件，忽略异常退出时未写完整的末尾"""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except (EOFError, zlib.error, OSError) as e:
+        logger.warning("录制文件未完整结束，已读取到可用部分: %s", e)
+
+
+class ReplayWebView(PlatformWebView):
+    """回放用的WebView，不创建配置文件、不加载网页"""
+
+    def _setup_profile(self):
+        pass
+
+    def _setup_page(self):
+        pass
+
+    def apply_resource_mode(self):
+        pass
+
+    def load_platform_url(self, url: str):
+        self.is_ready = False
+        self._load_started_at = time.monotonic()
+
+    def recycle(self):
+        self.last_heartbeat_at = time.monotonic()
+
+    def renderer_pid(self) -> Optional[int]:
+        return None
+
+    def send_batch(self, items: List[Dict]):
+        pass
+
+    def execute_script(self, script: str, callback=None):
+        pass
+
+
+@dataclass
+class ReplayReport:
+    """回放结果"""
+    events: int = 0
+    wall_seconds: float = 0.0
+    max_lag_ms: float = 0.0
+    ui_times: Dict[str, List[float]] = field(default_factory=dict)  # 消息类型 -> 界面线程耗时(秒)
+
+    def add(self, message_type: str, seconds: float):
+        self.events += 1
+        self.ui_times.setdefault(message_type, []).append(seconds)
+
+    def format(self) -> str:
+        all_times = [t for times in self.ui_times.values() for t in times]
+        lines = [f"回放 {self.events} 条消息，用时 {self.wall_seconds:.2f} 秒，"
+                 f"界面线程合计 {sum(all_times):.2f} 秒，最大延迟 {self.max_lag_ms:.0f} ms"]
+        for message_type, times in sorted(self.ui_times.items(), key=lambda item: -sum(item[1])):
+            times = sorted(times)
+            lines.append(
+                f"  {message_type or '(无类型)'}: {len(times)} 条，平均 {sum(times) / len(times) * 1000:.3f} ms，"
+                f"p50 {times[len(times) // 2] * 1000:.3f} ms，p99 {times[int(len(times) * 0.99)] * 1000:.3f} ms，"
+                f"最大 {times[-1] * 1000:.3f} ms")
+        return "\n".join(lines)
+
+
+class BridgeReplayer(QObject):
+    """把录制的平台消息送回平台页面"""
+
+    # 信号
+    finished = pyqtSignal(object)  # ReplayReport
+
+    def __init__(self, pages: Dict[str, object], path: Path, speed: float = 1.0, parent=None):
+        """speed 为回放倍速，0 表示尽快回放"""
+        super().__init__(parent)
+        self.pages = pages
+        self.speed = speed
+        self.records = list(iter_recording(path))
+        self.report = ReplayReport()
+        self._index = 0
+        self._start = 0.0
+        self._origin = self.records[0]["t"] if self.records else 0.0
+
+        # 之后创建的店铺页面（包括恢复的占位标签页）都使用回放WebView
+        for page in self.pages.values():
+            page.webview_class = ReplayWebView
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        """按首次出现的顺序打开录制中的店铺，然后开始回放"""
+        opened = set()
+        for record in self.records:
+            key = (record["p"], record["w"])
+            page = self.pages.get(record["p"])
+            if key in opened or page is None:
+                continue
+            opened.add(key)
+            page.load_shop(PlatformShop(webview_id=record["w"], platform=record["p"],
+                                        user_name=f"回放{len(opened)}"))
+        logger.info("开始回放 %s 条消息，%s 个店铺，倍速 %s", len(self.records), len(opened),
+                    "最快" if self.speed <= 0 else self.speed)
+        self._start = time.perf_counter()
+        self._timer.start(0)
+
+    def _due(self, record: Dict) -> float:
+        """消息应被处理的时间（相对回放开始）"""
+        return 0.0 if self.speed <= 0 else (record["t"] - self._origin) / self.speed
+
+    def _tick(self):
+        slice_end = time.perf_counter() + MAX_SPEED_SLICE
+        while self._index < len(self.records):
+            record = self.records[self._index]
+            now = time.perf_counter()
+            elapsed = now - self._start
+            due = self._due(record)
+            if due > elapsed:
+                self._timer.start(int((due - elapsed) * 1000))
+                return
+            if now >= slice_end:
+                self._timer.start(0)
+                return
+
+            self._index += 1
+            page = self.pages.get(record["p"])
+            webview = page.webviews.get(record["w"]) if page else None
+            if webview is None:
+                continue
+            if self.speed > 0:
+                self.report.max_lag_ms = max(self.report.max_lag_ms, (elapsed - due) * 1000)
+            webview.last_heartbeat_at = time.monotonic()
+            begin = time.perf_counter()
+            webview._handle_platform_message(record["m"])
+            self.report.add(record["m"].get("type", ""), time.perf_counter() - begin)
+
+        self.report.wall_seconds = time.perf_counter() - self._start
+        self.finished.emit(self.report)
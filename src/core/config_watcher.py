@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+配置文件热加载：监视 data/config.json，读取、解析并校验后通知应用按配置项比较差异
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from .log_setup import LEVELS
+from .resource_mode import RESOURCE_MODES
+
+# 文件变化后等待多久再读取(毫秒)，编辑器保存时往往连续触发多次
+DEBOUNCE_MS = 300
+
+NUMBER = "number"
+
+# 各配置项的类型要求；字典配置项列出其中各键的类型，未列出的键不检查
+CONFIG_SCHEMA = {
+    "auto_reply": bool,
+    "auto_reply_cooldown": NUMBER,
+    "notification": bool,
+    "theme": str,
+    "knowledge_base": {"top_k": int},
+    "order_lookup": {"enabled": bool, "ttl": NUMBER, "apis": dict},
+    "catalog_sync": {"interval": NUMBER, "apis": dict},
+    "transfer_router": {"idle_seconds": NUMBER, "agents": dict},
+    "conversation_queue": {"hotkey": str, "sla_seconds": dict},
+    "quick_switcher": {"hotkey": str, "limit": int},
+    "session_restore": {"enabled": bool, "background_concurrency": int},
+    "event_bus": {"workers": int, "max_queue": int},
+    "bridge_recorder": {"enabled": bool},
+    "local_api": {"enabled": bool, "port": int, "token": str},
+    "poll_scheduler": {"min_interval": NUMBER, "max_interval": NUMBER, "unread_interval": NUMBER,
+                       "idle_after": NUMBER, "budget_per_second": NUMBER, "night_hours": list,
+                       "night_factor": NUMBER, "probe_timeout": NUMBER, "tick_ms": int},
+    "compliance": {"enabled": bool, "block_send": bool, "reload_interval": NUMBER},
+    "quick_replies": {"limit": int},
+    "response_analytics": {"session_gap": NUMBER, "hours": int, "days": int, "save_interval": NUMBER},
+    "resource_mode": {"mode": str, "sample_interval": NUMBER},
+    "profile_janitor": {"enabled": bool, "http_cache_mb": NUMBER, "quota_mb": NUMBER, "trash_days": NUMBER},
+    "watchdog": {"enabled": bool, "memory_budget_mb": NUMBER, "heartbeat_timeout": NUMBER,
+                 "check_interval": NUMBER},
+    "logging": {"level": str, "levels": dict, "console": bool, "max_mb": NUMBER, "backup_count": int,
+                "buffer_size": int, "rate_limit_burst": int, "rate_limit_interval": NUMBER},
+    "send_rate_limits": dict,
+    "platforms": dict,
+}
+
+# 平台配置中各键的类型，只写需要覆盖的键即可
+PLATFORM_SCHEMA = {"name": str, "url": str, "icon": str, "enabled": bool}
+
+
+def _type_error(path: str, value, expected) -> str:
+    if expected == NUMBER:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"{path} 应为数字"
+        if value < 0:
+            return f"{path} 不能为负数"
+        return ""
+    if expected is int and (isinstance(value, bool) or not isinstance(value, int)):
+        return f"{path} 应为整数"
+    if expected is not int and not isinstance(value, expected):
+        return f"{path} 类型应为 {expected.__name__}"
+    return ""
+
+
+def validate_config(config) -> List[str]:
+    """检查配置的结构和取值，返回错误列表，为空表示可以应用"""
+    if not isinstance(config, dict):
+        return ["配置文件顶层应为对象"]
+    errors = []
+    for key, expected in CONFIG_SCHEMA.items():
+        if key not in config:
+            continue
+        value = config[key]
+        if isinstance(expected, dict):
+            if not isinstance(value, dict):
+                errors.append(f"{key} 应为对象")
+                continue
+            for name, item_type in expected.items():
+                if name in value:
+                    error = _type_error(f"{key}.{name}", value[name], item_type)
+                    if error:
+                        errors.append(error)
+        else:
+            error = _type_error(key, value, expected)
+            if error:
+                errors.append(error)
+    if errors:
+        return errors
+
+    poll = config.get("poll_scheduler", {})
+    if poll.get("min_interval", 0) > poll.get("max_interval", float("inf")):
+        errors.append("poll_scheduler.min_interval 不能大于 max_interval")
+    mode = config.get("resource_mode", {}).get("mode")
+    if mode is not None and mode not in RESOURCE_MODES:
+        errors.append(f"resource_mode.mode 应为 {'/'.join(RESOURCE_MODES)} 之一")
+    for key in ("conversation_queue", "quick_switcher"):
+        if config.get(key, {}).get("hotkey", None) == "":
+            errors.append(f"{key}.hotkey 不能为空")
+    logging_config = config.get("logging", {})
+    if logging_config.get("level", "INFO") not in LEVELS:
+        errors.append(f"logging.level 应为 {'/'.join(LEVELS)} 之一")
+    for name, level in logging_config.get("levels", {}).items():
+        if level not in LEVELS:
+            errors.append(f"logging.levels.{name} 应为 {'/'.join(LEVELS)} 之一")
+    if logging_config.get("buffer_size", 1) < 1:
+        errors.append("logging.buffer_size 应大于 0")
+    port = config.get("local_api", {}).get("port", 1)
+    if not 0 < port < 65536:
+        errors.append("local_api.port 应在 1-65535 之间")
+    for platform, limit in config.get("send_rate_limits", {}).items():
+        if not isinstance(limit, dict) or any(_type_error("", limit.get(name), NUMBER)
+                                              for name in ("rate", "burst")):
+            errors.append(f"send_rate_limits.{platform} 应包含数字 rate 和 burst")
+
+    for platform, platform_config in config.get("platforms", {}).items():
+        if not isinstance(platform_config, dict):
+            errors.append(f"platforms.{platform} 应为对象")
+            continue
+        for name, item_type in PLATFORM_SCHEMA.items():
+            if name in platform_config:
+                error = _type_error(f"platforms.{platform}.{name}", platform_config[name], item_type)
+                if error:
+                    errors.append(error)
+        url = platform_config.get("url")
+        if isinstance(url, str) and not url.startswith(("http://", "https://")):
+            errors.append(f"platforms.{platform}.url 应以 http:// 或 https:// 开头")
+    return errors
+
+
+def diff_config(old: Dict, new: Dict) -> List[str]:
+    """返回取值不同的顶层配置项"""
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+
+class ConfigWatcher(QObject):
+    """监视配置文件，变化后读取并解析，程序自己保存的内容不再通知"""
+
+    # 信号
+    file_changed = pyqtSignal(dict)  # 解析后的配置
+    load_failed = pyqtSignal(str)  # 错误信息
+
+    def __init__(self, path: Path, parent=None):
+        super().__init__(parent)
+        self.path = Path(path)
+        self._digest = self._read_digest()
+
+        # 同时监视目录：编辑器以替换文件的方式保存时，对文件本身的监视会失效
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.addPath(str(self.path.parent))
+        self._watch_file()
+        self._watcher.fileChanged.connect(self._schedule)
+        self._watcher.directoryChanged.connect(self._schedule)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.timeout.connect(self.check)
+
+    def _watch_file(self):
+        if self.path.exists() and str(self.path) not in self._watcher.files():
+            self._watcher.addPath(str(self.path))
+
+    def _read_digest(self) -> str:
+        try:
+            return hashlib.sha1(self.path.read_bytes()).hexdigest()
+        except OSError:
+            return ""
+
+    def _schedule(self, *args):
+        self._debounce.start(DEBOUNCE_MS)
+
+    def mark_saved(self, data: bytes):
+        """记录程序自己写入的内容，避免把保存当作外部修改再加载一次"""
+        self._digest = hashlib.sha1(data).hexdigest()
+
+    def check(self):
+        """读取配置文件，内容与上次不同时解析并发出通知"""
+        self._watch_file()
+        try:
+            data = self.path.read_bytes()
+        except OSError:
+            # 文件正在被替换或已删除，保留当前配置
+            return
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == self._digest:
+            return
+        self._digest = digest
+        try:
+            config = json.loads(data.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError) as e:
+            self.load_failed.emit(f"配置文件格式错误: {e}")
+            return
+        if not isinstance(config, dict):
+            self.load_failed.emit("配置文件顶层应为对象")
+            return
+        self.file_changed.emit(config)
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+事件总线，把平台页面产生的事件分发给日志、存储、Webhook、机器人等订阅者
+
+发布在界面线程中只做入队，不执行订阅者的处理函数。每个订阅者有独立的有界队列，
+由线程池（普通函数）或后台事件循环（协程函数）按顺序逐个处理，处理慢的订阅者
+只会让自己的队列积压，按丢弃策略处理溢出，不会拖慢界面和其他订阅者。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, ClassVar, Deque, Dict, Iterable, List, Optional, Tuple, Type
+
+from ..db.entities import ChatMessage, PlatformShop
+
+logger = logging.getLogger(__name__)
+
+# 丢弃策略
+DROP_OLDEST = "drop_oldest"    # 队列满时丢弃最早的事件
+DROP_NEWEST = "drop_newest"    # 队列满时丢弃新事件
+BLOCK = "block"                # 队列满时发布方最多等待 block_timeout 秒，仍满则丢弃新事件
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+# 默认配置，可通过 config.json 中的 "event_bus" 覆盖
+DEFAULT_BUS_CONFIG = {
+    "workers": 4,            # 线程池大小
+    "max_queue": 1000,       # 订阅者默认队列长度
+    "block_timeout": 0.05,   # BLOCK 策略的最长等待时间(秒)
+}
+# 每次调度最多连续处理的事件数，处理完后重新排队，避免长期占用线程
+DRAIN_BATCH = 64
+# 用于计算耗时分位数的样本数
+LATENCY_SAMPLES = 1024
+# 同一订阅者丢弃事件的告警间隔(秒)
+DROP_WARNING_INTERVAL = 60
+
+
+class BusEvent:
+    """事件基类，event_type 用于按名称订阅和序列化"""
+    event_type: ClassVar[str] = ""
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["type"] = self.event_type
+        return data
+
+
+@dataclass
+class NewMessageEvent(BusEvent):
+    """店铺未读消息数变化"""
+    event_type: ClassVar[str] = "new_message"
+    platform: str
+    webview_id: str
+    count: int
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class ChatMessageEvent(BusEvent):
+    """收到或发出一条聊天消息"""
+    event_type: ClassVar[str] = "chat_message"
+    message: ChatMessage
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict:
+        return {"type": self.event_type, "message": self.message.to_dict(), "timestamp": self.timestamp}
+
+
+@dataclass
+class ShopUpdatedEvent(BusEvent):
+    """店铺登录信息更新"""
+    event_type: ClassVar[str] = "shop_updated"
+    platform: str
+    shop: PlatformShop
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict:
+        return {"type": self.event_type, "platform": self.platform, "shop": self.shop.to_dict(),
+                "timestamp": self.timestamp}
+
+
+@dataclass
+class ShopReadyEvent(BusEvent):
+    """店铺页面就绪"""
+    event_type: ClassVar[str] = "shop_ready"
+    platform: str
+    webview_id: str
+    elapsed_ms: float
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class ConversationsChangedEvent(BusEvent):
+    """店铺待回复会话变化"""
+    event_type: ClassVar[str] = "conversations_changed"
+    platform: str
+    webview_id: str
+    diff: Dict
+    timestamp: float = field(default_factory=time.time)
+
+
+EVENT_TYPES: Dict[str, Type[BusEvent]] = {
+    cls.event_type: cls
+    for cls in (NewMessageEvent, ChatMessageEvent, ShopUpdatedEvent, ShopReadyEvent, ConversationsChangedEvent)
+}
+
+
+@dataclass
+class SubscriberStats:
+    """订阅者统计"""
+    name: str
+    depth: int
+    max_depth: int
+    delivered: int
+    dropped: int
+    errors: int
+    avg_latency_ms: float   # 处理函数平均耗时
+    p99_latency_ms: float
+    avg_wait_ms: float      # 事件在队列中的平均等待时间
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class Subscription:
+    """订阅者，持有自己的有界队列和统计"""
+
+    def __init__(self, bus: 'EventBus', name: str, handler: Callable, event_types: Tuple[Type[BusEvent], ...],
+                 max_queue: int, policy: str, block_timeout: float):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"未知的丢弃策略: {policy}")
+        self.bus = bus
+        self.name = name
+        self.handler = handler
+        self.event_types = event_types
+        self.max_queue = max_queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.is_async = asyncio.iscoroutinefunction(handler)
+        self.active = True
+
+        self._queue: Deque[Tuple[float, BusEvent]] = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._scheduled = False
+
+        self.max_depth = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self._total_latency = 0.0
+        self._total_wait = 0.0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._last_drop_warning = 0.0
+
+    def accepts(self, event: BusEvent) -> bool:
+        return not self.event_types or isinstance(event, self.event_types)
+
+    def offer(self, event: BusEvent):
+        """事件入队，必要时调度处理"""
+        with self._lock:
+            if not self.active:
+                return
+            if len(self._queue) >= self.max_queue:
+                if self.policy == DROP_OLDEST:
+                    self._queue.popleft()
+                    self._on_dropped()
+                elif self.policy == BLOCK and self._not_full.wait_for(
+                        lambda: len(self._queue) < self.max_queue or not self.active, self.block_timeout):
+                    pass
+                else:
+                    self._on_dropped()
+                    return
+            self._queue.append((time.perf_counter(), event))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            self.bus._schedule(self)
+
+    def _on_dropped(self):
+        self.dropped += 1
+        now = time.monotonic()
+        if now - self._last_drop_warning > DROP_WARNING_INTERVAL:
+            self._last_drop_warning = now
+            logger.warning("事件总线: 订阅者 %s 处理过慢，已丢弃 %s 个事件", self.name, self.dropped)
+
+    def drain(self, limit: int = DRAIN_BATCH):
+        """在线程池中按顺序处理一批事件"""
+        for _ in range(limit):
+            with self._lock:
+                if not self._queue or not self.active:
+                    self._scheduled = False
+                    return
+                queued_at, event = self._queue.popleft()
+                self._not_full.notify()
+
+            start = time.perf_counter()
+            try:
+                if self.is_async:
+                    asyncio.run_coroutine_threadsafe(self.handler(event), self.bus.loop()).result()
+                else:
+                    self.handler(event)
+            except Exception as e:
+                self.errors += 1
+                logger.error("事件总线: 订阅者 %s 处理 %s 失败: %s", self.name, event.event_type, e)
+            end = time.perf_counter()
+
+            with self._lock:
+                self.delivered += 1
+                self._total_latency += end - start
+                self._total_wait += start - queued_at
+                self._latencies.append(end - start)
+
+        # 还有积压，重新排队让其他订阅者也能获得线程
+        with self._lock:
+            if self._queue and self.active:
+                self.bus._schedule(self)
+            else:
+                self._scheduled = False
+
+    def stats(self) -> SubscriberStats:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            delivered = self.delivered
+            return SubscriberStats(
+                name=self.name,
+                depth=len(self._queue),
+                max_depth=self.max_depth,
+                delivered=delivered,
+                dropped=self.dropped,
+                errors=self.errors,
+                avg_latency_ms=self._total_latency / delivered * 1000 if delivered else 0.0,
+                p99_latency_ms=latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+                avg_wait_ms=self._total_wait / delivered * 1000 if delivered else 0.0,
+            )
+
+    def unsubscribe(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """事件总线"""
+
+    def __init__(self, config: Dict = None):
+        self.config = dict(DEFAULT_BUS_CONFIG)
+        self.config.update(config or {})
+
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.config["workers"], thread_name_prefix="event_bus")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def subscribe(self, handler: Callable, event_types: Iterable[Type[BusEvent]] = (), name: str = "",
+                  max_queue: int = None, policy: str = DROP_OLDEST) -> Subscription:
+        """订阅事件，event_types 为空时接收所有事件；handler 可以是普通函数或协程函数"""
+        subscription = Subscription(
+            self, name or getattr(handler, "__qualname__", repr(handler)), handler, tuple(event_types),
+            max_queue or self.config["max_queue"], policy, self.config["block_timeout"])
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with subscription._lock:
+            subscription.active = False
+            subscription._queue.clear()
+            subscription._not_full.notify_all()
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+
+    def publish(self, event: BusEvent):
+        """发布事件，只入队不等待处理"""
+        if self._closed:
+            return
+        for subscription in self._subscriptions:
+            if subscription.accepts(event):
+                subscription.offer(event)
+
+    def _schedule(self, subscription: Subscription):
+        try:
+            self._executor.submit(subscription.drain)
+        except RuntimeError:
+            # 已关闭
+            pass
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环，首次使用时启动"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="event_bus_loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def stats(self) -> List[SubscriberStats]:
+        """各订阅者的队列深度和处理耗时"""
+        return [subscription.stats() for subscription in self._subscriptions]
+
+    def shutdown(self, wait: bool = True):
+        """停止接收事件，wait 为 True 时先处理完已入队的事件"""
+        self._closed = True
+        self._executor.shutdown(wait=wait)
+        if wait:
+            # 关闭期间未能重新调度的积压事件在当前线程处理完
+            for subscription in self._subscriptions:
+                subscription.drain(len(subscription._queue) + 1)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+日志：各模块通过 logging.getLogger(__name__) 记录，调用线程只把记录放入队列，
+由后台线程写入按大小轮转的日志文件、内存环形缓冲区和控制台。
+按子系统(模块路径，如 "controls.webview_widget" 或整个 "services")设置级别，
+同一位置反复出现的警告和错误按时间窗口限流
+"""
+
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+# 各模块日志器的公共前缀，子系统名即去掉该前缀后的模块路径
+ROOT_LOGGER = "src"
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# 默认配置，可通过 config.json 中的 "logging" 覆盖
+DEFAULT_LOGGING_CONFIG = {
+    "level": "INFO",             # 默认级别
+    "levels": {},                # 子系统 -> 级别，如 {"controls.webview_widget": "DEBUG"}
+    "console": True,             # 同时输出到控制台
+    "max_mb": 5,                 # 单个日志文件上限
+    "backup_count": 5,           # 保留的历史日志文件数
+    "buffer_size": 2000,         # 内存中保留的最近日志条数，供日志窗口查看
+    "rate_limit_burst": 5,       # 同一位置的警告/错误在时间窗口内最多记录的条数
+    "rate_limit_interval": 60,   # 限流时间窗口(秒)
+}
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(threadName)s] %(subsystem)s: %(message)s"
+
+
+def subsystem_of(logger_name: str) -> str:
+    """日志器名对应的子系统名"""
+    if logger_name.startswith(ROOT_LOGGER + "."):
+        return logger_name[len(ROOT_LOGGER) + 1:]
+    return logger_name
+
+
+@dataclass
+class LogEntry:
+    """环形缓冲区中的一条日志"""
+    seq: int
+    created: float
+    level: int
+    subsystem: str
+    thread: str
+    message: str
+
+    @property
+    def level_name(self) -> str:
+        return logging.getLevelName(self.level)
+
+    def format(self) -> str:
+        stamp = time.strftime("%H:%M:%S", time.localtime(self.created))
+        return f"{stamp}.{int(self.created * 1000) % 1000:03d} {self.level_name:<7} {self.subsystem}: {self.message}"
+
+
+class RateLimitFilter(logging.Filter):
+    """同一调用位置(日志器+行号)的警告和错误，每个时间窗口最多放行 burst 条，
+    窗口结束后的第一条附带被省略的条数。DEBUG/INFO 不限流，由级别控制"""
+
+    def __init__(self, burst: int = 5, interval: float = 60):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.suppressed_total = 0
+        self._lock = threading.Lock()
+        # (日志器, 行号) -> [窗口开始时间, 窗口内条数, 已省略条数]
+        self._windows: Dict[Tuple[str, int], List] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.lineno)
+        now = record.created
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 10000:
+                    self._prune(now)
+            elif window[1] < self.burst:
+                window[1] += 1
+                return True
+            else:
+                window[2] += 1
+                self.suppressed_total += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.msg}（前 {self.interval:.0f} 秒内已省略 {suppressed} 条相同位置的日志）"
+        return True
+
+    def _prune(self, now: float):
+        """丢弃已过期的窗口，调用位置有限，一般不会触发"""
+        for key in [key for key, window in self._windows.items()
+                    if now - window[0] >= self.interval and not window[2]]:
+            del self._windows[key]
+
+
+class RingBufferHandler(logging.Handler):
+    """把最近的日志保存在内存中，日志窗口按序号增量读取"""
+
+    def __init__(self, capacity: int = 2000):
+        super().__init__()
+        self._entries: Deque[LogEntry] = deque(maxlen=max(capacity, 1))
+        self._entry_lock = threading.Lock()
+        self._seq = 0
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            message = record.getMessage()
+            with self._entry_lock:
+                self._seq += 1
+                self._entries.append(LogEntry(self._seq, record.created, record.levelno,
+                                              getattr(record, "subsystem", record.name),
+                                              record.threadName, message))
+        except Exception:
+            self.handleError(record)
+
+    def set_capacity(self, capacity: int):
+        with self._entry_lock:
+            if capacity != self._entries.maxlen:
+                self._entries = deque(self._entries, maxlen=max(capacity, 1))
+
+    def entries(self, after_seq: int = 0) -> List[LogEntry]:
+        """序号大于 after_seq 的日志，按时间先后排列"""
+        with self._entry_lock:
+            if not self._entries or self._entries[-1].seq <= after_seq:
+                return []
+            if self._entries[0].seq > after_seq:
+                return list(self._entries)
+            return [entry for entry in self._entries if entry.seq > after_seq]
+
+    def clear(self):
+        with self._entry_lock:
+            self._entries.clear()
+
+
+class _SubsystemQueueHandler(logging.handlers.QueueHandler):
+    """入队前在调用线程中格式化消息并记录子系统名，避免把参数对象带到后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.subsystem = subsystem_of(record.name)
+        return record
+
+
+class LogService:
+    """配置根日志器：调用线程只入队，后台线程写文件、环形缓冲区和控制台"""
+
+    def __init__(self, log_dir: Path, config: Optional[Dict] = None):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_file = self.log_dir / "pdkbot.log"
+        self.config = {**DEFAULT_LOGGING_CONFIG, **(config or {})}
+        self._configured_levels: List[str] = []
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        self.file_handler = logging.handlers.RotatingFileHandler(
+            self.log_file, maxBytes=int(self.config["max_mb"] * 1024 * 1024),
+            backupCount=self.config["backup_count"], encoding="utf-8", delay=True)
+        self.file_handler.setFormatter(formatter)
+        self.buffer = RingBufferHandler(self.config["buffer_size"])
+        self.console_handler = logging.StreamHandler()
+        self.console_handler.setFormatter(formatter)
+        if not self.config["console"]:
+            self.console_handler.setLevel(logging.CRITICAL + 1)
+
+        self.rate_limit = RateLimitFilter(self.config["rate_limit_burst"], self.config["rate_limit_interval"])
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.queue_handler = _SubsystemQueueHandler(self._queue)
+        self.queue_handler.addFilter(self.rate_limit)
+        self.listener = logging.handlers.QueueListener(
+            self._queue, self.file_handler, self.buffer, self.console_handler, respect_handler_level=True)
+
+    def start(self):
+        """替换根日志器的处理器并启动后台写入线程"""
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.queue_handler)
+        # 根日志器只放行警告以上，第三方库的调试信息不进入队列
+        root.setLevel(logging.WARNING)
+        logging.captureWarnings(True)
+        self.update_config(self.config)
+        self.listener.start()
+
+    def update_config(self, config: Dict):
+        """应用级别、限流、轮转和缓冲区设置，可在运行中调用"""
+        self.config = {**DEFAULT_LOGGING_CONFIG, **(config or {})}
+        logging.getLogger(ROOT_LOGGER).setLevel(self.config["level"])
+        for name in self._configured_levels:
+            logging.getLogger(f"{ROOT_LOGGER}.{name}").setLevel(logging.NOTSET)
+        self._configured_levels = list(self.config["levels"])
+        for name, level in self.config["levels"].items():
+            logging.getLogger(f"{ROOT_LOGGER}.{name}").setLevel(level)
+
+        self.console_handler.setLevel(logging.NOTSET if self.config["console"] else logging.CRITICAL + 1)
+        self.rate_limit.burst = self.config["rate_limit_burst"]
+        self.rate_limit.interval = self.config["rate_limit_interval"]
+        self.buffer.set_capacity(self.config["buffer_size"])
+        # 轮转参数在写入线程中读取，直接替换属性即可
+        self.file_handler.maxBytes = int(self.config["max_mb"] * 1024 * 1024)
+        self.file_handler.backupCount = self.config["backup_count"]
+
+    def stop(self):
+        """写完队列中剩余的日志后停止后台线程"""
+        self.listener.stop()
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.file_handler.close()
+
+
+class _SlowStream:
+    """模拟被重定向或阻塞的控制台，每次写入耗时固定"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, text: str):
+        time.sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+def run_benchmark(records: int = 20000, console_delay_ms: float = 0.5):
+    """对比控制台写入缓慢时直接输出和经队列输出对调用线程的影响，并检查轮转和限流"""
+    import tempfile
+
+    logger = logging.getLogger(f"{ROOT_LOGGER}.benchmark")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    def timed(count: int) -> List[float]:
+        timings = []
+        for i in range(count):
+            begin = time.perf_counter()
+            logger.info("收到消息 %d: %s", i, {"buyer": f"buyer{i % 100}", "text": "你好" * 20})
+            timings.append((time.perf_counter() - begin) * 1e6)
+        return sorted(timings)
+
+    def summary(timings: List[float]) -> str:
+        return (f"平均 {sum(timings) / len(timings):.1f} us，p50 {timings[len(timings) // 2]:.1f} us，"
+                f"p99 {timings[int(len(timings) * 0.99)]:.1f} us")
+
+    slow_stream = _SlowStream(console_delay_ms / 1000)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        direct = logging.StreamHandler(slow_stream)
+        logger.addHandler(direct)
+        direct_timings = timed(records // 10)
+        logger.removeHandler(direct)
+
+        service = LogService(Path(temp_dir), {"max_mb": 1, "backup_count": 3})
+        service.console_handler.setStream(slow_stream)
+        service.listener.start()
+        logger.addHandler(service.queue_handler)
+        queued_timings = timed(records)
+        # 控制台跟不上时队列会积压，这里只写文件和缓冲区以便统计轮转
+        service.console_handler.setLevel(logging.CRITICAL + 1)
+        for i in range(1000):
+            logger.error("处理平台消息失败: %s", "Expecting value")
+        flush_begin = time.perf_counter()
+        service.stop()
+        flush_seconds = time.perf_counter() - flush_begin
+        logger.removeHandler(service.queue_handler)
+        files = sorted(path.name for path in Path(temp_dir).glob("pdkbot.log*"))
+
+    print(f"控制台每次写入 {console_delay_ms} ms")
+    print(f"直接输出 {len(direct_timings)} 条，调用线程每条 {summary(direct_timings)}")
+    print(f"经队列输出 {len(queued_timings)} 条，调用线程每条 {summary(queued_timings)}")
+    print(f"停止时后台线程写完积压日志 {flush_seconds:.1f} 秒，日志文件: {', '.join(files)}")
+    print(f"1000 条相同位置的错误，限流省略 {service.rate_limit.suppressed_total} 条，"
+          f"缓冲区保留最近 {len(service.buffer.entries())} 条")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="日志队列性能测试")
+    parser.add_argument("--records", type=int, default=20000, help="写入的日志条数")
+    parser.add_argument("--console-delay", type=float, default=0.5, help="模拟的控制台写入耗时(毫秒)")
+    args = parser.parse_args()
+    run_benchmark(args.records, args.console_delay)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+未读检测轮询调度器
+
+平台脚本不再各自每秒检测一次未读消息，而是由本调度器统一通过 runJavaScript 调用
+window.pywebview.probe()。每个店铺的检测间隔按以下因素调整：
+    - 正在查看的店铺使用最短间隔
+    - 有未读消息或最近有消息变化的店铺间隔较短，空闲越久间隔越长
+    - 夜间时段（默认0点至8点）未查看的店铺间隔加倍
+所有店铺共享每秒检测次数的预算，超出预算时优先检测逾期最久的店铺。
+页面返回每次检测在渲染进程中的耗时，连同往返耗时按店铺统计。
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QTimer
+
+# 默认轮询配置，可通过 config.json 中的 "poll_scheduler" 覆盖
+DEFAULT_POLL_CONFIG = {
+    "min_interval": 1.0,         # 正在查看或刚有消息变化时的检测间隔(秒)
+    "max_interval": 30.0,        # 长时间空闲时的检测间隔(秒)
+    "unread_interval": 3.0,      # 有未读消息时的最长检测间隔(秒)
+    "idle_after": 600,           # 空闲多久后间隔增至最长(秒)
+    "budget_per_second": 10,     # 所有店铺每秒最多检测次数
+    "night_hours": [0, 8],       # 夜间时段[开始, 结束)
+    "night_factor": 2.0,         # 夜间时段未查看店铺的间隔倍数
+    "probe_timeout": 10,         # 检测无响应多久后允许再次检测(秒)
+    "tick_ms": 100,              # 调度间隔(毫秒)
+}
+
+# 参数为页面自行兜底检测的间隔(毫秒)
+PROBE_SCRIPT = "window.pywebview && window.pywebview.probe ? window.pywebview.probe({fallback_ms}) : -1"
+
+
+@dataclass
+class ProbeStats:
+    """单个店铺的检测统计"""
+    platform: str
+    webview: object
+    interval: float = 0.0
+    last_probe_at: float = 0.0
+    poked: bool = False
+    in_flight_since: Optional[float] = None
+    deferred_since: Optional[float] = None
+    probes: int = 0
+    deferred: int = 0            # 因预算不足推迟的次数
+    deferred_ms_total: float = 0.0
+    js_ms_total: float = 0.0
+    js_ms_max: float = 0.0
+    rtt_ms_total: float = 0.0
+
+    @property
+    def js_ms(self) -> float:
+        return self.js_ms_total / self.probes if self.probes else 0.0
+
+    @property
+    def rtt_ms(self) -> float:
+        return self.rtt_ms_total / self.probes if self.probes else 0.0
+
+
+class PollScheduler(QObject):
+    """按店铺活跃度、是否正在查看和时段调整检测间隔，并限制总检测频率"""
+
+    def __init__(self, get_focused_id: Callable[[], Optional[str]], config: Dict = None, parent=None):
+        super().__init__(parent)
+        self.config = dict(DEFAULT_POLL_CONFIG)
+        self.config.update(config or {})
+        self.get_focused_id = get_focused_id
+        self._shops: Dict[str, ProbeStats] = {}
+        self._tokens = float(self.config["budget_per_second"])
+        self._refilled_at = time.monotonic()
+        self._started_at = time.monotonic()
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._timer.start(int(self.config["tick_ms"]))
+
+    def stop(self):
+        self._timer.stop()
+
+    def update_config(self, config: Dict):
+        """修改检测间隔和预算，已调度的店铺下次检测时按新间隔计算"""
+        self.config = dict(DEFAULT_POLL_CONFIG)
+        self.config.update(config or {})
+        self._tokens = min(self._tokens, float(self.config["budget_per_second"]))
+        if self._timer.isActive():
+            self._timer.start(int(self.config["tick_ms"]))
+
+    def register(self, platform: str, webview):
+        """开始调度店铺页面，页面就绪后立即检测一次"""
+        self._shops[webview.webview_id] = ProbeStats(platform, webview)
+
+    def unregister(self, webview_id: str):
+        self._shops.pop(webview_id, None)
+
+    def poke(self, webview_id: str):
+        """店铺有变化（如收到消息），尽快检测"""
+        state = self._shops.get(webview_id)
+        if state is not None:
+            state.poked = True
+
+    def interval_for(self, state: ProbeStats, focused: bool, now: float, hour: int) -> float:
+        """店铺当前的检测间隔(秒)"""
+        config = self.config
+        if focused:
+            return config["min_interval"]
+        webview = state.webview
+        idle = now - webview.last_activity_at
+        ratio = min(max(idle / config["idle_after"], 0.0), 1.0)
+        interval = config["min_interval"] + (config["max_interval"] - config["min_interval"]) * ratio
+        if webview.unread_count:
+            interval = min(interval, config["unread_interval"])
+        start, end = config["night_hours"]
+        if (start <= hour < end) if start <= end else (hour >= start or hour < end):
+            interval *= config["night_factor"]
+        return interval
+
+    def _tick(self):
+        now = time.monotonic()
+        budget = float(self.config["budget_per_second"])
+        self._tokens = min(budget, self._tokens + (now - self._refilled_at) * budget)
+        self._refilled_at = now
+
+        focused_id = self.get_focused_id()
+        hour = datetime.now().hour
+        due: List[tuple] = []
+        for webview_id, state in self._shops.items():
+            if not state.webview.is_ready:
+                continue
+            if state.in_flight_since is not None:
+                if now - state.in_flight_since < self.config["probe_timeout"]:
+                    continue
+                state.in_flight_since = None
+            # 间隔随状态实时变化，例如切换到该店铺后立即按最短间隔计算
+            state.interval = self.interval_for(state, webview_id == focused_id, now, hour)
+            overdue = now - state.last_probe_at - state.interval
+            if overdue >= 0 or state.poked:
+                due.append((webview_id != focused_id, -overdue, state))
+        if not due:
+            return
+
+        # 正在查看的店铺优先，其余按逾期时长
+        due.sort(key=lambda item: item[:2])
+        for _, _, state in due:
+            if self._tokens < 1:
+                if state.deferred_since is None:
+                    state.deferred_since = now
+                continue
+            self._tokens -= 1
+            self._probe(state, now)
+
+    def _probe(self, state: ProbeStats, now: float):
+        state.in_flight_since = now
+        state.last_probe_at = now
+        state.poked = False
+        if state.deferred_since is not None:
+            state.deferred += 1
+            state.deferred_ms_total += (now - state.deferred_since) * 1000
+            state.deferred_since = None
+        webview_id = state.webview.webview_id
+        script = PROBE_SCRIPT.format(fallback_ms=self.fallback_ms())
+        state.webview.execute_script(
+            script, lambda result, wid=webview_id, sent=time.perf_counter(): self._on_result(wid, sent, result))
+
+    def fallback_ms(self) -> int:
+        """页面兜底检测间隔：最长检测间隔的两倍，预算不足推迟检测时也不会提前触发"""
+        config = self.config
+        longest = config["max_interval"] * max(config["night_factor"], 1.0) + config["probe_timeout"]
+        return int(longest * 2 * 1000)
+
+    def _on_result(self, webview_id: str, sent: float, result):
+        state = self._shops.get(webview_id)
+        if state is None:
+            return
+        state.in_flight_since = None
+        if not isinstance(result, (int, float)) or result < 0:
+            # 平台脚本尚未注册检测函数
+            return
+        state.probes += 1
+        state.js_ms_total += result
+        state.js_ms_max = max(state.js_ms_max, result)
+        state.rtt_ms_total += (time.perf_counter() - sent) * 1000
+
+    def stats(self) -> List[ProbeStats]:
+        return list(self._shops.values())
+
+    def report(self, shop_names: Dict[str, str]) -> List[str]:
+        """各店铺的检测次数、间隔和耗时，按渲染进程耗时合计排序"""
+        elapsed = max(time.monotonic() - self._started_at, 1.0)
+        states = sorted(self._shops.values(), key=lambda s: -s.js_ms_total)
+        total_probes = sum(s.probes for s in states)
+        lines = [f"共 {len(states)} 个店铺，平均每秒检测 {total_probes / elapsed:.2f} 次"
+                 f"（预算 {self.config['budget_per_second']} 次）"]
+        for state in states:
+            webview_id = state.webview.webview_id
+            lines.append(
+                f"{shop_names.get(webview_id, webview_id[:8])}：间隔 {state.interval:.1f} 秒，"
+                f"检测 {state.probes} 次，页面耗时平均 {state.js_ms:.2f} ms / 最大 {state.js_ms_max:.2f} ms，"
+                f"往返 {state.rtt_ms:.1f} ms，因预算推迟 {state.deferred} 次"
+                f"（合计 {state.deferred_ms_total / 1000:.1f} 秒）")
+        return lines
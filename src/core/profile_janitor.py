@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+配置文件清理，统计各店铺WebView配置文件的磁盘占用，清理已关闭店铺的超额缓存，
+并把没有店铺记录的孤立配置文件移到回收目录，超过保留天数后删除。
+扫描和删除在定时器中分片进行，不阻塞界面
+"""
+
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# 默认配置，可通过 config.json 中的 "profile_janitor" 覆盖
+DEFAULT_JANITOR_CONFIG = {
+    "enabled": True,
+    "http_cache_mb": 64,         # 每个配置文件的HTTP缓存上限
+    "quota_mb": 512,             # 每个配置文件的磁盘配额，超出时清理已关闭店铺的缓存
+    "scan_interval": 3600,       # 扫描间隔(秒)
+    "start_delay": 60,           # 启动后多久开始第一次扫描(秒)
+    "orphan_grace_hours": 1,     # 孤立配置文件最后修改超过该时间才移到回收目录
+    "trash_days": 7,             # 回收目录中的配置文件保留天数
+    "slice_ms": 10,              # 每次定时器回调的最长工作时间(毫秒)
+}
+# 分片之间的间隔(毫秒)
+SLICE_INTERVAL = 50
+# 可安全删除的缓存目录（相对配置文件目录）
+CACHE_DIRS = ("cache", "Cache", "Code Cache", "GPUCache",
+              os.path.join("Service Worker", "CacheStorage"),
+              os.path.join("Service Worker", "ScriptCache"))
+
+
+@dataclass
+class ProfileUsage:
+    """单个配置文件的磁盘占用"""
+    webview_id: str
+    total_bytes: int = 0
+    cache_bytes: int = 0
+    files: int = 0
+    orphan: bool = False
+    is_open: bool = False
+    freed_bytes: int = 0
+
+    @property
+    def total_mb(self) -> float:
+        return self.total_bytes / (1024 * 1024)
+
+    @property
+    def cache_mb(self) -> float:
+        return self.cache_bytes / (1024 * 1024)
+
+
+def _walk_files(root: Path) -> Iterator[os.DirEntry]:
+    """逐个遍历目录下的文件，不跟随符号链接"""
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def _is_cache_file(relative: str) -> bool:
+    return any(relative == d or relative.startswith(d + os.sep) for d in CACHE_DIRS)
+
+
+class ProfileJanitor(QObject):
+    """WebView配置文件清理"""
+
+    # 信号
+    scan_finished = pyqtSignal(object)  # List[ProfileUsage]
+
+    def __init__(self, profiles_dir: Path, get_known_ids: Callable[[], Optional[Set[str]]],
+                 get_open_ids: Callable[[], Set[str]], config: Dict = None, parent=None):
+        super().__init__(parent)
+
+        self.config = dict(DEFAULT_JANITOR_CONFIG)
+        self.config.update(config or {})
+        self.profiles_dir = profiles_dir
+        # 孤立配置文件先移到这里，名称为 <webview_id>.<移入时间戳>，误判时可以移回
+        self.trash_dir = profiles_dir.parent / (profiles_dir.name + "_trash")
+        # 返回None表示店铺记录不可用（读取失败或为空），此时不判断孤立配置文件
+        self._get_known_ids = get_known_ids
+        self._get_open_ids = get_open_ids
+
+        self.usage: Dict[str, ProfileUsage] = {}
+        self.last_scan_at: Optional[float] = None
+        self._steps: Optional[Iterator[None]] = None
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    @property
+    def http_cache_bytes(self) -> int:
+        """创建WebView时使用的HTTP缓存上限，0表示由Chromium自动决定"""
+        return int(self.config["http_cache_mb"] * 1024 * 1024)
+
+    def start(self):
+        """延迟一段时间后开始第一次扫描"""
+        if self.config["enabled"]:
+            self._timer.start(int(self.config["start_delay"] * 1000))
+
+    def stop(self):
+        self._timer.stop()
+        self._steps = None
+
+    def update_config(self, config: Dict):
+        """修改配额和缓存上限，重新开始计时"""
+        self.stop()
+        self.config = dict(DEFAULT_JANITOR_CONFIG)
+        self.config.update(config or {})
+        self.start()
+
+    def scan_now(self):
+        """立即开始一次扫描（已在扫描时忽略）"""
+        if self._steps is None:
+            self._steps = self._scan()
+            self._timer.start(SLICE_INTERVAL)
+
+    def _tick(self):
+        if self._steps is None:
+            self._steps = self._scan()
+            self._timer.start(SLICE_INTERVAL)
+
+        deadline = time.perf_counter() + self.config["slice_ms"] / 1000
+        for _ in self._steps:
+            if time.perf_counter() >= deadline:
+                return
+
+        # 本轮扫描结束，等待下一轮
+        self._steps = None
+        self._timer.start(int(self.config["scan_interval"] * 1000))
+
+    def _scan(self) -> Iterator[None]:
+        """扫描所有配置文件，每处理一个文件让出一次"""
+        if not self.profiles_dir.exists():
+            return
+        try:
+            profile_dirs = [entry for entry in os.scandir(self.profiles_dir) if entry.is_dir(follow_symlinks=False)]
+        except OSError as e:
+            logger.error("扫描配置文件目录失败: %s", e)
+            return
+
+        usage: Dict[str, ProfileUsage] = {}
+        grace = self.config["orphan_grace_hours"] * 3600
+        quota = self.config["quota_mb"] * 1024 * 1024
+        for profile in profile_dirs:
+            webview_id = profile.name
+            # 每个配置文件开始处理前重新获取，期间打开的店铺不会被清理
+            is_open = webview_id in self._get_open_ids()
+            known_ids = self._get_known_ids()
+            orphan = known_ids is not None and webview_id not in known_ids and not is_open
+            item = ProfileUsage(webview_id, orphan=orphan, is_open=is_open)
+            usage[webview_id] = item
+
+            latest_mtime = 0.0
+            root = Path(profile.path)
+            for entry in _walk_files(root):
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                item.files += 1
+                item.total_bytes += stat.st_size
+                latest_mtime = max(latest_mtime, stat.st_mtime)
+                if _is_cache_file(os.path.relpath(entry.path, profile.path)):
+                    item.cache_bytes += stat.st_size
+                yield
+
+            try:
+                latest_mtime = max(latest_mtime, profile.stat().st_mtime)
+            except OSError:
+                pass
+            if item.orphan and time.time() - latest_mtime > grace:
+                self._move_to_trash(root, item)
+            elif not is_open and quota and item.total_bytes > quota:
+                for cache_dir in CACHE_DIRS:
+                    if (root / cache_dir).is_dir():
+                        yield from self._remove_tree(root / cache_dir, item)
+
+        yield from self._purge_trash()
+        self.usage = usage
+        self.last_scan_at = time.time()
+        freed = sum(item.freed_bytes for item in usage.values())
+        if freed:
+            logger.info("配置文件清理: 释放 %.1f MB", freed / (1024 * 1024))
+        self.scan_finished.emit(list(usage.values()))
+
+    def _move_to_trash(self, root: Path, item: ProfileUsage):
+        """把孤立配置文件移到回收目录，同一磁盘上只是重命名"""
+        if item.webview_id in self._get_open_ids():
+            return
+        try:
+            self.trash_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(root, self.trash_dir / f"{item.webview_id}.{int(time.time())}")
+        except OSError as e:
+            logger.error("移动孤立配置文件失败(%s): %s", item.webview_id, e)
+            return
+        logger.info("孤立配置文件已移到回收目录: %s", item.webview_id)
+        item.freed_bytes += item.total_bytes
+        item.total_bytes = item.cache_bytes = 0
+
+    def _purge_trash(self) -> Iterator[None]:
+        """删除回收目录中超过保留天数的配置文件"""
+        if not self.trash_dir.is_dir():
+            return
+        expire_before = time.time() - self.config["trash_days"] * 86400
+        try:
+            trashed = [Path(entry.path) for entry in os.scandir(self.trash_dir) if entry.is_dir(follow_symlinks=False)]
+        except OSError as e:
+            logger.error("扫描回收目录失败: %s", e)
+            return
+        for path in trashed:
+            try:
+                moved_at = int(path.name.rsplit(".", 1)[1])
+            except (IndexError, ValueError):
+                continue
+            if moved_at > expire_before:
+                continue
+            for entry in _walk_files(path):
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+                yield
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _remove_tree(self, root: Path, item: ProfileUsage) -> Iterator[None]:
+        """逐个删除文件，店铺被重新打开时立即停止"""
+        for entry in _walk_files(root):
+            if item.webview_id in self._get_open_ids():
+                return
+            try:
+                size = entry.stat(follow_symlinks=False).st_size
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            item.freed_bytes += size
+            item.total_bytes -= size
+            if _is_cache_file(os.path.relpath(entry.path, self.profiles_dir / item.webview_id)):
+                item.cache_bytes -= size
+            yield
+        # 文件删除完后移除剩余的空目录
+        if item.webview_id not in self._get_open_ids():
+            shutil.rmtree(root, ignore_errors=True)
+
+    def report(self, shop_names: Dict[str, str] = None) -> List[str]:
+        """按占用从大到小生成报告文本"""
+        shop_names = shop_names or {}
+        lines = []
+        for item in sorted(self.usage.values(), key=lambda u: u.total_bytes, reverse=True):
+            if item.orphan and not item.total_bytes:
+                continue
+            name = shop_names.get(item.webview_id) or ("孤立配置" if item.orphan else item.webview_id)
+            line = f"{name}: {item.total_mb:.1f} MB（缓存 {item.cache_mb:.1f} MB）"
+            if item.freed_bytes:
+                line += f"，已清理 {item.freed_bytes / (1024 * 1024):.1f} MB"
+            lines.append(line)
+        return lines
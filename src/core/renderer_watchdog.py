@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+渲染进程看门狗，监控各店铺页面的内存占用和存活状态，
+在超出内存预算、心跳中断或渲染进程崩溃时回收页面
+"""
+
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# 默认看门狗配置，可通过 config.json 中的 "watchdog" 覆盖
+DEFAULT_WATCHDOG_CONFIG = {
+    "enabled": True,
+    "check_interval": 15,        # 检查间隔(秒)
+    "memory_budget_mb": 1024,    # 单个店铺渲染进程内存预算
+    "heartbeat_timeout": 180,    # 心跳超时(秒)
+    "idle_seconds": 120,         # 无消息变化多久视为低活跃
+    "force_ratio": 1.5,          # 超出预算该倍数时不再等待低活跃时机
+    "backoff_base": 10,          # 回收退避基数(秒)
+    "backoff_max": 900,          # 回收退避上限(秒)
+    "max_reloads": 3,            # 连续重载多少次后改为重建WebView
+}
+
+
+def process_memory_mb(pid: int) -> Optional[float]:
+    """获取进程常驻内存(MB)，无法获取时返回None"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except Exception:
+            return None
+
+    if sys.platform.startswith("linux"):
+        try:
+            with open(Path("/proc") / str(pid) / "status", 'r') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except Exception:
+            return None
+    return None
+
+
+@dataclass
+class WatchedView:
+    """被监控的店铺页面状态"""
+    platform: str
+    webview: object
+    failures: int = 0
+    next_allowed_at: float = 0.0
+    last_recycle_at: float = 0.0
+    crashed: bool = False
+    pending_reason: str = ""
+    memory_before: Optional[float] = None
+    awaiting_after: bool = False
+
+
+class RendererWatchdog(QObject):
+    """渲染进程看门狗"""
+
+    # 信号
+    recycled = pyqtSignal(str, str, str)  # 平台名, webview_id, 原因
+    recreate_requested = pyqtSignal(str, str)  # 平台名, webview_id
+
+    def __init__(self, config: Dict = None, parent=None):
+        super().__init__(parent)
+
+        self.config = dict(DEFAULT_WATCHDOG_CONFIG)
+        self.config.update(config or {})
+
+        self._views: Dict[str, WatchedView] = {}
+        # 停止监控的页面的退避状态，重建页面后按 webview_id 接续，避免每次崩溃都从头退避
+        self._retired: Dict[str, WatchedView] = {}
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.check)
+
+    def start(self):
+        """启动看门狗"""
+        if self.config["enabled"]:
+            self._timer.start(int(self.config["check_interval"] * 1000))
+
+    def stop(self):
+        """停止看门狗"""
+        self._timer.stop()
+
+    def update_config(self, config: Dict):
+        """更新看门狗配置"""
+        self.config.update(config or {})
+        self.stop()
+        self.start()
+
+    def watch(self, platform: str, webview):
+        """开始监控店铺页面"""
+        state = WatchedView(platform=platform, webview=webview)
+        retired = self._retired.pop(webview.webview_id, None)
+        if retired is not None:
+            state.failures = retired.failures
+            state.next_allowed_at = retired.next_allowed_at
+            state.last_recycle_at = retired.last_recycle_at
+        self._views[webview.webview_id] = state
+        webview.render_process_crashed.connect(
+            lambda status, exit_code, wid=webview.webview_id: self._on_crashed(wid, status))
+        webview.page_ready.connect(
+            lambda trigger, elapsed, wid=webview.webview_id: self._log_memory_after(wid))
+
+    def unwatch(self, webview_id: str):
+        """停止监控店铺页面，保留近期的退避状态"""
+        state = self._views.pop(webview_id, None)
+        now = time.monotonic()
+        for retired_id in [retired_id for retired_id, retired in self._retired.items()
+                           if now - retired.last_recycle_at > self.config["backoff_max"]]:
+            del self._retired[retired_id]
+        if state is not None and state.failures and now - state.last_recycle_at <= self.config["backoff_max"]:
+            state.webview = None
+            self._retired[webview_id] = state
+
+    def memory_usage(self) -> Dict[str, Optional[float]]:
+        """获取各店铺渲染进程内存(MB)"""
+        return {webview_id: self._memory_of(state) for webview_id, state in self._views.items()}
+
+    def _memory_of(self, state: WatchedView) -> Optional[float]:
+        pid = state.webview.renderer_pid()
+        return process_memory_mb(pid) if pid else None
+
+    def _on_crashed(self, webview_id: str, status: str):
+        """渲染进程崩溃，尽快回收"""
+        state = self._views.get(webview_id)
+        if state is None:
+            return
+        state.crashed = True
+        state.pending_reason = f"渲染进程终止({status})"
+        delay = max(0.0, state.next_allowed_at - time.monotonic())
+        QTimer.singleShot(int(delay * 1000), lambda: self._check_one(webview_id))
+
+    def check(self):
+        """定期检查所有店铺页面"""
+        for webview_id in list(self._views.keys()):
+            self._check_one(webview_id)
+
+    def _check_one(self, webview_id: str):
+        """检查单个店铺页面"""
+        state = self._views.get(webview_id)
+        if state is None:
+            return
+
+        now = time.monotonic()
+        webview = state.webview
+        memory = self._memory_of(state)
+        budget = self.config["memory_budget_mb"]
+
+        # 回收后未等到就绪时，在下一次检查中记录回收后内存
+        if state.awaiting_after and now - state.last_recycle_at >= self.config["check_interval"]:
+            self._log_memory_after(webview_id, memory)
+
+        force = state.crashed
+        if not state.crashed:
+            if now - webview.last_heartbeat_at > self.config["heartbeat_timeout"]:
+                # 页面失去响应，监控已停止，无需等待低活跃时机
+                state.pending_reason = "心跳超时"
+                force = True
+            elif memory is not None and memory > budget:
+                state.pending_reason = f"内存超出预算({memory:.0f}/{budget} MB)"
+                force = memory > budget * self.config["force_ratio"]
+            elif state.pending_reason:
+                state.pending_reason = ""
+
+        if not state.pending_reason:
+            # 长时间稳定后重置退避
+            if state.failures and now - state.last_recycle_at > self.config["backoff_max"]:
+                state.failures = 0
+            return
+
+        if now < state.next_allowed_at:
+            return
+        if not force and not self._is_low_activity(webview, now):
+            return
+
+        self._recycle(webview_id, state, memory, now)
+
+    def _is_low_activity(self, webview, now: float) -> bool:
+        """当前是否适合回收：页面不可见，或长时间无新消息且无未读"""
+        if not webview.isVisible():
+            return True
+        return webview.unread_count == 0 and now - webview.last_activity_at > self.config["idle_seconds"]
+
+    def _recycle(self, webview_id: str, state: WatchedView, memory: Optional[float], now: float):
+        """回收店铺页面"""
+        reason = state.pending_reason
+        state.failures += 1
+        delay = min(self.config["backoff_base"] * (2 ** (state.failures - 1)), self.config["backoff_max"])
+        state.next_allowed_at = now + delay
+        state.last_recycle_at = now
+        state.crashed = False
+        state.pending_reason = ""
+        state.memory_before = memory
+        state.awaiting_after = True
+
+        before = f"{memory:.0f} MB" if memory is not None else "未知"
+        if state.failures > self.config["max_reloads"]:
+            # 退避次数不清零，重建后仍失败时继续拉长间隔，长时间稳定后才重置
+            logger.warning("看门狗: 重建 %s[%s]，原因: %s，回收前内存 %s，下次最早 %.0f 秒后",
+                           state.platform, webview_id, reason, before, delay)
+            self.recreate_requested.emit(state.platform, webview_id)
+        else:
+            logger.warning("看门狗: 重载 %s[%s]，原因: %s，回收前内存 %s，下次最早 %.0f 秒后",
+                           state.platform, webview_id, reason, before, delay)
+            state.webview.recycle()
+        self.recycled.emit(state.platform, webview_id, reason)
+
+    def _log_memory_after(self, webview_id: str, memory: Optional[float] = None):
+        """记录回收后的内存"""
+        state = self._views.get(webview_id)
+        if state is None or not state.awaiting_after:
+            return
+        state.awaiting_after = False
+        if memory is None:
+            memory = self._memory_of(state)
+        before = f"{state.memory_before:.0f} MB" if state.memory_before is not None else "未知"
+        after = f"{memory:.0f} MB" if memory is not None else "未知"
+        logger.info("看门狗: %s[%s] 回收完成，内存 %s -> %s", state.platform, webview_id, before, after)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+资源模式
+
+每种模式是一组作用于所有店铺页面的配置：Chromium 命令行参数（启动时生效）、
+QWebEngineSettings、HTTP 缓存上限和图片加载策略。低配置电脑同时打开几十个店铺时
+可选用 "low" 或 "minimal"。
+
+ResourceSampler 定期统计本进程及其子进程（QtWebEngineProcess）的常驻内存与CPU占用，
+按启动时的资源模式分别累计，用于比较各模式与默认模式的差异。
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtWebEngineCore import QWebEngineSettings
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODE = "default"
+
+# 各模式的配置；settings 的键为 QWebEngineSettings.WebAttribute 的名称
+RESOURCE_MODES = {
+    "default": {
+        "name": "默认",
+        "chromium_flags": [],
+        "settings": {},
+        "http_cache_mb": 0,          # 0 表示只受配置文件清理的上限约束
+    },
+    "low": {
+        "name": "低资源",
+        "chromium_flags": [
+            "--disable-gpu",
+            "--disable-gpu-compositing",
+            "--disable-smooth-scrolling",
+            "--enable-low-end-device-mode",
+            "--js-flags=--max-old-space-size=256",
+            # 隐藏页面的定时器唤醒在一分钟后降为每分钟一次
+            "--enable-features=IntensiveWakeUpThrottling:grace_period_seconds/60",
+            "--disable-features=BackForwardCache,MediaRouter",
+        ],
+        "settings": {
+            "WebGLEnabled": False,
+            "Accelerated2dCanvasEnabled": False,
+            "PluginsEnabled": False,
+            "PdfViewerEnabled": False,
+            "ScrollAnimatorEnabled": False,
+            "PlaybackRequiresUserGesture": True,
+            "AutoLoadImages": True,
+        },
+        "http_cache_mb": 16,
+    },
+    "minimal": {
+        "name": "极简(不加载图片)",
+        "chromium_flags": [
+            "--disable-gpu",
+            "--disable-gpu-compositing",
+            "--disable-smooth-scrolling",
+            "--enable-low-end-device-mode",
+            "--js-flags=--max-old-space-size=192",
+            "--enable-features=IntensiveWakeUpThrottling:grace_period_seconds/10",
+            "--disable-features=BackForwardCache,MediaRouter",
+        ],
+        "settings": {
+            "WebGLEnabled": False,
+            "Accelerated2dCanvasEnabled": False,
+            "PluginsEnabled": False,
+            "PdfViewerEnabled": False,
+            "ScrollAnimatorEnabled": False,
+            "PlaybackRequiresUserGesture": True,
+            "AutoLoadImages": False,
+        },
+        "http_cache_mb": 8,
+    },
+}
+
+# 默认资源统计配置，可通过 config.json 中的 "resource_mode" 覆盖
+DEFAULT_RESOURCE_CONFIG = {
+    "mode": DEFAULT_MODE,
+    "sample_interval": 60,       # 资源占用采样间隔(秒)
+}
+
+
+def get_mode(name: str) -> Dict:
+    """获取模式配置，未知模式按默认处理"""
+    return RESOURCE_MODES.get(name, RESOURCE_MODES[DEFAULT_MODE])
+
+
+def apply_chromium_flags(name: str):
+    """把模式的 Chromium 参数追加到 QTWEBENGINE_CHROMIUM_FLAGS，需在创建 QApplication 之前调用"""
+    flags = get_mode(name)["chromium_flags"]
+    if not flags:
+        return
+    existing = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "").split()
+    os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = " ".join(existing + [f for f in flags if f not in existing])
+
+
+def apply_web_settings(settings: QWebEngineSettings, name: str):
+    """把模式的页面设置应用到 QWebEngineSettings，未列出的属性恢复默认值"""
+    mode_settings = get_mode(name)["settings"]
+    for attribute_name in {key for mode in RESOURCE_MODES.values() for key in mode["settings"]}:
+        attribute = getattr(QWebEngineSettings.WebAttribute, attribute_name, None)
+        if attribute is None:
+            continue
+        if attribute_name in mode_settings:
+            settings.setAttribute(attribute, mode_settings[attribute_name])
+        else:
+            settings.resetAttribute(attribute)
+
+
+def http_cache_bytes(name: str, janitor_bytes: int) -> int:
+    """模式的HTTP缓存上限与配置文件清理上限中较小的一个(字节，0表示不限制)"""
+    mode_bytes = get_mode(name)["http_cache_mb"] * 1024 * 1024
+    if not mode_bytes:
+        return janitor_bytes
+    return min(mode_bytes, janitor_bytes) if janitor_bytes else mode_bytes
+
+
+@dataclass
+class ModeUsage:
+    """某一资源模式下累计的资源占用"""
+    samples: int = 0
+    rss_mb_total: float = 0.0
+    cpu_percent_total: float = 0.0
+    shop_total: int = 0
+    updated_at: float = 0.0
+
+    @property
+    def rss_mb(self) -> float:
+        return self.rss_mb_total / self.samples if self.samples else 0.0
+
+    @property
+    def cpu_percent(self) -> float:
+        return self.cpu_percent_total / self.samples if self.samples else 0.0
+
+    @property
+    def shops(self) -> float:
+        return self.shop_total / self.samples if self.samples else 0.0
+
+    def per_shop(self, value: float) -> float:
+        return value / self.shops if self.shops else value
+
+
+class ResourceSampler(QObject):
+    """按资源模式统计进程树的常驻内存和CPU占用"""
+
+    def __init__(self, data_dir: Path, mode: str, get_shop_count: Callable[[], int],
+                 config: Dict = None, parent=None):
+        super().__init__(parent)
+        self.config = dict(DEFAULT_RESOURCE_CONFIG)
+        self.config.update(config or {})
+        self.mode = mode if mode in RESOURCE_MODES else DEFAULT_MODE
+        self.get_shop_count = get_shop_count
+        self.path = data_dir / "analytics" / "resource_usage.json"
+        self.usage: Dict[str, ModeUsage] = self._load()
+
+        # pid -> 上次采样时的CPU时间(秒)
+        self._cpu_times: Dict[int, float] = {}
+        self._sampled_at: Optional[float] = None
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.sample)
+
+    def _load(self) -> Dict[str, ModeUsage]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return {name: ModeUsage(**data) for name, data in json.load(f).items()}
+        except Exception as e:
+            logger.error("加载资源占用统计失败: %s", e)
+            return {}
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({name: asdict(usage) for name, usage in self.usage.items()}, f,
+                          ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error("保存资源占用统计失败: %s", e)
+
+    def start(self):
+        if psutil is None:
+            logger.warning("未安装 psutil，不统计资源占用")
+            return
+        self.sample()
+        self._timer.start(int(self.config["sample_interval"] * 1000))
+
+    def stop(self):
+        self._timer.stop()
+        self.save()
+
+    def update_config(self, config: Dict):
+        """修改采样间隔；统计的模式仍是启动时的模式"""
+        self.config = dict(DEFAULT_RESOURCE_CONFIG)
+        self.config.update(config or {})
+        if self._timer.isActive():
+            self._timer.start(int(self.config["sample_interval"] * 1000))
+
+    def _process_tree(self) -> List:
+        process = psutil.Process()
+        try:
+            return [process] + process.children(recursive=True)
+        except psutil.Error:
+            return [process]
+
+    def sample(self):
+        """采样一次；第一次只记录CPU时间基准"""
+        now = time.monotonic()
+        rss = 0
+        cpu_times: Dict[int, float] = {}
+        for process in self._process_tree():
+            try:
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    times = process.cpu_times()
+                    cpu_times[process.pid] = times.user + times.system
+            except psutil.Error:
+                continue
+
+        if self._sampled_at is not None and now > self._sampled_at:
+            cpu_seconds = sum(t - self._cpu_times.get(pid, 0.0) for pid, t in cpu_times.items())
+            usage = self.usage.setdefault(self.mode, ModeUsage())
+            usage.samples += 1
+            usage.rss_mb_total += rss / (1024 * 1024)
+            usage.cpu_percent_total += max(cpu_seconds, 0.0) / (now - self._sampled_at) * 100
+            usage.shop_total += self.get_shop_count()
+            usage.updated_at = time.time()
+            if usage.samples % 10 == 0:
+                self.save()
+        self._cpu_times = cpu_times
+        self._sampled_at = now
+
+    def report(self) -> List[str]:
+        """各模式的平均占用，以及相对默认模式的变化（按每个店铺折算）"""
+        if psutil is None:
+            return ["未安装 psutil，无法统计资源占用"]
+        lines = []
+        baseline = self.usage.get(DEFAULT_MODE)
+        for name, mode in RESOURCE_MODES.items():
+            usage = self.usage.get(name)
+            if usage is None or not usage.samples:
+                continue
+            line = (f"{mode['name']}{'(当前)' if name == self.mode else ''}：平均 {usage.shops:.1f} 个店铺，"
+                    f"内存 {usage.rss_mb:.0f} MB（每店 {usage.per_shop(usage.rss_mb):.0f} MB），"
+                    f"CPU {usage.cpu_percent:.1f}%（每店 {usage.per_shop(usage.cpu_percent):.2f}%），"
+                    f"{usage.samples} 次采样")
+            if baseline is not None and baseline.samples and name != DEFAULT_MODE:
+                base_rss = baseline.per_shop(baseline.rss_mb)
+                base_cpu = baseline.per_shop(baseline.cpu_percent)
+                if base_rss and base_cpu:
+                    line += (f"；相对默认：内存 {usage.per_shop(usage.rss_mb) / base_rss * 100 - 100:+.0f}%，"
+                             f"CPU {usage.per_shop(usage.cpu_percent) / base_cpu * 100 - 100:+.0f}%")
+            lines.append(line)
+        if baseline is None or not baseline.samples:
+            lines.append("还没有默认模式的统计，以默认模式运行一段时间后可比较差异")
+        return lines
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+后台标签页恢复，按并发预算逐个创建恢复会话后的占位标签页
+"""
+
+from typing import Callable, Dict
+
+from PyQt6.QtCore import QObject, QTimer
+
+# 默认配置，可通过 config.json 中的 "session_restore" 覆盖
+DEFAULT_RESTORE_CONFIG = {
+    "enabled": True,
+    "background_concurrency": 1,  # 后台同时加载的页面数
+    "background_delay": 3,        # 启动后多久开始后台加载(秒)
+    "load_timeout": 30,           # 页面超过该时间未就绪不再占用并发预算(秒)
+}
+# 检查间隔(毫秒)
+CHECK_INTERVAL = 1000
+
+
+class TabRestorer(QObject):
+    """后台逐个创建占位标签页的WebView"""
+
+    def __init__(self, get_pages: Callable[[], Dict[str, object]], config: Dict = None, parent=None):
+        super().__init__(parent)
+
+        self.config = dict(DEFAULT_RESTORE_CONFIG)
+        self.config.update(config or {})
+        self._get_pages = get_pages
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        """延迟一段时间后开始后台加载"""
+        if self.config["background_concurrency"] <= 0:
+            return
+        QTimer.singleShot(int(self.config["background_delay"] * 1000), lambda: self._timer.start(CHECK_INTERVAL))
+
+    def stop(self):
+        self._timer.stop()
+
+    def _loading_count(self) -> int:
+        """正在加载且未超时的页面数"""
+        count = 0
+        for page in self._get_pages().values():
+            for webview in page.webviews.values():
+                seconds = webview.loading_seconds()
+                if seconds is not None and seconds < self.config["load_timeout"]:
+                    count += 1
+        return count
+
+    def _tick(self):
+        budget = self.config["background_concurrency"] - self._loading_count()
+        if budget <= 0:
+            return
+
+        for page in self._get_pages().values():
+            while budget > 0:
+                webview_id = page.next_placeholder()
+                if webview_id is None:
+                    break
+                page.materialize(webview_id)
+                budget -= 1
+            if budget <= 0:
+                return
+
+        # 没有剩余的占位标签页
+        self._timer.stop()
@@ -3,10 +3,11 @@
 数据库实体类
 """
 
-from dataclasses import dataclass, asdict
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, asdict, field
+from typing import Optional, Dict, Any, List
 from enum import Enum
 import json
+import time
 
 class ShopType(Enum):
     """店铺类型枚举"""
@@ -70,4 +71,141 @@ class ReceiveMessageResponse:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ReceiveMessageResponse':
-        return cls(**data) 
\ No newline at end of file
+        return cls(**data) 
+
+@dataclass
+class ChatMessage:
+    """聊天消息（由receiveMessage整理得到）"""
+    platform: str = ""
+    webview_id: str = ""
+    buyer_id: str = ""
+    buyer_name: str = ""
+    content: str = ""
+    msg_id: str = ""
+    timestamp: float = 0.0
+    from_buyer: bool = True
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChatMessage':
+        return cls(**data)
+    
+    @classmethod
+    def from_response(cls, platform: str, webview_id: str, data: Dict[str, Any]) -> 'ChatMessage':
+        """从平台脚本上报的receiveMessage数据构建，兼容拼多多的pdd_message/payload结构"""
+        message = data.get('pdd_message') or data.get('payload') or data
+        if isinstance(message.get('message'), dict):
+            message = message['message']
+        sender = message.get('from') if isinstance(message.get('from'), dict) else {}
+        
+        buyer_id = message.get('buyerId') or sender.get('uid') or message.get('uid') or ""
+        timestamp = float(message.get('timestamp') or message.get('ts') or time.time())
+        # 毫秒时间戳统一为秒
+        if timestamp > 1e12:
+            timestamp = timestamp / 1000
+        
+        return cls(
+            platform=platform,
+            webview_id=webview_id,
+            buyer_id=str(buyer_id),
+            buyer_name=message.get('buyerName') or message.get('nickname') or sender.get('nickname', ""),
+            content=message.get('content') or message.get('text') or "",
+            msg_id=str(message.get('msgId') or message.get('msg_id') or ""),
+            timestamp=timestamp,
+            from_buyer=message.get('fromBuyer', sender.get('role', 'user') == 'user')
+        )
+
+
+@dataclass
+class AutoReplyRule:
+    """自动回复规则"""
+    rule_id: str = ""
+    keywords: List[str] = field(default_factory=list)  # 任一关键词命中即触发
+    regex: str = ""  # 正则表达式，与关键词二选一或同时使用
+    reply: str = ""
+    platforms: List[str] = field(default_factory=list)  # 为空表示所有平台
+    shops: List[str] = field(default_factory=list)  # webview_id列表，为空表示所有店铺
+    priority: int = 0  # 多条规则命中时优先级高者生效
+    cooldown: Optional[float] = None  # 同一买家冷却时间(秒)，为空使用全局设置
+    enabled: bool = True
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AutoReplyRule':
+        return cls(**data)
+
+
+@dataclass
+class KnowledgeEntry:
+    """知识库问答条目"""
+    entry_id: str = ""
+    question: str = ""
+    answer: str = ""
+    keywords: List[str] = field(default_factory=list)  # 额外的检索关键词
+    platforms: List[str] = field(default_factory=list)  # 为空表示所有平台
+    updated_at: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KnowledgeEntry':
+        return cls(**data)
+
+
+@dataclass
+class Product:
+    """店铺商品（SKU）"""
+    product_id: str = ""
+    title: str = ""
+    sku_code: str = ""
+    price: float = 0.0
+    stock: int = 0
+    status: str = ""
+    image_url: str = ""
+    updated_at: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Product':
+        return cls(**data)
+
+
+@dataclass
+class SessionTab:
+    """会话恢复用的标签页记录"""
+    webview_id: str = ""
+    title: str = ""
+    unread: int = 0  # 退出时的未读消息数
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SessionTab':
+        return cls(**data)
+
+
+@dataclass
+class QuickReply:
+    """快捷回复模板"""
+    reply_id: str = ""
+    shortcut: str = ""  # 快捷词，输入“/快捷词”检索，如 "fh"
+    title: str = ""
+    content: str = ""  # 可包含变量，如 {买家}、{订单号}、{店铺}
+    platforms: List[str] = field(default_factory=list)  # 为空表示所有平台
+    shops: List[str] = field(default_factory=list)  # webview_id列表，为空表示所有店铺
+    updated_at: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuickReply':
+        return cls(**data)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+聊天消息存储，按天追加写入JSON Lines文件
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, TextIO
+
+from .entities import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MessageStore:
+    """聊天消息存储"""
+
+    def __init__(self, data_dir: Path):
+        self.messages_dir = data_dir / "messages"
+        self.messages_dir.mkdir(parents=True, exist_ok=True)
+        self._file: Optional[TextIO] = None
+        self._file_day = ""
+
+    @staticmethod
+    def _day_of(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+    def _day_file(self, day: str) -> Path:
+        return self.messages_dir / f"messages-{day}.jsonl"
+
+    def append(self, message: ChatMessage):
+        """追加一条消息"""
+        day = self._day_of(message.timestamp or time.time())
+        try:
+            if self._file is None or day != self._file_day:
+                self.close()
+                self._file = open(self._day_file(day), 'a', encoding='utf-8')
+                self._file_day = day
+            self._file.write(json.dumps(message.to_dict(), ensure_ascii=False) + "\n")
+            self._file.flush()
+        except Exception as e:
+            logger.error("保存聊天消息失败: %s", e)
+
+    def close(self):
+        """关闭当前文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_day = ""
+
+    def list_days(self) -> List[str]:
+        """列出有消息记录的日期"""
+        return sorted(path.stem[len("messages-"):] for path in self.messages_dir.glob("messages-*.jsonl"))
+
+    def iter_messages(self, start: float = None, end: float = None,
+                      platforms: List[str] = None, shops: List[str] = None) -> Iterator[ChatMessage]:
+        """按时间顺序逐条读取消息，时间范围为 [start, end)"""
+        start_day = self._day_of(start) if start is not None else ""
+        end_day = self._day_of(end) if end is not None else ""
+
+        for day in self.list_days():
+            if start_day and day < start_day:
+                continue
+            if end_day and day > end_day:
+                break
+            for message in self.iter_day(day, platforms, shops):
+                if start is not None and message.timestamp < start:
+                    continue
+                if end is not None and message.timestamp >= end:
+                    continue
+                yield message
+
+    def iter_day(self, day: str, platforms: List[str] = None, shops: List[str] = None) -> Iterator[ChatMessage]:
+        """逐条读取某一天（YYYY-MM-DD）文件中的消息"""
+        try:
+            with open(self._day_file(day), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        message = ChatMessage.from_dict(json.loads(line))
+                    except Exception:
+                        # 跳过写入中断产生的不完整行
+                        continue
+                    if platforms and message.platform not in platforms:
+                        continue
+                    if shops and message.webview_id not in shops:
+                        continue
+                    yield message
+        except Exception as e:
+            logger.error("读取聊天消息失败: %s", e)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+会话快照存储，退出时保存打开的标签页，启动时恢复
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict
+
+from .entities import SessionTab
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """会话快照存储（data/session.json）"""
+
+    def __init__(self, data_dir: Path):
+        self.session_file = data_dir / "session.json"
+
+    def load(self) -> Dict:
+        """读取快照，格式：
+        {"current_platform": str, "platforms": {平台名: {"tabs": [SessionTab], "current": int, "visible": bool}}}
+        """
+        if not self.session_file.exists():
+            return {}
+        try:
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for state in data.get("platforms", {}).values():
+                state["tabs"] = [SessionTab.from_dict(tab) for tab in state.get("tabs", [])]
+            return data
+        except Exception as e:
+            logger.error("加载会话快照失败: %s", e)
+            return {}
+
+    def save(self, current_platform: str, platforms: Dict[str, Dict]):
+        """原子写入快照，tabs 为 SessionTab 列表"""
+        data = {
+            "current_platform": current_platform,
+            "platforms": {
+                platform: dict(state, tabs=[tab.to_dict() for tab in state.get("tabs", [])])
+                for platform, state in platforms.items()
+            }
+        }
+        tmp_file = self.session_file.with_suffix(".tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.session_file)
+        except Exception as e:
+            logger.error("保存会话快照失败: %s", e)
+
@@ -4,10 +4,14 @@
 """
 
 import json
+import logging
+import os
 from pathlib import Path
 from typing import List, Dict, Optional
 from .entities import PlatformShop, ShopType
 
+logger = logging.getLogger(__name__)
+
 class ShopManager:
     """店铺数据管理器"""
     
@@ -15,6 +19,8 @@ class ShopManager:
         self.data_dir = data_dir
         self.shops_file = data_dir / "shops.json"
         self._shops_cache: Dict[str, List[PlatformShop]] = {}
+        # 店铺文件存在但读取失败，此时店铺列表不完整，不能据此判断哪些配置文件已无主
+        self.load_failed = False
         self._load_shops()
     
     def _load_shops(self):
@@ -31,19 +37,22 @@ class ShopManager:
                     PlatformShop.from_dict(shop_data) for shop_data in shops_list
                 ]
         except Exception as e:
-            print(f"加载店铺数据失败: {e}")
+            self.load_failed = True
+            logger.error("加载店铺数据失败: %s", e)
     
     def _save_shops(self):
-        """保存店铺数据到文件"""
+        """保存店铺数据到文件，先写临时文件再替换，避免中途退出留下不完整的文件"""
         try:
             data = {}
             for platform, shops in self._shops_cache.items():
                 data[platform] = [shop.to_dict() for shop in shops]
             
-            with open(self.shops_file, 'w', encoding='utf-8') as f:
+            temp_file = self.shops_file.with_name(self.shops_file.name + ".tmp")
+            with open(temp_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.shops_file)
         except Exception as e:
-            print(f"保存店铺数据失败: {e}")
+            logger.error("保存店铺数据失败: %s", e)
     
     def get_platform_shops(self, platform: str) -> List[PlatformShop]:
         """获取指定平台的店铺列表"""
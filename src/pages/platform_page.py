@@ -3,18 +3,24 @@
 平台页面，管理特定平台的WebView标签页
 """
 
+import logging
 import uuid
 from typing import Dict, List, Optional
 
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, 
-                           QStackedWidget, QMessageBox, QPushButton, QLabel)
-from PyQt6.QtCore import pyqtSignal, QTimer
+                           QStackedWidget, QMessageBox, QPushButton, QLabel, QFileDialog,
+                           QLineEdit, QCompleter, QApplication)
+from PyQt6.QtCore import pyqtSignal, QTimer, QStringListModel, Qt
 from PyQt6.QtGui import QIcon, QPixmap
 
 from ..controls.webview_widget import PlatformWebView
 from ..controls.shop_list_widget import ShopListWidget
-from ..db.entities import PlatformShop, NewMessage
+from ..db.entities import PlatformShop, NewMessage, ChatMessage, Product, SessionTab
 from ..db.shop_manager import ShopManager
+from ..core.event_bus import (EventBus, BusEvent, NewMessageEvent, ChatMessageEvent, ShopUpdatedEvent,
+                              ShopReadyEvent, ConversationsChangedEvent)
+
+logger = logging.getLogger(__name__)
 
 
 class PlatformTabWidget(QTabWidget):
@@ -24,7 +30,6 @@ class PlatformTabWidget(QTabWidget):
         super().__init__(parent)
         self.setTabsClosable(True)
         self.setMovable(True)
-        self.tabCloseRequested.connect(self.close_tab)
         
         # 设置样式
         self.setStyleSheet("""
@@ -50,14 +55,22 @@ class PlatformTabWidget(QTabWidget):
                 background-color: #e0e0e0;
             }
         """)
+
+
+class PlaceholderTab(QWidget):
+    """恢复会话时的占位标签页，选中后才创建真正的WebView"""
     
-    def close_tab(self, index: int):
-        """关闭标签页"""
-        if index >= 0:
-            widget = self.widget(index)
-            if widget:
-                widget.deleteLater()
-            self.removeTab(index)
+    def __init__(self, webview_id: str, title: str, unread: int = 0, parent=None):
+        super().__init__(parent)
+        self.webview_id = webview_id
+        self.title = title
+        self.unread = unread
+        
+        layout = QVBoxLayout(self)
+        label = QLabel(f"{title}\n\n正在恢复店铺页面...")
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        label.setStyleSheet("font-size: 16px; color: #86868b;")
+        layout.addWidget(label)
 
 
 class PlatformPage(QWidget):
@@ -67,18 +80,36 @@ class PlatformPage(QWidget):
     new_message_received = pyqtSignal(str, NewMessage)  # 平台名, 新消息
     shop_updated = pyqtSignal(str, PlatformShop)  # 平台名, 店铺信息
     tab_changed = pyqtSignal(str, str)  # 平台名, 标签页标题
+    shop_ready = pyqtSignal(str, str, float)  # 平台名, webview_id, 就绪耗时(毫秒)
+    webview_created = pyqtSignal(str, object)  # 平台名, PlatformWebView
+    webview_closed = pyqtSignal(str, str)  # 平台名, webview_id
+    chat_message_received = pyqtSignal(ChatMessage)  # 聊天消息
+    send_ack_received = pyqtSignal(str, dict)  # webview_id, 发送回执
+    media_send_requested = pyqtSignal(str, str, str)  # 平台名, webview_id, 文件路径
+    product_search_requested = pyqtSignal(str, str, str)  # 平台名, webview_id, 查询文本
+    unread_changed = pyqtSignal(str, str, int)  # 平台名, webview_id, 未读消息数
+    transfer_requested = pyqtSignal(str, str)  # 平台名, webview_id
+    conversations_changed = pyqtSignal(str, str, dict)  # 平台名, webview_id, 待回复会话变化
+    compliance_check_requested = pyqtSignal(str, str, int, str)  # 平台名, webview_id, 请求序号, 输入框文本
+    quick_reply_query_requested = pyqtSignal(str, str, int, str)  # 平台名, webview_id, 请求序号, 检索文本
+    quick_reply_selected = pyqtSignal(str, str, str, dict)  # 平台名, webview_id, 模板ID, 当前会话的买家
     
-    def __init__(self, platform: str, platform_name: str, chat_url: str, shop_manager: ShopManager, parent=None):
+    def __init__(self, platform: str, platform_name: str, chat_url: str, shop_manager: ShopManager,
+                 event_bus: EventBus = None, parent=None):
         super().__init__(parent)
         
         self.platform = platform
         self.platform_name = platform_name
         self.chat_url = chat_url
         self.shop_manager = shop_manager
+        self.event_bus = event_bus
         
         # 存储WebView实例
         self.webviews: Dict[str, PlatformWebView] = {}
-        self.webview_tabs: Dict[str, int] = {}  # webview_id -> tab_index
+        # 恢复会话后尚未创建WebView的占位标签页
+        self.placeholders: Dict[str, PlaceholderTab] = {}
+        # WebView类，回放录制的平台消息时替换为不加载网页的实现
+        self.webview_class = PlatformWebView
         
         self.setup_ui()
         self.load_saved_shops()
@@ -129,8 +160,39 @@ class PlatformPage(QWidget):
         """)
         self.back_button.clicked.connect(self.show_shop_list)
         
+        self.send_media_button = QPushButton("发送图片/视频")
+        self.send_media_button.setStyleSheet(self.back_button.styleSheet())
+        self.send_media_button.clicked.connect(self.choose_media_to_send)
+        
+        # 商品查询，结果来自本地商品目录
+        self.product_search = QLineEdit()
+        self.product_search.setPlaceholderText("搜索商品（编码/关键词）")
+        self.product_search.setMinimumWidth(260)
+        self.product_search.setStyleSheet("""
+            QLineEdit {
+                border: 1px solid #ccc;
+                padding: 9px 12px;
+                border-radius: 6px;
+                font-size: 14px;
+                background-color: white;
+            }
+        """)
+        self.product_results = QStringListModel(self)
+        completer = QCompleter(self.product_results, self)
+        completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        completer.activated.connect(self.on_product_selected)
+        self.product_search.setCompleter(completer)
+        self.product_search.textEdited.connect(self.on_product_search_edited)
+        
+        self.transfer_button = QPushButton("转接")
+        self.transfer_button.setStyleSheet(self.back_button.styleSheet())
+        self.transfer_button.clicked.connect(self.request_transfer)
+        
         toolbar.addWidget(self.back_button)
         toolbar.addStretch()
+        toolbar.addWidget(self.product_search)
+        toolbar.addWidget(self.send_media_button)
+        toolbar.addWidget(self.transfer_button)
         
         tab_layout.addLayout(toolbar)
         tab_layout.addWidget(self.tab_widget)
@@ -157,34 +219,176 @@ class PlatformPage(QWidget):
     def load_shop(self, shop: PlatformShop):
         """加载店铺"""
         # 检查是否已经打开
-        if shop.webview_id in self.webviews:
+        if shop.webview_id in self.webviews or shop.webview_id in self.placeholders:
             # 切换到对应标签页
-            tab_index = self.webview_tabs[shop.webview_id]
-            self.tab_widget.setCurrentIndex(tab_index)
-            self.show_tab_widget()
+            self.focus_webview(shop.webview_id)
             return
             
         # 创建新的WebView
-        webview = PlatformWebView(self.platform, shop.webview_id)
-        webview.user_info_received.connect(self.on_user_info_received)
-        webview.new_message_received.connect(self.on_new_message_received)
-        webview.message_received.connect(self.on_message_received)
+        webview = self._create_webview(shop.webview_id)
         
         # 添加到标签页
         tab_title = shop.user_name or f"新{self.platform_name}账号"
         tab_index = self.tab_widget.addTab(webview, tab_title)
+        self.tab_widget.tabBar().setTabData(tab_index, tab_title)
         
         # 存储引用
         self.webviews[shop.webview_id] = webview
-        self.webview_tabs[shop.webview_id] = tab_index
         
         # 加载页面
         webview.load_platform_url(self.chat_url)
+        self.webview_created.emit(self.platform, webview)
         
         # 切换到新标签页
         self.tab_widget.setCurrentIndex(tab_index)
         self.show_tab_widget()
         
+    def restore_tabs(self, tabs: List[SessionTab], current_index: int = 0, show_tabs: bool = True):
+        """按上次退出时的顺序恢复占位标签页，并显示上次的未读数"""
+        for tab in tabs:
+            if tab.webview_id in self.webviews or tab.webview_id in self.placeholders:
+                continue
+            placeholder = PlaceholderTab(tab.webview_id, tab.title, tab.unread)
+            self.placeholders[tab.webview_id] = placeholder
+            index = self.tab_widget.addTab(placeholder, tab.title)
+            self._set_tab_title(index, tab.title, tab.unread)
+        
+        if self.tab_widget.count():
+            self.tab_widget.setCurrentIndex(min(max(current_index, 0), self.tab_widget.count() - 1))
+            if show_tabs:
+                self.show_tab_widget()
+        
+    def materialize(self, webview_id: str) -> Optional[PlatformWebView]:
+        """将占位标签页替换为真正的WebView"""
+        placeholder = self.placeholders.pop(webview_id, None)
+        if placeholder is None:
+            return self.webviews.get(webview_id)
+        
+        tab_index = self.tab_widget.indexOf(placeholder)
+        tab_title = self._tab_base_title(tab_index)
+        tab_text = self.tab_widget.tabText(tab_index)
+        was_current = self.tab_widget.currentIndex() == tab_index
+        
+        webview = self._create_webview(webview_id)
+        webview.unread_count = placeholder.unread
+        self.webviews[webview_id] = webview
+        # 先插入并选中新标签页再移除占位页，避免当前标签页切换到相邻的占位页
+        self.tab_widget.insertTab(tab_index, webview, tab_text)
+        self.tab_widget.tabBar().setTabData(tab_index, tab_title)
+        if was_current:
+            self.tab_widget.setCurrentIndex(tab_index)
+        self.tab_widget.removeTab(tab_index + 1)
+        placeholder.deleteLater()
+        
+        webview.load_platform_url(self.chat_url)
+        self.webview_created.emit(self.platform, webview)
+        return webview
+        
+    def suspend(self):
+        """关闭所有WebView并换回占位标签页，保留标签页顺序和未读数（停用平台时调用）"""
+        for webview_id, webview in list(self.webviews.items()):
+            tab_index = self.tab_widget.indexOf(webview)
+            was_current = self.tab_widget.currentIndex() == tab_index
+            placeholder = PlaceholderTab(webview_id, self._tab_base_title(tab_index), webview.unread_count)
+            self.placeholders[webview_id] = placeholder
+            del self.webviews[webview_id]
+            self.webview_closed.emit(self.platform, webview_id)
+            self.tab_widget.insertTab(tab_index, placeholder, placeholder.title)
+            if was_current:
+                self.tab_widget.setCurrentIndex(tab_index)
+            self.tab_widget.removeTab(tab_index + 1)
+            self._set_tab_title(tab_index, placeholder.title, placeholder.unread)
+            webview.deleteLater()
+
+    def next_placeholder(self) -> Optional[str]:
+        """按标签页顺序返回下一个待创建的店铺"""
+        for index in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(index)
+            if isinstance(widget, PlaceholderTab):
+                return widget.webview_id
+        return None
+        
+    def snapshot_tabs(self) -> List[SessionTab]:
+        """当前打开的标签页，用于退出时保存会话"""
+        tabs = []
+        for index in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(index)
+            if isinstance(widget, PlaceholderTab):
+                tabs.append(SessionTab(widget.webview_id, widget.title, widget.unread))
+            elif isinstance(widget, PlatformWebView):
+                tabs.append(SessionTab(widget.webview_id, self._tab_base_title(index), widget.unread_count))
+        return tabs
+        
+    def showEvent(self, event):
+        """页面显示时创建当前的占位标签页"""
+        super().showEvent(event)
+        current = self.tab_widget.currentWidget()
+        if isinstance(current, PlaceholderTab):
+            QTimer.singleShot(0, lambda webview_id=current.webview_id: self.materialize(webview_id))
+        
+    def _tab_base_title(self, index: int) -> str:
+        """不含未读数的标签页标题，单独保存在标签数据中，店铺名本身带括号时也不会被截断"""
+        title = self.tab_widget.tabBar().tabData(index)
+        return title if isinstance(title, str) else self.tab_widget.tabText(index)
+        
+    def _set_tab_title(self, index: int, title: str, count: int):
+        """设置标签页标题，并在后面显示未读数"""
+        self.tab_widget.tabBar().setTabData(index, title)
+        self.tab_widget.setTabText(index, f"{title} ({count})" if count > 0 else title)
+        
+    def _set_tab_badge(self, index: int, count: int):
+        """在标签页标题后显示未读数"""
+        self._set_tab_title(index, self._tab_base_title(index), count)
+        
+    def _create_webview(self, webview_id: str) -> PlatformWebView:
+        """创建WebView并连接信号"""
+        webview = self.webview_class(self.platform, webview_id)
+        webview.user_info_received.connect(self.on_user_info_received)
+        webview.new_message_received.connect(self.on_new_message_received)
+        webview.message_received.connect(self.on_message_received)
+        webview.page_ready.connect(self.on_page_ready)
+        webview.send_ack_received.connect(
+            lambda ack, webview_id=webview_id: self.send_ack_received.emit(webview_id, ack))
+        webview.conversations_changed.connect(
+            lambda diff, webview_id=webview_id: self.on_conversations_changed(webview_id, diff))
+        webview.compliance_check_requested.connect(
+            lambda seq, text, webview_id=webview_id:
+                self.compliance_check_requested.emit(self.platform, webview_id, seq, text))
+        webview.quick_reply_query_requested.connect(
+            lambda seq, query, webview_id=webview_id:
+                self.quick_reply_query_requested.emit(self.platform, webview_id, seq, query))
+        webview.quick_reply_selected.connect(
+            lambda reply_id, buyer, webview_id=webview_id:
+                self.quick_reply_selected.emit(self.platform, webview_id, reply_id, buyer))
+        return webview
+        
+    def recreate_webview(self, webview_id: str):
+        """重建店铺WebView，保留配置文件（登录状态）和标签页位置"""
+        old_webview = self.webviews.get(webview_id)
+        if old_webview is None:
+            return
+        
+        tab_index = self.tab_widget.indexOf(old_webview)
+        tab_title = self._tab_base_title(tab_index)
+        tab_text = self.tab_widget.tabText(tab_index)
+        was_current = self.tab_widget.currentIndex() == tab_index
+        url = old_webview.url().toString() or self.chat_url
+        
+        self.webview_closed.emit(self.platform, webview_id)
+        
+        webview = self._create_webview(webview_id)
+        self.webviews[webview_id] = webview
+        # 先插入并选中新标签页再移除旧页面，避免当前标签页切换到相邻的占位页而触发创建
+        self.tab_widget.insertTab(tab_index, webview, tab_text)
+        self.tab_widget.tabBar().setTabData(tab_index, tab_title)
+        if was_current:
+            self.tab_widget.setCurrentIndex(tab_index)
+        self.tab_widget.removeTab(tab_index + 1)
+        old_webview.deleteLater()
+        
+        webview.load_platform_url(url)
+        self.webview_created.emit(self.platform, webview)
+        
     def create_new_shop(self):
         """创建新店铺"""
         # 生成新的webview_id
@@ -208,16 +412,14 @@ class PlatformPage(QWidget):
             # 从字典中移除
             if webview_id in self.webviews:
                 del self.webviews[webview_id]
-            if webview_id in self.webview_tabs:
-                del self.webview_tabs[webview_id]
-                
-            # 更新其他标签页的索引
-            for vid, idx in list(self.webview_tabs.items()):
-                if idx > index:
-                    self.webview_tabs[vid] = idx - 1
+            self.webview_closed.emit(self.platform, webview_id)
+        elif isinstance(widget, PlaceholderTab):
+            self.placeholders.pop(widget.webview_id, None)
         
         # 关闭标签页
         self.tab_widget.removeTab(index)
+        if widget:
+            widget.deleteLater()
         
         # 如果没有标签页了，返回店铺选择
         if self.tab_widget.count() == 0:
@@ -227,22 +429,26 @@ class PlatformPage(QWidget):
         """标签页改变事件"""
         if index >= 0:
             widget = self.tab_widget.widget(index)
-            if isinstance(widget, PlatformWebView):
-                tab_title = self.tab_widget.tabText(index)
-                self.tab_changed.emit(self.platform, tab_title)
+            if isinstance(widget, PlaceholderTab) and self.isVisible():
+                # 延迟到标签页切换完成后再创建
+                QTimer.singleShot(0, lambda webview_id=widget.webview_id: self.materialize(webview_id))
+            if isinstance(widget, (PlatformWebView, PlaceholderTab)):
+                self.tab_changed.emit(self.platform, self._tab_base_title(index))
     
     def on_user_info_received(self, shop: PlatformShop):
         """接收到用户信息"""
         # 保存到数据库
         self.shop_manager.add_shop(self.platform, shop)
         
-        # 更新标签页标题
-        if shop.webview_id in self.webview_tabs:
-            tab_index = self.webview_tabs[shop.webview_id]
-            self.tab_widget.setTabText(tab_index, shop.user_name)
+        # 更新标签页标题，保留未读数
+        webview = self.webviews.get(shop.webview_id)
+        tab_index = self.tab_widget.indexOf(webview) if webview else -1
+        if tab_index >= 0:
+            self._set_tab_title(tab_index, shop.user_name, webview.unread_count)
             
         # 发出信号
         self.shop_updated.emit(self.platform, shop)
+        self.publish(ShopUpdatedEvent(self.platform, shop))
         
     def on_new_message_received(self, new_msg: NewMessage):
         """接收到新消息"""
@@ -250,34 +456,94 @@ class PlatformPage(QWidget):
         sender = self.sender()
         if isinstance(sender, PlatformWebView):
             webview_id = sender.webview_id
+            count = new_msg.new_message_count if new_msg.has_new_message else 0
             
             # 更新标签页显示（添加未读消息提示）
-            if webview_id in self.webview_tabs:
-                tab_index = self.webview_tabs[webview_id]
-                tab_text = self.tab_widget.tabText(tab_index)
-                
-                if new_msg.has_new_message and new_msg.new_message_count > 0:
-                    # 添加未读消息数量
-                    if not tab_text.endswith(")"):
-                        tab_text = f"{tab_text} ({new_msg.new_message_count})"
-                    else:
-                        # 更新数量
-                        base_text = tab_text[:tab_text.rfind("(")].strip()
-                        tab_text = f"{base_text} ({new_msg.new_message_count})"
-                else:
-                    # 移除未读消息提示
-                    if "(" in tab_text:
-                        tab_text = tab_text[:tab_text.rfind("(")].strip()
-                        
-                self.tab_widget.setTabText(tab_index, tab_text)
+            tab_index = self.tab_widget.indexOf(sender)
+            if tab_index >= 0:
+                self._set_tab_badge(tab_index, count)
                 
             # 发出信号
             self.new_message_received.emit(self.platform, new_msg)
+            self.unread_changed.emit(self.platform, webview_id, count)
+            self.publish(NewMessageEvent(self.platform, webview_id, count))
+    
+    def on_page_ready(self, trigger: str, elapsed_ms: float):
+        """店铺页面就绪"""
+        sender = self.sender()
+        if isinstance(sender, PlatformWebView):
+            self.shop_ready.emit(self.platform, sender.webview_id, elapsed_ms)
+            self.publish(ShopReadyEvent(self.platform, sender.webview_id, elapsed_ms))
+    
+    def get_ready_times(self) -> Dict[str, Optional[float]]:
+        """获取各店铺的就绪耗时(毫秒)，尚未就绪的为None"""
+        return {webview_id: webview.time_to_ready_ms for webview_id, webview in self.webviews.items()}
     
     def on_message_received(self, message_data: dict):
         """接收到普通消息"""
-        # 可以在这里处理具体的消息内容
-        print(f"{self.platform} 收到消息: {message_data}")
+        logger.debug("%s 收到消息: %s", self.platform, message_data)
+        sender = self.sender()
+        if isinstance(sender, PlatformWebView):
+            message = ChatMessage.from_response(self.platform, sender.webview_id, message_data)
+            self.chat_message_received.emit(message)
+            self.publish(ChatMessageEvent(message))
+        
+    def on_conversations_changed(self, webview_id: str, diff: dict):
+        """店铺待回复会话变化"""
+        self.conversations_changed.emit(self.platform, webview_id, diff)
+        self.publish(ConversationsChangedEvent(self.platform, webview_id, diff))
+        
+    def publish(self, event: BusEvent):
+        """发布到事件总线"""
+        if self.event_bus is not None:
+            self.event_bus.publish(event)
+        
+    def choose_media_to_send(self):
+        """选择图片/视频发送到当前店铺的当前会话"""
+        webview = self.get_current_webview()
+        if webview is None:
+            return
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择图片或视频", "",
+            "图片/视频 (*.jpg *.jpeg *.png *.gif *.bmp *.webp *.mp4 *.mov *.avi *.mkv *.webm)"
+        )
+        for path in paths:
+            self.media_send_requested.emit(self.platform, webview.webview_id, path)
+    
+    def request_transfer(self):
+        """为当前店铺请求转接目标"""
+        webview = self.get_current_webview()
+        if webview is not None:
+            self.transfer_requested.emit(self.platform, webview.webview_id)
+    
+    def on_product_search_edited(self, text: str):
+        """商品查询框输入变化"""
+        webview = self.get_current_webview()
+        if webview is None or not text.strip():
+            self.product_results.setStringList([])
+            return
+        self.product_search_requested.emit(self.platform, webview.webview_id, text)
+    
+    def show_product_results(self, products: List[Product]):
+        """显示商品查询结果"""
+        self.product_results.setStringList(
+            [f"{p.title}  ￥{p.price:.2f}  库存{p.stock}  {p.sku_code}" for p in products])
+        if products:
+            self.product_search.completer().complete()
+    
+    def on_product_selected(self, text: str):
+        """选中商品后复制商品信息，便于粘贴到聊天输入框"""
+        QApplication.clipboard().setText(text)
+        
+    def focus_webview(self, webview_id: str) -> Optional[PlatformWebView]:
+        """切换到店铺标签页，占位标签页会立即创建WebView"""
+        if webview_id in self.placeholders:
+            self.materialize(webview_id)
+        webview = self.webviews.get(webview_id)
+        if webview is not None:
+            self.tab_widget.setCurrentWidget(webview)
+            self.show_tab_widget()
+        return webview
         
     def get_current_webview(self) -> Optional[PlatformWebView]:
         """获取当前WebView"""
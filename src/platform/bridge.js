@@ -0,0 +1,692 @@
+// PdkBot 桥接脚本，在文档创建时注入，先于页面自身脚本执行
+(function() {
+    if (window.pywebview && window.pywebview.__pdkbot) {
+        return;
+    }
+
+    function postMessage(data) {
+        // 通过控制台输出消息，然后在Python中捕获
+        console.log('PYWEBVIEW_MESSAGE:' + JSON.stringify(data));
+    }
+
+    // 记录已完成的网络响应，供就绪条件匹配
+    const MAX_SEEN_RESPONSES = 200;
+    const seenResponses = [];
+    const responseWaiters = [];
+
+    function recordResponse(url) {
+        if (!url) {
+            return;
+        }
+        seenResponses.push(url);
+        if (seenResponses.length > MAX_SEEN_RESPONSES) {
+            seenResponses.shift();
+        }
+        for (let i = responseWaiters.length - 1; i >= 0; i--) {
+            if (url.indexOf(responseWaiters[i].pattern) !== -1) {
+                const waiter = responseWaiters.splice(i, 1)[0];
+                waiter.callback();
+            }
+        }
+    }
+
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function() {
+            return originalFetch.apply(this, arguments).then(res => {
+                recordResponse(res.url);
+                return res;
+            });
+        };
+    }
+
+    const originalOpen = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function(method, url) {
+        this.addEventListener('loadend', () => recordResponse(this.responseURL || String(url)));
+        return originalOpen.apply(this, arguments);
+    };
+
+    // 等待平台声明的就绪条件（选择器出现或网络响应到达）
+    function whenReady(options, callback) {
+        const selector = options.selector;
+        const response = options.response;
+        const timeout = options.timeout || 30000;
+        let done = false;
+        let observer = null;
+        let timer = null;
+
+        function finish(trigger, degraded) {
+            if (done) {
+                return;
+            }
+            done = true;
+            if (observer) {
+                observer.disconnect();
+            }
+            clearTimeout(timer);
+            postMessage({
+                type: 'ready',
+                response: JSON.stringify({
+                    ready: true,
+                    degraded: !!degraded,
+                    trigger: trigger,
+                    elapsed: Math.round(performance.now())
+                })
+            });
+            try {
+                callback();
+            } catch (e) {
+                console.error('平台脚本启动失败:', e);
+            }
+        }
+
+        if (selector) {
+            if (document.querySelector(selector)) {
+                finish('selector');
+                return;
+            }
+            let pending = false;
+            observer = new MutationObserver(() => {
+                if (pending) {
+                    return;
+                }
+                pending = true;
+                setTimeout(() => {
+                    pending = false;
+                    if (document.querySelector(selector)) {
+                        finish('selector');
+                    }
+                }, 50);
+            });
+            observer.observe(document, { childList: true, subtree: true });
+        }
+
+        if (response) {
+            if (seenResponses.some(url => url.indexOf(response) !== -1)) {
+                finish('response');
+                return;
+            }
+            responseWaiters.push({ pattern: response, callback: () => finish('response') });
+        }
+
+        // 超时后按降级模式启动平台脚本（例如选择器已随页面改版失效），
+        // 不再无限等待；停留在登录页时采集不到数据，不影响使用
+        timer = setTimeout(() => finish('timeout', true), timeout);
+    }
+
+    // 平台脚本通过 configure 声明输入框、发送按钮选择器，
+    // 或提供 openConversation/sendText 实现覆盖默认行为；
+    // 自行实现 sendText 时用 pywebview.sendInput(input) 触发发送，才不会被违禁词检查拦截
+    const platformOptions = {
+        inputSelector: 'textarea',
+        sendButtonSelector: ''
+    };
+
+    function configure(options) {
+        Object.assign(platformOptions, options);
+    }
+
+    function setInputValue(input, text) {
+        input.focus();
+        if (input.isContentEditable) {
+            document.execCommand('selectAll', false, null);
+            document.execCommand('insertText', false, text);
+            return;
+        }
+        // 使用原生setter，确保React等框架能感知到值变化
+        const proto = input.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(input, text);
+        input.dispatchEvent(new Event('input', { bubbles: true }));
+    }
+
+    function triggerSend(input) {
+        const button = platformOptions.sendButtonSelector && document.querySelector(platformOptions.sendButtonSelector);
+        if (button) {
+            button.click();
+        } else {
+            const init = { key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true };
+            input.dispatchEvent(new KeyboardEvent('keydown', init));
+            input.dispatchEvent(new KeyboardEvent('keyup', init));
+        }
+    }
+
+    // 程序触发的发送不经违禁词拦截。按键和点击事件同步派发，放行只覆盖这一次调用，
+    // 等待打开会话等期间客服自己按下的回车仍会检查
+    function sendInput(input) {
+        complianceBypass++;
+        try {
+            triggerSend(input);
+        } finally {
+            complianceBypass--;
+        }
+    }
+
+    async function sendText(text, conversationId) {
+        // 程序发送的消息已在Python端检查过
+        if (platformOptions.sendText) {
+            return await platformOptions.sendText(text, conversationId);
+        }
+        if (conversationId && platformOptions.openConversation) {
+            await platformOptions.openConversation(conversationId);
+        }
+        const input = document.querySelector(platformOptions.inputSelector);
+        if (!input) {
+            throw new Error('未找到聊天输入框');
+        }
+        setInputValue(input, text);
+        sendInput(input);
+        return true;
+    }
+
+    // 发送前违禁词检查：输入框内容变化后请Python端检查，命中时在输入框上方提示；
+    // 有禁止发送的命中时拦截回车和发送按钮。检查结果返回前按下发送，先拦截，
+    // 结果没有禁止发送的命中时再自动发送
+    const COMPLIANCE_DELAY = 120;
+    let complianceEnabled = false;
+    let complianceBypass = 0;
+    let complianceSeq = 0;
+    let complianceTimer = null;
+    const complianceRequests = new Map();   // seq -> 检查的文本
+    let checkedText = null;
+    let checkedBlocking = false;
+    let pendingSendInput = null;
+    let compliancePanel = null;
+
+    function setCompliance(enabled) {
+        complianceEnabled = !!enabled;
+        if (!complianceEnabled) {
+            renderCompliance(null, []);
+        }
+    }
+
+    function chatInput(target) {
+        return target && target.closest ? target.closest(platformOptions.inputSelector) : null;
+    }
+
+    function inputText(input) {
+        return input.isContentEditable ? input.innerText : input.value;
+    }
+
+    function requestComplianceCheck(text) {
+        clearTimeout(complianceTimer);
+        complianceSeq++;
+        complianceRequests.set(complianceSeq, text);
+        if (complianceRequests.size > 20) {
+            complianceRequests.delete(complianceRequests.keys().next().value);
+        }
+        postMessage({ type: 'complianceCheck', response: JSON.stringify({ seq: complianceSeq, text: text }) });
+    }
+
+    function showCompliance(seq, hits, block) {
+        const text = complianceRequests.get(seq);
+        if (text === undefined || seq !== complianceSeq) {
+            return;
+        }
+        complianceRequests.clear();
+        checkedText = text;
+        checkedBlocking = !!block && hits.some(hit => hit.level === 'block');
+        const input = pendingSendInput || document.querySelector(platformOptions.inputSelector);
+        renderCompliance(input, hits);
+        if (pendingSendInput) {
+            const pending = pendingSendInput;
+            pendingSendInput = null;
+            if (!checkedBlocking && inputText(pending) === text) {
+                sendInput(pending);
+            }
+        }
+    }
+
+    function renderCompliance(input, hits) {
+        if (!hits.length || !input) {
+            if (compliancePanel) {
+                compliancePanel.style.display = 'none';
+            }
+            return;
+        }
+        if (!compliancePanel) {
+            compliancePanel = document.createElement('div');
+            compliancePanel.style.cssText = 'position:fixed;z-index:2147483647;max-width:480px;padding:6px 10px;' +
+                'border-radius:6px;font-size:12px;line-height:1.6;box-shadow:0 2px 8px rgba(0,0,0,.2);' +
+                'white-space:pre-wrap;word-break:break-all;pointer-events:none';
+            document.body.appendChild(compliancePanel);
+        }
+        const panel = compliancePanel;
+        panel.textContent = '';
+        panel.style.background = checkedBlocking ? '#fff1f0' : '#fffbe6';
+        panel.style.border = '1px solid ' + (checkedBlocking ? '#ff4d4f' : '#faad14');
+        const title = document.createElement('div');
+        const names = [...new Set(hits.map(hit => hit.category ? `${hit.text}(${hit.category})` : hit.text))];
+        title.textContent = (checkedBlocking ? '⛔ 含违禁词，已禁止发送：' : '⚠ 含敏感词：') + names.join('、');
+        panel.appendChild(title);
+        // 原文中标出命中位置
+        const preview = document.createElement('div');
+        let position = 0;
+        for (const hit of hits) {
+            const start = Math.max(hit.start, position);
+            if (hit.end <= start) {
+                continue;
+            }
+            preview.appendChild(document.createTextNode(checkedText.slice(position, start)));
+            const mark = document.createElement('mark');
+            mark.style.background = hit.level === 'block' ? '#ffccc7' : '#fff1b8';
+            mark.textContent = checkedText.slice(start, hit.end);
+            preview.appendChild(mark);
+            position = hit.end;
+        }
+        preview.appendChild(document.createTextNode(checkedText.slice(position)));
+        panel.appendChild(preview);
+        panel.style.display = 'block';
+        const rect = input.getBoundingClientRect();
+        panel.style.left = Math.max(rect.left, 4) + 'px';
+        panel.style.bottom = Math.max(window.innerHeight - rect.top + 4, 4) + 'px';
+    }
+
+    // 返回true表示本次发送被拦截
+    function interceptSend(input, event) {
+        if (!complianceEnabled || complianceBypass || !input) {
+            return false;
+        }
+        const text = inputText(input);
+        if (!text.trim()) {
+            return false;
+        }
+        if (text === checkedText && !checkedBlocking) {
+            return false;
+        }
+        event.preventDefault();
+        event.stopImmediatePropagation();
+        if (text !== checkedText) {
+            pendingSendInput = input;
+            requestComplianceCheck(text);
+        } else if (compliancePanel) {
+            compliancePanel.animate([{ opacity: 0.3 }, { opacity: 1 }], { duration: 300, iterations: 2 });
+        }
+        return true;
+    }
+
+    document.addEventListener('input', event => {
+        const input = chatInput(event.target);
+        if (!complianceEnabled || !input) {
+            return;
+        }
+        pendingSendInput = null;
+        clearTimeout(complianceTimer);
+        complianceTimer = setTimeout(() => requestComplianceCheck(inputText(input)), COMPLIANCE_DELAY);
+    }, true);
+
+    document.addEventListener('keydown', event => {
+        if (event.key === 'Enter' && !event.shiftKey && !event.isComposing) {
+            interceptSend(chatInput(event.target), event);
+        }
+    }, true);
+
+    document.addEventListener('click', event => {
+        const button = platformOptions.sendButtonSelector && event.target.closest &&
+            event.target.closest(platformOptions.sendButtonSelector);
+        if (button) {
+            interceptSend(document.querySelector(platformOptions.inputSelector), event);
+        }
+    }, true);
+
+    // 快捷回复：输入框内容以“/”开头时请Python端检索模板并在输入框上方列出；
+    // 上下键选择，回车或Tab插入（Python端替换变量后写回输入框），Esc关闭
+    const QUICK_REPLY_MAX_QUERY = 32;
+    let quickReplySeq = 0;
+    let quickReplyItems = [];
+    let quickReplyIndex = 0;
+    let quickReplyInput = null;
+    let quickReplyPanel = null;
+
+    function currentBuyer() {
+        // 平台脚本可通过configure({currentBuyer})提供当前会话的买家 {id, name}
+        try {
+            return platformOptions.currentBuyer ? platformOptions.currentBuyer() || null : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function requestQuickReplies(input) {
+        const text = inputText(input);
+        if (!text.startsWith('/') || text.length > QUICK_REPLY_MAX_QUERY || text.includes('\n')) {
+            hideQuickReplies();
+            return;
+        }
+        quickReplyInput = input;
+        quickReplySeq++;
+        postMessage({ type: 'quickReplyQuery', response: JSON.stringify({ seq: quickReplySeq, query: text.slice(1) }) });
+    }
+
+    function showQuickReplies(seq, items) {
+        if (seq !== quickReplySeq || !quickReplyInput) {
+            return;
+        }
+        quickReplyItems = items;
+        quickReplyIndex = 0;
+        renderQuickReplies();
+    }
+
+    function hideQuickReplies() {
+        // 丢弃尚未返回的检索结果
+        quickReplySeq++;
+        quickReplyItems = [];
+        renderQuickReplies();
+    }
+
+    function renderQuickReplies() {
+        if (!quickReplyItems.length || !quickReplyInput) {
+            if (quickReplyPanel) {
+                quickReplyPanel.style.display = 'none';
+            }
+            return;
+        }
+        if (!quickReplyPanel) {
+            quickReplyPanel = document.createElement('div');
+            quickReplyPanel.style.cssText = 'position:fixed;z-index:2147483647;width:420px;max-height:320px;' +
+                'overflow-y:auto;background:#fff;border:1px solid #d2d2d7;border-radius:6px;font-size:13px;' +
+                'line-height:1.5;box-shadow:0 2px 8px rgba(0,0,0,.2)';
+            document.body.appendChild(quickReplyPanel);
+        }
+        const panel = quickReplyPanel;
+        panel.textContent = '';
+        quickReplyItems.forEach((item, index) => {
+            const row = document.createElement('div');
+            row.style.cssText = 'padding:4px 10px;cursor:pointer;white-space:nowrap;overflow:hidden;' +
+                'text-overflow:ellipsis;background:' + (index === quickReplyIndex ? '#e6f4ff' : 'transparent');
+            const name = document.createElement('b');
+            name.textContent = (item.shortcut ? '/' + item.shortcut + ' ' : '') + item.title;
+            const preview = document.createElement('span');
+            preview.style.color = '#86868b';
+            preview.textContent = ' ' + item.preview;
+            row.appendChild(name);
+            row.appendChild(preview);
+            // 用mousedown并阻止默认行为，避免输入框失去焦点
+            row.addEventListener('mousedown', event => {
+                event.preventDefault();
+                chooseQuickReply(index);
+            });
+            panel.appendChild(row);
+        });
+        panel.style.display = 'block';
+        const rect = quickReplyInput.getBoundingClientRect();
+        panel.style.left = Math.max(rect.left, 4) + 'px';
+        panel.style.bottom = Math.max(window.innerHeight - rect.top + 4, 4) + 'px';
+        const selected = panel.children[quickReplyIndex];
+        if (selected) {
+            selected.scrollIntoView({ block: 'nearest' });
+        }
+    }
+
+    function chooseQuickReply(index) {
+        const item = quickReplyItems[index];
+        hideQuickReplies();
+        if (item) {
+            postMessage({ type: 'quickReplySelect', response: JSON.stringify({ id: item.id, buyer: currentBuyer() }) });
+        }
+    }
+
+    function insertText(text) {
+        const input = quickReplyInput && quickReplyInput.isConnected ? quickReplyInput :
+            document.querySelector(platformOptions.inputSelector);
+        if (!input) {
+            return false;
+        }
+        setInputValue(input, text);
+        return true;
+    }
+
+    document.addEventListener('input', event => {
+        const input = chatInput(event.target);
+        if (input) {
+            requestQuickReplies(input);
+        }
+    }, true);
+
+    document.addEventListener('focusout', event => {
+        if (quickReplyInput && event.target === quickReplyInput) {
+            hideQuickReplies();
+        }
+    }, true);
+
+    // 在window上捕获，先于违禁词检查的回车拦截执行
+    window.addEventListener('keydown', event => {
+        if (!quickReplyItems.length || event.isComposing || !chatInput(event.target)) {
+            return;
+        }
+        const count = quickReplyItems.length;
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            quickReplyIndex = (quickReplyIndex + (event.key === 'ArrowDown' ? 1 : -1) + count) % count;
+            renderQuickReplies();
+        } else if (event.key === 'Enter' || event.key === 'Tab') {
+            chooseQuickReply(quickReplyIndex);
+        } else if (event.key === 'Escape') {
+            hideQuickReplies();
+        } else {
+            return;
+        }
+        event.preventDefault();
+        event.stopImmediatePropagation();
+    }, true);
+
+    function waitFor(predicate, timeout) {
+        return new Promise((resolve, reject) => {
+            const start = Date.now();
+            (function poll() {
+                const value = predicate();
+                if (value) {
+                    resolve(value);
+                } else if (Date.now() - start > timeout) {
+                    reject(new Error('等待页面元素超时'));
+                } else {
+                    setTimeout(poll, 100);
+                }
+            })();
+        });
+    }
+
+    // 上传请求：点击文件选择框前先请Python端准备该条消息的文件，
+    // 每次点击对应一项，避免文件选择框取到其他消息或上次重试留下的文件
+    const uploadWaiters = new Map();
+
+    function requestUpload(id, timeout) {
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                uploadWaiters.delete(id);
+                reject(new Error('等待上传文件超时'));
+            }, timeout);
+            uploadWaiters.set(id, (ok) => {
+                clearTimeout(timer);
+                uploadWaiters.delete(id);
+                ok ? resolve() : reject(new Error('没有待上传的文件'));
+            });
+            postMessage({ type: 'uploadRequest', response: JSON.stringify({ id: id }) });
+        });
+    }
+
+    function uploadReady(id, ok) {
+        const waiter = uploadWaiters.get(id);
+        if (waiter) {
+            waiter(ok);
+        }
+    }
+
+    // 发送图片/视频：平台可提供 sendMedia 实现并返回平台素材ID以便复用；
+    // 默认点击文件选择框，由Python端的 chooseFiles 提供待上传文件
+    async function sendMedia(item) {
+        if (platformOptions.sendMedia) {
+            return await platformOptions.sendMedia(item);
+        }
+        if (item.conversationId && platformOptions.openConversation) {
+            await platformOptions.openConversation(item.conversationId);
+        }
+        const fileInput = await waitFor(
+            () => document.querySelector(platformOptions.fileInputSelector || 'input[type=file]'), 5000);
+        await requestUpload(item.id, 5000);
+        fileInput.click();
+        if (platformOptions.mediaSendButtonSelector) {
+            const button = await waitFor(() => document.querySelector(platformOptions.mediaSendButtonSelector), 30000);
+            button.click();
+        }
+        return '';
+    }
+
+    // 批量发送，逐条回执；已发送过的ID直接回执成功，保证重试幂等
+    const deliveredIds = new Set();
+
+    async function sendBatch(items) {
+        for (const item of items) {
+            let ok = true;
+            let error = '';
+            let mediaId = '';
+            if (!deliveredIds.has(item.id)) {
+                try {
+                    if (item.kind === 'image' || item.kind === 'video') {
+                        mediaId = (await sendMedia(item)) || '';
+                    } else {
+                        await sendText(item.text, item.conversationId);
+                    }
+                    deliveredIds.add(item.id);
+                } catch (e) {
+                    ok = false;
+                    error = String((e && e.message) || e);
+                }
+            }
+            postMessage({
+                type: 'sendAck',
+                response: JSON.stringify({ id: item.id, ok: ok, error: error, mediaId: mediaId })
+            });
+        }
+    }
+
+    // 待回复会话上报：平台脚本每次传入当前完整列表，这里只把变化部分发给Python。
+    // 列表项为 {id, name, waitSeconds?, overdue?}，未提供等待时长时以首次出现时间为准
+    const FULL_SYNC_INTERVAL = 60000;
+    let reportedConversations = new Map();
+    let lastFullSync = 0;
+
+    function reportConversations(list) {
+        const now = Date.now();
+        const current = new Map();
+        for (const item of list) {
+            if (!item || !item.id) {
+                continue;
+            }
+            const previous = reportedConversations.get(item.id);
+            let waitingSince = previous ? previous.waitingSince : now;
+            if (typeof item.waitSeconds === 'number' && item.waitSeconds >= 0) {
+                // 页面显示的等待时长精度有限，偏差不足一分钟时沿用上次的时间，避免重复上报
+                const reported = now - item.waitSeconds * 1000;
+                if (!previous || Math.abs(reported - previous.waitingSince) >= 60000) {
+                    waitingSince = reported;
+                }
+            }
+            current.set(item.id, {
+                id: String(item.id),
+                name: item.name || '',
+                waitingSince: waitingSince,
+                overdue: !!item.overdue
+            });
+        }
+
+        const full = now - lastFullSync >= FULL_SYNC_INTERVAL;
+        const upsert = [];
+        const remove = [];
+        for (const [id, conversation] of current) {
+            const previous = reportedConversations.get(id);
+            if (full || !previous || previous.waitingSince !== conversation.waitingSince
+                || previous.overdue !== conversation.overdue || previous.name !== conversation.name) {
+                upsert.push(conversation);
+            }
+        }
+        if (!full) {
+            for (const id of reportedConversations.keys()) {
+                if (!current.has(id)) {
+                    remove.push(id);
+                }
+            }
+        }
+        reportedConversations = current;
+
+        // 定期发送完整列表，Python端据此纠正遗漏的变化
+        if (full) {
+            lastFullSync = now;
+        } else if (!upsert.length && !remove.length) {
+            return;
+        }
+        postMessage({
+            type: 'conversations',
+            response: JSON.stringify({ full: full, upsert: upsert, remove: remove })
+        });
+    }
+
+    async function openConversation(conversationId) {
+        if (!platformOptions.openConversation) {
+            throw new Error('平台脚本不支持打开指定会话');
+        }
+        await platformOptions.openConversation(conversationId);
+    }
+
+    // 未读检测由Python端的轮询调度器统一调用 probe() 触发，返回本次检测耗时(毫秒)。
+    // 调度器长时间未调用时（例如Python端未启用）自行兜底检测。
+    // 调度器每次调用时传入兜底间隔（长于它最长的检测间隔），兜底检测不会打乱调度
+    const AUTO_PROBE_CHECK = 5000;
+    let autoProbeAfter = 15000;
+    let probeFn = null;
+    let lastProbeAt = 0;
+
+    function registerProbe(fn) {
+        probeFn = fn;
+    }
+
+    function probe(fallbackMs) {
+        if (typeof fallbackMs === 'number' && fallbackMs > 0) {
+            autoProbeAfter = fallbackMs;
+        }
+        if (!probeFn) {
+            return -1;
+        }
+        const start = performance.now();
+        lastProbeAt = Date.now();
+        try {
+            probeFn();
+        } catch (e) {
+            console.error('未读检测失败:', e);
+        }
+        return performance.now() - start;
+    }
+
+    setInterval(() => {
+        if (probeFn && Date.now() - lastProbeAt >= autoProbeAfter) {
+            probe();
+        }
+    }, AUTO_PROBE_CHECK);
+
+    // 心跳，供Python端看门狗判断渲染进程是否存活
+    const HEARTBEAT_INTERVAL = 10000;
+    setInterval(() => postMessage({ type: 'heartbeat', response: '{}' }), HEARTBEAT_INTERVAL);
+
+    window.pywebview = {
+        __pdkbot: true,
+        api: {
+            post_message: postMessage
+        },
+        whenReady: whenReady,
+        configure: configure,
+        sendText: sendText,
+        sendInput: sendInput,
+        sendBatch: sendBatch,
+        requestUpload: requestUpload,
+        uploadReady: uploadReady,
+        reportConversations: reportConversations,
+        openConversation: openConversation,
+        registerProbe: registerProbe,
+        probe: probe,
+        setCompliance: setCompliance,
+        showCompliance: showCompliance,
+        showQuickReplies: showQuickReplies,
+        insertText: insertText
+    };
+
+    // 每次页面创建桥接对象后通知Python端，按当前设置开启违禁词检查等，不依赖页面就绪
+    postMessage({ type: 'bridgeReady', response: '{}' });
+})();
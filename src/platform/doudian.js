@@ -47,7 +47,9 @@
         }
     }
     
-    // 初始化
-    setTimeout(getCurrentUser, 2000);
-    setInterval(checkNewMessages, 1000);
+    // 会话列表出现即视为就绪，随后开始采集用户信息和监控
+    window.pywebview.whenReady({ selector: '[class*="chat-list"], [class*="conversation-list"]' }, () => {
+        getCurrentUser();
+        window.pywebview.registerProbe(checkNewMessages);
+    });
 })();
\ No newline at end of file
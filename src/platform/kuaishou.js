@@ -46,7 +46,9 @@
         }
     }
     
-    // 初始化
-    setTimeout(getCurrentUser, 2000);
-    setInterval(checkNewMessages, 1000);
+    // 会话列表出现即视为就绪，随后开始采集用户信息和监控
+    window.pywebview.whenReady({ selector: '[class*="session-list"], [class*="chat-list"]' }, () => {
+        getCurrentUser();
+        window.pywebview.registerProbe(checkNewMessages);
+    });
 })(); 
\ No newline at end of file
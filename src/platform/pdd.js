@@ -1,25 +1,88 @@
-﻿fetch('https://mms.pinduoduo.com/chats/userinfo/realtime?get_response=true').then(res => {
-    res.json().then(r => {
-        window.pywebview.api.post_message({
-            type: 'currentuser', response: JSON.stringify({
-                userName: r.username,
-                mallName: r.mall.mall_name,
-                userId: r.id.toString(),
-                mallId: r.mall.mall_id.toString(),
-                avatar: r.mall.logo
+﻿// 拼多多平台消息监控脚本
+(function() {
+    function getCurrentUser() {
+        fetch('https://mms.pinduoduo.com/chats/userinfo/realtime?get_response=true').then(res => {
+            res.json().then(r => {
+                window.pywebview.api.post_message({
+                    type: 'currentuser', response: JSON.stringify({
+                        userName: r.username,
+                        mallName: r.mall.mall_name,
+                        userId: r.id.toString(),
+                        mallId: r.mall.mall_id.toString(),
+                        avatar: r.mall.logo
+                    })
+                })
             })
         })
-    })
-})
+    }
+
+    // 会话ID -> 会话列表元素，用于打开指定会话
+    let conversationItems = new Map();
+
+    // 解析“30秒”“5分钟”“1小时”之类的等待时长
+    function parseWaitSeconds(text) {
+        const match = /(\d+)\s*(秒|分|小时|时)/.exec(text || '');
+        if (!match) {
+            return undefined;
+        }
+        const value = parseInt(match[1], 10);
+        return match[2] === '秒' ? value : match[2] === '分' ? value * 60 : value * 3600;
+    }
+
+    function collectConversations(waitElements) {
+        const items = new Map();
+        const conversations = [];
+        for (const element of waitElements) {
+            const item = element.closest('[data-random], [class*="chat-item"], li');
+            if (!item) {
+                continue;
+            }
+            const nameElement = item.querySelector('[class*="nickname"], [class*="name"]');
+            const name = nameElement ? nameElement.textContent.trim() : '';
+            const id = item.getAttribute('data-random') || item.getAttribute('data-uid') || item.id || name;
+            if (!id) {
+                continue;
+            }
+            items.set(id, item);
+            conversations.push({
+                id: id,
+                name: name,
+                waitSeconds: parseWaitSeconds(element.textContent),
+                overdue: element.classList.contains('chat-unreply-over-time')
+            });
+        }
+        conversationItems = items;
+        return conversations;
+    }
 
-setInterval(() => {
-    let waitReplys = document.querySelectorAll('.chat-unreply-time');
-    let waitOverReplys = document.querySelectorAll('.chat-unreply-over-time');
-    let allWaitReplys = [...waitReplys, ...waitOverReplys]
-    window.pywebview.api.post_message({
-        type: 'newmessage', response: JSON.stringify({
-            hasNewMessage: allWaitReplys.length > 0,
-            newMessageCount: allWaitReplys.length,
+    function checkNewMessages() {
+        let waitReplys = document.querySelectorAll('.chat-unreply-time');
+        let waitOverReplys = document.querySelectorAll('.chat-unreply-over-time');
+        let allWaitReplys = [...waitReplys, ...waitOverReplys]
+        window.pywebview.api.post_message({
+            type: 'newmessage', response: JSON.stringify({
+                hasNewMessage: allWaitReplys.length > 0,
+                newMessageCount: allWaitReplys.length,
+            })
         })
-    })
-}, 1000)
\ No newline at end of file
+        window.pywebview.reportConversations(collectConversations(allWaitReplys));
+    }
+
+    window.pywebview.configure({
+        inputSelector: '#replyTextarea',
+        sendButtonSelector: '.send-btn',
+        openConversation: async (conversationId) => {
+            const item = conversationItems.get(conversationId);
+            if (!item || !item.isConnected) {
+                throw new Error('会话已不在列表中');
+            }
+            item.click();
+        }
+    });
+
+    // 会话列表渲染完成即视为就绪
+    window.pywebview.whenReady({ selector: '.chat-list' }, () => {
+        getCurrentUser();
+        window.pywebview.registerProbe(checkNewMessages);
+    });
+})();
\ No newline at end of file
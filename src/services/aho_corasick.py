@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Aho-Corasick 多模式匹配自动机
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """Aho-Corasick 自动机，一次扫描文本即可找出所有模式串的出现位置"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态直接结束的模式：(模式长度, 值)
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        # 沿失败链最近的一个有输出的状态
+        self._output_link: List[int] = [0]
+        self._built = False
+        self.pattern_count = 0
+
+    def add(self, pattern: str, value: Any):
+        """添加模式串，添加后需重新调用build()"""
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._output_link.append(0)
+            state = next_state
+        self._output[state].append((len(pattern), value))
+        self.pattern_count += 1
+        self._built = False
+
+    def build(self):
+        """构建失败指针"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        output_link = self._output_link
+
+        queue = deque()
+        for next_state in goto[0].values():
+            fail[next_state] = 0
+            output_link[next_state] = 0
+            queue.append(next_state)
+
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[next_state] = target if target != next_state else 0
+                fail_state = fail[next_state]
+                output_link[next_state] = fail_state if output[fail_state] else output_link[fail_state]
+
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """遍历所有匹配，返回 (起始位置, 结束位置, 值)，结束位置不含"""
+        if not self._built:
+            self.build()
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        output_link = self._output_link
+
+        state = 0
+        for index, ch in enumerate(text):
+            next_state = goto[state].get(ch)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(ch)
+            state = next_state or 0
+            if not state:
+                continue
+
+            end = index + 1
+            out_state = state if output[state] else output_link[state]
+            while out_state:
+                for length, value in output[out_state]:
+                    yield end - length, end, value
+                out_state = output_link[out_state]
+
+    def find_values(self, text: str) -> List[Any]:
+        """返回所有命中的值（可能重复）"""
+        return [value for _, _, value in self.iter_matches(text)]
+
+    def __len__(self) -> int:
+        return self.pattern_count
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+关键词自动回复引擎
+
+所有规则的关键词编译进同一个 Aho-Corasick 自动机，匹配耗时只与消息长度
+和命中数量有关，与规则数量无关。正则规则逐条编译，按平台合并的表达式只用于预筛，
+命中的规则全部参与优先级比较，适合少量需要模式匹配的场景。
+"""
+
+import json
+import logging
+import random
+import re
+import string
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..db.entities import AutoReplyRule, ChatMessage
+from .aho_corasick import AhoCorasick
+from .regex_set import RegexSet
+
+logger = logging.getLogger(__name__)
+
+# 同一买家的默认回复冷却时间(秒)
+DEFAULT_COOLDOWN = 60.0
+# 冷却记录超过该数量时清理过期项
+COOLDOWN_PRUNE_SIZE = 10000
+
+
+class AutoReplyEngine:
+    """自动回复引擎"""
+
+    def __init__(self, rules_file: Path, default_cooldown: float = DEFAULT_COOLDOWN):
+        self.rules_file = rules_file
+        self.default_cooldown = default_cooldown
+
+        self.rules: List[AutoReplyRule] = []
+        self._automaton = AhoCorasick()
+        self._regex_rules: Dict[str, RegexSet[int]] = {}
+        self._max_cooldown = default_cooldown
+
+        # (webview_id, buyer_id) -> 上次自动回复时间
+        self._last_replied: Dict[Tuple[str, str], float] = {}
+
+        self.load_rules()
+
+    def load_rules(self):
+        """从文件加载规则并编译"""
+        rules = []
+        if self.rules_file.exists():
+            try:
+                with open(self.rules_file, 'r', encoding='utf-8') as f:
+                    rules = [AutoReplyRule.from_dict(item) for item in json.load(f)]
+            except Exception as e:
+                logger.error("加载自动回复规则失败: %s", e)
+        self.set_rules(rules)
+
+    def save_rules(self):
+        """保存规则到文件"""
+        try:
+            with open(self.rules_file, 'w', encoding='utf-8') as f:
+                json.dump([rule.to_dict() for rule in self.rules], f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error("保存自动回复规则失败: %s", e)
+
+    def set_rules(self, rules: List[AutoReplyRule]):
+        """替换规则集并重新编译"""
+        self.rules = [rule for rule in rules if rule.enabled]
+        self._compile()
+
+    def _compile(self):
+        """将规则编译为关键词自动机和按平台分组的正则"""
+        automaton = AhoCorasick()
+        regex_rules: Dict[str, RegexSet[int]] = {}
+        max_cooldown = self.default_cooldown
+
+        for index, rule in enumerate(self.rules):
+            for keyword in rule.keywords:
+                automaton.add(keyword.lower(), index)
+            if rule.cooldown is not None:
+                max_cooldown = max(max_cooldown, rule.cooldown)
+            if not rule.regex:
+                continue
+            try:
+                for platform in (rule.platforms or ["*"]):
+                    regex_rules.setdefault(platform, RegexSet(re.IGNORECASE)).add(rule.regex, index)
+            except re.error as e:
+                logger.warning("自动回复规则 %s 正则无效: %s", rule.rule_id, e)
+
+        automaton.build()
+
+        common = regex_rules.get("*", RegexSet(re.IGNORECASE))
+        for platform, regexes in regex_rules.items():
+            if platform != "*":
+                regexes.extend(common)
+            regexes.build()
+
+        self._automaton = automaton
+        self._regex_rules = regex_rules
+        self._max_cooldown = max_cooldown
+
+    def _in_scope(self, rule: AutoReplyRule, message: ChatMessage) -> bool:
+        """规则是否适用于该消息的平台和店铺"""
+        if rule.platforms and message.platform not in rule.platforms:
+            return False
+        if rule.shops and message.webview_id not in rule.shops:
+            return False
+        return True
+
+    def find_rule(self, message: ChatMessage) -> Optional[AutoReplyRule]:
+        """查找命中的优先级最高的规则，不检查冷却"""
+        content = message.content
+        if not content:
+            return None
+
+        best: Optional[AutoReplyRule] = None
+        for index in self._automaton.find_values(content.lower()):
+            rule = self.rules[index]
+            if (best is None or rule.priority > best.priority) and self._in_scope(rule, message):
+                best = rule
+
+        regexes = self._regex_rules.get(message.platform) or self._regex_rules.get("*")
+        if regexes is not None:
+            for index in regexes.values(content):
+                rule = self.rules[index]
+                if (best is None or rule.priority > best.priority) and self._in_scope(rule, message):
+                    best = rule
+
+        return best
+
+    def match(self, message: ChatMessage, now: float = None) -> Optional[AutoReplyRule]:
+        """匹配消息，命中且不在冷却期内时返回规则并记录回复时间"""
+        if not message.from_buyer:
+            return None
+
+        rule = self.find_rule(message)
+        if rule is None:
+            return None
+
+        now = time.monotonic() if now is None else now
+        key = (message.webview_id, message.buyer_id)
+        cooldown = self.default_cooldown if rule.cooldown is None else rule.cooldown
+        last = self._last_replied.get(key)
+        if last is not None and now - last < cooldown:
+            return None
+
+        self._last_replied[key] = now
+        if len(self._last_replied) > COOLDOWN_PRUNE_SIZE:
+            self._prune_cooldowns(now)
+        return rule
+
+    def _prune_cooldowns(self, now: float):
+        """清理已过冷却期的记录"""
+        self._last_replied = {
+            key: last for key, last in self._last_replied.items()
+            if now - last < self._max_cooldown
+        }
+
+
+def run_benchmark(rule_count: int = 10000, message_count: int = 20000):
+    """自动回复匹配性能测试"""
+    rng = random.Random(42)
+    alphabet = "的一是在不了有和人这中大为上个我以要他时来用们生到作地于出就分对成会可发货退款包邮尺码颜色质量快递"
+    platforms = ["pdd", "doudian", "kuaishou", "jd"]
+
+    def random_word(length: int) -> str:
+        return "".join(rng.choice(alphabet) for _ in range(length))
+
+    rules = []
+    for i in range(rule_count):
+        rules.append(AutoReplyRule(
+            rule_id=str(i),
+            keywords=[random_word(rng.randint(2, 5)) for _ in range(rng.randint(1, 3))],
+            reply=f"回复{i}",
+            platforms=[rng.choice(platforms)] if i % 3 == 0 else [],
+            priority=rng.randint(0, 10),
+            cooldown=0
+        ))
+    # 少量正则规则
+    for i in range(20):
+        rules.append(AutoReplyRule(rule_id=f"re{i}", regex=rf"订单号?\s*{i}\d{{6}}", reply="正则回复", cooldown=0))
+
+    engine = AutoReplyEngine(Path("__benchmark_rules__.json"))
+    start = time.perf_counter()
+    engine.set_rules(rules)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    messages = [
+        ChatMessage(
+            platform=rng.choice(platforms),
+            webview_id="shop",
+            buyer_id=str(rng.randint(0, 1000)),
+            content=random_word(rng.randint(10, 60)) + rng.choice(["", " 订单 1234567", string.ascii_letters[:8]])
+        )
+        for _ in range(message_count)
+    ]
+
+    timings = []
+    hits = 0
+    for message in messages:
+        begin = time.perf_counter()
+        if engine.match(message) is not None:
+            hits += 1
+        timings.append((time.perf_counter() - begin) * 1e6)
+
+    timings.sort()
+    print(f"规则数: {len(rules)}，自动机状态数: {len(engine._automaton._goto)}，编译耗时: {compile_ms:.0f} ms")
+    print(f"消息数: {message_count}，命中: {hits}")
+    print(f"单条匹配耗时: 平均 {sum(timings) / len(timings):.1f} us，"
+          f"p50 {timings[len(timings) // 2]:.1f} us，p99 {timings[int(len(timings) * 0.99)]:.1f} us，"
+          f"最大 {timings[-1]:.1f} us")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+店铺商品目录存储
+
+每个店铺一个SQLite数据库，商品表按编码和标题建立前缀索引，
+标题分词后写入FTS5全文索引用于关键词检索。使用WAL模式，
+后台同步写入时界面线程的查询不会被阻塞。
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from ..db.entities import Product
+from .tokenizer import normalize, tokenize
+
+# 前缀查询的上界字符
+_PREFIX_END = "\U0010ffff"
+# 关键词检索参与排序的候选数量
+KEYWORD_CANDIDATES = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    sku_code TEXT NOT NULL,
+    sku_norm TEXT NOT NULL,
+    price REAL NOT NULL,
+    stock INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    image_url TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_title ON products(title_norm);
+CREATE INDEX IF NOT EXISTS idx_products_sku ON products(sku_norm);
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(tokens, tokenize='unicode61');
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 与 Product 字段顺序一致
+_COLUMNS = "product_id, title, sku_code, price, stock, status, image_url, updated_at"
+_JOINED_COLUMNS = ", ".join(f"p.{column.strip()}" for column in _COLUMNS.split(","))
+
+
+def _index_text(product: Product) -> str:
+    """商品的全文索引内容：标题分词与编码，空格分隔"""
+    tokens = tokenize(product.title, unigrams=False)
+    tokens.extend(tokenize(product.sku_code))
+    return " ".join(tokens)
+
+
+def _fts_query(text: str) -> str:
+    """构建FTS5查询：所有词都需命中，最后一个词可能未输入完整时按前缀匹配
+
+    中文双字词已是完整的词，只有单字和字母数字词需要前缀匹配。
+    """
+    tokens = tokenize(text, unigrams=False)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    last = tokens[-1]
+    if len(last) == 1 or last.isascii():
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class CatalogStore:
+    """单个店铺的商品目录"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.executescript(_SCHEMA)
+        self._reader = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def upsert_many(self, products: Iterable[Product]) -> int:
+        """新增或更新商品，返回处理条数"""
+        count = 0
+        with self._write_lock, self._writer:
+            for product in products:
+                row = self._writer.execute(
+                    "SELECT rowid FROM products WHERE product_id = ?", (product.product_id,)).fetchone()
+                values = (product.title, normalize(product.title), product.sku_code, normalize(product.sku_code),
+                          product.price, product.stock, product.status, product.image_url, product.updated_at)
+                if row is None:
+                    cursor = self._writer.execute(
+                        "INSERT INTO products (title, title_norm, sku_code, sku_norm, price, stock, status, "
+                        "image_url, updated_at, product_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        values + (product.product_id,))
+                    rowid = cursor.lastrowid
+                else:
+                    rowid = row[0]
+                    self._writer.execute(
+                        "UPDATE products SET title = ?, title_norm = ?, sku_code = ?, sku_norm = ?, price = ?, "
+                        "stock = ?, status = ?, image_url = ?, updated_at = ? WHERE rowid = ?", values + (rowid,))
+                    self._writer.execute("DELETE FROM products_fts WHERE rowid = ?", (rowid,))
+                self._writer.execute("INSERT INTO products_fts (rowid, tokens) VALUES (?, ?)",
+                                     (rowid, _index_text(product)))
+                count += 1
+        return count
+
+    def delete_many(self, product_ids: Iterable[str]) -> int:
+        """删除商品，返回删除条数"""
+        count = 0
+        with self._write_lock, self._writer:
+            for product_id in product_ids:
+                row = self._writer.execute(
+                    "SELECT rowid FROM products WHERE product_id = ?", (product_id,)).fetchone()
+                if row is None:
+                    continue
+                self._writer.execute("DELETE FROM products_fts WHERE rowid = ?", row)
+                self._writer.execute("DELETE FROM products WHERE rowid = ?", row)
+                count += 1
+        return count
+
+    def _query(self, sql: str, params: tuple) -> List[Product]:
+        with self._read_lock:
+            rows = self._reader.execute(sql, params).fetchall()
+        return [Product(*row) for row in rows]
+
+    def get(self, product_id: str) -> Optional[Product]:
+        products = self._query(f"SELECT {_COLUMNS} FROM products WHERE product_id = ?", (product_id,))
+        return products[0] if products else None
+
+    def prefix_search(self, prefix: str, limit: int = 10) -> List[Product]:
+        """按商品编码或标题前缀查找"""
+        prefix = normalize(prefix).strip()
+        if not prefix:
+            return []
+        upper = prefix + _PREFIX_END
+        products = self._query(
+            f"SELECT {_COLUMNS} FROM products WHERE sku_norm >= ? AND sku_norm < ? "
+            "ORDER BY sku_norm LIMIT ?", (prefix, upper, limit))
+        if len(products) < limit:
+            seen = {p.product_id for p in products}
+            products.extend(p for p in self._query(
+                f"SELECT {_COLUMNS} FROM products WHERE title_norm >= ? AND title_norm < ? "
+                "ORDER BY title_norm LIMIT ?", (prefix, upper, limit))
+                if p.product_id not in seen)
+        return products[:limit]
+
+    def keyword_search(self, text: str, limit: int = 10) -> List[Product]:
+        """按关键词检索
+
+        常见词可能命中大部分商品，对全部命中结果计算BM25代价较高，
+        因此只取前 KEYWORD_CANDIDATES 个命中结果，标题连续包含查询文本的排在前面，
+        其次按标题长度排序。
+        """
+        query = _fts_query(text)
+        if not query:
+            return []
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT {_JOINED_COLUMNS}, p.title_norm "
+                "FROM products_fts JOIN products p ON p.rowid = products_fts.rowid "
+                "WHERE products_fts MATCH ? LIMIT ?", (query, KEYWORD_CANDIDATES)).fetchall()
+        needle = "".join(normalize(text).split())
+        rows.sort(key=lambda row: (needle not in "".join(row[-1].split()), len(row[-1])))
+        return [Product(*row[:-1]) for row in rows[:limit]]
+
+    def search(self, text: str, limit: int = 10) -> List[Product]:
+        """前缀匹配优先，不足时补充关键词检索结果"""
+        products = self.prefix_search(text, limit)
+        if len(products) < limit:
+            seen = {p.product_id for p in products}
+            products.extend(p for p in self.keyword_search(text, limit) if p.product_id not in seen)
+        return products[:limit]
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def get_state(self) -> Dict[str, str]:
+        """同步状态（游标、增量起点等）"""
+        with self._read_lock:
+            return dict(self._reader.execute("SELECT key, value FROM sync_state").fetchall())
+
+    def set_state(self, **values):
+        with self._write_lock, self._writer:
+            self._writer.executemany(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                [(key, str(value)) for key, value in values.items()])
+
+    def clear(self):
+        """清空商品和同步状态，用于全量重新同步"""
+        with self._write_lock, self._writer:
+            self._writer.execute("DELETE FROM products")
+            self._writer.execute("DELETE FROM products_fts")
+            self._writer.execute("DELETE FROM sync_state")
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        with self._read_lock:
+            self._reader.close()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+店铺商品目录同步
+
+首次同步按游标分页拉取全部商品，之后按上次同步到的更新时间增量拉取。
+每页写入后保存游标，同步中断时下次从断点继续。同步在后台线程执行，
+商品保存在本地目录存储中，查询不经过网络。
+"""
+
+import argparse
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from ..db.entities import Product
+from .catalog_store import CatalogStore
+from .session_pool import REQUEST_TIMEOUT, SessionPool, extract_list, fill_template, get_path
+
+logger = logging.getLogger(__name__)
+
+# 增量同步间隔(秒)
+DEFAULT_SYNC_INTERVAL = 600
+DEFAULT_PAGE_SIZE = 100
+# 单次同步的最大页数，防止接口游标异常时无限循环
+MAX_PAGES = 10000
+# 商品字段 -> 接口字段，未配置的按同名字段读取
+DEFAULT_FIELDS = {field: field for field in Product.__dataclass_fields__}
+
+
+def parse_product(item: Dict, fields: Dict[str, str]) -> Optional[Product]:
+    """按字段映射将接口返回的商品转为 Product"""
+    values = {}
+    for name, path in fields.items():
+        value = get_path(item, path)
+        if value is not None:
+            values[name] = value
+    if not values.get("product_id"):
+        return None
+    updated_at = float(values.get("updated_at") or 0)
+    return Product(
+        product_id=str(values["product_id"]),
+        title=str(values.get("title", "")),
+        sku_code=str(values.get("sku_code", "")),
+        price=float(values.get("price") or 0),
+        stock=int(values.get("stock") or 0),
+        status=str(values.get("status", "")),
+        image_url=str(values.get("image_url", "")),
+        # 毫秒时间戳统一为秒
+        updated_at=updated_at / 1000 if updated_at > 1e12 else updated_at
+    )
+
+
+class CatalogSync(QObject):
+    """店铺商品目录同步
+
+    各平台的商品接口通过配置提供，格式：
+        {"url": "...", "method": "GET", "params": {...}, "json": {...},
+         "items_path": "result.goods", "cursor_path": "result.next_cursor",
+         "fields": {"product_id": "goods_id", "title": "goods_name", ...},
+         "deleted_statuses": ["deleted"]}
+    url、params、json 中的 {cursor}、{updated_since}、{page_size} 会替换为当前分页参数。
+    """
+
+    # 信号（在后台线程发出）
+    sync_finished = pyqtSignal(str, str, int)  # 平台名, webview_id, 变更商品数
+    sync_failed = pyqtSignal(str, str, str)  # 平台名, webview_id, 错误信息
+
+    def __init__(self, data_dir: Path, session_pool: SessionPool, apis: Dict = None,
+                 interval: float = DEFAULT_SYNC_INTERVAL, max_workers: int = 2, parent=None):
+        super().__init__(parent)
+
+        self.catalog_dir = data_dir / "catalog"
+        self.session_pool = session_pool
+        self.apis: Dict[str, Dict] = dict(apis or {})
+
+        self._stores: Dict[str, CatalogStore] = {}
+        self._shops: Dict[str, str] = {}  # webview_id -> 平台名
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="catalog-sync")
+
+        # interval为0时不定时同步
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.sync_all)
+        if interval > 0:
+            self._timer.start(int(interval * 1000))
+
+    def store(self, webview_id: str) -> CatalogStore:
+        """获取店铺的商品目录"""
+        with self._lock:
+            store = self._stores.get(webview_id)
+            if store is None:
+                store = CatalogStore(self.catalog_dir / f"{webview_id}.db")
+                self._stores[webview_id] = store
+            return store
+
+    def watch(self, platform: str, webview_id: str):
+        """登记店铺并立即同步一次"""
+        if platform not in self.apis:
+            return
+        self._shops[webview_id] = platform
+        self.sync(platform, webview_id)
+
+    def sync_all(self):
+        """增量同步所有已登记的店铺"""
+        for webview_id, platform in list(self._shops.items()):
+            self.sync(platform, webview_id)
+
+    def sync(self, platform: str, webview_id: str, full: bool = False) -> bool:
+        """提交后台同步，店铺已在同步中时返回False"""
+        with self._lock:
+            if webview_id in self._running:
+                return False
+            self._running.add(webview_id)
+        self._executor.submit(self._run, platform, webview_id, full)
+        return True
+
+    def search(self, webview_id: str, text: str, limit: int = 10) -> List[Product]:
+        """在店铺商品目录中查找商品"""
+        if webview_id not in self._stores and not (self.catalog_dir / f"{webview_id}.db").exists():
+            return []
+        return self.store(webview_id).search(text, limit)
+
+    def _run(self, platform: str, webview_id: str, full: bool):
+        try:
+            if self._stopped.is_set():
+                # 退出时尚未开始的同步直接跳过
+                return
+            changed = self.sync_now(platform, webview_id, full)
+        except Exception as e:
+            logger.error("同步商品失败(%s/%s): %s", platform, webview_id, e)
+            self.sync_failed.emit(platform, webview_id, str(e))
+        else:
+            self.sync_finished.emit(platform, webview_id, changed)
+        finally:
+            with self._lock:
+                self._running.discard(webview_id)
+
+    def sync_now(self, platform: str, webview_id: str, full: bool = False) -> int:
+        """在当前线程同步店铺商品，返回变更商品数"""
+        api = self.apis.get(platform)
+        if not api or not api.get("url"):
+            raise ValueError(f"未配置 {platform} 平台的商品接口")
+
+        store = self.store(webview_id)
+        if full:
+            store.clear()
+        state = store.get_state()
+        cursor = state.get("cursor", "")
+        updated_since = float(state.get("updated_since", 0))
+        # 本轮同步开始时的增量起点，中断续传时保持不变
+        round_since = float(state.get("round_since", updated_since))
+
+        fields = dict(DEFAULT_FIELDS)
+        fields.update(api.get("fields", {}))
+        deleted_statuses = set(api.get("deleted_statuses", ["deleted"]))
+        session = self.session_pool.get(webview_id)
+
+        changed = 0
+        max_updated = updated_since
+        for _ in range(MAX_PAGES):
+            if self._stopped.is_set():
+                break
+            values = {"cursor": cursor, "updated_since": int(round_since),
+                      "page_size": api.get("page_size", DEFAULT_PAGE_SIZE)}
+            response = session.request(
+                api.get("method", "GET"),
+                fill_template(api["url"], values),
+                params=fill_template(api.get("params"), values),
+                json=fill_template(api.get("json"), values),
+                timeout=api.get("timeout", REQUEST_TIMEOUT)
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            products = [p for p in (parse_product(item, fields) for item in extract_list(data, api["items_path"]))
+                        if p is not None]
+            deleted = [p.product_id for p in products if p.status in deleted_statuses]
+            changed += store.upsert_many(p for p in products if p.status not in deleted_statuses)
+            changed += store.delete_many(deleted)
+            max_updated = max([max_updated] + [p.updated_at for p in products])
+
+            next_cursor = get_path(data, api.get("cursor_path", ""))
+            if not products or not next_cursor:
+                # 本轮完成，下次从本轮见到的最大更新时间开始增量同步
+                store.set_state(cursor="", updated_since=max_updated, round_since=max_updated,
+                                synced_at=time.time())
+                break
+            cursor = str(next_cursor)
+            store.set_state(cursor=cursor, updated_since=max_updated, round_since=round_since)
+        return changed
+
+    def shutdown(self):
+        """停止同步并关闭目录存储"""
+        self._stopped.set()
+        self._timer.stop()
+        # 不使用 cancel_futures(需要 Python 3.9)：排队中的同步看到停止标志后立即返回
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+
+
+def _percentile(samples: List[float], ratio: float) -> float:
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * ratio), len(samples) - 1)]
+
+
+def run_benchmark(product_count: int = 100000, queries: int = 2000):
+    """从本地模拟接口同步商品并测试查询延迟"""
+    import random
+    from .stub_server import StubPlatformServer, fake_product
+
+    with tempfile.TemporaryDirectory() as tmp, StubPlatformServer(products=product_count) as server:
+        sync = CatalogSync(Path(tmp), SessionPool(), {"pdd": server.product_api(page_size=1000)},
+                           interval=0)
+
+        begin = time.perf_counter()
+        changed = sync.sync_now("pdd", "shop1")
+        print(f"全量同步 {changed} 个商品，耗时 {time.perf_counter() - begin:.1f} 秒")
+
+        server.touch_products(range(0, product_count, 100))
+        begin = time.perf_counter()
+        changed = sync.sync_now("pdd", "shop1")
+        print(f"增量同步 {changed} 个商品，耗时 {time.perf_counter() - begin:.2f} 秒，"
+              f"服务器共收到请求 {server.request_count} 次")
+
+        rng = random.Random(1)
+        samples: Dict[str, List[float]] = {"前缀": [], "关键词": [], "组合": []}
+        for _ in range(queries):
+            product = fake_product(rng.randrange(product_count))
+            words = product["title"].split()
+            cases: List[Tuple[str, str]] = [
+                ("前缀", product["sku_code"][:rng.randint(3, 8)]),
+                ("关键词", " ".join(rng.sample(words, min(2, len(words))))),
+                ("组合", words[0][:rng.randint(1, len(words[0]))]),
+            ]
+            for name, text in cases:
+                start = time.perf_counter()
+                if name == "前缀":
+                    sync.store("shop1").prefix_search(text)
+                elif name == "关键词":
+                    sync.store("shop1").keyword_search(text)
+                else:
+                    sync.search("shop1", text)
+                samples[name].append((time.perf_counter() - start) * 1000)
+
+        for name, values in samples.items():
+            print(f"{name}查询: 平均 {sum(values) / len(values):.2f} ms, "
+                  f"p50 {_percentile(values, 0.5):.2f} ms, p99 {_percentile(values, 0.99):.2f} ms")
+        sync.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="商品目录同步与查询性能测试")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    run_benchmark(args.products, args.queries)
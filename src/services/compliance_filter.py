@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+发送前违禁词检查
+
+各平台对极限词、站外联系方式等违规用语有各自的词表。词表放在 data/compliance/ 目录：
+common.txt 适用于所有平台，<平台>.txt（如 pdd.txt）只适用于该平台。每行一项：
+
+    词语[<Tab>类别[<Tab>级别]]
+    re:正则表达式[<Tab>类别[<Tab>级别]]
+
+级别为 block（默认，禁止发送）或 warn（只提醒），# 开头为注释。
+
+所有平台的词语编译进同一个 Aho-Corasick 自动机。正则逐项编译，并按平台合并为一个
+不含分组名的表达式用于预筛：合并表达式没有匹配时跳过逐项检查，有匹配时逐项检查，
+因此重叠的正则都能报告，禁止发送的命中不会被只提醒的命中遮住。
+检查前文本统一转换：全角转半角、大写转小写、繁体转简体，词语匹配时再去掉空白、
+标点和符号，因此“微 信”“ＶＸ”“微＊信”都能命中。命中位置映射回原文，用于高亮。
+词表文件变化后在后台线程重新编译，编译完成后整体替换，检查不会被阻塞。
+"""
+
+import argparse
+import logging
+import random
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .aho_corasick import AhoCorasick
+from .regex_set import RegexSet
+
+try:
+    from opencc import OpenCC
+    _t2s = OpenCC("t2s")
+except ImportError:
+    _t2s = None
+
+logger = logging.getLogger(__name__)
+
+LEVEL_BLOCK = "block"
+LEVEL_WARN = "warn"
+COMMON_LIST = "common"
+
+# 默认配置，可通过 config.json 中的 "compliance" 覆盖
+DEFAULT_COMPLIANCE_CONFIG = {
+    "enabled": True,
+    "block_send": True,          # 命中 block 级别的词时禁止发送
+    "reload_interval": 2,        # 检查词表文件是否变化的间隔(秒)
+}
+
+# 未安装 opencc 时使用的常用繁体字对照表（繁简成对）
+_TRADITIONAL_PAIRS = (
+    "萬万 與与 專专 業业 叢丛 東东 絲丝 兩两 嚴严 喪丧 個个 豐丰 臨临 為为 麗丽 舉举 義义 烏乌 樂乐 喬乔 習习 鄉乡 書书 買买 亂乱 爭争 於于 虧亏 雲云 亞亚 "
+    "產产 親亲 億亿 僅仅 從从 倉仓 儀仪 們们 價价 眾众 優优 會会 傘伞 偉伟 傳传 傷伤 倫伦 偽伪 體体 餘余 傭佣 俠侠 侶侣 偵侦 側侧 僑侨 兒儿 黨党 蘭兰 關关 "
+    "興兴 養养 內内 岡冈 冊册 寫写 軍军 農农 馮冯 衝冲 決决 況况 凍冻 淨净 準准 涼凉 減减 幾几 鳳凤 憑凭 凱凯 擊击 劃划 劉刘 則则 剛刚 創创 刪删 別别 劑剂 "
+    "劍剑 劇剧 勸劝 辦办 務务 動动 勵励 勁劲 勞劳 勢势 勻匀 區区 醫医 華华 協协 單单 賣卖 盧卢 衛卫 卻却 廠厂 廳厅 歷历 厲厉 壓压 厭厌 縣县 參参 雙双 發发 "
+    "變变 敘叙 臺台 葉叶 號号 嘆叹 嚇吓 嗎吗 啟启 吳吴 員员 聽听 國国 圖图 圓圆 聖圣 場场 壞坏 塊块 堅坚 壇坛 墳坟 墜坠 壯壮 聲声 殼壳 處处 備备 復复 夠够 "
+    "頭头 誇夸 夾夹 奪夺 奮奋 獎奖 婦妇 媽妈 嬰婴 孫孙 學学 寧宁 寶宝 實实 寵宠 審审 憲宪 宮宫 寬宽 賓宾 對对 尋寻 導导 壽寿 將将 爾尔 塵尘 嘗尝 層层 屬属 "
+    "歲岁 島岛 峽峡 崗岗 嶺岭 幣币 帥帅 師师 帳帐 帶带 幫帮 幹干 廣广 莊庄 慶庆 廬庐 庫库 應应 廟庙 開开 異异 棄弃 張张 彌弥 彎弯 彈弹 強强 歸归 當当 錄录 "
+    "徹彻 徑径 後后 憶忆 懷怀 態态 憐怜 總总 戀恋 懇恳 惡恶 惱恼 悅悦 懸悬 驚惊 慘惨 慚惭 慣惯 願愿 懶懒 戲戏 戰战 戶户 撲扑 執执 擴扩 掃扫 揚扬 擾扰 撫抚 "
+    "搶抢 護护 報报 擔担 擬拟 攏拢 揀拣 擁拥 攔拦 擰拧 撥拨 擇择 掛挂 擋挡 揮挥 損损 撿捡 換换 據据 擠挤 攜携 搖摇 攝摄 擺摆 敵敌 數数 齋斋 鬥斗 斬斩 斷断 "
+    "無无 舊旧 時时 曠旷 晝昼 顯显 晉晋 曬晒 曉晓 暈晕 暫暂 術术 機机 殺杀 雜杂 權权 條条 來来 楊杨 極极 構构 槍枪 櫃柜 檢检 樣样 橋桥 樹树 標标 欄栏 樓楼 "
+    "檔档 橫横 槳桨 歡欢 歐欧 殘残 毀毁 氣气 漢汉 湯汤 溝沟 沒没 滬沪 瀋沈 溫温 濕湿 測测 濃浓 濟济 濱滨 滿满 滅灭 潤润 漲涨 漸渐 潔洁 澤泽 灑洒 灣湾 災灾 "
+    "燈灯 靈灵 爐炉 點点 煉炼 煙烟 燒烧 熱热 營营 爺爷 牆墙 牽牵 犧牺 狀状 猶犹 獨独 獄狱 獲获 環环 現现 瑪玛 畫画 暢畅 療疗 瘋疯 癢痒 皺皱 盞盏 監监 蓋盖 "
+    "盤盘 睏困 矚瞩 礎础 確确 碼码 礦矿 禮礼 禍祸 離离 種种 積积 稱称 穩稳 窮穷 竊窃 競竞 筆笔 節节 範范 築筑 簡简 籃篮 類类 糧粮 紅红 約约 級级 紀纪 紡纺 "
+    "純纯 紙纸 紛纷 細细 終终 組组 結结 絕绝 統统 經经 綠绿 維维 網网 緊紧 線线 編编 緣缘 練练 縮缩 績绩 織织 繼继 續续 罰罚 罷罢 羅罗 聞闻 聯联 職职 聰聪 "
+    "肅肃 脅胁 膽胆 腦脑 腸肠 膚肤 臉脸 艦舰 艱艰 藝艺 蘋苹 蘇苏 蔥葱 蕭萧 薦荐 藥药 蟲虫 補补 裝装 製制 襪袜 見见 規规 視视 覽览 覺觉 觀观 觸触 計计 記记 "
+    "討讨 讓让 訓训 議议 訊讯 許许 論论 設设 訪访 證证 評评 識识 詐诈 訴诉 診诊 詞词 譯译 試试 詩诗 誠诚 話话 該该 詳详 語语 誤误 說说 請请 諸诸 讀读 課课 "
+    "誰谁 調调 談谈 謝谢 謠谣 講讲 謹谨 譜谱 貝贝 負负 財财 貢贡 貧贫 貨货 販贩 貪贪 貫贯 責责 貴贵 貸贷 費费 貿贸 賀贺 資资 賈贾 賊贼 賠赔 賞赏 賬账 賭赌 "
+    "賺赚 購购 賽赛 贈赠 贊赞 趙赵 趕赶 躍跃 車车 軌轨 軟软 轉转 輪轮 較较 載载 輔辅 輕轻 輛辆 輸输 辭辞 邊边 達达 遷迁 過过 運运 還还 這这 進进 遠远 違违 "
+    "連连 遲迟 適适 選选 遜逊 遺遗 鄭郑 鄰邻 醜丑 釋释 針针 釣钓 鈕钮 鈴铃 鉛铅 銀银 銅铜 銷销 鋼钢 錢钱 錯错 錶表 鍵键 鎖锁 鎮镇 鏡镜 鐘钟 鐵铁 鑰钥 長长 "
+    "門门 閃闪 閉闭 問问 閒闲 間间 閱阅 闆板 隊队 陽阳 陰阴 陣阵 階阶 際际 陸陆 陳陈 險险 隨随 隱隐 難难 雞鸡 電电 霧雾 響响 頁页 頂顶 項项 順顺 須须 預预 "
+    "領领 頻频 題题 額额 顏颜 顧顾 風风 飛飞 飯饭 飲饮 飽饱 館馆 馬马 駕驾 驗验 騙骗 髒脏 髮发 鬧闹 魚鱼 魯鲁 鮮鲜 鳥鸟 鴨鸭 鵝鹅 鹽盐 麥麦 麵面 黃黄 齊齐 "
+    "齒齿 齡龄 龍龙 龜龟 週周 遊游 佔占 彙汇 鬱郁 係系 繫系 衹只 隻只 裡里 穀谷 蒐搜 捨舍 臟脏 瀏浏 淚泪 滾滚 漁渔 濾滤 獵猎 盜盗 薩萨 褲裤 誌志 貓猫 賴赖 "
+    "蹤踪 釘钉 閣阁 餅饼 驅驱 鴻鸿 鵬鹏 慮虑 氫氢 潛潜 澀涩 瀉泻 爛烂 瑣琐 甕瓮 睜睁 矯矫 碩硕 祕秘 稅税 穌稣 窩窝 糾纠 紋纹 紗纱 紮扎 絃弦 綁绑 綜综 綢绸 "
+    "緒绪 締缔 縫缝 繩绳 繪绘 罈坛 翹翘 聳耸 脫脱 腫肿 膩腻 艙舱 蓮莲 蔔卜 蕩荡 薑姜 藍蓝 蘆芦 虛虚 蝦虾 螞蚂 衚胡 袞衮 褻亵 覓觅 詢询 誕诞 誘诱 諒谅 謀谋 "
+    "謎谜 謊谎 謙谦 譏讥 譽誉 豈岂 豬猪 貞贞 賄贿 賦赋 質质 賤贱 贖赎 趨趋 跡迹 踐践 躊踌 軀躯 輯辑 輿舆 轄辖 轟轰 辯辩 逕迳 遞递 邏逻 郵邮 醞酝 釀酿 鈔钞 "
+    "鉤钩 銳锐 鋒锋 鋪铺 錦锦 鍋锅 鍛锻 鎊镑 鏈链 鑄铸 鑑鉴 閘闸 闊阔 闖闯 隸隶 雖虽 雛雏 靜静 韁缰 韓韩 頓顿 頒颁 頗颇 頸颈 顆颗 顫颤 飄飘 餓饿 餵喂 饒饶 "
+    "駐驻 騎骑 騰腾 驕骄 驟骤 髖髋 鬆松 鬍胡 鯊鲨 鳴鸣 鶴鹤 鷹鹰 麼么 黴霉 齣出 "
+)
+_TRADITIONAL = {pair[0]: pair[1] for pair in _TRADITIONAL_PAIRS.split()}
+
+# 字符 -> 转换结果；词语匹配时被去掉的字符（空白、标点、符号、控制字符）对应空串
+_char_cache: Dict[str, Tuple[str, str]] = {}
+
+
+def _convert_char(ch: str) -> Tuple[str, str]:
+    """单个字符的转换结果：(用于正则的文本, 用于词语匹配的文本)"""
+    converted = _char_cache.get(ch)
+    if converted is not None:
+        return converted
+    text = unicodedata.normalize("NFKC", ch).lower()
+    if _t2s is not None:
+        text = _t2s.convert(text)
+    else:
+        text = "".join(_TRADITIONAL.get(c, c) for c in text)
+    stripped = "".join(c for c in text if unicodedata.category(c)[0] not in "PSZC")
+    converted = _char_cache[ch] = (text, stripped)
+    return converted
+
+
+def normalize(text: str, strip: bool = True) -> str:
+    """转换文本；strip 为True时去掉空白、标点和符号"""
+    which = 1 if strip else 0
+    return "".join((_char_cache.get(ch) or _convert_char(ch))[which] for ch in text)
+
+
+def source_positions(text: str, strip: bool = True) -> List[int]:
+    """normalize() 结果中每个字符在原文中的位置，只在有命中时计算"""
+    positions = []
+    which = 1 if strip else 0
+    for index, ch in enumerate(text):
+        positions.extend([index] * len((_char_cache.get(ch) or _convert_char(ch))[which]))
+    return positions
+
+
+@dataclass
+class ComplianceTerm:
+    """词表中的一项"""
+    pattern: str
+    category: str = ""
+    level: str = LEVEL_BLOCK
+    platform: str = ""           # 空表示所有平台
+    is_regex: bool = False
+    source: str = ""             # 文件名:行号
+
+
+@dataclass
+class ComplianceHit:
+    """一处命中，位置为原文中的 [start, end)"""
+    start: int
+    end: int
+    text: str
+    term: ComplianceTerm
+
+    @property
+    def blocking(self) -> bool:
+        return self.term.level == LEVEL_BLOCK
+
+    def to_dict(self) -> Dict:
+        return {"start": self.start, "end": self.end, "text": self.text, "category": self.term.category,
+                "level": self.term.level}
+
+
+class _CompiledLists:
+    """编译好的词表，编译完成后不再修改，可在多个线程中同时使用"""
+
+    def __init__(self, terms: List[ComplianceTerm]):
+        self.terms = terms
+        self.automaton = AhoCorasick()
+        regex_terms: Dict[str, RegexSet[int]] = {}
+        for index, term in enumerate(terms):
+            if term.is_regex:
+                regexes = regex_terms.setdefault(term.platform, RegexSet(re.IGNORECASE))
+                try:
+                    regexes.add(term.pattern, index)
+                except re.error as e:
+                    logger.warning("违禁词正则无效(%s): %s", term.source, e)
+                continue
+            pattern = normalize(term.pattern)
+            if not pattern:
+                logger.warning("违禁词只包含标点或符号，已忽略(%s)", term.source)
+                continue
+            self.automaton.add(pattern, index)
+        self.automaton.build()
+
+        # 每个平台的正则包含通用正则；"" 为只有通用正则的平台使用
+        self.regexes: Dict[str, RegexSet[int]] = {}
+        common = regex_terms.get("", RegexSet(re.IGNORECASE))
+        for platform, regexes in regex_terms.items():
+            if platform:
+                regexes.extend(common)
+            regexes.build()
+            self.regexes[platform] = regexes
+
+    def check(self, platform: str, text: str) -> List[ComplianceHit]:
+        hits = []
+        seen = set()
+        terms = self.terms
+        if len(self.automaton):
+            positions = None
+            for start, end, index in self.automaton.iter_matches(normalize(text)):
+                term = terms[index]
+                if term.platform and term.platform != platform:
+                    continue
+                if positions is None:
+                    positions = source_positions(text)
+                span = (positions[start], positions[end - 1] + 1, term.category, term.level)
+                if span in seen:
+                    continue
+                seen.add(span)
+                hits.append(ComplianceHit(span[0], span[1], text[span[0]:span[1]], term))
+
+        regexes = self.regexes.get(platform) or self.regexes.get("")
+        if regexes is not None:
+            positions = None
+            for match, index in regexes.matches(normalize(text, strip=False)):
+                if positions is None:
+                    positions = source_positions(text, strip=False)
+                start, end = positions[match.start()], positions[match.end() - 1] + 1
+                hits.append(ComplianceHit(start, end, text[start:end], terms[index]))
+
+        hits.sort(key=lambda hit: (hit.start, -hit.end))
+        return hits
+
+
+def parse_list(path: Path, platform: str) -> List[ComplianceTerm]:
+    """读取一个词表文件"""
+    terms = []
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            fields = line.split("\t")
+            pattern = fields[0].strip()
+            category = fields[1].strip() if len(fields) > 1 else ""
+            level = fields[2].strip().lower() if len(fields) > 2 else LEVEL_BLOCK
+            if level not in (LEVEL_BLOCK, LEVEL_WARN):
+                level = LEVEL_BLOCK
+            is_regex = pattern.startswith("re:")
+            if is_regex:
+                pattern = pattern[3:]
+            if pattern:
+                terms.append(ComplianceTerm(pattern, category, level, platform, is_regex, f"{path.name}:{number}"))
+    return terms
+
+
+class ComplianceFilter:
+    """发送前违禁词检查，check() 可在任意线程中调用"""
+
+    def __init__(self, lists_dir: Path, config: Dict = None):
+        self.lists_dir = lists_dir
+        self.config = dict(DEFAULT_COMPLIANCE_CONFIG)
+        self.config.update(config or {})
+        self._compiled = _CompiledLists([])
+        self._signature: Optional[tuple] = None
+        self._compiling = False
+        self.compiled_at = 0.0
+        self.compile_seconds = 0.0
+
+    def update_config(self, config: Dict):
+        """修改开关和检查间隔，词表不变"""
+        self.config = dict(DEFAULT_COMPLIANCE_CONFIG)
+        self.config.update(config or {})
+
+    def _list_files(self) -> List[Path]:
+        if not self.lists_dir.is_dir():
+            return []
+        return sorted(self.lists_dir.glob("*.txt"))
+
+    def _current_signature(self) -> tuple:
+        signature = []
+        for path in self._list_files():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def load(self):
+        """读取并编译全部词表"""
+        signature = self._current_signature()
+        terms = []
+        for path in self._list_files():
+            platform = "" if path.stem == COMMON_LIST else path.stem
+            try:
+                terms.extend(parse_list(path, platform))
+            except Exception as e:
+                logger.error("读取违禁词表失败(%s): %s", path.name, e)
+        # 先记录签名，编译出错时也要等词表再次修改后才重试，避免每隔几秒重复失败
+        self._signature = signature
+        try:
+            self.set_terms(terms)
+        except Exception:
+            logger.exception("编译违禁词表失败")
+
+    def set_terms(self, terms: List[ComplianceTerm]):
+        """编译词表并替换当前词表"""
+        begin = time.perf_counter()
+        compiled = _CompiledLists(terms)
+        self.compile_seconds = time.perf_counter() - begin
+        self._compiled = compiled
+        self.compiled_at = time.time()
+
+    def reload_if_changed(self) -> bool:
+        """词表文件有变化时在后台线程重新编译，返回是否开始重新编译"""
+        if self._compiling or self._current_signature() == self._signature:
+            return False
+        self._compiling = True
+
+        def compile_lists():
+            try:
+                self.load()
+                logger.info("已加载违禁词表：%s 项，编译耗时 %.0f ms",
+                            self.term_count, self.compile_seconds * 1000)
+            finally:
+                self._compiling = False
+
+        threading.Thread(target=compile_lists, name="compliance_compile", daemon=True).start()
+        return True
+
+    @property
+    def term_count(self) -> int:
+        return len(self._compiled.terms)
+
+    def check(self, platform: str, text: str) -> List[ComplianceHit]:
+        """检查一段文本，返回按位置排序的命中"""
+        if not text or not self.config["enabled"]:
+            return []
+        return self._compiled.check(platform, text)
+
+    def reject_reason(self, platform: str, text: str) -> str:
+        """有禁止发送的命中时返回原因，否则返回空串"""
+        if not self.config["block_send"]:
+            return ""
+        blocking = [hit for hit in self.check(platform, text) if hit.blocking]
+        return describe(blocking)
+
+
+def describe(hits: List[ComplianceHit]) -> str:
+    """命中的简短说明，如 “含违禁词：最好(极限词)、微信(站外联系方式)”"""
+    if not hits:
+        return ""
+    names = []
+    for hit in hits:
+        name = f"{hit.text}({hit.term.category})" if hit.term.category else hit.text
+        if name not in names:
+            names.append(name)
+    return "含违禁词：" + "、".join(names)
+
+
+def run_benchmark(terms: int = 50000, texts: int = 20000, seed: int = 1):
+    """生成随机词表和回复，测试编译耗时和每条回复的检查耗时"""
+    rng = random.Random(seed)
+    alphabet = [chr(code) for code in range(0x4E00, 0x4E00 + 3000)]
+
+    def random_word(low: int, high: int) -> str:
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(low, high)))
+
+    platforms = ["", "pdd", "doudian", "jd", "kuaishou"]
+    term_list = [ComplianceTerm(random_word(2, 6), "测试", LEVEL_BLOCK, rng.choice(platforms)) for _ in range(terms)]
+    term_list += [
+        ComplianceTerm("最好", "极限词"),
+        ComplianceTerm("微信", "站外联系方式"),
+        ComplianceTerm(r"1[3-9]\d{9}", "站外联系方式", is_regex=True),
+        ComplianceTerm(r"(?:vx|wx|qq)\s*[:：]?\s*[a-z0-9_-]{5,}", "站外联系方式", is_regex=True),
+    ]
+    compliance = ComplianceFilter(Path("."))
+    compliance.set_terms(term_list)
+    print(f"{len(term_list)} 项词表，编译耗时 {compliance.compile_seconds * 1000:.0f} ms，"
+          f"自动机 {len(compliance._compiled.automaton._goto)} 个状态")
+
+    samples = []
+    for i in range(texts):
+        text = random_word(10, 60)
+        if i % 10 == 0:
+            text += rng.choice(["，這是最好的", "，加微 信", "，加ＶＸ：abc123456", "，电话13812345678"])
+        samples.append(text)
+
+    for text, platform in (("亲，這款是全網最好的，加 微＊信 聊", "pdd"), ("电话 13812345678", "jd")):
+        hits = compliance.check(platform, text)
+        print(f"{text} -> {describe(hits)}")
+
+    durations = []
+    hit_count = 0
+    for i, text in enumerate(samples):
+        platform = platforms[1 + i % 4]
+        begin = time.perf_counter()
+        hits = compliance.check(platform, text)
+        durations.append(time.perf_counter() - begin)
+        hit_count += bool(hits)
+    durations.sort()
+    average = sum(len(text) for text in samples) / len(samples)
+    print(f"{texts} 条回复（平均 {average:.0f} 字），{hit_count} 条有命中；每条耗时 "
+          f"p50 {durations[len(durations) // 2] * 1e6:.0f} µs，"
+          f"p99 {durations[int(len(durations) * 0.99)] * 1e6:.0f} µs，"
+          f"最大 {durations[-1] * 1e6:.0f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="发送前违禁词检查")
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="数据目录")
+    parser.add_argument("--platform", default="", help="平台")
+    parser.add_argument("--check", metavar="TEXT", help="检查一段文本")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="用N项随机词表测试检查耗时")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+    compliance = ComplianceFilter(args.data_dir / "compliance")
+    compliance.load()
+    print(f"已加载 {compliance.term_count} 项，编译耗时 {compliance.compile_seconds * 1000:.0f} ms")
+    if args.check:
+        hits = compliance.check(args.platform, args.check)
+        print(describe(hits) or "未发现违禁词")
+        for hit in hits:
+            print(f"  [{hit.start}, {hit.end}) {hit.text} {hit.term.category} {hit.term.level} ({hit.term.source})")
+
+
+if __name__ == "__main__":
+    main()
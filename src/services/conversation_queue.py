@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+待回复会话队列
+
+汇总所有平台、所有店铺的待回复会话，按开始等待的时间排成全局优先队列，
+等待最久的会话排在最前。平台脚本只上报会话的变化，队列增量更新；
+超过SLA时限仍未回复的会话按店铺计入超时次数。
+"""
+
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# 各平台默认回复时限(秒)
+DEFAULT_SLA_SECONDS = {
+    "pdd": 180,
+    "doudian": 180,
+    "kuaishou": 180,
+    "jd": 120,
+}
+FALLBACK_SLA_SECONDS = 180
+# 超时检查间隔(毫秒)
+CHECK_INTERVAL = 1000
+
+ConversationKey = Tuple[str, str]  # (webview_id, 会话ID)
+
+
+@dataclass
+class WaitingConversation:
+    """待回复会话"""
+    platform: str
+    webview_id: str
+    conversation_id: str
+    name: str = ""
+    waiting_since: float = 0.0
+    overdue: bool = False  # 平台页面已标记为超时
+    breached: bool = False  # 已计入超时次数
+    version: int = 0
+
+    @property
+    def key(self) -> ConversationKey:
+        return self.webview_id, self.conversation_id
+
+    def waited(self, now: float = None) -> float:
+        return (time.time() if now is None else now) - self.waiting_since
+
+
+@dataclass
+class ShopSlaStats:
+    """店铺回复时效统计"""
+    platform: str
+    webview_id: str
+    answered: int = 0
+    breaches: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.answered if self.answered else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "platform": self.platform,
+            "webview_id": self.webview_id,
+            "answered": self.answered,
+            "breaches": self.breaches,
+            "average_wait": self.average_wait,
+            "max_wait": self.max_wait,
+        }
+
+
+class ConversationQueue(QObject):
+    """跨店铺的待回复会话优先队列"""
+
+    # 信号
+    queue_changed = pyqtSignal(int)  # 待回复会话数
+    sla_breached = pyqtSignal(object)  # WaitingConversation
+
+    def __init__(self, sla_seconds: Dict[str, float] = None, parent=None):
+        super().__init__(parent)
+
+        self.sla_seconds = dict(DEFAULT_SLA_SECONDS)
+        self.sla_seconds.update(sla_seconds or {})
+
+        self.conversations: Dict[ConversationKey, WaitingConversation] = {}
+        self.stats: Dict[str, ShopSlaStats] = {}
+        # 两个堆都使用惰性删除：(时间, 序号, 会话键, 版本)
+        self._by_wait: List[Tuple[float, int, ConversationKey, int]] = []
+        self._by_deadline: List[Tuple[float, int, ConversationKey, int]] = []
+        self._seq = itertools.count()
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.check_breaches)
+        self._timer.start(CHECK_INTERVAL)
+
+    def __len__(self) -> int:
+        return len(self.conversations)
+
+    def _sla(self, platform: str) -> float:
+        return self.sla_seconds.get(platform, FALLBACK_SLA_SECONDS)
+
+    def set_sla_seconds(self, sla_seconds: Dict[str, float]):
+        """修改各平台超时时间，按新时间重建截止时间堆"""
+        self.sla_seconds = dict(DEFAULT_SLA_SECONDS)
+        self.sla_seconds.update(sla_seconds or {})
+        self._by_deadline = [(c.waiting_since + self._sla(c.platform), next(self._seq), c.key, c.version)
+                             for c in self.conversations.values() if not c.breached]
+        heapq.heapify(self._by_deadline)
+        self.check_breaches()
+
+    def _shop_stats(self, platform: str, webview_id: str) -> ShopSlaStats:
+        stats = self.stats.get(webview_id)
+        if stats is None:
+            stats = ShopSlaStats(platform, webview_id)
+            self.stats[webview_id] = stats
+        return stats
+
+    def _is_current(self, entry) -> bool:
+        conversation = self.conversations.get(entry[2])
+        return conversation is not None and conversation.version == entry[3]
+
+    def _push(self, conversation: WaitingConversation):
+        conversation.version += 1
+        key = conversation.key
+        heapq.heappush(self._by_wait, (conversation.waiting_since, next(self._seq), key, conversation.version))
+        if not conversation.breached:
+            deadline = conversation.waiting_since + self._sla(conversation.platform)
+            heapq.heappush(self._by_deadline, (deadline, next(self._seq), key, conversation.version))
+        # 过期记录过多时重建
+        if len(self._by_wait) > 2 * len(self.conversations) + 64:
+            self._by_wait = [e for e in self._by_wait if self._is_current(e)]
+            heapq.heapify(self._by_wait)
+            self._by_deadline = [e for e in self._by_deadline if self._is_current(e)]
+            heapq.heapify(self._by_deadline)
+
+    def _breach(self, conversation: WaitingConversation):
+        if conversation.breached:
+            return
+        conversation.breached = True
+        self._shop_stats(conversation.platform, conversation.webview_id).breaches += 1
+        self.sla_breached.emit(conversation)
+
+    def _answer(self, conversation: WaitingConversation, now: float):
+        """会话从待回复列表消失，视为已回复"""
+        del self.conversations[conversation.key]
+        waited = max(conversation.waited(now), 0.0)
+        stats = self._shop_stats(conversation.platform, conversation.webview_id)
+        stats.answered += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+
+    def apply_diff(self, platform: str, webview_id: str, diff: Dict, now: float = None):
+        """应用平台脚本上报的会话变化
+
+        diff 格式：{"full": bool, "upsert": [{id, name, waitingSince(毫秒), overdue}], "remove": [id]}
+        full 为 True 时 upsert 是完整列表，未包含的会话视为已回复。
+        """
+        now = time.time() if now is None else now
+        upserted = set()
+        for item in diff.get("upsert", []):
+            conversation_id = str(item.get("id", ""))
+            if not conversation_id:
+                continue
+            key = (webview_id, conversation_id)
+            upserted.add(key)
+            waiting_since = float(item.get("waitingSince") or now * 1000) / 1000
+
+            conversation = self.conversations.get(key)
+            if conversation is not None and waiting_since > conversation.waiting_since:
+                # 等待起点后移说明两次上报之间已回复过，买家又发来了新消息
+                self._answer(conversation, waiting_since)
+                conversation = None
+            if conversation is None:
+                conversation = WaitingConversation(platform, webview_id, conversation_id)
+                self.conversations[key] = conversation
+            elif conversation.waiting_since == waiting_since and conversation.overdue == bool(item.get("overdue")):
+                conversation.name = item.get("name", conversation.name)
+                continue
+            conversation.name = item.get("name", conversation.name)
+            conversation.waiting_since = waiting_since
+            conversation.overdue = bool(item.get("overdue"))
+            self._push(conversation)
+            if conversation.overdue:
+                self._breach(conversation)
+
+        if diff.get("full"):
+            removed = [c for key, c in self.conversations.items()
+                       if key[0] == webview_id and key not in upserted]
+        else:
+            removed = [self.conversations[(webview_id, str(cid))] for cid in diff.get("remove", [])
+                       if (webview_id, str(cid)) in self.conversations]
+        for conversation in removed:
+            self._answer(conversation, now)
+
+        self.check_breaches(now)
+        self.queue_changed.emit(len(self.conversations))
+
+    def remove_shop(self, webview_id: str):
+        """店铺关闭后移除其会话（不计入回复统计）"""
+        for key in [key for key in self.conversations if key[0] == webview_id]:
+            del self.conversations[key]
+        self.queue_changed.emit(len(self.conversations))
+
+    def check_breaches(self, now: float = None):
+        """将超过回复时限的会话计入店铺超时次数"""
+        now = time.time() if now is None else now
+        while self._by_deadline and self._by_deadline[0][0] <= now:
+            entry = heapq.heappop(self._by_deadline)
+            if self._is_current(entry):
+                self._breach(self.conversations[entry[2]])
+
+    def peek(self, skip: int = 0) -> Optional[WaitingConversation]:
+        """等待最久的会话，skip为跳过的数量（连续按快捷键时依次切换）"""
+        while self._by_wait and not self._is_current(self._by_wait[0]):
+            heapq.heappop(self._by_wait)
+        if skip == 0:
+            return self.conversations[self._by_wait[0][2]] if self._by_wait else None
+        ranked = self.most_urgent(skip + 1)
+        return ranked[skip] if len(ranked) > skip else None
+
+    def most_urgent(self, limit: int = 10) -> List[WaitingConversation]:
+        """按等待时间排序的前若干个会话"""
+        result = []
+        for entry in heapq.nsmallest(limit * 2 + 8, self._by_wait):
+            if self._is_current(entry):
+                result.append(self.conversations[entry[2]])
+                if len(result) == limit:
+                    return result
+        if len(result) < limit and len(result) < len(self.conversations):
+            # 过期记录较多时退回到完整排序
+            result = sorted(self.conversations.values(), key=lambda c: c.waiting_since)[:limit]
+        return result
+
+    def breach_counts(self) -> Dict[str, int]:
+        """各店铺的超时次数"""
+        return {webview_id: stats.breaches for webview_id, stats in self.stats.items()}
+
+    def total_breaches(self) -> int:
+        return sum(stats.breaches for stats in self.stats.values())
@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+聊天记录批量导出
+
+按天逐条读取 MessageStore 中的消息，经生成器流式写入 CSV 文件或 Parquet 数据集
+（每天一个分片文件），内存占用只与批大小有关，与导出的消息总量无关。
+支持按时间范围、平台和店铺筛选；每完成一天写一次断点，中断后以相同参数再次导出
+会从断点继续。Parquet 需要安装 pyarrow（可选）。
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..db.entities import ChatMessage, PlatformShop
+from ..db.message_store import MessageStore
+from ..db.shop_manager import ShopManager
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "parquet")
+
+COLUMNS = ["time", "timestamp", "platform", "mall_id", "mall_name", "agent", "webview_id",
+           "buyer_id", "buyer_name", "from_buyer", "msg_id", "content"]
+
+# 断点文件的格式版本，导出列变化时递增
+CHECKPOINT_VERSION = 1
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("time", pa.timestamp("ms")),
+        ("timestamp", pa.float64()),
+        ("platform", pa.string()),
+        ("mall_id", pa.string()),
+        ("mall_name", pa.string()),
+        ("agent", pa.string()),
+        ("webview_id", pa.string()),
+        ("buyer_id", pa.string()),
+        ("buyer_name", pa.string()),
+        ("from_buyer", pa.bool_()),
+        ("msg_id", pa.string()),
+        ("content", pa.string()),
+    ])
+
+
+@dataclass
+class ExportOptions:
+    """导出参数；断点只在参数完全相同时继续使用"""
+    output: str
+    format: str = "csv"
+    start_day: str = ""              # 起始日期(含)，YYYY-MM-DD，空表示不限
+    end_day: str = ""                # 结束日期(含)
+    platforms: List[str] = field(default_factory=list)
+    shops: List[str] = field(default_factory=list)   # webview_id
+    batch_size: int = 20000          # 每批写入的行数(Parquet为行组大小)
+
+    def key(self) -> Dict:
+        data = asdict(self)
+        data.pop("batch_size")
+        return data
+
+
+@dataclass
+class ExportProgress:
+    """导出进度"""
+    days_done: int = 0
+    days_total: int = 0
+    day: str = ""
+    rows: int = 0
+    bytes_written: int = 0
+    elapsed: float = 0.0
+    resumed: bool = False
+    finished: bool = False
+    cancelled: bool = False
+    error: str = ""
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class HistoryExporter:
+    """聊天记录流式导出，可在后台线程中调用 run()"""
+
+    def __init__(self, store: MessageStore, options: ExportOptions,
+                 shop_of: Callable[[str, str], Optional[PlatformShop]] = None):
+        if options.format not in FORMATS:
+            raise ValueError(f"不支持的导出格式: {options.format}")
+        if options.format == "parquet" and pa is None:
+            raise RuntimeError("导出 Parquet 需要安装 pyarrow")
+        self.store = store
+        self.options = options
+        self.output = Path(options.output)
+        self.checkpoint_path = self.output.with_name(self.output.name + ".export.json")
+        self.shop_of = shop_of or (lambda platform, webview_id: None)
+        self._shop_cache: Dict[Tuple[str, str], Tuple[str, str, str]] = {}
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止；当前批次写完后停止，已完成的天数保留在断点中"""
+        self._cancelled = True
+
+    def days(self) -> List[str]:
+        """需要导出的日期"""
+        return [day for day in self.store.list_days()
+                if (not self.options.start_day or day >= self.options.start_day)
+                and (not self.options.end_day or day <= self.options.end_day)]
+
+    def _shop_columns(self, platform: str, webview_id: str) -> Tuple[str, str, str]:
+        key = (platform, webview_id)
+        columns = self._shop_cache.get(key)
+        if columns is None:
+            shop = self.shop_of(platform, webview_id)
+            columns = (shop.mall_id, shop.mall_name, shop.user_name) if shop else ("", "", "")
+            self._shop_cache[key] = columns
+        return columns
+
+    def iter_rows(self, day: str) -> Iterator[tuple]:
+        """某一天符合筛选条件的消息，按导出列的顺序"""
+        for message in self.store.iter_day(day, self.options.platforms or None, self.options.shops or None):
+            mall_id, mall_name, agent = self._shop_columns(message.platform, message.webview_id)
+            yield (message.timestamp, message.platform, mall_id, mall_name, agent, message.webview_id,
+                   message.buyer_id, message.buyer_name, message.from_buyer, message.msg_id, message.content)
+
+    def iter_batches(self, day: str) -> Iterator[List[tuple]]:
+        batch = []
+        for row in self.iter_rows(day):
+            batch.append(row)
+            if len(batch) >= self.options.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _load_checkpoint(self) -> Optional[Dict]:
+        if not self.checkpoint_path.exists():
+            return None
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            logger.error("读取导出断点失败: %s", e)
+            return None
+        if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("options") != self.options.key():
+            return None
+        if not self._output_matches(checkpoint):
+            # 已导出的部分被删除或截短，断点记录的日期不再可信，重新导出
+            logger.warning("导出文件与断点不符，重新导出: %s", self.output)
+            return None
+        return checkpoint
+
+    def _output_matches(self, checkpoint: Dict) -> bool:
+        """断点记录的已导出部分是否仍完整存在"""
+        if self.options.format == "csv":
+            return self.output.is_file() and self.output.stat().st_size >= checkpoint["csv_offset"]
+        return all(self._part_path(day).is_file() for day in checkpoint["done_days"])
+
+    def _save_checkpoint(self, done_days: List[str], rows: int, csv_offset: int):
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": CHECKPOINT_VERSION, "options": self.options.key(), "done_days": done_days,
+                       "rows": rows, "csv_offset": csv_offset}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, progress: Callable[[ExportProgress], None] = None, restart: bool = False) -> ExportProgress:
+        """执行导出；有参数相同的断点时从断点继续，除非 restart 为True"""
+        begin = time.perf_counter()
+        checkpoint = None if restart else self._load_checkpoint()
+        days = self.days()
+        done_days = list(checkpoint["done_days"]) if checkpoint else []
+        state = ExportProgress(days_done=len(done_days), days_total=len(days),
+                               rows=checkpoint["rows"] if checkpoint else 0, resumed=checkpoint is not None)
+        done = set(done_days)
+        pending = [day for day in days if day not in done]
+
+        try:
+            if self.options.format == "csv":
+                writer = self._write_csv_day
+                csv_offset = self._prepare_csv(checkpoint)
+            else:
+                writer = self._write_parquet_day
+                csv_offset = 0
+                self._prepare_parquet(checkpoint)
+
+            for day in pending:
+                state.day = day
+                csv_offset = writer(day, csv_offset, state, begin, progress)
+                if self._cancelled:
+                    break
+                done_days.append(day)
+                state.days_done += 1
+                self._save_checkpoint(done_days, state.rows, csv_offset)
+                if progress:
+                    state.elapsed = time.perf_counter() - begin
+                    progress(state)
+        except Exception as e:
+            state.error = str(e)
+            logger.error("导出聊天记录失败: %s", e)
+
+        state.elapsed = time.perf_counter() - begin
+        state.cancelled = self._cancelled
+        state.finished = not state.cancelled and not state.error
+        if state.finished:
+            # 导出完成后删除断点，再次导出时重新生成
+            self.checkpoint_path.unlink(missing_ok=True)
+        if progress:
+            progress(state)
+        return state
+
+    def _prepare_csv(self, checkpoint: Optional[Dict]) -> int:
+        """新导出时写入表头；继续导出时截掉最后一个完整日期之后写入的部分"""
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        if checkpoint:
+            os.truncate(self.output, checkpoint["csv_offset"])
+            return checkpoint["csv_offset"]
+        # 带BOM，便于Excel正确识别中文
+        with open(self.output, 'w', encoding='utf-8-sig', newline='') as f:
+            csv.writer(f).writerow(COLUMNS)
+        return self.output.stat().st_size
+
+    def _write_csv_day(self, day: str, offset: int, state: ExportProgress, begin: float,
+                       progress: Callable[[ExportProgress], None]) -> int:
+        """写入一天的消息，返回写入后的文件长度"""
+        # 同一分钟内的消息复用格式化结果，strftime 是逐行开销中最大的一项
+        minute_cache = [None, ""]
+
+        def format_time(timestamp: float) -> str:
+            seconds = int(timestamp)
+            minute = seconds // 60
+            if minute != minute_cache[0]:
+                minute_cache[0] = minute
+                minute_cache[1] = datetime.fromtimestamp(minute * 60).strftime("%Y-%m-%d %H:%M")
+            return f"{minute_cache[1]}:{seconds % 60:02d}"
+
+        with open(self.output, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            for batch in self.iter_batches(day):
+                writer.writerows((format_time(row[0]), f"{row[0]:.3f}", *row[1:8], int(row[8]), *row[9:])
+                                 for row in batch)
+                state.rows += len(batch)
+                f.flush()
+                offset = os.fstat(f.fileno()).st_size
+                state.bytes_written = offset
+                if progress:
+                    state.elapsed = time.perf_counter() - begin
+                    progress(state)
+                if self._cancelled:
+                    break
+        return offset
+
+    def _part_path(self, day: str) -> Path:
+        return self.output / f"messages-{day}.parquet"
+
+    def _prepare_parquet(self, checkpoint: Optional[Dict]):
+        """Parquet 导出为目录，每天一个分片；新导出时清除旧分片"""
+        self.output.mkdir(parents=True, exist_ok=True)
+        keep = set(checkpoint["done_days"]) if checkpoint else set()
+        for path in self.output.glob("messages-*.parquet*"):
+            if path.suffix != ".parquet" or path.stem[len("messages-"):] not in keep:
+                path.unlink()
+
+    def _write_parquet_day(self, day: str, offset: int, state: ExportProgress, begin: float,
+                           progress: Callable[[ExportProgress], None]) -> int:
+        """写入一天的分片，先写临时文件，完整写完后再改名"""
+        schema = _parquet_schema()
+        part_path = self._part_path(day)
+        tmp_path = part_path.with_suffix(".parquet.tmp")
+        writer = None
+        try:
+            for batch in self.iter_batches(day):
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+                columns = list(zip(*batch))
+                arrays = [pa.array([int(t * 1000) for t in columns[0]], pa.timestamp("ms")),
+                          pa.array(columns[0], pa.float64())]
+                arrays += [pa.array(values, schema.field(index + 2).type)
+                           for index, values in enumerate(columns[1:])]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                state.rows += len(batch)
+                if progress:
+                    state.elapsed = time.perf_counter() - begin
+                    progress(state)
+                if self._cancelled:
+                    break
+        finally:
+            if writer is not None:
+                writer.close()
+        if self._cancelled:
+            tmp_path.unlink(missing_ok=True)
+        elif writer is not None:
+            os.replace(tmp_path, part_path)
+            state.bytes_written += part_path.stat().st_size
+        return offset
+
+
+def format_progress(state: ExportProgress) -> str:
+    return (f"{state.days_done}/{state.days_total} 天，{state.rows} 条，"
+            f"{state.bytes_written / (1024 * 1024):.1f} MB，{state.rows_per_second:.0f} 条/秒")
+
+
+def run_benchmark(messages: int = 1000000, days: int = 30, seed: int = 1):
+    """生成模拟消息后导出，测试吞吐、内存峰值和断点续传结果是否一致"""
+    import tracemalloc
+
+    rng = random.Random(seed)
+    data_dir = Path(tempfile.mkdtemp(prefix="pdkbot_export_"))
+    try:
+        store = MessageStore(data_dir)
+        start = time.time() - days * 86400
+        platforms = ["pdd", "doudian", "jd", "kuaishou"]
+        print(f"生成 {messages} 条消息...")
+        for i in range(messages):
+            store.append(ChatMessage(
+                platform=platforms[i % 4], webview_id=f"shop{i % 40}", buyer_id=f"buyer{rng.randrange(5000)}",
+                buyer_name="买家", content="请问这个商品什么时候发货，可以用顺丰吗" * rng.randint(1, 3),
+                msg_id=str(i), timestamp=start + i * days * 86400 / messages, from_buyer=i % 2 == 0))
+        store.close()
+
+        formats = ["csv"] + (["parquet"] if parquet_available() else [])
+        for fmt in formats:
+            output = data_dir / "export" / ("messages.csv" if fmt == "csv" else "messages")
+            state = HistoryExporter(store, ExportOptions(str(output), fmt)).run()
+            print(f"{fmt}: {format_progress(state)}，耗时 {state.elapsed:.1f} 秒")
+
+            # 导出到一半时取消，再继续导出，结果应与一次导出完全相同
+            resumed_output = data_dir / "export" / ("resumed.csv" if fmt == "csv" else "resumed")
+            exporter = HistoryExporter(store, ExportOptions(str(resumed_output), fmt))
+            half = messages // 2
+
+            def cancel_at_half(progress: ExportProgress, exporter=exporter):
+                if progress.rows >= half:
+                    exporter.cancel()
+
+            tracemalloc.start()
+            first = exporter.run(cancel_at_half)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            second = HistoryExporter(store, ExportOptions(str(resumed_output), fmt)).run()
+            if fmt == "csv":
+                same = output.read_bytes() == resumed_output.read_bytes()
+            else:
+                same = all((output / p.name).read_bytes() == p.read_bytes() for p in resumed_output.iterdir())
+            print(f"{fmt} 断点续传：中断于 {first.rows} 条（{first.days_done} 天，Python内存峰值 "
+                  f"{peak / (1024 * 1024):.1f} MB），继续后共 {second.rows} 条，"
+                  f"与一次导出{'一致' if same else '不一致'}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出聊天记录")
+    parser.add_argument("output", nargs="?", help="CSV文件路径，或Parquet输出目录")
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="数据目录")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--start", default="", help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--end", default="", help="结束日期 YYYY-MM-DD")
+    parser.add_argument("--platform", action="append", default=[], help="平台，可重复")
+    parser.add_argument("--shop", action="append", default=[], help="店铺webview_id，可重复")
+    parser.add_argument("--restart", action="store_true", help="忽略断点重新导出")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="用N条模拟消息测试导出性能")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+    if not args.output:
+        parser.error("需要指定输出路径")
+
+    shop_manager = ShopManager(args.data_dir)
+    options = ExportOptions(args.output, args.format, args.start, args.end, args.platform, args.shop)
+    exporter = HistoryExporter(MessageStore(args.data_dir), options, shop_manager.find_shop)
+    last_print = [0.0]
+
+    def report(state: ExportProgress):
+        now = time.monotonic()
+        if now - last_print[0] >= 1 or state.finished:
+            last_print[0] = now
+            print(format_progress(state))
+
+    state = exporter.run(report, restart=args.restart)
+    if state.resumed:
+        print("已从上次的断点继续导出")
+    if state.finished:
+        print(f"导出完成：{args.output}，耗时 {state.elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+本地知识库：问答条目以追加日志形式保存在磁盘，检索使用倒排索引和BM25评分
+
+倒排表使用可增长的NumPy数组保存，新增和更新条目只追加倒排项，
+旧版本条目标记为删除，删除比例过高时再整理索引。
+"""
+
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..db.entities import KnowledgeEntry
+from .tokenizer import tokenize
+
+logger = logging.getLogger(__name__)
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 出现在超过该比例文档中的词区分度很低，查询中有其他词时跳过
+STOP_TERM_RATIO = 0.5
+# 已删除槽位超过该比例时整理索引
+COMPACT_RATIO = 0.3
+COMPACT_MIN_DEAD = 1000
+
+
+class _Postings:
+    """单个词的倒排表"""
+
+    __slots__ = ("docs", "tfs", "size")
+
+    def __init__(self):
+        self.docs = np.empty(4, dtype=np.int32)
+        self.tfs = np.empty(4, dtype=np.float32)
+        self.size = 0
+
+    def append(self, doc: int, tf: int):
+        if self.size == len(self.docs):
+            capacity = len(self.docs) * 2
+            self.docs = np.resize(self.docs, capacity)
+            self.tfs = np.resize(self.tfs, capacity)
+        self.docs[self.size] = doc
+        self.tfs[self.size] = tf
+        self.size += 1
+
+
+class KnowledgeIndex:
+    """BM25倒排索引，支持增量新增和删除"""
+
+    def __init__(self):
+        self._term_ids: Dict[str, int] = {}
+        self._postings: List[_Postings] = []
+        self._doc_freq = np.zeros(16, dtype=np.int32)
+
+        self._doc_len = np.zeros(16, dtype=np.float32)
+        self._alive = np.zeros(16, dtype=bool)
+        self._doc_terms: List[Optional[np.ndarray]] = []
+        self._doc_keys: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+
+        self._live_count = 0
+        self._total_len = 0.0
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    @property
+    def dead_count(self) -> int:
+        return len(self._doc_keys) - self._live_count
+
+    def _grow(self, array: np.ndarray, size: int) -> np.ndarray:
+        if size <= len(array):
+            return array
+        grown = np.zeros(max(size, len(array) * 2), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def add(self, key: str, tokens: List[str]):
+        """新增或替换文档"""
+        self.remove(key)
+
+        slot = len(self._doc_keys)
+        self._doc_len = self._grow(self._doc_len, slot + 1)
+        self._alive = self._grow(self._alive, slot + 1)
+
+        counts = Counter(tokens)
+        term_ids = np.empty(len(counts), dtype=np.int32)
+        for i, (term, tf) in enumerate(counts.items()):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = len(self._postings)
+                self._term_ids[term] = term_id
+                self._postings.append(_Postings())
+                self._doc_freq = self._grow(self._doc_freq, term_id + 1)
+            self._postings[term_id].append(slot, tf)
+            self._doc_freq[term_id] += 1
+            term_ids[i] = term_id
+
+        self._doc_keys.append(key)
+        self._doc_terms.append(term_ids)
+        self._doc_len[slot] = len(tokens)
+        self._alive[slot] = True
+        self._slots[key] = slot
+        self._live_count += 1
+        self._total_len += len(tokens)
+
+    def remove(self, key: str) -> bool:
+        """删除文档（标记删除，倒排项在整理时清除）"""
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return False
+        self._alive[slot] = False
+        self._doc_freq[self._doc_terms[slot]] -= 1
+        self._doc_terms[slot] = None
+        self._doc_keys[slot] = None
+        self._live_count -= 1
+        self._total_len -= float(self._doc_len[slot])
+        return True
+
+    def needs_compaction(self) -> bool:
+        dead = self.dead_count
+        return dead >= COMPACT_MIN_DEAD and dead > len(self._doc_keys) * COMPACT_RATIO
+
+    def search(self, tokens: List[str], limit: int) -> List[Tuple[str, float]]:
+        """BM25检索，返回 (文档键, 得分) 列表"""
+        if not self._live_count or not tokens:
+            return []
+
+        avg_len = self._total_len / self._live_count
+        doc_count = self._live_count
+        terms = []
+        for term, query_tf in Counter(tokens).items():
+            term_id = self._term_ids.get(term)
+            if term_id is not None and self._doc_freq[term_id] > 0:
+                terms.append((term_id, query_tf, int(self._doc_freq[term_id])))
+        selective = [item for item in terms if item[2] <= doc_count * STOP_TERM_RATIO]
+        if selective:
+            terms = selective
+
+        all_docs = []
+        all_weights = []
+        for term_id, query_tf, df in terms:
+            postings = self._postings[term_id]
+            docs = postings.docs[:postings.size]
+            tfs = postings.tfs[:postings.size]
+            idf = math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_len[docs] / avg_len)
+            all_docs.append(docs)
+            all_weights.append((idf * query_tf) * tfs * (BM25_K1 + 1.0) / (tfs + norm))
+
+        if not all_docs:
+            return []
+
+        docs = np.concatenate(all_docs)
+        scores = np.bincount(docs, weights=np.concatenate(all_weights))
+        scores[~self._alive[:len(scores)]] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            top = np.argpartition(scores[candidates], -limit)[-limit:]
+            candidates = candidates[top]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._doc_keys[slot], float(scores[slot])) for slot in order]
+
+
+class KnowledgeBase:
+    """知识库，负责条目存储和检索"""
+
+    def __init__(self, data_dir: Path):
+        self.kb_dir = data_dir / "knowledge_base"
+        self.kb_dir.mkdir(parents=True, exist_ok=True)
+        self.log_file = self.kb_dir / "entries.jsonl"
+
+        self.entries: Dict[str, KnowledgeEntry] = {}
+        self._index = KnowledgeIndex()
+        self._lock = threading.RLock()
+        self._log_lines = 0
+        self.loaded = False
+
+    @staticmethod
+    def _entry_tokens(entry: KnowledgeEntry) -> List[str]:
+        return tokenize(" ".join([entry.question] + entry.keywords), unigrams=False)
+
+    def load(self):
+        """从日志加载条目并建立索引"""
+        entries: Dict[str, KnowledgeEntry] = {}
+        lines = 0
+        if self.log_file.exists():
+            try:
+                with open(self.log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        lines += 1
+                        record = json.loads(line)
+                        if record.get("op") == "del":
+                            entries.pop(record["entry_id"], None)
+                        else:
+                            entry = KnowledgeEntry.from_dict(record["entry"])
+                            entries[entry.entry_id] = entry
+            except Exception as e:
+                logger.error("加载知识库失败: %s", e)
+
+        index = KnowledgeIndex()
+        for entry in entries.values():
+            index.add(entry.entry_id, self._entry_tokens(entry))
+
+        with self._lock:
+            self.entries = entries
+            self._index = index
+            self._log_lines = lines
+            self.loaded = True
+
+    def load_in_background(self):
+        """在后台线程加载，避免阻塞界面"""
+        threading.Thread(target=self.load, name="KnowledgeBaseLoader", daemon=True).start()
+
+    def _append_log(self, records: List[Dict]):
+        try:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._log_lines += len(records)
+        except Exception as e:
+            logger.error("保存知识库失败: %s", e)
+
+    def put(self, entry: KnowledgeEntry):
+        """新增或更新条目"""
+        self.put_many([entry])
+
+    def put_many(self, entries: List[KnowledgeEntry]):
+        """批量新增或更新条目"""
+        now = time.time()
+        with self._lock:
+            for entry in entries:
+                entry.updated_at = entry.updated_at or now
+                self.entries[entry.entry_id] = entry
+                self._index.add(entry.entry_id, self._entry_tokens(entry))
+            self._append_log([{"op": "put", "entry": entry.to_dict()} for entry in entries])
+            self._maybe_compact()
+
+    def delete(self, entry_id: str) -> bool:
+        """删除条目"""
+        with self._lock:
+            if self.entries.pop(entry_id, None) is None:
+                return False
+            self._index.remove(entry_id)
+            self._append_log([{"op": "del", "entry_id": entry_id}])
+            self._maybe_compact()
+            return True
+
+    def _maybe_compact(self):
+        """删除或覆盖过多时重写日志并重建索引"""
+        if self._index.needs_compaction():
+            index = KnowledgeIndex()
+            for entry in self.entries.values():
+                index.add(entry.entry_id, self._entry_tokens(entry))
+            self._index = index
+
+        if self._log_lines > max(2 * len(self.entries), 1000):
+            tmp_file = self.log_file.with_suffix(".tmp")
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    for entry in self.entries.values():
+                        f.write(json.dumps({"op": "put", "entry": entry.to_dict()}, ensure_ascii=False) + "\n")
+                os.replace(tmp_file, self.log_file)
+                self._log_lines = len(self.entries)
+            except Exception as e:
+                logger.error("整理知识库日志失败: %s", e)
+
+    def search(self, text: str, top_k: int = 3, platform: str = "") -> List[Tuple[KnowledgeEntry, float]]:
+        """检索与文本最相关的条目"""
+        tokens = tokenize(text, unigrams=False)
+        with self._lock:
+            # 多取一些候选，用于过滤平台
+            results = self._index.search(tokens, top_k * 4)
+            matched = []
+            for entry_id, score in results:
+                entry = self.entries[entry_id]
+                if platform and entry.platforms and platform not in entry.platforms:
+                    continue
+                matched.append((entry, score))
+                if len(matched) >= top_k:
+                    break
+            return matched
+
+    def suggest(self, text: str, top_k: int = 3, platform: str = "") -> List[str]:
+        """返回建议回答"""
+        return [entry.answer for entry, _ in self.search(text, top_k, platform)]
+
+
+def run_benchmark(entry_count: int = 100000, query_count: int = 1000):
+    """知识库检索性能测试"""
+    rng = random.Random(7)
+    # 按齐夫分布从常用汉字中取词，近似真实问句的用字分布
+    chars = [chr(0x4e00 + i) for i in range(3000)]
+    char_cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(len(chars))))
+    words = ["".join(rng.choices(chars, cum_weights=char_cum_weights, k=rng.randint(2, 4)))
+             for _ in range(20000)]
+    word_cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(len(words))))
+
+    def sentence(n: int) -> str:
+        return "".join(rng.choices(words, cum_weights=word_cum_weights, k=n))
+
+    texts = [sentence(rng.randint(4, 10)) for _ in range(entry_count)]
+    queries = [sentence(rng.randint(3, 8)) for _ in range(query_count)]
+
+    index = KnowledgeIndex()
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        index.add(str(i), tokenize(text, unigrams=False))
+    build_s = time.perf_counter() - start
+
+    timings = []
+    for text in queries:
+        query = tokenize(text, unigrams=False)
+        begin = time.perf_counter()
+        index.search(query, 5)
+        timings.append((time.perf_counter() - begin) * 1000)
+
+    # 增量更新
+    updates = [(str(rng.randrange(entry_count)), sentence(6)) for _ in range(1000)]
+    begin = time.perf_counter()
+    for key, text in updates:
+        index.add(key, tokenize(text, unigrams=False))
+    update_ms = (time.perf_counter() - begin) * 1000
+
+    timings.sort()
+    print(f"条目数: {entry_count}，词项数: {len(index._term_ids)}，建索引耗时: {build_s:.1f} s")
+    print(f"检索耗时: 平均 {sum(timings) / len(timings):.2f} ms，p50 {timings[len(timings) // 2]:.2f} ms，"
+          f"p99 {timings[int(len(timings) * 0.99)]:.2f} ms")
+    print(f"增量更新耗时: 平均 {update_ms / len(updates):.3f} ms/条")
+
+
+if __name__ == "__main__":
+    run_benchmark()
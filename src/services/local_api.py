@@ -0,0 +1,556 @@
+# -*- coding: utf-8 -*-
+"""
+本地HTTP/WebSocket接口
+
+在事件总线的后台事件循环中运行，只监听本机地址，供看板、机器人等外部程序使用：
+    GET  /api/shops    店铺列表（含是否打开、未读数）
+    GET  /api/unread   未读消息数合计（按平台、按店铺）
+    GET  /api/stats    事件总线订阅者与WebSocket客户端统计
+    POST /api/send     通过指定店铺的WebView发送消息
+    GET  /ws           WebSocket，按批推送实时事件，可用 ?types= 过滤事件类型
+
+所有请求都需要令牌：请求头 Authorization: Bearer <token>，或查询参数 ?token=<token>。
+每个WebSocket客户端有独立的有界队列，客户端读取过慢时丢弃最早的事件并在下一帧中
+报告丢弃数，发送长时间阻塞的客户端会被断开，不影响其他客户端。
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from ..core.event_bus import DROP_OLDEST, EventBus, Subscription
+
+logger = logging.getLogger(__name__)
+
+# 默认配置，可通过 config.json 中的 "local_api" 覆盖
+DEFAULT_API_CONFIG = {
+    "enabled": False,
+    "host": "127.0.0.1",
+    "port": 17890,
+    "token": "",
+    "batch_interval": 0.1,   # 合并事件的等待时间(秒)
+    "batch_size": 200,       # 每帧最多事件数
+    "client_queue": 1000,    # 每个客户端的事件队列长度
+    "send_timeout": 10,      # 写入客户端超过该时间(秒)视为卡死并断开
+}
+# 请求头与请求体上限
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+MAX_FRAME_BYTES = 64 * 1024
+# 等待发送回执的最长时间(秒)
+SEND_RESULT_TIMEOUT = 60
+# 平台脚本消息类型与事件类型的对应关系，?types= 中两种名称均可使用
+BRIDGE_EVENT_NAMES = {
+    "currentuser": "shop_updated",
+    "newmessage": "new_message",
+    "receiveMessage": "chat_message",
+}
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+class ApiError(Exception):
+    """返回给客户端的错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class GuiDispatcher(QObject):
+    """把函数调用转到界面线程执行，返回 concurrent.futures.Future"""
+
+    _call = pyqtSignal(object, object)  # 函数, Future
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 在其他线程发出信号时，Qt 以队列方式在本对象所在的界面线程中执行
+        self._call.connect(self._run)
+
+    def submit(self, func: Callable) -> Future:
+        future = Future()
+        self._call.emit(func, future)
+        return future
+
+    def _run(self, func: Callable, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func())
+        except Exception as e:
+            future.set_exception(e)
+
+
+def _direct_dispatch(func: Callable) -> Future:
+    """在当前线程直接执行（没有界面线程时使用）"""
+    future = Future()
+    try:
+        future.set_result(func())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _encode_frame(opcode: int, payload: bytes) -> bytes:
+    """服务端帧不加掩码"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """读取一帧，返回 (操作码, 内容)"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    masked = second & 0x80
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MAX_FRAME_BYTES:
+        raise ApiError(1009, "消息过大")
+    mask = await reader.readexactly(4) if masked else b""
+    payload = await reader.readexactly(length)
+    if masked:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class WebSocketClient:
+    """WebSocket客户端连接，事件先进入有界队列，再由发送任务按批写出"""
+
+    def __init__(self, writer: asyncio.StreamWriter, types: Set[str], max_queue: int, peer: str):
+        self.writer = writer
+        self.types = types
+        self.max_queue = max_queue
+        self.peer = peer
+        self.queue: Deque[Dict] = deque()
+        self.wakeup = asyncio.Event()
+        self.connected_at = time.time()
+        self.sent_events = 0
+        self.sent_frames = 0
+        self.dropped = 0
+        self._unreported_drops = 0
+
+    def push(self, event: Dict):
+        if self.types and event.get("type") not in self.types:
+            return
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+            self._unreported_drops += 1
+        self.queue.append(event)
+        self.wakeup.set()
+
+    def take_batch(self, size: int) -> Dict:
+        events = [self.queue.popleft() for _ in range(min(size, len(self.queue)))]
+        frame = {"type": "events", "events": events, "dropped": self._unreported_drops}
+        self._unreported_drops = 0
+        return frame
+
+    def stats(self) -> Dict:
+        return {
+            "peer": self.peer,
+            "types": sorted(self.types),
+            "connected_at": self.connected_at,
+            "depth": len(self.queue),
+            "sent_events": self.sent_events,
+            "sent_frames": self.sent_frames,
+            "dropped": self.dropped,
+        }
+
+
+class LocalApiServer:
+    """本地HTTP/WebSocket接口服务器"""
+
+    def __init__(self, event_bus: EventBus,
+                 get_shops: Callable[[], List[Dict]],
+                 get_unread: Callable[[], Dict],
+                 send_message: Callable[[Dict], Future],
+                 dispatch: Callable[[Callable], Future] = None,
+                 config: Dict = None):
+        """get_shops、get_unread、send_message 通过 dispatch 在界面线程中调用；
+        send_message 返回在发送完成时得到结果的 Future"""
+        self.config = dict(DEFAULT_API_CONFIG)
+        self.config.update(config or {})
+        self.event_bus = event_bus
+        self._get_shops = get_shops
+        self._get_unread = get_unread
+        self._send_message = send_message
+        self._dispatch = dispatch or _direct_dispatch
+
+        self.clients: Set[WebSocketClient] = set()
+        self.port: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscription: Optional[Subscription] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.config['host']}:{self.port}"
+
+    def start(self):
+        """在事件总线的事件循环中启动服务器"""
+        if not self.config["token"]:
+            raise ValueError("未配置访问令牌")
+        loop = self.event_bus.loop()
+        asyncio.run_coroutine_threadsafe(self._start(), loop).result(timeout=10)
+        self._subscription = self.event_bus.subscribe(self._on_event, name="local_api", policy=DROP_OLDEST,
+                                                      max_queue=self.config["client_queue"] * 10)
+        logger.info("本地接口已启动: %s", self.base_url)
+
+    def stop(self):
+        if self._subscription is not None:
+            self._subscription.unsubscribe()
+            self._subscription = None
+        if self._server is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._stop(), self.event_bus.loop()).result(timeout=5)
+            except Exception as e:
+                logger.error("停止本地接口失败: %s", e)
+            self._server = None
+
+    async def _start(self):
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.config["host"], self.config["port"], limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _stop(self):
+        self._server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await self._server.wait_closed()
+
+    def _on_event(self, event):
+        """事件总线订阅者，在线程池中序列化后交给事件循环，不等待各客户端"""
+        if self.clients:
+            self.event_bus.loop().call_soon_threadsafe(self._fan_out, event.to_dict())
+
+    def _fan_out(self, data: Dict):
+        """在事件循环中把事件放入各客户端的队列"""
+        for client in self.clients:
+            client.push(data)
+
+    # ---- HTTP ----
+
+    def _authorized(self, headers: Dict[str, str], query: Dict[str, str]) -> bool:
+        token = query.get("token", "")
+        auth = headers.get("authorization", "")
+        if auth.lower().startswith("bearer "):
+            token = auth[7:].strip()
+        return hmac.compare_digest(token.encode("utf-8"), str(self.config["token"]).encode("utf-8"))
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            await self._handle_request(reader, writer)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error("本地接口处理请求失败: %s", e)
+        finally:
+            self._tasks.discard(task)
+            writer.close()
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            await self._respond(writer, 400, {"error": "请求格式错误"})
+            return
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        url = urlparse(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if not self._authorized(headers, query):
+            await self._respond(writer, 401, {"error": "令牌无效"})
+            return
+
+        if url.path == "/ws":
+            await self._handle_websocket(reader, writer, headers, query)
+            return
+
+        body = {}
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            await self._respond(writer, 413, {"error": "请求体过大"})
+            return
+        if length:
+            try:
+                body = json.loads(await reader.readexactly(length))
+            except ValueError:
+                await self._respond(writer, 400, {"error": "请求体不是有效的JSON"})
+                return
+
+        try:
+            status, data = 200, await self._route(method, url.path, body)
+        except ApiError as e:
+            status, data = e.status, {"error": str(e)}
+        await self._respond(writer, status, data)
+
+    async def _route(self, method: str, path: str, body: Dict):
+        if method == "GET" and path == "/api/shops":
+            return {"shops": await self._on_gui(self._get_shops)}
+        if method == "GET" and path == "/api/unread":
+            return await self._on_gui(self._get_unread)
+        if method == "GET" and path == "/api/stats":
+            return {
+                "subscribers": [s.to_dict() for s in self.event_bus.stats()],
+                "clients": [c.stats() for c in self.clients],
+            }
+        if method == "POST" and path == "/api/send":
+            if not isinstance(body, dict) or not body.get("webview_id") or not body.get("text"):
+                raise ApiError(400, "缺少 webview_id 或 text")
+            future = await self._on_gui(lambda: self._send_message(body))
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), SEND_RESULT_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise ApiError(504, "等待发送结果超时")
+        raise ApiError(404, "接口不存在")
+
+    async def _on_gui(self, func: Callable):
+        """在界面线程中执行并等待结果，KeyError 视为资源不存在"""
+        try:
+            return await asyncio.wrap_future(self._dispatch(func))
+        except KeyError as e:
+            raise ApiError(404, f"不存在: {e.args[0] if e.args else ''}")
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, data: Dict):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                  413: "Payload Too Large", 504: "Gateway Timeout"}.get(status, "Error")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload)
+        await writer.drain()
+
+    # ---- WebSocket ----
+
+    async def _handle_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                headers: Dict[str, str], query: Dict[str, str]):
+        key = headers.get("sec-websocket-key", "")
+        if headers.get("upgrade", "").lower() != "websocket" or not key:
+            await self._respond(writer, 400, {"error": "需要WebSocket握手"})
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode("latin-1") + WS_GUID).digest()).decode("ascii")
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+
+        types = {BRIDGE_EVENT_NAMES.get(t, t) for t in query.get("types", "").split(",") if t}
+        peer = "%s:%s" % writer.get_extra_info("peername")[:2]
+        client = WebSocketClient(writer, types, self.config["client_queue"], peer)
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self._send_loop(client))
+        try:
+            while True:
+                opcode, payload = await _read_frame(reader)
+                if opcode == OP_CLOSE:
+                    writer.write(_encode_frame(OP_CLOSE, payload[:2]))
+                    break
+                if opcode == OP_PING:
+                    writer.write(_encode_frame(OP_PONG, payload))
+                elif opcode == OP_TEXT:
+                    self._handle_client_message(client, payload)
+        except ApiError:
+            writer.write(_encode_frame(OP_CLOSE, struct.pack("!H", 1009)))
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+
+    def _handle_client_message(self, client: WebSocketClient, payload: bytes):
+        """客户端可发送 {"op": "subscribe", "types": [...]} 修改订阅的事件类型"""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if isinstance(message, dict) and message.get("op") == "subscribe":
+            client.types = {BRIDGE_EVENT_NAMES.get(t, t) for t in message.get("types") or []}
+
+    async def _send_loop(self, client: WebSocketClient):
+        """等待一小段时间合并事件后按批发送，写入阻塞过久时断开客户端"""
+        try:
+            while True:
+                await client.wakeup.wait()
+                await asyncio.sleep(self.config["batch_interval"])
+                client.wakeup.clear()
+                while client.queue:
+                    frame = client.take_batch(self.config["batch_size"])
+                    client.writer.write(_encode_frame(OP_TEXT, json.dumps(frame, ensure_ascii=False).encode("utf-8")))
+                    await asyncio.wait_for(client.writer.drain(), self.config["send_timeout"])
+                    client.sent_events += len(frame["events"])
+                    client.sent_frames += 1
+        except asyncio.TimeoutError:
+            logger.warning("本地接口: 客户端 %s 接收过慢，已断开", client.peer)
+            self.clients.discard(client)
+            client.writer.close()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+class _TestClient:
+    """自测用的最小HTTP/WebSocket客户端"""
+
+    def __init__(self, port: int, token: str):
+        self.port = port
+        self.token = token
+
+    def request(self, method: str, path: str, body: Dict = None, token: str = None) -> Tuple[int, Dict]:
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+            sock.sendall(
+                f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                f"Authorization: Bearer {self.token if token is None else token}\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload)
+            data = b""
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        head, _, content = data.partition(b"\r\n\r\n")
+        return int(head.split(b" ")[1]), json.loads(content)
+
+    def websocket(self, types: str = "") -> socket.socket:
+        sock = socket.create_connection(("127.0.0.1", self.port), timeout=10)
+        key = base64.b64encode(b"pdkbot-selftest!").decode("ascii")
+        sock.sendall(
+            f"GET /ws?token={self.token}&types={types} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+            f"Sec-WebSocket-Version: 13\r\n\r\n".encode("latin-1"))
+        response = b""
+        while b"\r\n\r\n" not in response:
+            response += sock.recv(1)
+        if b" 101 " not in response.split(b"\r\n")[0]:
+            raise RuntimeError(response.decode("latin-1"))
+        return sock
+
+    @staticmethod
+    def read_frame(sock: socket.socket) -> Dict:
+        def read(n: int) -> bytes:
+            data = b""
+            while len(data) < n:
+                chunk = sock.recv(n - len(data))
+                if not chunk:
+                    raise ConnectionError("连接已关闭")
+                data += chunk
+            return data
+
+        first, second = read(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", read(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", read(8))[0]
+        return json.loads(read(length))
+
+
+def run_selftest(events: int = 5000):
+    """启动服务器并用本地客户端验证鉴权、REST接口和WebSocket批量推送"""
+    from ..core.event_bus import NewMessageEvent, ShopReadyEvent
+
+    bus = EventBus()
+    sent: List[Dict] = []
+
+    def send_message(body: Dict) -> Future:
+        if body["webview_id"] != "shop1":
+            raise KeyError(body["webview_id"])
+        sent.append(body)
+        future = Future()
+        threading.Timer(0.05, lambda: future.set_result({"ok": True, "error": ""})).start()
+        return future
+
+    server = LocalApiServer(
+        bus,
+        get_shops=lambda: [{"platform": "pdd", "webview_id": "shop1", "user_name": "测试店铺", "open": True,
+                            "unread": 3}],
+        get_unread=lambda: {"total": 3, "platforms": {"pdd": 3}, "shops": {"shop1": 3}},
+        send_message=send_message,
+        config={"port": 0, "token": "selftest-token"})
+    server.start()
+    client = _TestClient(server.port, "selftest-token")
+
+    status, _ = client.request("GET", "/api/shops", token="wrong")
+    print(f"错误令牌: {status}")
+    print(f"店铺列表: {client.request('GET', '/api/shops')}")
+    print(f"未读合计: {client.request('GET', '/api/unread')}")
+    print(f"发送消息: {client.request('POST', '/api/send', {'webview_id': 'shop1', 'text': '您好'})}")
+    print(f"发送到不存在的店铺: {client.request('POST', '/api/send', {'webview_id': 'nope', 'text': '您好'})}")
+
+    sock = client.websocket("newmessage")
+    sock.settimeout(1.0)
+    time.sleep(0.1)
+
+    def stream(paced: bool) -> str:
+        begin = time.perf_counter()
+        for i in range(events):
+            bus.publish(NewMessageEvent("pdd", "shop1", i))
+            bus.publish(ShopReadyEvent("pdd", "shop1", 1.0))  # 被客户端过滤
+            if paced and i % 100 == 99:
+                time.sleep(0.02)
+        received, frames, dropped = [], 0, 0
+        while len(received) + dropped < events:
+            try:
+                frame = client.read_frame(sock)
+            except socket.timeout:
+                break
+            frames += 1
+            dropped += frame["dropped"]
+            received.extend(event["count"] for event in frame["events"])
+        elapsed = time.perf_counter() - begin
+        return (f"{events} 个事件，{frames} 帧，收到 {len(received)}，丢弃 {dropped}，"
+                f"顺序正确 {received == sorted(received)}，耗时 {elapsed:.2f} 秒")
+
+    print(f"WebSocket 每秒约五千个事件: {stream(True)}")
+    print(f"WebSocket 瞬间突发: {stream(False)}")
+    print(f"统计: {client.request('GET', '/api/stats')[1]}")
+
+    sock.close()
+    server.stop()
+    bus.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地接口自测")
+    parser.add_argument("--events", type=int, default=5000)
+    args = parser.parse_args()
+    run_selftest(args.events)
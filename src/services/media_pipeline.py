@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+图片/视频发送流水线
+
+预处理（按平台限制缩放、压缩、转码，生成缩略图）在工作线程中进行，
+不阻塞界面。文件按内容哈希去重：同一文件处理结果可复用，已上传过的
+素材直接使用平台返回的素材ID发送，无需再次上传。哈希分块读取，视频由
+ffmpeg流式转码，上传时由浏览器直接从磁盘读取，大文件不会整体读入内存。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+VIDEO_SUFFIXES = {".mp4", ".mov", ".avi", ".mkv", ".webm"}
+
+# 各平台素材限制
+PLATFORM_MEDIA_LIMITS = {
+    "pdd": {"image_max_side": 1920, "image_max_bytes": 3 * 1024 * 1024,
+            "video_max_side": 1280, "video_max_bytes": 50 * 1024 * 1024},
+    "doudian": {"image_max_side": 2048, "image_max_bytes": 5 * 1024 * 1024,
+                "video_max_side": 1280, "video_max_bytes": 100 * 1024 * 1024},
+    "kuaishou": {"image_max_side": 2048, "image_max_bytes": 5 * 1024 * 1024,
+                 "video_max_side": 1280, "video_max_bytes": 100 * 1024 * 1024},
+    "jd": {"image_max_side": 1920, "image_max_bytes": 3 * 1024 * 1024,
+           "video_max_side": 1280, "video_max_bytes": 50 * 1024 * 1024},
+}
+DEFAULT_MEDIA_LIMITS = PLATFORM_MEDIA_LIMITS["pdd"]
+
+# ffprobe/ffmpeg 输出中的画面尺寸，如 "1920x1080"
+_VIDEO_SIZE = re.compile(r"\b(\d{2,5})x(\d{2,5})\b")
+
+THUMBNAIL_SIZE = 200
+# 上传较慢，回执超时按文件大小放宽
+UPLOAD_TIMEOUT_BASE = 30.0
+UPLOAD_BYTES_PER_SECOND = 256 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """分块计算文件SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class PreparedMedia:
+    """预处理完成的素材"""
+    source: str
+    platform: str
+    kind: str  # image / video
+    sha256: str
+    file: str  # 实际上传的文件
+    size: int
+    thumbnail: str = ""
+    media_id: str = ""  # 平台素材ID，已上传过时有值
+    webview_id: str = ""
+    conversation_id: str = ""
+
+
+class MediaCache:
+    """素材缓存：内容哈希 -> 平台素材ID"""
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                logger.error("加载素材缓存失败: %s", e)
+
+    @staticmethod
+    def _key(platform: str, sha256: str) -> str:
+        return f"{platform}:{sha256}"
+
+    def get_media_id(self, platform: str, sha256: str) -> str:
+        with self._lock:
+            return self._entries.get(self._key(platform, sha256), {}).get("media_id", "")
+
+    def set_media_id(self, platform: str, sha256: str, media_id: str):
+        with self._lock:
+            self._entries[self._key(platform, sha256)] = {"media_id": media_id, "uploaded_at": time.time()}
+            data = dict(self._entries)
+        try:
+            tmp_path = self.cache_file.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.error("保存素材缓存失败: %s", e)
+
+
+class MediaPipeline(QObject):
+    """图片/视频发送流水线"""
+
+    # 信号
+    media_prepared = pyqtSignal(object)  # PreparedMedia
+    media_failed = pyqtSignal(str, str)  # 源文件, 错误信息
+
+    def __init__(self, data_dir: Path, send_queue, max_workers: int = 2, parent=None):
+        super().__init__(parent)
+
+        self.media_dir = data_dir / "media"
+        self.processed_dir = self.media_dir / "processed"
+        self.thumbs_dir = self.media_dir / "thumbs"
+        self.processed_dir.mkdir(parents=True, exist_ok=True)
+        self.thumbs_dir.mkdir(parents=True, exist_ok=True)
+
+        self.cache = MediaCache(self.media_dir / "cache.json")
+        self.send_queue = send_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="MediaWorker")
+        # 已提交未完成的任务，退出时取消尚未开始的
+        self._pending: Set[Future] = set()
+        self._pending_lock = threading.Lock()
+        self._ffmpeg = shutil.which("ffmpeg")
+        self._ffprobe = shutil.which("ffprobe")
+        
+        # 预处理在工作线程完成，通过信号回到界面线程提交发送
+        self.media_prepared.connect(self.submit_prepared)
+
+    def shutdown(self):
+        """取消尚未开始的预处理并停止工作线程（cancel_futures 需要 Python 3.9，这里逐个取消）"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, set()
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def prepare(self, path: str, platform: str) -> Future:
+        """在工作线程中预处理素材，返回 Future[PreparedMedia]"""
+        future = self._executor.submit(self._prepare, Path(path), platform)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard_pending)
+        return future
+
+    def _discard_pending(self, future: Future):
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def send_media(self, platform: str, webview_id: str, path: str, conversation_id: str = ""):
+        """预处理并发送素材，预处理完成后回到界面线程提交发送"""
+        future = self.prepare(path, platform)
+        future.add_done_callback(lambda f: self._on_prepared(f, webview_id, conversation_id, path))
+
+    def _on_prepared(self, future: Future, webview_id: str, conversation_id: str, path: str):
+        """预处理完成（工作线程），信号跨线程发出时自动排队到界面线程"""
+        try:
+            media = future.result()
+        except Exception as e:
+            logger.error("素材预处理失败: %s", e)
+            self.media_failed.emit(path, str(e))
+            return
+        media.webview_id = webview_id
+        media.conversation_id = conversation_id
+        self.media_prepared.emit(media)
+
+    def submit_prepared(self, media: PreparedMedia):
+        """提交发送（界面线程调用）"""
+        payload = {"kind": media.kind, "conversationId": media.conversation_id, "sha256": media.sha256}
+        if media.media_id:
+            payload["mediaId"] = media.media_id
+        else:
+            payload["file"] = media.file
+            payload["ackTimeout"] = UPLOAD_TIMEOUT_BASE + media.size / UPLOAD_BYTES_PER_SECOND
+
+        ticket = self.send_queue.submit(media.platform, media.webview_id, payload)
+        if not media.media_id:
+            ticket.delivered.connect(lambda request_id, t=ticket, m=media: self._on_uploaded(m, t))
+        return ticket
+
+    def _on_uploaded(self, media: PreparedMedia, ticket):
+        """记录平台返回的素材ID，之后发送同一文件时直接复用"""
+        media_id = ticket.result.get("mediaId", "")
+        if media_id:
+            self.cache.set_media_id(media.platform, media.sha256, media_id)
+
+    def _prepare(self, source: Path, platform: str) -> PreparedMedia:
+        """预处理素材（工作线程）"""
+        if not source.exists():
+            raise FileNotFoundError(f"文件不存在: {source}")
+
+        suffix = source.suffix.lower()
+        if suffix in IMAGE_SUFFIXES:
+            kind = "image"
+        elif suffix in VIDEO_SUFFIXES:
+            kind = "video"
+        else:
+            raise ValueError(f"不支持的文件类型: {suffix}")
+
+        limits = PLATFORM_MEDIA_LIMITS.get(platform, DEFAULT_MEDIA_LIMITS)
+        sha256 = hash_file(source)
+        media_id = self.cache.get_media_id(platform, sha256)
+        if media_id:
+            # 已上传过，直接复用平台素材ID，无需再处理
+            thumbnail = self.thumbs_dir / f"{sha256}.jpg"
+            return PreparedMedia(
+                source=str(source),
+                platform=platform,
+                kind=kind,
+                sha256=sha256,
+                file=str(source),
+                size=source.stat().st_size,
+                thumbnail=str(thumbnail) if thumbnail.exists() else "",
+                media_id=media_id
+            )
+
+        if kind == "image":
+            target = self._prepare_image(source, sha256, platform, limits)
+            thumbnail = self._image_thumbnail(target, sha256)
+        else:
+            target = self._prepare_video(source, sha256, platform, limits)
+            thumbnail = self._video_thumbnail(target, sha256)
+
+        return PreparedMedia(
+            source=str(source),
+            platform=platform,
+            kind=kind,
+            sha256=sha256,
+            file=str(target),
+            size=target.stat().st_size,
+            thumbnail=thumbnail
+        )
+
+    def _prepare_image(self, source: Path, sha256: str, platform: str, limits: Dict) -> Path:
+        """按平台限制缩放和压缩图片，处理结果按哈希缓存"""
+        target = self.processed_dir / f"{sha256}_{platform}.jpg"
+        if target.exists():
+            return target
+
+        reader = QImageReader(str(source))
+        size = reader.size()
+        max_side = limits["image_max_side"]
+        if (source.stat().st_size <= limits["image_max_bytes"]
+                and size.isValid() and max(size.width(), size.height()) <= max_side):
+            # 已满足限制，直接上传原文件
+            return source
+
+        # 读取时直接缩放，避免解码出完整的大图
+        if size.isValid() and max(size.width(), size.height()) > max_side:
+            reader.setScaledSize(size.scaled(max_side, max_side, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            raise ValueError(f"无法读取图片: {reader.errorString()}")
+        if image.hasAlphaChannel():
+            image = image.convertToFormat(QImage.Format.Format_RGB32)
+
+        tmp_path = target.with_suffix(".tmp.jpg")
+        for quality in (90, 80, 70, 60, 50):
+            if not image.save(str(tmp_path), "JPEG", quality):
+                raise ValueError("图片压缩失败")
+            if tmp_path.stat().st_size <= limits["image_max_bytes"]:
+                break
+        else:
+            tmp_path.unlink(missing_ok=True)
+            raise ValueError("图片压缩后仍超出平台大小限制")
+        os.replace(tmp_path, target)
+        return target
+
+    def _prepare_video(self, source: Path, sha256: str, platform: str, limits: Dict) -> Path:
+        """超出平台限制的视频使用ffmpeg转码"""
+        max_side = limits["video_max_side"]
+        # 长边超限也要转码；旋转信息不影响长边，直接比较编码尺寸
+        size = self._video_size(source)
+        too_large = size is not None and max(size) > max_side
+        if source.stat().st_size <= limits["video_max_bytes"] and not too_large:
+            return source
+
+        target = self.processed_dir / f"{sha256}_{platform}.mp4"
+        if target.exists():
+            return target
+        if not self._ffmpeg:
+            raise ValueError("视频超出平台限制，且未安装ffmpeg无法转码")
+
+        tmp_path = target.with_suffix(".tmp.mp4")
+        # 按长边缩放，竖屏视频限制高度，横屏视频限制宽度，另一边按比例取偶数
+        scale = (f"scale='if(gt(iw,ih),min({max_side},iw),-2)'"
+                 f":'if(gt(iw,ih),-2,min({max_side},ih))'")
+        command = [
+            self._ffmpeg, "-y", "-loglevel", "error", "-i", str(source),
+            "-vf", scale,
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+            "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart",
+            str(tmp_path)
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            tmp_path.unlink(missing_ok=True)
+            raise ValueError(f"视频转码失败: {result.stderr.strip()}")
+        if tmp_path.stat().st_size > limits["video_max_bytes"]:
+            tmp_path.unlink(missing_ok=True)
+            raise ValueError("视频转码后仍超出平台大小限制")
+        os.replace(tmp_path, target)
+        return target
+
+    def _video_size(self, path: Path) -> Optional[Tuple[int, int]]:
+        """视频画面的宽和高，优先用ffprobe，没有时解析ffmpeg输出的流信息；都不可用时返回None"""
+        if self._ffprobe:
+            command = [self._ffprobe, "-v", "error", "-select_streams", "v:0",
+                       "-show_entries", "stream=width,height", "-of", "csv=p=0:s=x", str(path)]
+            result = subprocess.run(command, capture_output=True, text=True)
+            output = result.stdout
+        elif self._ffmpeg:
+            # 未指定输出时ffmpeg以错误退出，但会先在stderr中列出输入流
+            result = subprocess.run([self._ffmpeg, "-hide_banner", "-i", str(path)], capture_output=True, text=True)
+            output = "\n".join(line for line in result.stderr.splitlines() if "Video:" in line)
+        else:
+            return None
+        match = _VIDEO_SIZE.search(output)
+        if match is None:
+            logger.warning("无法获取视频分辨率: %s", path)
+            return None
+        return int(match.group(1)), int(match.group(2))
+
+    def _image_thumbnail(self, path: Path, sha256: str) -> str:
+        thumbnail = self.thumbs_dir / f"{sha256}.jpg"
+        if thumbnail.exists():
+            return str(thumbnail)
+        reader = QImageReader(str(path))
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(size.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull() or not image.save(str(thumbnail), "JPEG", 80):
+            return ""
+        return str(thumbnail)
+
+    def _video_thumbnail(self, path: Path, sha256: str) -> str:
+        thumbnail = self.thumbs_dir / f"{sha256}.jpg"
+        if thumbnail.exists():
+            return str(thumbnail)
+        if not self._ffmpeg:
+            return ""
+        command = [
+            self._ffmpeg, "-y", "-loglevel", "error", "-i", str(path),
+            "-frames:v", "1", "-vf", f"scale={THUMBNAIL_SIZE}:-2", str(thumbnail)
+        ]
+        result = subprocess.run(command, capture_output=True)
+        return str(thumbnail) if result.returncode == 0 and thumbnail.exists() else ""
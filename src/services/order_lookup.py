@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+买家订单查询服务
+
+按 (平台, 店铺, 买家) 缓存查询结果，缓存有过期时间；同一买家的并发查询
+合并为一次请求（singleflight）。请求在后台线程池中执行，使用与店铺
+WebView同一登录状态的HTTP会话。
+"""
+
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Set, Tuple
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from .session_pool import REQUEST_TIMEOUT, SessionPool, extract_list, fill_template
+
+# 缓存过期时间(秒)与容量
+DEFAULT_TTL = 300.0
+DEFAULT_CACHE_SIZE = 5000
+# 后台线程数
+DEFAULT_WORKERS = 4
+
+LookupKey = Tuple[str, str, str]
+
+
+@dataclass
+class OrderLookupResult:
+    """订单查询结果"""
+    platform: str
+    webview_id: str
+    buyer_id: str
+    orders: List[Dict] = field(default_factory=list)
+    fetched_at: float = field(default_factory=time.time)
+
+
+class TTLCache:
+    """带过期时间的LRU缓存，线程安全"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_size: int = DEFAULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: "OrderedDict[LookupKey, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now: float = None):
+        """获取未过期的值，不存在或已过期时返回None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if now >= expires_at:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._items[key] = (now + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """删除指定键，不指定时清空"""
+        with self._lock:
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SingleFlight:
+    """合并相同键的并发调用，进行中的调用结束前复用同一个Future"""
+
+    def __init__(self):
+        self._calls: Dict[object, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, submit: Callable[[], Future]) -> Tuple[Future, bool]:
+        """返回 (Future, 是否复用了进行中的调用)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, True
+            future = submit()
+            self._calls[key] = future
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future, False
+
+    def _forget(self, key, future: Future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+
+class OrderLookupService(QObject):
+    """买家订单查询服务
+
+    各平台的订单接口通过配置提供，格式：
+        {"url": "...", "method": "POST", "params": {...}, "json": {...}, "items_path": "result.orders"}
+    url、params、json 中的 {buyer_id} 会替换为买家ID。
+    """
+
+    # 信号（在后台线程发出，跨线程连接时自动排队到界面线程）
+    orders_ready = pyqtSignal(object)  # OrderLookupResult
+    lookup_failed = pyqtSignal(str, str, str, str)  # 平台名, webview_id, 买家ID, 错误信息
+
+    def __init__(self, session_pool: SessionPool, apis: Dict = None, ttl: float = DEFAULT_TTL,
+                 max_workers: int = DEFAULT_WORKERS, cache_size: int = DEFAULT_CACHE_SIZE, parent=None):
+        super().__init__(parent)
+
+        self.session_pool = session_pool
+        self.apis: Dict[str, Dict] = dict(apis or {})
+        self.cache = TTLCache(ttl, cache_size)
+        self._flight = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="order-lookup")
+        # 已提交未完成的查询，退出时取消尚未开始的
+        self._pending: Set[Future] = set()
+        self._pending_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.requests = 0
+
+    def lookup(self, platform: str, webview_id: str, buyer_id: str, force: bool = False) -> Future:
+        """查询买家订单，返回结果为 OrderLookupResult 的Future"""
+        key = (platform, webview_id, buyer_id)
+        if not force:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("hits")
+                future: Future = Future()
+                future.set_result(cached)
+                return future
+
+        future, shared = self._flight.do(key, lambda: self._submit(key, force))
+        self._count("coalesced" if shared else "misses")
+        return future
+
+    def _submit(self, key: LookupKey, force: bool) -> Future:
+        future = self._executor.submit(self._fetch, key, force)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard_pending)
+        return future
+
+    def _discard_pending(self, future: Future):
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def invalidate(self, platform: str, webview_id: str, buyer_id: str):
+        """使某个买家的缓存失效"""
+        self.cache.invalidate((platform, webview_id, buyer_id))
+
+    def _count(self, name: str, delta: int = 1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def _fetch(self, key: LookupKey, force: bool = False) -> OrderLookupResult:
+        """在后台线程请求平台订单接口"""
+        if not force:
+            # 查缓存和发起请求之间，上一次请求可能刚好完成
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        platform, webview_id, buyer_id = key
+        api = self.apis.get(platform)
+        try:
+            if not api or not api.get("url"):
+                raise ValueError(f"未配置 {platform} 平台的订单接口")
+
+            values = {"buyer_id": buyer_id}
+            session = self.session_pool.get(webview_id)
+            self._count("requests")
+            response = session.request(
+                api.get("method", "GET"),
+                fill_template(api["url"], values),
+                params=fill_template(api.get("params"), values),
+                json=fill_template(api.get("json"), values),
+                timeout=api.get("timeout", REQUEST_TIMEOUT)
+            )
+            response.raise_for_status()
+            result = OrderLookupResult(platform, webview_id, buyer_id,
+                                       extract_list(response.json(), api.get("items_path", "")))
+        except Exception as e:
+            self._count("errors")
+            self.lookup_failed.emit(platform, webview_id, buyer_id, str(e))
+            raise
+
+        self.cache.put(key, result)
+        self.orders_ready.emit(result)
+        return result
+
+    @property
+    def hit_rate(self) -> float:
+        """缓存命中率，合并的并发请求也计为命中"""
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def get_stats(self) -> Dict:
+        """统计信息"""
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "requests": self.requests,
+                "cached": len(self.cache),
+                "hit_rate": self.hit_rate,
+            }
+
+    def shutdown(self):
+        """取消尚未开始的查询并停止后台线程（cancel_futures 需要 Python 3.9，这里逐个取消）"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, set()
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+
+def run_benchmark(buyers: int = 200, lookups: int = 5000, latency: float = 0.05, threads: int = 16):
+    """对本地模拟服务器发起并发查询，统计实际请求数和命中率"""
+    import random
+    from .stub_server import StubPlatformServer
+
+    with StubPlatformServer(latency=latency) as server:
+        service = OrderLookupService(SessionPool(), {"pdd": server.order_api()}, ttl=60)
+        rng = random.Random(1)
+        # 少数买家占大部分查询，模拟多个客服同时查看同一买家
+        weights = [1.0 / (i + 1) for i in range(buyers)]
+        keys = rng.choices(range(buyers), weights=weights, k=lookups)
+
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = list(pool.map(lambda b: service.lookup("pdd", "shop1", f"buyer{b}"), keys))
+        results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - begin
+
+        stats = service.get_stats()
+        print(f"{lookups} 次查询，{len({r.buyer_id for r in results})} 个买家，耗时 {elapsed:.2f} 秒")
+        print(f"服务器收到请求 {server.request_count} 次，命中 {stats['hits']}，"
+              f"合并 {stats['coalesced']}，未命中 {stats['misses']}，命中率 {stats['hit_rate']:.1%}")
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="订单查询缓存与合并请求测试")
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟接口延迟(秒)")
+    args = parser.parse_args()
+    run_benchmark(args.buyers, args.lookups, args.latency)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+汉字拼音首字母
+
+安装了 pypinyin 时使用其结果（覆盖全部汉字）；否则按 GB2312 一级汉字按拼音排序的
+编码区间查表，二级汉字和其他字符保持原样。多音字只取一个读音。
+"""
+
+from functools import lru_cache
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+# GB2312 一级汉字（按拼音排序）各声母的起始编码
+_GB2312_INITIALS = [
+    (0xB0A1, "a"), (0xB0C5, "b"), (0xB2C1, "c"), (0xB4EE, "d"), (0xB6EA, "e"),
+    (0xB7A2, "f"), (0xB8C1, "g"), (0xB9FE, "h"), (0xBBF7, "j"), (0xBFA6, "k"),
+    (0xC0AC, "l"), (0xC2E8, "m"), (0xC4C3, "n"), (0xC5B6, "o"), (0xC5BE, "p"),
+    (0xC6DA, "q"), (0xC8BB, "r"), (0xC8F6, "s"), (0xCBFA, "t"), (0xCDDA, "w"),
+    (0xCEF4, "x"), (0xD1B9, "y"), (0xD4D1, "z"),
+]
+_GB2312_LEVEL1_END = 0xD7F9
+
+
+@lru_cache(maxsize=8192)
+def char_initial(char: str) -> str:
+    """单个字符的拼音首字母，非汉字原样返回（字母转为小写）"""
+    if char < "一" or char > "鿿":
+        return char.lower()
+    try:
+        code = int.from_bytes(char.encode("gb2312"), "big")
+    except UnicodeEncodeError:
+        return char
+    if code < _GB2312_INITIALS[0][0] or code > _GB2312_LEVEL1_END:
+        return char
+    initial = char
+    for start, letter in _GB2312_INITIALS:
+        if code < start:
+            break
+        initial = letter
+    return initial
+
+
+def initials(text: str) -> str:
+    """文本的拼音首字母串，如 "拼多多旗舰店" -> "pddqjd" """
+    if lazy_pinyin is not None:
+        return "".join(lazy_pinyin(text, style=Style.FIRST_LETTER, errors=lambda s: list(s))).lower()
+    return "".join(char_initial(c) for c in text)
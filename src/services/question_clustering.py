@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+买家问题近似去重聚类
+
+对每条买家消息的字符片段计算MinHash签名，按LSH分段分桶，
+只与同桶的聚类代表比较，查找近似问题的耗时与历史消息总量无关。
+聚类数量有上限，超出时淘汰出现次数最少的聚类，因此可以在有限内存内
+流式处理任意数量的消息。
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..db.entities import ChatMessage
+from ..db.message_store import MessageStore
+from .tokenizer import normalize
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+
+# 去除标点、空白和语气词后再切片，避免“吗”“呀”之类的差异影响相似度
+_NOISE_PATTERN = re.compile(r"[\s\W_]+|[吗呢呀啊吧哦嘛啦哈亲]")
+
+
+@dataclass
+class QuestionCluster:
+    """近似问题聚类"""
+    cluster_id: int
+    text: str
+    signature: np.ndarray
+    count: int = 0
+    by_shop: Counter = field(default_factory=Counter)  # "平台/webview_id" -> 次数
+    samples: List[str] = field(default_factory=list)
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+
+    def by_platform(self) -> Counter:
+        counts = Counter()
+        for key, count in self.by_shop.items():
+            counts[key.split("/", 1)[0]] += count
+        return counts
+
+    def to_dict(self) -> Dict:
+        return {
+            "cluster_id": self.cluster_id,
+            "text": self.text,
+            "signature": self.signature.tolist(),
+            "count": self.count,
+            "by_shop": dict(self.by_shop),
+            "samples": self.samples,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuestionCluster':
+        return cls(
+            cluster_id=data["cluster_id"],
+            text=data["text"],
+            signature=np.array(data["signature"], dtype=np.uint32),
+            count=data["count"],
+            by_shop=Counter(data["by_shop"]),
+            samples=data["samples"],
+            first_seen=data["first_seen"],
+            last_seen=data["last_seen"],
+        )
+
+
+class QuestionClusterer:
+    """基于MinHash/LSH的增量问题聚类"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 2,
+                 threshold: float = 0.5, max_clusters: int = 50000, max_samples: int = 3,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm必须能被bands整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.max_clusters = max_clusters
+        self.max_samples = max_samples
+        self.seed = seed
+
+        rng = np.random.RandomState(seed)
+        # 参数取32位以内，保证 a*x+b 不超出uint64
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self.clusters: Dict[int, QuestionCluster] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._next_id = 0
+        self.processed = 0
+        self.last_timestamp = 0.0
+
+    def shingles(self, text: str) -> np.ndarray:
+        """计算字符片段哈希"""
+        text = _NOISE_PATTERN.sub("", normalize(text))
+        if not text:
+            return np.empty(0, dtype=np.uint64)
+        k = self.shingle_size
+        grams = {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams),
+                           dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """计算MinHash签名，文本为空时返回None"""
+        hashes = self.shingles(text)
+        if not len(hashes):
+            return None
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.bands)]
+
+    def _find_cluster(self, signature: np.ndarray, keys: List[bytes]) -> Optional[QuestionCluster]:
+        """在同桶候选中查找最相似的聚类"""
+        best = None
+        best_score = self.threshold
+        seen = set()
+        for band, key in enumerate(keys):
+            for cluster_id in self._buckets[band].get(key, ()):
+                if cluster_id in seen:
+                    continue
+                seen.add(cluster_id)
+                cluster = self.clusters[cluster_id]
+                score = float(np.count_nonzero(cluster.signature == signature)) / self.num_perm
+                if score >= best_score:
+                    best = cluster
+                    best_score = score
+        return best
+
+    def add(self, text: str, platform: str = "", webview_id: str = "",
+            timestamp: float = 0.0) -> Optional[QuestionCluster]:
+        """加入一条消息，返回其所属聚类"""
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        keys = self._band_keys(signature)
+        cluster = self._find_cluster(signature, keys)
+        if cluster is None:
+            cluster = QuestionCluster(
+                cluster_id=self._next_id,
+                text=text,
+                signature=signature,
+                first_seen=timestamp
+            )
+            self._next_id += 1
+            self.clusters[cluster.cluster_id] = cluster
+            for band, key in enumerate(keys):
+                self._buckets[band].setdefault(key, []).append(cluster.cluster_id)
+
+        cluster.count += 1
+        cluster.by_shop[f"{platform}/{webview_id}"] += 1
+        cluster.last_seen = max(cluster.last_seen, timestamp)
+        if len(cluster.samples) < self.max_samples and text not in cluster.samples:
+            cluster.samples.append(text)
+
+        self.processed += 1
+        self.last_timestamp = max(self.last_timestamp, timestamp)
+        if len(self.clusters) > self.max_clusters:
+            self._evict()
+        return cluster
+
+    def add_message(self, message: ChatMessage) -> Optional[QuestionCluster]:
+        """加入一条买家消息"""
+        if not message.from_buyer:
+            return None
+        return self.add(message.content, message.platform, message.webview_id, message.timestamp)
+
+    def process_stream(self, messages: Iterable[ChatMessage], progress_every: int = 0) -> int:
+        """流式处理消息，返回处理条数"""
+        count = 0
+        for message in messages:
+            if self.add_message(message) is not None:
+                count += 1
+                if progress_every and count % progress_every == 0:
+                    print(f"已处理 {count} 条，当前聚类数 {len(self.clusters)}")
+        return count
+
+    def _evict(self):
+        """淘汰出现次数最少、最久未出现的聚类，一次淘汰10%以摊薄开销"""
+        target = int(self.max_clusters * 0.9)
+        victims = sorted(self.clusters.values(), key=lambda c: (c.count, c.last_seen))
+        for cluster in victims[:len(self.clusters) - target]:
+            del self.clusters[cluster.cluster_id]
+            for band, key in enumerate(self._band_keys(cluster.signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is None:
+                    continue
+                bucket.remove(cluster.cluster_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def top_clusters(self, limit: int = 20, min_count: int = 2) -> List[QuestionCluster]:
+        """按出现次数排序的聚类"""
+        clusters = [c for c in self.clusters.values() if c.count >= min_count]
+        clusters.sort(key=lambda c: c.count, reverse=True)
+        return clusters[:limit]
+
+    def report(self, limit: int = 20) -> str:
+        """生成文本报告"""
+        lines = [f"共处理 {self.processed} 条买家消息，聚类 {len(self.clusters)} 个"]
+        for rank, cluster in enumerate(self.top_clusters(limit), 1):
+            platforms = "，".join(f"{p}:{n}" for p, n in cluster.by_platform().most_common())
+            shops = "，".join(f"{s}:{n}" for s, n in cluster.by_shop.most_common(5))
+            lines.append(f"{rank:>3}. [{cluster.count}] {cluster.text}")
+            lines.append(f"     平台: {platforms}")
+            lines.append(f"     店铺: {shops}")
+            if len(cluster.samples) > 1:
+                lines.append(f"     示例: {' | '.join(cluster.samples[1:])}")
+        return "\n".join(lines)
+
+    def save(self, path: Path):
+        """保存状态，供下次增量处理"""
+        state = {
+            "params": {
+                "num_perm": self.num_perm, "bands": self.bands, "shingle_size": self.shingle_size,
+                "threshold": self.threshold, "max_clusters": self.max_clusters, "seed": self.seed,
+            },
+            "next_id": self._next_id,
+            "processed": self.processed,
+            "last_timestamp": self.last_timestamp,
+            "clusters": [cluster.to_dict() for cluster in self.clusters.values()],
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'QuestionClusterer':
+        """加载已保存的状态"""
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        clusterer = cls(**state["params"])
+        clusterer._next_id = state["next_id"]
+        clusterer.processed = state["processed"]
+        clusterer.last_timestamp = state["last_timestamp"]
+        for data in state["clusters"]:
+            cluster = QuestionCluster.from_dict(data)
+            clusterer.clusters[cluster.cluster_id] = cluster
+            for band, key in enumerate(clusterer._band_keys(cluster.signature)):
+                clusterer._buckets[band].setdefault(key, []).append(cluster.cluster_id)
+        return clusterer
+
+
+def run_incremental(data_dir: Path, state_file: Path = None, full: bool = False,
+                    progress_every: int = 100000) -> QuestionClusterer:
+    """对消息存储执行增量聚类：只处理上次运行之后的消息"""
+    state_file = state_file or data_dir / "analytics" / "question_clusters.json"
+    if state_file.exists() and not full:
+        clusterer = QuestionClusterer.load(state_file)
+        start: Optional[float] = clusterer.last_timestamp
+    else:
+        clusterer = QuestionClusterer()
+        start = None
+
+    store = MessageStore(data_dir)
+    messages = store.iter_messages(start=start)
+    if start is not None:
+        # 时间戳相同的消息上次已处理
+        messages = (m for m in messages if m.timestamp > start)
+
+    begin = time.perf_counter()
+    count = clusterer.process_stream(messages, progress_every)
+    elapsed = time.perf_counter() - begin
+    print(f"本次处理 {count} 条消息，耗时 {elapsed:.1f} 秒")
+
+    clusterer.save(state_file)
+    return clusterer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="买家问题近似去重聚类")
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="数据目录")
+    parser.add_argument("--full", action="store_true", help="忽略已保存状态，全量重新聚类")
+    parser.add_argument("--top", type=int, default=20, help="输出前N个聚类")
+    args = parser.parse_args()
+
+    clusterer = run_incremental(args.data_dir, full=args.full)
+    print(clusterer.report(args.top))
+
+
+if __name__ == "__main__":
+    main()
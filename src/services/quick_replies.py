@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+快捷回复模板
+
+模板保存在 data/quick_replies/templates.json（QuickReply 列表），platforms、shops 为空
+表示适用于所有平台/店铺；各模板的使用次数保存在 usage.json。客服在聊天输入框中输入
+“/”加快捷词、标题或标题拼音首字母即可检索，例如“/fh”匹配快捷词 fh 和标题“发货时间”。
+
+按适用范围（全部、某平台、某店铺）各建一棵前缀树，每个节点保存其子树中使用次数最多的
+前 TOP_K 个模板，检索只需沿查询走到对应节点，再合并当前店铺适用的几棵树的结果，
+耗时与模板总数无关。使用一次模板只更新其各个键路径上的节点。
+
+模板内容中的变量在插入时替换：{买家}、{订单号}、{店铺}、{客服}、{日期}、{时间}，
+没有取到值的变量替换为空。
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..db.entities import QuickReply
+from .pinyin import initials
+
+logger = logging.getLogger(__name__)
+
+# 每个节点保存的模板数，也是一次检索最多返回的条数
+TOP_K = 20
+# 前缀树深度上限，更长的查询在该深度节点的子树中逐个比较
+MAX_KEY_DEPTH = 12
+
+VARIABLES = ("买家", "订单号", "店铺", "客服", "日期", "时间")
+_VARIABLE_RE = re.compile(r"\{(" + "|".join(VARIABLES) + r")\}")
+_SPACE_RE = re.compile(r"\s+")
+
+# 适用范围：("", "") 所有店铺，(平台, "") 某平台，("", webview_id) 某店铺
+Scope = Tuple[str, str]
+
+
+def expand(content: str, context: Dict[str, str]) -> str:
+    """替换模板中的变量，context 的键为变量名（如“买家”）"""
+    values = {"日期": time.strftime("%Y-%m-%d"), "时间": time.strftime("%H:%M")}
+    values.update(context)
+    return _VARIABLE_RE.sub(lambda match: str(values.get(match.group(1)) or ""), content)
+
+
+def _normalize(text: str) -> str:
+    return _SPACE_RE.sub("", text).lower()
+
+
+def template_keys(reply: QuickReply) -> List[str]:
+    """模板的检索键：快捷词、标题和标题的拼音首字母"""
+    keys = []
+    for text in (reply.shortcut, reply.title):
+        text = _normalize(text)
+        for key in (text, initials(text)):
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+
+def template_scopes(reply: QuickReply) -> List[Scope]:
+    if reply.shops:
+        return [("", shop) for shop in reply.shops]
+    if reply.platforms:
+        return [(platform, "") for platform in reply.platforms]
+    return [("", "")]
+
+
+class PrefixIndex:
+    """前缀树，每个节点保存子树中排名前 TOP_K 的模板
+
+    节点不建对象，而是以前缀字符串为键存在几个字典里，值都是字符串或字符串元组：
+    5万条模板约有十几万个节点，这样内存更省，也不会因大量对象拖慢垃圾回收。
+    """
+
+    def __init__(self, rank: Callable[[str], tuple]):
+        self.rank = rank
+        self.top: Dict[str, Tuple[str, ...]] = {}       # 前缀 -> 子树中排名最高的模板，从高到低
+        self.ids: Dict[str, Tuple[str, ...]] = {}       # 前缀 -> 键在此结束（或在最大深度截断）的模板
+        self.children: Dict[str, str] = {}              # 前缀 -> 各子节点的下一个字符
+        self.keys: Dict[str, Tuple[str, ...]] = {}
+        self._pending: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _offer(self, prefix: str, reply_id: str):
+        """排名上升或新增后放入节点的 top 列表"""
+        top = self.top.get(prefix, ())
+        if reply_id in top:
+            top = list(top)
+        elif len(top) < TOP_K:
+            top = list(top) + [reply_id]
+        elif self.rank(reply_id) > self.rank(top[-1]):
+            top = list(top[:-1]) + [reply_id]
+        else:
+            return
+        top.sort(key=self.rank, reverse=True)
+        self.top[prefix] = tuple(top)
+
+    def _recompute(self, prefix: str):
+        candidates = set(self.ids.get(prefix, ()))
+        for char in self.children.get(prefix, ""):
+            candidates.update(self.top.get(prefix + char, ()))
+        self.top[prefix] = tuple(heapq.nlargest(TOP_K, candidates, key=self.rank))
+
+    def add(self, reply_id: str, keys: List[str], defer: bool = False):
+        """加入模板；批量加入时 defer=True，全部加入后调用 finalize()"""
+        self.keys[reply_id] = tuple(keys)
+        for key in keys:
+            key = key[:MAX_KEY_DEPTH]
+            for i, char in enumerate(key):
+                chars = self.children.get(key[:i], "")
+                if char not in chars:
+                    self.children[key[:i]] = chars + char
+            if defer:
+                self._pending.setdefault(key, []).append(reply_id)
+                continue
+            self.ids[key] = self.ids.get(key, ()) + (reply_id,)
+            for i in range(len(key) + 1):
+                self._offer(key[:i], reply_id)
+
+    def finalize(self):
+        """批量加入后自底向上计算各节点的 top 列表"""
+        for key, reply_ids in self._pending.items():
+            self.ids[key] = self.ids.get(key, ()) + tuple(reply_ids)
+        self._pending = {}
+        for prefix in sorted(set(self.children) | set(self.ids), key=len, reverse=True):
+            self._recompute(prefix)
+
+    def remove(self, reply_id: str):
+        for key in self.keys.pop(reply_id, ()):
+            key = key[:MAX_KEY_DEPTH]
+            self.ids[key] = tuple(other for other in self.ids.get(key, ()) if other != reply_id)
+            for i in range(len(key), -1, -1):
+                if reply_id in self.top.get(key[:i], ()):
+                    self._recompute(key[:i])
+
+    def touch(self, reply_id: str):
+        """模板排名上升（如使用次数增加）后更新其路径上的节点"""
+        for key in self.keys.get(reply_id, ()):
+            key = key[:MAX_KEY_DEPTH]
+            for i in range(len(key) + 1):
+                self._offer(key[:i], reply_id)
+
+    def search(self, query: str, limit: int = TOP_K) -> List[str]:
+        """返回键以 query 开头的模板，按排名从高到低"""
+        query = _normalize(query)
+        if len(query) <= MAX_KEY_DEPTH:
+            return list(self.top.get(query, ())[:limit])
+        # 超过最大深度：比较该深度节点子树中各模板的完整键
+        matched = set()
+        stack = [query[:MAX_KEY_DEPTH]]
+        while stack:
+            prefix = stack.pop()
+            for reply_id in self.ids.get(prefix, ()):
+                if any(key.startswith(query) for key in self.keys[reply_id]):
+                    matched.add(reply_id)
+            stack.extend(prefix + char for char in self.children.get(prefix, ""))
+        return heapq.nlargest(limit, matched, key=self.rank)
+
+
+class QuickReplyStore:
+    """快捷回复模板及其使用次数，search() 和 use() 在界面线程调用"""
+
+    def __init__(self, data_dir: Path):
+        self.store_dir = data_dir / "quick_replies"
+        self.templates_file = self.store_dir / "templates.json"
+        self.usage_file = self.store_dir / "usage.json"
+        self.templates: Dict[str, QuickReply] = {}
+        self._indexes: Dict[Scope, PrefixIndex] = {}
+        # reply_id -> [使用次数, 最近使用时间]
+        self.usage: Dict[str, List[float]] = self._load_usage()
+        self._usage_dirty = False
+        self._signature: Optional[float] = None
+        self._loading = False
+        self.build_seconds = 0.0
+
+    def _load_usage(self) -> Dict[str, List[float]]:
+        if not self.usage_file.exists():
+            return {}
+        try:
+            with open(self.usage_file, 'r', encoding='utf-8') as f:
+                return {reply_id: list(value) for reply_id, value in json.load(f).items()}
+        except Exception as e:
+            logger.error("加载快捷回复使用次数失败: %s", e)
+            return {}
+
+    def save_usage(self):
+        """使用次数有变化时保存"""
+        if not self._usage_dirty:
+            return
+        self._usage_dirty = False
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = self.usage_file.with_suffix(".tmp")
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.usage, f)
+            os.replace(temp_file, self.usage_file)
+        except Exception as e:
+            logger.error("保存快捷回复使用次数失败: %s", e)
+
+    def rank(self, reply_id: str) -> tuple:
+        usage = self.usage.get(reply_id)
+        return (usage[0], usage[1]) if usage else (0, 0.0)
+
+    def _current_signature(self) -> Optional[float]:
+        try:
+            return self.templates_file.stat().st_mtime
+        except OSError:
+            return None
+
+    def load(self):
+        """读取模板文件并建立索引"""
+        signature = self._current_signature()
+        templates = []
+        if self.templates_file.exists():
+            try:
+                with open(self.templates_file, 'r', encoding='utf-8') as f:
+                    templates = [QuickReply.from_dict(item) for item in json.load(f)]
+            except Exception as e:
+                logger.error("加载快捷回复失败: %s", e)
+                return
+        self.set_templates(templates)
+        self._signature = signature
+
+    def set_templates(self, templates: Iterable[QuickReply]):
+        """建立索引并替换当前模板"""
+        begin = time.perf_counter()
+        by_id: Dict[str, QuickReply] = {}
+        indexes: Dict[Scope, PrefixIndex] = {}
+        for reply in templates:
+            if not reply.reply_id or not reply.content:
+                continue
+            by_id[reply.reply_id] = reply
+            keys = template_keys(reply)
+            for scope in template_scopes(reply):
+                index = indexes.get(scope)
+                if index is None:
+                    index = indexes[scope] = PrefixIndex(self.rank)
+                index.add(reply.reply_id, keys, defer=True)
+        for index in indexes.values():
+            index.finalize()
+        self.templates, self._indexes = by_id, indexes
+        self.build_seconds = time.perf_counter() - begin
+
+    def reload_if_changed(self) -> bool:
+        """模板文件有变化时在后台线程重新建立索引，返回是否开始重新加载"""
+        if self._loading or self._current_signature() == self._signature:
+            return False
+        self._loading = True
+
+        def load_templates():
+            try:
+                self.load()
+                logger.info("已加载快捷回复：%s 条，建立索引耗时 %.0f ms",
+                            len(self.templates), self.build_seconds * 1000)
+            finally:
+                self._loading = False
+
+        threading.Thread(target=load_templates, name="quick_reply_load", daemon=True).start()
+        return True
+
+    def search(self, query: str, platform: str, webview_id: str, limit: int = 10) -> List[QuickReply]:
+        """检索当前店铺可用的模板，按使用次数从高到低"""
+        indexes = self._indexes
+        candidates = set()
+        for scope in (("", ""), (platform, ""), ("", webview_id)):
+            index = indexes.get(scope)
+            if index is not None:
+                candidates.update(index.search(query, limit))
+        templates = self.templates
+        return [templates[reply_id] for reply_id in heapq.nlargest(limit, candidates, key=self.rank)
+                if reply_id in templates]
+
+    def use(self, reply_id: str, context: Dict[str, str]) -> Optional[str]:
+        """记录一次使用并返回替换变量后的内容，模板不存在时返回None"""
+        reply = self.templates.get(reply_id)
+        if reply is None:
+            return None
+        usage = self.usage.setdefault(reply_id, [0, 0.0])
+        usage[0] += 1
+        usage[1] = time.time()
+        self._usage_dirty = True
+        for scope in template_scopes(reply):
+            index = self._indexes.get(scope)
+            if index is not None:
+                index.touch(reply_id)
+        return expand(reply.content, context)
+
+
+def run_benchmark(templates: int = 50000, seed: int = 1):
+    """模拟逐字输入“/”查询，统计每次按键的检索耗时，并与逐个比较的结果核对"""
+    import tracemalloc
+    from .stub_server import _WORDS
+
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    platforms = ["pdd", "doudian", "kuaishou", "jd"]
+    shops = [f"{i:032x}" for i in range(200)]
+    replies = []
+    for i in range(templates):
+        scope = rng.random()
+        replies.append(QuickReply(
+            reply_id=f"r{i}",
+            shortcut="".join(rng.choice(letters) for _ in range(rng.randint(2, 5))),
+            title="".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 3))),
+            content=f"亲，{{买家}}您好，您的订单{{订单号}}已由{{店铺}}安排发货（模板{i}）",
+            platforms=[rng.choice(platforms)] if scope < 0.3 else [],
+            shops=[rng.choice(shops)] if scope > 0.8 else [],
+        ))
+
+    import gc
+    import tempfile
+    store = QuickReplyStore(Path(tempfile.mkdtemp()))
+    for reply in replies:
+        store.usage[reply.reply_id] = [rng.choice([0] * 5 + list(range(1, 50))), rng.random()]
+    # 先在 tracemalloc 下建一次索引统计内存，再单独计时
+    tracemalloc.start()
+    store.set_templates(replies)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    store.set_templates([])
+    gc.collect()
+    store.set_templates(replies)
+    gc.collect()
+
+    def brute_force(query: str, platform: str, webview_id: str, limit: int) -> List[str]:
+        query = _normalize(query)
+        matched = [reply.reply_id for reply in replies
+                   if any(key.startswith(query) for key in template_keys(reply))
+                   and any(scope in (("", ""), (platform, ""), ("", webview_id)) for scope in template_scopes(reply))]
+        return [store.rank(reply_id) for reply_id in heapq.nlargest(limit, matched, key=store.rank)]
+
+    timings: List[float] = []
+    use_timings: List[float] = []
+    mismatches = 0
+    for round_index in range(200):
+        target = rng.choice(replies)
+        platform = target.platforms[0] if target.platforms else rng.choice(platforms)
+        webview_id = target.shops[0] if target.shops else rng.choice(shops)
+        query = rng.choice([target.shortcut, target.title, initials(target.title)])
+        for end in range(0, len(query) + 1):
+            start = time.perf_counter()
+            result = store.search(query[:end], platform, webview_id)
+            timings.append(time.perf_counter() - start)
+            if round_index % 20 == 0 and end:
+                if [store.rank(reply.reply_id) for reply in result] != brute_force(query[:end], platform,
+                                                                                    webview_id, 10):
+                    mismatches += 1
+        start = time.perf_counter()
+        store.use(target.reply_id, {"买家": "张三", "订单号": "240501-1234", "店铺": "旗舰店"})
+        use_timings.append(time.perf_counter() - start)
+
+    def summary(samples: List[float]) -> str:
+        samples.sort()
+        return (f"平均 {sum(samples) / len(samples) * 1000:.3f} ms，p50 {samples[len(samples) // 2] * 1000:.3f} ms，"
+                f"p99 {samples[int(len(samples) * 0.99)] * 1000:.3f} ms，最大 {samples[-1] * 1000:.3f} ms")
+
+    print(f"{templates} 条模板，建立索引 {store.build_seconds * 1000:.0f} ms，"
+          f"内存峰值 {peak / 1024 / 1024:.1f} MB")
+    print(f"按键检索 {len(timings)} 次，{summary(timings)}")
+    print(f"使用模板 {len(use_timings)} 次，{summary(use_timings)}")
+    print(f"与逐个比较的结果不一致：{mismatches} 次")
+    sample = store.search("", "pdd", shops[0], 1)[0]
+    print(f"示例：{sample.title} -> {expand(sample.content, {'买家': '张三', '订单号': '240501-1234', '店铺': '旗舰店'})}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="快捷回复检索测试")
+    parser.add_argument("--templates", type=int, default=50000)
+    args = parser.parse_args()
+    run_benchmark(args.templates)
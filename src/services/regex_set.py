@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+一组逐项编译的正则，合并表达式只用于预筛
+
+把多个正则合并为一个 a|b|c 表达式时，每个位置只会报告第一个命中的分支，
+重叠的正则会互相遮住；含命名分组或反向引用的正则合并后还会编译失败或含义改变。
+这里每个正则单独编译、单独匹配，合并表达式只用来快速判断一段文本是否可能命中：
+合并表达式没有匹配时跳过逐项检查
+"""
+
+import re
+from typing import Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 含反向引用或命名分组的正则合并后分组编号会变化，不参与预筛，每次都逐项检查
+_UNMERGEABLE = re.compile(r"\\[1-9]|\(\?P[<=]")
+
+
+class RegexSet(Generic[T]):
+    """逐项编译的正则及其对应的值，编译完成后不再修改，可在多个线程中同时使用"""
+
+    def __init__(self, flags: int = 0):
+        self.flags = flags
+        self.items: List[Tuple[re.Pattern, T]] = []
+        self._always: List[Tuple[re.Pattern, T]] = []
+        self._merged: List[str] = []
+        self._prefilter: Optional[re.Pattern] = None
+
+    def add(self, pattern: str, value: T):
+        """加入一个正则，无效时抛出 re.error，由调用方记录并跳过"""
+        compiled = re.compile(pattern, self.flags)
+        self.items.append((compiled, value))
+        mergeable = not compiled.groupindex and not _UNMERGEABLE.search(pattern)
+        if mergeable:
+            try:
+                # 合并后位于分组内，不能使用全局标志
+                re.compile(f"(?:{pattern})")
+            except re.error:
+                mergeable = False
+        if mergeable:
+            self._merged.append(f"(?:{pattern})")
+        else:
+            self._always.append((compiled, value))
+
+    def extend(self, other: "RegexSet[T]"):
+        """加入另一组中的全部正则"""
+        self.items.extend(other.items)
+        self._always.extend(other._always)
+        self._merged.extend(other._merged)
+
+    def build(self):
+        """全部加入后编译预筛表达式"""
+        self._prefilter = None
+        if self._merged:
+            try:
+                self._prefilter = re.compile("|".join(self._merged), self.flags)
+            except re.error:
+                # 个别写法单独可以编译、合并后不行，此时逐项检查
+                self._always = list(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def candidates(self, text: str) -> List[Tuple[re.Pattern, T]]:
+        """可能在文本中命中的正则"""
+        if self._prefilter is None or len(self._always) == len(self.items):
+            return self.items
+        if self._prefilter.search(text) is None:
+            return self._always
+        return self.items
+
+    def matches(self, text: str) -> List[Tuple[re.Match, T]]:
+        """全部命中，包括重叠的命中；空串命中不计"""
+        result = []
+        for pattern, value in self.candidates(text):
+            for match in pattern.finditer(text):
+                if match.end() > match.start():
+                    result.append((match, value))
+        return result
+
+    def values(self, text: str) -> List[T]:
+        """在文本中有命中的正则对应的值"""
+        return [value for pattern, value in self.candidates(text) if pattern.search(text)]
@@ -0,0 +1,590 @@
+# -*- coding: utf-8 -*-
+"""
+回复时效统计
+
+从聊天消息和未读数变化中流式统计三项指标：
+    - first_response：会话开始（买家首条消息）到客服首次回复的时间
+    - response：客服每次回复距最早一条未回复买家消息的时间
+    - unread_clear：店铺出现未读消息到未读数清零的时间（只能实时统计）
+每项指标按全部、平台、店铺（mall_id）、客服账号（webview_id）分别统计。每个序列
+由一个总体的 t-digest 分位数草图，加上最近若干小时、若干天的按时间分桶的草图组成，
+草图的质心数有上限，因此每个序列占用的内存是常量，与消息数量无关。
+
+状态保存在 data/analytics/response_times.json，程序启动时只补算上次保存之后的消息；
+也可以对 MessageStore 中的全部历史单遍重新统计。
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..db.entities import ChatMessage
+from ..db.message_store import MessageStore
+from ..db.shop_manager import ShopManager
+
+logger = logging.getLogger(__name__)
+
+METRIC_NAMES = {
+    "first_response": "首次响应",
+    "response": "平均响应",
+    "unread_clear": "未读清零",
+}
+DIMENSION_NAMES = {
+    "all": "全部",
+    "platform": "平台",
+    "shop": "店铺",
+    "agent": "客服",
+}
+# 只能从实时事件得到、无法从历史消息重新统计的指标
+LIVE_ONLY_METRICS = ("unread_clear",)
+
+# 默认统计配置，可通过 config.json 中的 "response_analytics" 覆盖
+DEFAULT_ANALYTICS_CONFIG = {
+    "session_gap": 1800,         # 买家与客服都无消息超过该时长(秒)后视为新会话
+    "hours": 48,                 # 保留最近多少小时的分桶
+    "days": 30,                  # 保留最近多少天的分桶
+    "compression": 100,          # 总体草图的压缩参数，越大越精确
+    "bucket_compression": 30,    # 分桶草图的压缩参数
+    "save_interval": 600,        # 定期保存间隔(秒)
+}
+
+# 最近一次查询的 (时段序号, 本地时区偏移)，偏移只在整刻钟切换，同一时段内复用
+_OFFSET_SLOT = 900
+_offset_cache: Tuple[int, int] = (-1, 0)
+
+
+def local_offset(timestamp: float) -> int:
+    """该时刻本地时区相对UTC的偏移(秒)，按时刻计算，夏令时切换前后分小时、分天都正确"""
+    global _offset_cache
+    slot = int(timestamp // _OFFSET_SLOT)
+    cached_slot, offset = _offset_cache
+    if slot != cached_slot:
+        offset = time.localtime(timestamp).tm_gmtoff
+        _offset_cache = (slot, offset)
+    return offset
+
+
+def hour_index(timestamp: float) -> int:
+    return int((timestamp + local_offset(timestamp)) // 3600)
+
+
+def day_index(timestamp: float) -> int:
+    return int((timestamp + local_offset(timestamp)) // 86400)
+
+
+def day_start(index: int) -> float:
+    """本地日期序号对应的当天零点时间戳"""
+    midnight = index * 86400
+    return midnight - local_offset(midnight - local_offset(midnight))
+
+
+class TDigest:
+    """合并式 t-digest（k1 尺度函数），质心数约为 compression 的常数倍"""
+    __slots__ = ("compression", "means", "weights", "count", "total", "min", "max", "_buffer")
+
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.count = 0.0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[Tuple[float, float]] = []
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.total += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= self.compression * 2:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        """合并另一个草图"""
+        other._compress()
+        self._buffer.extend(zip(other.means, other.weights))
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+        scale = self.compression / (2 * math.pi)
+
+        def limit_after(q: float) -> float:
+            # k1(q) = δ/2π·asin(2q-1)，每个质心跨越的 k 不超过1
+            k = scale * math.asin(2 * min(max(q, 0.0), 1.0) - 1) + 1
+            return 1.0 if k >= scale * math.pi / 2 else (math.sin(k / scale) + 1) / 2
+
+        means, weights = [], []
+        mean, weight = items[0]
+        cumulative = 0.0
+        q_limit = limit_after(0.0)
+        for value, w in items[1:]:
+            if (cumulative + weight + w) / total <= q_limit:
+                weight += w
+                mean += (value - mean) * w / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                cumulative += weight
+                q_limit = limit_after(cumulative / total)
+                mean, weight = value, w
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> float:
+        """估计分位数，没有数据时返回 nan"""
+        self._compress()
+        if not self.means:
+            return math.nan
+        if len(self.means) == 1:
+            return self.means[0]
+        target = q * self.count
+        cumulative = 0.0
+        previous_center, previous_mean = 0.0, self.min
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                ratio = (target - previous_center) / span if span > 0 else 0.0
+                return previous_mean + (mean - previous_mean) * ratio
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        span = self.count - previous_center
+        ratio = (target - previous_center) / span if span > 0 else 1.0
+        return previous_mean + (self.max - previous_mean) * min(ratio, 1.0)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def size(self) -> int:
+        """质心数（含未合并的缓冲）"""
+        return len(self.means) + len(self._buffer)
+
+    def to_dict(self) -> Dict:
+        self._compress()
+        return {"c": self.compression, "m": [round(m, 3) for m in self.means], "w": self.weights,
+                "n": self.count, "t": self.total, "lo": self.min, "hi": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TDigest":
+        digest = cls(data["c"])
+        digest.means, digest.weights = data["m"], data["w"]
+        digest.count, digest.total = data["n"], data["t"]
+        digest.min = data["lo"] if data["lo"] is not None else math.inf
+        digest.max = data["hi"] if data["hi"] is not None else -math.inf
+        return digest
+
+
+class Series:
+    """一个统计序列：总体草图 + 最近若干小时、若干天的分桶草图"""
+    __slots__ = ("overall", "hourly", "daily", "_config")
+
+    def __init__(self, config: Dict):
+        self._config = config
+        self.overall = TDigest(config["compression"])
+        self.hourly: Dict[int, TDigest] = {}
+        self.daily: Dict[int, TDigest] = {}
+
+    def add(self, value: float, timestamp: float):
+        self.overall.add(value)
+        self._bucket(self.hourly, hour_index(timestamp), self._config["hours"]).add(value)
+        self._bucket(self.daily, day_index(timestamp), self._config["days"]).add(value)
+
+    def _bucket(self, buckets: Dict[int, TDigest], index: int, keep: int) -> TDigest:
+        digest = buckets.get(index)
+        if digest is None:
+            digest = buckets[index] = TDigest(self._config["bucket_compression"])
+            newest = max(buckets)
+            for old in [i for i in buckets if i <= newest - keep]:
+                del buckets[old]
+        return digest
+
+    def window(self, start_day: Optional[int] = None, end_day: Optional[int] = None) -> TDigest:
+        """合并 [start_day, end_day) 的日分桶；不限范围时返回总体草图"""
+        if start_day is None and end_day is None:
+            return self.overall
+        merged = TDigest(self._config["compression"])
+        for index, digest in self.daily.items():
+            if (start_day is None or index >= start_day) and (end_day is None or index < end_day):
+                merged.merge(digest)
+        return merged
+
+    def to_dict(self) -> Dict:
+        return {"overall": self.overall.to_dict(),
+                "hourly": {str(i): d.to_dict() for i, d in self.hourly.items()},
+                "daily": {str(i): d.to_dict() for i, d in self.daily.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict, config: Dict) -> "Series":
+        series = cls(config)
+        series.overall = TDigest.from_dict(data["overall"])
+        series.hourly = {int(i): TDigest.from_dict(d) for i, d in data["hourly"].items()}
+        series.daily = {int(i): TDigest.from_dict(d) for i, d in data["daily"].items()}
+        return series
+
+
+@dataclass
+class _Conversation:
+    """进行中的会话"""
+    session_start: float
+    last_at: float
+    unanswered_since: Optional[float] = None
+    answered: bool = False
+
+
+@dataclass
+class SummaryRow:
+    """报表中的一行"""
+    key: str
+    count: int
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+
+
+SeriesKey = Tuple[str, str, str]  # (指标, 维度, 键)
+
+
+class ResponseAnalytics:
+    """回复时效流式统计，可在事件总线的后台线程中调用"""
+
+    def __init__(self, shop_of: Callable[[str, str], str] = None, config: Dict = None):
+        """shop_of(platform, webview_id) 返回客服账号所属店铺的标识，默认与 webview_id 相同"""
+        self.config = dict(DEFAULT_ANALYTICS_CONFIG)
+        self.config.update(config or {})
+        self.shop_of = shop_of or (lambda platform, webview_id: webview_id)
+        self.series: Dict[SeriesKey, Series] = {}
+        self.processed = 0
+        self.last_timestamp = 0.0
+        self._conversations: Dict[Tuple[str, str], _Conversation] = {}
+        self._unread_since: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.RLock()
+        # 补算历史期间暂存的实时消息
+        self._catching_up = False
+        self._held: List[ChatMessage] = []
+
+    def _record(self, metric: str, platform: str, webview_id: str, value: float, timestamp: float):
+        for dimension, key in (("all", ""), ("platform", platform),
+                               ("shop", self.shop_of(platform, webview_id)), ("agent", webview_id)):
+            series = self.series.get((metric, dimension, key))
+            if series is None:
+                series = self.series[(metric, dimension, key)] = Series(self.config)
+            series.add(value, timestamp)
+
+    def add_message(self, message: ChatMessage):
+        """处理一条聊天消息"""
+        with self._lock:
+            if self._catching_up:
+                if len(self._held) < 100000:
+                    self._held.append(message)
+                return
+            self._add(message)
+
+    def _add(self, message: ChatMessage):
+        if not message.buyer_id:
+            return
+        timestamp = message.timestamp or time.time()
+        key = (message.webview_id, message.buyer_id)
+        conversation = self._conversations.get(key)
+        if message.from_buyer:
+            if conversation is None or timestamp - conversation.last_at > self.config["session_gap"]:
+                conversation = self._conversations[key] = _Conversation(timestamp, timestamp)
+            if conversation.unanswered_since is None:
+                conversation.unanswered_since = timestamp
+            conversation.last_at = max(conversation.last_at, timestamp)
+        elif conversation is not None:
+            if conversation.unanswered_since is not None and timestamp >= conversation.unanswered_since:
+                self._record("response", message.platform, message.webview_id,
+                             timestamp - conversation.unanswered_since, timestamp)
+                if not conversation.answered:
+                    conversation.answered = True
+                    self._record("first_response", message.platform, message.webview_id,
+                                 timestamp - conversation.session_start, timestamp)
+                conversation.unanswered_since = None
+            conversation.last_at = max(conversation.last_at, timestamp)
+
+        self.processed += 1
+        if timestamp > self.last_timestamp:
+            self.last_timestamp = timestamp
+        if self.processed % 10000 == 0:
+            self._expire_conversations()
+
+    def _expire_conversations(self):
+        """移除已结束的会话，使会话表只包含最近活跃的会话"""
+        cutoff = self.last_timestamp - self.config["session_gap"]
+        for key in [k for k, c in self._conversations.items() if c.last_at < cutoff]:
+            del self._conversations[key]
+
+    def add_unread(self, platform: str, webview_id: str, count: int, timestamp: float = None):
+        """处理未读数变化"""
+        timestamp = timestamp or time.time()
+        key = (platform, webview_id)
+        with self._lock:
+            since = self._unread_since.get(key)
+            if count > 0 and since is None:
+                self._unread_since[key] = timestamp
+            elif count <= 0 and since is not None:
+                del self._unread_since[key]
+                self._record("unread_clear", platform, webview_id, timestamp - since, timestamp)
+
+    def process_stream(self, messages: Iterable[ChatMessage], progress_every: int = 0) -> int:
+        """逐条处理消息流，返回处理的条数"""
+        count = 0
+        begin = time.perf_counter()
+        with self._lock:
+            for message in messages:
+                self._add(message)
+                count += 1
+                if progress_every and count % progress_every == 0:
+                    print(f"已处理 {count} 条消息，{count / (time.perf_counter() - begin):.0f} 条/秒")
+        return count
+
+    def hold_live(self):
+        """开始暂存实时消息，直到 catch_up 完成；应在订阅实时事件之前或同时调用"""
+        with self._lock:
+            self._catching_up = True
+
+    def catch_up(self, store: MessageStore):
+        """补算上次保存之后写入消息存储的消息；期间收到的实时消息暂存，补算后处理较新的部分"""
+        with self._lock:
+            self._catching_up = True
+            start = self.last_timestamp or None
+        count = 0
+        try:
+            messages = store.iter_messages(start=start)
+            if start is not None:
+                messages = (m for m in messages if m.timestamp > start)
+            for message in messages:
+                with self._lock:
+                    self._add(message)
+                count += 1
+        except Exception:
+            logger.exception("补算回复时效统计失败，已补算 %s 条", count)
+        finally:
+            # 补算失败也要恢复实时统计，否则之后的消息都只会被暂存
+            with self._lock:
+                watermark = self.last_timestamp
+                for message in self._held:
+                    if (message.timestamp or time.time()) > watermark:
+                        self._add(message)
+                self._held = []
+                self._catching_up = False
+        return count
+
+    def adopt_live_series(self, other: "ResponseAnalytics"):
+        """重新统计后，保留只能实时统计的指标"""
+        with self._lock, other._lock:
+            for key, series in other.series.items():
+                if key[0] in LIVE_ONLY_METRICS:
+                    self.series[key] = series
+            self._unread_since = dict(other._unread_since)
+
+    def summary(self, metric: str, dimension: str, start_day: Optional[int] = None,
+                end_day: Optional[int] = None) -> List[SummaryRow]:
+        """某一指标按维度汇总，按次数降序；时间范围为 [start_day, end_day) 的本地日期序号"""
+        rows = []
+        with self._lock:
+            for (series_metric, series_dimension, key), series in self.series.items():
+                if series_metric != metric or series_dimension != dimension:
+                    continue
+                digest = series.window(start_day, end_day)
+                if digest.count:
+                    rows.append(SummaryRow(key, int(digest.count), digest.mean, digest.quantile(0.5),
+                                           digest.quantile(0.9), digest.quantile(0.99)))
+        rows.sort(key=lambda row: -row.count)
+        return rows
+
+    def hourly(self, metric: str, dimension: str, key: str, day: int) -> List[Optional[SummaryRow]]:
+        """某个序列在某天（本地日期序号）每小时的统计，没有数据的小时为None"""
+        with self._lock:
+            series = self.series.get((metric, dimension, key))
+            rows: List[Optional[SummaryRow]] = []
+            for hour in range(24):
+                digest = series.hourly.get(day * 24 + hour) if series else None
+                if digest is None or not digest.count:
+                    rows.append(None)
+                    continue
+                rows.append(SummaryRow(f"{hour:02d}:00", int(digest.count), digest.mean, digest.quantile(0.5),
+                                       digest.quantile(0.9), digest.quantile(0.99)))
+            return rows
+
+    def centroid_count(self) -> int:
+        """所有草图的质心总数，用于观察内存占用"""
+        with self._lock:
+            return sum(s.overall.size + sum(d.size for d in s.hourly.values()) + sum(d.size for d in s.daily.values())
+                       for s in self.series.values())
+
+    def save(self, path: Path):
+        """保存状态，供下次启动时继续统计"""
+        with self._lock:
+            state = {
+                "processed": self.processed,
+                "last_timestamp": self.last_timestamp,
+                "series": [[list(key), series.to_dict()] for key, series in self.series.items()],
+                "conversations": [[list(key), c.session_start, c.last_at, c.unanswered_since, c.answered]
+                                  for key, c in self._conversations.items()],
+                "unread_since": [[list(key), since] for key, since in self._unread_since.items()],
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, shop_of: Callable[[str, str], str] = None,
+             config: Dict = None) -> "ResponseAnalytics":
+        """加载已保存的状态，文件不存在或损坏时返回空统计"""
+        analytics = cls(shop_of, config)
+        if not path.exists():
+            return analytics
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            analytics.processed = state["processed"]
+            analytics.last_timestamp = state["last_timestamp"]
+            analytics.series = {tuple(key): Series.from_dict(data, analytics.config)
+                                for key, data in state["series"]}
+            analytics._conversations = {tuple(key): _Conversation(start, last, unanswered, answered)
+                                        for key, start, last, unanswered, answered in state["conversations"]}
+            analytics._unread_since = {tuple(key): since for key, since in state["unread_since"]}
+        except Exception as e:
+            logger.error("加载回复时效统计失败: %s", e)
+            return cls(shop_of, config)
+        return analytics
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds != seconds:  # nan
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.0f}秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}分"
+    return f"{seconds / 3600:.1f}时"
+
+
+def rebuild(data_dir: Path, state_file: Path = None, shop_of: Callable[[str, str], str] = None,
+            config: Dict = None, progress_every: int = 100000) -> ResponseAnalytics:
+    """单遍扫描全部历史消息重新统计"""
+    state_file = state_file or data_dir / "analytics" / "response_times.json"
+    previous = ResponseAnalytics.load(state_file, shop_of, config)
+    analytics = ResponseAnalytics(shop_of, config)
+    begin = time.perf_counter()
+    count = analytics.process_stream(MessageStore(data_dir).iter_messages(), progress_every)
+    elapsed = time.perf_counter() - begin
+    print(f"重新统计 {count} 条消息，耗时 {elapsed:.1f} 秒，共 {len(analytics.series)} 个序列、"
+          f"{analytics.centroid_count()} 个质心")
+    analytics.adopt_live_series(previous)
+    analytics.save(state_file)
+    return analytics
+
+
+def run_benchmark(messages: int = 1000000, shops: int = 50, seed: int = 1):
+    """生成模拟会话消息，测试单遍统计的吞吐量、内存上限和分位数误差"""
+    rng = random.Random(seed)
+    platforms = ["pdd", "doudian", "kuaishou", "jd"]
+    agents = [(platforms[i % len(platforms)], f"agent{i:03d}") for i in range(shops)]
+    exact: List[float] = []
+
+    def generate():
+        # 买家消息按泊松过程到达，多数在对数正态分布的延迟后得到回复
+        now = time.time() - 7 * 86400
+        replies: List[Tuple[float, int, str, str, str]] = []
+        for i in range(messages):
+            if replies and replies[0][0] <= now + 0.5:
+                due, _, platform, agent, buyer = heapq.heappop(replies)
+                now = max(now, due)
+                yield ChatMessage(platform, agent, buyer, "", "您好", f"m{i}", now, from_buyer=False)
+                continue
+            now += rng.expovariate(2.0)
+            platform, agent = rng.choice(agents)
+            buyer = f"buyer{rng.randrange(200)}"
+            if rng.random() < 0.9:
+                heapq.heappush(replies, (now + rng.lognormvariate(3.5, 1.0), i, platform, agent, buyer))
+            yield ChatMessage(platform, agent, buyer, "", "在吗", f"m{i}", now, from_buyer=True)
+
+    analytics = ResponseAnalytics(shop_of=lambda platform, webview_id: f"shop-{webview_id[-1]}")
+    original_record = analytics._record
+
+    def record(metric, platform, webview_id, value, timestamp):
+        if metric == "response":
+            exact.append(value)
+        original_record(metric, platform, webview_id, value, timestamp)
+
+    analytics._record = record
+    begin = time.perf_counter()
+    count = analytics.process_stream(generate())
+    elapsed = time.perf_counter() - begin
+
+    exact.sort()
+    digest = analytics.series[("response", "all", "")].overall
+    print(f"{count} 条消息，{len(exact)} 次回复，耗时 {elapsed:.1f} 秒（{count / elapsed:.0f} 条/秒，含生成模拟数据）")
+    print(f"{len(analytics.series)} 个序列，{analytics.centroid_count()} 个质心，"
+          f"进行中的会话 {len(analytics._conversations)} 个")
+    for q in (0.5, 0.9, 0.99):
+        true_value = exact[min(int(q * len(exact)), len(exact) - 1)]
+        estimate = digest.quantile(q)
+        print(f"  p{int(q * 100)}: 精确 {true_value:.1f} 秒，估计 {estimate:.1f} 秒，"
+              f"误差 {abs(estimate - true_value) / true_value * 100:.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回复时效统计")
+    parser.add_argument("--data-dir", type=Path, default=Path("data"), help="数据目录")
+    parser.add_argument("--rebuild", action="store_true", help="单遍扫描全部历史消息重新统计")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="用N条模拟消息测试统计性能")
+    parser.add_argument("--dimension", default="platform", choices=list(DIMENSION_NAMES), help="报表维度")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+    state_file = args.data_dir / "analytics" / "response_times.json"
+    shop_manager = ShopManager(args.data_dir)
+
+    def shop_of(platform: str, webview_id: str) -> str:
+        shop = shop_manager.find_shop(platform, webview_id)
+        return (shop.mall_id if shop else "") or webview_id
+
+    if args.rebuild:
+        analytics = rebuild(args.data_dir, state_file, shop_of)
+    else:
+        analytics = ResponseAnalytics.load(state_file, shop_of)
+    today = day_index(time.time())
+    for metric, metric_name in METRIC_NAMES.items():
+        print(f"{metric_name}（今天 / 全部）:")
+        for label, start_day, end_day in (("今天", today, today + 1), ("全部", None, None)):
+            for row in analytics.summary(metric, args.dimension, start_day, end_day):
+                print(f"  [{label}] {row.key or '全部'}: {row.count} 次，平均 {format_seconds(row.mean)}，"
+                      f"p50 {format_seconds(row.p50)}，p90 {format_seconds(row.p90)}，"
+                      f"p99 {format_seconds(row.p99)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+消息发送队列
+
+每个店铺一个发送队列，按平台的限流规则（令牌桶）出队，同一店铺同一时刻
+可发送的消息合并为一次 runJavaScript 调用。页面逐条回执后结束发送，
+失败或超时按指数退避重试，重试的请求不会被之后提交的请求越过。发送请求带
+幂等键，重复提交或重试都不会重复发送。店铺页面关闭或长时间未就绪时，
+队列中的请求直接失败。
+"""
+
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# 各平台默认限流：每秒发送条数、突发容量
+DEFAULT_RATE_LIMITS = {
+    "pdd": {"rate": 1.0, "burst": 3},
+    "doudian": {"rate": 1.0, "burst": 3},
+    "kuaishou": {"rate": 0.5, "burst": 2},
+    "jd": {"rate": 1.0, "burst": 3},
+}
+FALLBACK_RATE_LIMIT = {"rate": 0.5, "burst": 1}
+
+# 调度间隔(毫秒)
+TICK_INTERVAL = 100
+# 单条消息的回执超时(秒)，须长于页面发送一条消息最长的等待
+# （上传图片/视频时等待文件框5秒、准备文件5秒、等待发送按钮30秒），否则慢速上传会被重复发送
+ACK_TIMEOUT = 60.0
+# 店铺页面未就绪时，请求在队列中最多等待的时间(秒)
+QUEUE_TIMEOUT = 300.0
+# 重试次数与退避
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+# 单次批量发送的最大条数
+MAX_BATCH_SIZE = 10
+# 已完成请求的幂等记录保留数量
+IDEMPOTENCY_CACHE_SIZE = 5000
+
+
+class TokenBucket:
+    """令牌桶限流"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        # 调用方传入的时间可能早于创建令牌桶的时间，此时不补充也不扣减
+        if now <= self.updated_at:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self, now: float = None) -> int:
+        self._refill(time.monotonic() if now is None else now)
+        return int(self.tokens)
+
+    def take(self, count: int = 1, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens < count:
+            return False
+        self.tokens -= count
+        return True
+
+
+class SendTicket(QObject):
+    """发送凭据，发送完成或最终失败时发出信号"""
+
+    delivered = pyqtSignal(str)  # 请求ID
+    failed = pyqtSignal(str, str)  # 请求ID, 错误信息
+
+    def __init__(self, request_id: str, parent=None):
+        super().__init__(parent)
+        self.request_id = request_id
+        self.done = False
+        self.ok = False
+        self.error = ""
+        self.result: Dict = {}  # 页面回执的完整内容
+
+    def _resolve(self, ok: bool, error: str = "", result: Dict = None):
+        if self.done:
+            return
+        self.done = True
+        self.ok = ok
+        self.error = error
+        self.result = result or {}
+        if ok:
+            self.delivered.emit(self.request_id)
+        else:
+            self.failed.emit(self.request_id, error)
+
+
+@dataclass
+class SendRequest:
+    """发送请求"""
+    request_id: str
+    platform: str
+    webview_id: str
+    payload: Dict
+    ticket: SendTicket
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+    ack_deadline: float = 0.0
+    created_at: float = field(default_factory=time.monotonic)
+    seq: int = 0  # 提交顺序，重试时按此放回队列
+
+
+class OutboundSendQueue(QObject):
+    """按店铺限流的消息发送队列"""
+
+    # 信号
+    message_delivered = pyqtSignal(str, str, str)  # 平台名, webview_id, 请求ID
+    message_failed = pyqtSignal(str, str, str, str)  # 平台名, webview_id, 请求ID, 错误信息
+
+    def __init__(self, resolve_webview: Callable[[str, str], object], rate_limits: Dict = None, parent=None):
+        super().__init__(parent)
+
+        self._resolve_webview = resolve_webview
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS)
+        self.rate_limits.update(rate_limits or {})
+
+        self._queues: Dict[str, Deque[SendRequest]] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._in_flight: Dict[str, SendRequest] = {}
+        self._pending_keys: Dict[str, SendRequest] = {}
+        self._completed: "OrderedDict[str, SendTicket]" = OrderedDict()
+        self._seq = itertools.count()
+        # 发送前检查文字消息，返回非空的拒绝原因时不发送，例如违禁词检查
+        self.text_filter: Optional[Callable[[str, str], str]] = None
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+        self._timer.start(TICK_INTERVAL)
+
+    def set_rate_limits(self, rate_limits: Dict):
+        """修改各平台发送频率，令牌桶按新参数重新创建"""
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS)
+        self.rate_limits.update(rate_limits or {})
+        self._buckets.clear()
+
+    def send_text(self, platform: str, webview_id: str, text: str,
+                  conversation_id: str = "", idempotency_key: str = None) -> SendTicket:
+        """提交文字消息发送请求"""
+        return self.submit(platform, webview_id, {"kind": "text", "text": text, "conversationId": conversation_id},
+                           idempotency_key)
+
+    def submit(self, platform: str, webview_id: str, payload: Dict, idempotency_key: str = None) -> SendTicket:
+        """提交发送请求，相同幂等键的请求只发送一次并返回同一凭据"""
+        request_id = idempotency_key or uuid.uuid4().hex
+        if request_id in self._pending_keys:
+            return self._pending_keys[request_id].ticket
+        if request_id in self._completed:
+            return self._completed[request_id]
+
+        request = SendRequest(
+            request_id=request_id,
+            platform=platform,
+            webview_id=webview_id,
+            payload=payload,
+            ticket=SendTicket(request_id, self),
+            seq=next(self._seq)
+        )
+        self._pending_keys[request_id] = request
+        reason = ""
+        if self.text_filter is not None and payload.get("kind") == "text":
+            reason = self.text_filter(platform, payload.get("text", ""))
+        if reason:
+            # 不重试；在下一轮事件循环中结束，调用方可以先连接凭据的信号
+            request.attempts = MAX_ATTEMPTS
+            QTimer.singleShot(0, lambda: self._handle_result(request, False, reason))
+            return request.ticket
+        self._queues.setdefault(webview_id, deque()).append(request)
+        return request.ticket
+
+    def pending_count(self, webview_id: str = None) -> int:
+        """待发送和等待回执的请求数"""
+        if webview_id is None:
+            return len(self._pending_keys)
+        return sum(1 for r in self._pending_keys.values() if r.webview_id == webview_id)
+
+    def _bucket(self, platform: str, webview_id: str) -> TokenBucket:
+        bucket = self._buckets.get(webview_id)
+        if bucket is None:
+            limit = self.rate_limits.get(platform, FALLBACK_RATE_LIMIT)
+            bucket = TokenBucket(limit["rate"], limit["burst"])
+            self._buckets[webview_id] = bucket
+        return bucket
+
+    def _tick(self):
+        """出队发送并检查回执超时"""
+        now = time.monotonic()
+
+        for request in [r for r in self._in_flight.values() if now > r.ack_deadline]:
+            self._handle_result(request, False, "等待回执超时")
+
+        # 失败回调中可能提交新请求，遍历副本
+        for webview_id, queue in list(self._queues.items()):
+            if not queue:
+                continue
+            webview = self._resolve_webview(queue[0].platform, webview_id)
+            if webview is None:
+                # 重建页面时新页面立即替换旧页面，取不到说明店铺页面已关闭
+                self._fail_queued(queue, "店铺页面已关闭")
+                continue
+            if not webview.is_ready:
+                self._fail_queued(queue, "等待店铺页面就绪超时", now - QUEUE_TIMEOUT)
+                continue
+
+            bucket = self._bucket(queue[0].platform, webview_id)
+            batch: List[SendRequest] = []
+            while queue and len(batch) < MAX_BATCH_SIZE and bucket.available(now) > len(batch):
+                if queue[0].next_attempt_at > now:
+                    # 队首的请求在退避中，之后的请求不越过它，保持发送顺序
+                    break
+                batch.append(queue.popleft())
+
+            if not batch:
+                continue
+            bucket.take(len(batch), now)
+            items = []
+            # 页面逐条发送，后面的消息要等前面的发送完，回执期限逐条累加
+            ack_deadline = now
+            for request in batch:
+                request.attempts += 1
+                ack_deadline += max(ACK_TIMEOUT, request.payload.get("ackTimeout", 0))
+                request.ack_deadline = ack_deadline
+                self._in_flight[request.request_id] = request
+                items.append(dict(request.payload, id=request.request_id))
+            webview.send_batch(items)
+
+    def _requeue(self, request: SendRequest):
+        """把重试的请求按提交顺序放回队列；同一批中先后失败的请求也保持原来的顺序"""
+        queue = self._queues.setdefault(request.webview_id, deque())
+        index = 0
+        for index, queued in enumerate(queue):
+            if queued.seq > request.seq:
+                break
+        else:
+            index = len(queue)
+        queue.insert(index, request)
+
+    def _fail_queued(self, queue: Deque[SendRequest], error: str, created_before: float = None):
+        """不再重试，结束队列中的请求；给出 created_before 时只结束在此之前提交的请求"""
+        if created_before is None:
+            failed = list(queue)
+            queue.clear()
+        else:
+            failed = [request for request in queue if request.created_at < created_before]
+            if not failed:
+                return
+            for request in failed:
+                queue.remove(request)
+        for request in failed:
+            request.attempts = MAX_ATTEMPTS
+            self._handle_result(request, False, error)
+
+    def on_ack(self, webview_id: str, ack: Dict):
+        """处理页面回执"""
+        request = self._in_flight.get(ack.get("id", ""))
+        if request is None or request.webview_id != webview_id:
+            return
+        self._handle_result(request, bool(ack.get("ok")), ack.get("error", ""), ack)
+
+    def _handle_result(self, request: SendRequest, ok: bool, error: str, result: Dict = None):
+        self._in_flight.pop(request.request_id, None)
+
+        if not ok and request.attempts < MAX_ATTEMPTS:
+            delay = min(BACKOFF_BASE * (2 ** (request.attempts - 1)), BACKOFF_MAX)
+            request.next_attempt_at = time.monotonic() + delay
+            logger.warning("发送消息失败(%s)，%.0f 秒后第 %s 次重试", error, delay, request.attempts + 1)
+            self._requeue(request)
+            return
+
+        self._pending_keys.pop(request.request_id, None)
+        self._completed[request.request_id] = request.ticket
+        while len(self._completed) > IDEMPOTENCY_CACHE_SIZE:
+            self._completed.popitem(last=False)
+
+        request.ticket._resolve(ok, error, result)
+        if ok:
+            self.message_delivered.emit(request.platform, request.webview_id, request.request_id)
+        else:
+            logger.error("发送消息最终失败: %s", error)
+            self.message_failed.emit(request.platform, request.webview_id, request.request_id, error)
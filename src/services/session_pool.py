@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+按店铺配置文件复用的HTTP会话池
+
+每个店铺一个 requests.Session，连接池复用，Cookie 与 User-Agent 从
+对应 WebView 的配置文件同步，后台请求和页面处于同一登录状态。
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 单个会话的连接池大小
+POOL_MAXSIZE = 8
+# 请求超时(秒)
+REQUEST_TIMEOUT = 10.0
+
+
+def fill_template(template, values: Dict):
+    """替换请求模板中的 {buyer_id}、{cursor} 等占位符"""
+    if isinstance(template, str):
+        return template.format(**values)
+    if isinstance(template, dict):
+        return {k: fill_template(v, values) for k, v in template.items()}
+    if isinstance(template, list):
+        return [fill_template(v, values) for v in template]
+    return template
+
+
+def get_path(data, path: str):
+    """按 a.b.c 路径取出响应中的字段，不存在时返回None"""
+    for part in filter(None, path.split(".")):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def extract_list(data, path: str) -> List[Dict]:
+    """按路径取出响应中的列表"""
+    value = get_path(data, path)
+    return value if isinstance(value, list) else []
+
+
+def _to_requests_cookie(cookie) -> Dict:
+    """QNetworkCookie 转为 requests 的 Cookie 参数"""
+    domain = cookie.domain()
+    return {
+        "name": bytes(cookie.name()).decode("utf-8", errors="ignore"),
+        "value": bytes(cookie.value()).decode("utf-8", errors="ignore"),
+        "domain": domain,
+        "path": cookie.path() or "/",
+        "secure": cookie.isSecure(),
+    }
+
+
+class SessionPool:
+    """店铺HTTP会话池，线程安全"""
+
+    def __init__(self):
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def get(self, webview_id: str) -> requests.Session:
+        """获取店铺会话，不存在时创建"""
+        with self._lock:
+            session = self._sessions.get(webview_id)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[webview_id] = session
+            return session
+
+    def attach(self, webview):
+        """同步WebView配置文件的Cookie和User-Agent（界面线程调用）"""
+        session = self.get(webview.webview_id)
+        profile = webview.page().profile()
+        session.headers["User-Agent"] = profile.httpUserAgent()
+
+        cookie_store = profile.cookieStore()
+        cookie_store.cookieAdded.connect(lambda cookie, s=session: self._set_cookie(s, cookie))
+        cookie_store.cookieRemoved.connect(lambda cookie, s=session: self._remove_cookie(s, cookie))
+        cookie_store.loadAllCookies()
+
+    def _set_cookie(self, session: requests.Session, cookie):
+        params = _to_requests_cookie(cookie)
+        session.cookies.set(params.pop("name"), params.pop("value"), **params)
+
+    def _remove_cookie(self, session: requests.Session, cookie):
+        params = _to_requests_cookie(cookie)
+        try:
+            session.cookies.clear(params["domain"], params["path"], params["name"])
+        except KeyError:
+            pass
+
+    def release(self, webview_id: str):
+        """关闭店铺会话"""
+        with self._lock:
+            session: Optional[requests.Session] = self._sessions.pop(webview_id, None)
+        if session is not None:
+            session.close()
+
+    def close_all(self):
+        """关闭所有会话"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟平台接口服务器
+
+在后台线程运行，返回固定规则生成的假数据，用于在不登录真实平台的情况下
+测试订单查询、商品同步等后台请求。可配置接口延迟，并统计收到的请求数。
+"""
+
+import bisect
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_orders(buyer_id: str, count: int = 3) -> List[Dict]:
+    """按买家ID生成固定的假订单"""
+    seed = zlib.crc32(buyer_id.encode("utf-8"))
+    statuses = ["待发货", "已发货", "已签收", "退款中"]
+    return [
+        {
+            "order_sn": f"{seed:08x}-{i}",
+            "goods_name": f"测试商品{(seed + i) % 100}",
+            "amount": round(((seed >> i) % 50000) / 100, 2),
+            "status": statuses[(seed + i) % len(statuses)],
+            "created_at": 1700000000 + (seed % 86400) + i * 3600,
+        }
+        for i in range(count)
+    ]
+
+
+_WORDS = ["纯棉", "短袖", "T恤", "男款", "女款", "宽松", "夏季", "连衣裙", "牛仔裤", "运动鞋",
+          "手机壳", "数据线", "充电宝", "蓝牙耳机", "保温杯", "收纳盒", "床上四件套", "枕头", "毛巾", "拖鞋",
+          "儿童", "加厚", "防水", "透气", "韩版", "复古", "黑色", "白色", "大码", "新款"]
+
+
+def fake_product(index: int) -> Dict:
+    """按序号生成固定的假商品"""
+    seed = zlib.crc32(str(index).encode("utf-8"))
+    words = [_WORDS[(seed >> shift) % len(_WORDS)] for shift in (0, 5, 10, 15)]
+    return {
+        "product_id": str(100000 + index),
+        "title": " ".join(dict.fromkeys(words)) + f" {index % 97}号",
+        "sku_code": f"SKU{seed % 1000000:06d}{index:06d}",
+        "price": round((seed % 100000) / 100, 2),
+        "stock": seed % 1000,
+        "status": "on_sale",
+        "image_url": "",
+        "updated_at": 1700000000 + index,
+    }
+
+
+class StubPlatformServer:
+    """模拟平台接口服务器
+
+    GET/POST /orders?buyer_id=xxx  ->  {"result": {"orders": [...]}}
+    GET/POST /products?cursor=&page_size=&updated_since=  ->  {"result": {"goods": [...], "next_cursor": ""}}
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, products: int = 0):
+        self.latency = latency
+        self.products = [fake_product(i) for i in range(products)]
+        self._product_order: List[tuple] = []
+        self._sort_products()
+        self.request_count = 0
+        self.paths: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def order_api(self) -> Dict:
+        """对应本服务器的订单接口配置"""
+        return {
+            "url": f"{self.base_url}/orders",
+            "method": "GET",
+            "params": {"buyer_id": "{buyer_id}"},
+            "items_path": "result.orders",
+        }
+
+    def product_api(self, page_size: int = 100) -> Dict:
+        """对应本服务器的商品接口配置"""
+        return {
+            "url": f"{self.base_url}/products",
+            "method": "GET",
+            "params": {"cursor": "{cursor}", "page_size": "{page_size}", "updated_since": "{updated_since}"},
+            "page_size": page_size,
+            "items_path": "result.goods",
+            "cursor_path": "result.next_cursor",
+        }
+
+    def _sort_products(self):
+        self._product_order = sorted((p["updated_at"], i) for i, p in enumerate(self.products))
+
+    def touch_products(self, indexes: Iterable[int]):
+        """修改商品的更新时间，模拟商品变更"""
+        with self._lock:
+            now = time.time()
+            for index in indexes:
+                self.products[index]["updated_at"] = now
+                self.products[index]["stock"] += 1
+            self._sort_products()
+
+    def _product_page(self, cursor: str, page_size: int, updated_since: float) -> Dict:
+        """按更新时间排序分页，游标为排序后的位置"""
+        with self._lock:
+            start = int(cursor) if cursor else bisect.bisect_left(self._product_order, (updated_since, -1))
+            page = self._product_order[start:start + page_size]
+            end = start + len(page)
+            has_more = end < len(self._product_order)
+            return {"goods": [dict(self.products[i]) for _, i in page],
+                    "next_cursor": str(end) if has_more and page else ""}
+
+    def _record(self, path: str):
+        with self._lock:
+            self.request_count += 1
+            self.paths[path] = self.paths.get(path, 0) + 1
+
+    def handle(self, path: str, query: Dict[str, str], body: Dict) -> Dict:
+        """生成接口响应，返回None表示路径不存在"""
+        if path == "/orders":
+            buyer_id = query.get("buyer_id") or body.get("buyer_id", "")
+            return {"success": True, "result": {"orders": fake_orders(buyer_id)}}
+        if path == "/products":
+            params = dict(body, **query)
+            page = self._product_page(str(params.get("cursor") or ""), int(params.get("page_size") or 100),
+                                      float(params.get("updated_since") or 0))
+            return {"success": True, "result": page}
+        return None
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, body: Dict):
+                url = urlparse(self.path)
+                stub._record(url.path)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                data = stub.handle(url.path, query, body)
+                payload = json.dumps(data if data is not None else {"success": False},
+                                     ensure_ascii=False).encode("utf-8")
+                self.send_response(200 if data is not None else 404)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond({})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                self._respond(body if isinstance(body, dict) else {})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'StubPlatformServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'StubPlatformServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
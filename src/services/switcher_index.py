@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+快速切换索引
+
+为所有店铺（含未登录的已打开标签页）预先建立检索文本和拼音首字母，支持：
+    - 子串匹配：用户名、店铺名
+    - 拼音首字母匹配："zs" 匹配 "张三"
+    - 模糊匹配：按顺序包含查询中的所有字符
+    - 平台和状态关键词：查询中单独的 "pdd"、"抖店"、"未读"、"已打开" 等作为筛选条件
+
+索引为每个字和相邻两字维护包含它的店铺集合，多字查询对相邻两字的集合求交集
+得到子串匹配的候选，连续输入时（新查询以上一次查询开头）只在上一次的候选中继续
+筛选。每个字还维护按 匹配分+加分 排好序的列表（增量更新），单字查询直接取前几名，
+候选较多的多字查询沿首字的列表查找，分数上限低于当前第limit名时即停止。
+"""
+
+import argparse
+import bisect
+import heapq
+import random
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .pinyin import initials
+
+# 平台显示名称
+PLATFORM_NAMES = {
+    "pdd": "拼多多",
+    "doudian": "抖店",
+    "kuaishou": "快手",
+    "jd": "京东",
+}
+# 查询中可作为平台筛选条件的关键词
+PLATFORM_KEYWORDS = {
+    "pdd": "pdd", "拼多多": "pdd",
+    "doudian": "doudian", "抖店": "doudian",
+    "kuaishou": "kuaishou", "ks": "kuaishou", "快手": "kuaishou",
+    "jd": "jd", "京东": "jd",
+}
+UNREAD_KEYWORDS = {"未读", "wd"}
+OPEN_KEYWORDS = {"已打开", "打开", "ydk"}
+# 未读、已打开的排序加分，需小于相邻匹配等级的分差
+UNREAD_BONUS = 5
+OPEN_BONUS = 3
+MAX_BONUS = UNREAD_BONUS + OPEN_BONUS
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+@dataclass
+class SwitcherEntry:
+    """可切换的店铺"""
+    platform: str
+    webview_id: str
+    user_name: str = ""
+    mall_name: str = ""
+    unread: int = 0
+    is_open: bool = False
+
+    @property
+    def title(self) -> str:
+        return self.user_name or self.mall_name or self.webview_id[:8]
+
+    @property
+    def subtitle(self) -> str:
+        parts = [PLATFORM_NAMES.get(self.platform, self.platform)]
+        if self.mall_name and self.mall_name != self.title:
+            parts.append(self.mall_name)
+        if self.unread:
+            parts.append(f"未读 {self.unread}")
+        elif self.is_open:
+            parts.append("已打开")
+        return " · ".join(parts)
+
+
+class _Indexed:
+    """条目的预计算检索数据"""
+    __slots__ = ("num", "entry", "text", "initials", "grams", "bonus")
+
+    def __init__(self, num: int, entry: SwitcherEntry):
+        self.num = num
+        self.entry = entry
+        self.text = "".join(_normalize(f"{entry.user_name} {entry.mall_name}").split())
+        self.initials = initials(self.text)
+        # 单字和相邻两字，分别用于模糊匹配和子串匹配的候选
+        self.grams: FrozenSet[str] = frozenset(
+            gram for source in (self.text, self.initials)
+            for gram in (*source, *(source[i:i + 2] for i in range(len(source) - 1))))
+        self.bonus = (UNREAD_BONUS if entry.unread else 0) + (OPEN_BONUS if entry.is_open else 0)
+
+    def char_score(self, char: str) -> float:
+        """单字查询的匹配分（不含加分），也是以该字开头的查询子串匹配分的上限"""
+        position = self.text.find(char)
+        if position == 0:
+            return 100.0
+        if position > 0:
+            return 80.0 - min(position, 20) * 0.5
+        position = self.initials.find(char)
+        return 70.0 - min(position, 20) * 0.5 if position >= 0 else 0.0
+
+    def rank_key(self, char: str) -> int:
+        """在字符排序列表中的键，升序即按 匹配分+加分 降序"""
+        return ((_KEY_BASE - round((self.char_score(char) + self.bonus) * 2)) << 32) | self.num
+
+    def score(self, query: str) -> float:
+        """子串或首字母匹配分（不含加分），不匹配时返回0"""
+        position = self.text.find(query)
+        if position == 0:
+            return 100.0
+        if position > 0:
+            return 80.0 - min(position, 20) * 0.5
+        position = self.initials.find(query)
+        return 70.0 - min(position, 20) * 0.5 if position >= 0 else 0.0
+
+    def fuzzy_score(self, query: str, pattern) -> float:
+        """按顺序包含查询各字符时的匹配分，字符越集中分越高"""
+        match = pattern.search(self.text)
+        if match:
+            return 40.0 - min(match.end() - match.start() - len(query), 30)
+        match = pattern.search(self.initials)
+        if match:
+            return 20.0 - min(match.end() - match.start() - len(query), 15)
+        return 0.0
+
+
+_KEY_BASE = 1000
+_NUM_MASK = 0xFFFFFFFF
+# 候选不多于此数时直接逐个打分，否则沿首字的排序列表查找并提前结束
+_DIRECT_SCORE_LIMIT = 256
+# 模糊匹配最多检查的条目数（按首字排序列表的顺序）
+_FUZZY_SCAN_LIMIT = 300
+
+
+def _key_upper(key: int) -> float:
+    return (_KEY_BASE - (key >> 32)) / 2
+
+
+class SwitcherIndex:
+    """快速切换索引，增量更新"""
+
+    def __init__(self):
+        self._items: Dict[str, _Indexed] = {}
+        self._by_num: Dict[int, _Indexed] = {}
+        self._next_num = 0
+        # 单字或两字 -> 包含它的条目编号
+        self._postings: Dict[str, Set[int]] = {}
+        # 有加分的条目（未读或已打开），空查询时优先列出
+        self._flagged: Set[int] = set()
+        # 字符 -> 包含该字符的条目按 匹配分+加分 降序排列的键，首次用到时建立，之后增量维护
+        self._char_ranked: Dict[str, List[int]] = {}
+        # 上一次查询的文本与子串匹配候选
+        self._last_text = ""
+        self._last_candidates: Optional[Set[int]] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, webview_id: str) -> Optional[SwitcherEntry]:
+        item = self._items.get(webview_id)
+        return item.entry if item else None
+
+    def upsert(self, entry: SwitcherEntry):
+        """新增或更新条目"""
+        old = self._items.get(entry.webview_id)
+        item = _Indexed(old.num if old else self._next_num, entry)
+        if old is None:
+            self._next_num += 1
+        self._items[entry.webview_id] = item
+        self._by_num[item.num] = item
+
+        if old is None or old.text != item.text:
+            old_grams = old.grams if old else frozenset()
+            for gram in old_grams - item.grams:
+                self._postings[gram].discard(item.num)
+            for gram in item.grams - old_grams:
+                self._postings.setdefault(gram, set()).add(item.num)
+            self._last_candidates = None
+        if old is None or old.text != item.text or old.bonus != item.bonus:
+            self._update_ranked(old, item)
+
+        if item.bonus:
+            self._flagged.add(item.num)
+        else:
+            self._flagged.discard(item.num)
+
+    def remove(self, webview_id: str):
+        item = self._items.pop(webview_id, None)
+        if item is None:
+            return
+        del self._by_num[item.num]
+        for gram in item.grams:
+            self._postings[gram].discard(item.num)
+        self._update_ranked(item, None)
+        self._flagged.discard(item.num)
+        self._last_candidates = None
+
+    def warm(self):
+        """预先建立所有字符的排序列表，避免首次输入某个字时排序"""
+        for gram in list(self._postings):
+            if len(gram) == 1:
+                self._ranked(gram)
+
+    def _ranked(self, char: str) -> List[int]:
+        ranked = self._char_ranked.get(char)
+        if ranked is None:
+            by_num = self._by_num
+            ranked = sorted(by_num[num].rank_key(char) for num in self._postings.get(char, ()))
+            self._char_ranked[char] = ranked
+        return ranked
+
+    def _update_ranked(self, old: Optional[_Indexed], new: Optional[_Indexed]):
+        old_grams = old.grams if old else frozenset()
+        new_grams = new.grams if new else frozenset()
+        for char in old_grams | new_grams:
+            ranked = self._char_ranked.get(char)
+            if ranked is None:
+                continue
+            if char in old_grams:
+                key = old.rank_key(char)
+                i = bisect.bisect_left(ranked, key)
+                if i < len(ranked) and ranked[i] == key:
+                    del ranked[i]
+            if char in new_grams:
+                bisect.insort(ranked, new.rank_key(char))
+
+    def _intersect(self, grams, candidates: Optional[Set[int]] = None) -> Set[int]:
+        for gram in sorted(grams, key=lambda g: len(self._postings.get(g, ()))):
+            posting = self._postings.get(gram, set())
+            candidates = posting.copy() if candidates is None else candidates & posting
+            if not candidates:
+                break
+        return candidates if candidates is not None else set()
+
+    def _parse(self, query: str) -> Tuple[str, Optional[str], bool, bool]:
+        """拆出平台和状态关键词，返回 (检索文本, 平台, 仅未读, 仅已打开)"""
+        platform, unread_only, open_only = None, False, False
+        rest = []
+        for token in _normalize(query).split():
+            if token in PLATFORM_KEYWORDS:
+                platform = PLATFORM_KEYWORDS[token]
+            elif token in UNREAD_KEYWORDS:
+                unread_only = True
+            elif token in OPEN_KEYWORDS:
+                open_only = True
+            else:
+                rest.append(token)
+        return "".join(rest), platform, unread_only, open_only
+
+    def search(self, query: str, limit: int = 20) -> List[SwitcherEntry]:
+        """按 匹配分+加分 降序返回前limit个条目"""
+        text, platform, unread_only, open_only = self._parse(query)
+
+        def accept(item: _Indexed) -> bool:
+            return ((platform is None or item.entry.platform == platform)
+                    and (not unread_only or item.entry.unread > 0)
+                    and (not open_only or item.entry.is_open))
+
+        if not text:
+            return self._rank_without_text(limit, accept)
+        ranked = self._ranked(text[0])
+        if len(text) == 1:
+            self._last_text, self._last_candidates = text, None
+            result = []
+            for key in ranked:
+                item = self._by_num[key & _NUM_MASK]
+                if accept(item):
+                    result.append(item.entry)
+                    if len(result) >= limit:
+                        break
+            return result
+
+        # 子串匹配的候选：包含查询中所有相邻两字的条目，连续输入时在上一次的候选中继续筛选
+        if self._last_candidates is not None and len(self._last_text) >= 2 and text.startswith(self._last_text):
+            start = len(self._last_text) - 1
+            candidates = self._intersect({text[i:i + 2] for i in range(start, len(text) - 1)},
+                                         self._last_candidates)
+        else:
+            candidates = self._intersect({text[i:i + 2] for i in range(len(text) - 1)})
+        self._last_text, self._last_candidates = text, candidates
+
+        scored: List[Tuple[float, int]] = []  # 最小堆 (总分, 编号)
+
+        def push(score: float, item: _Indexed):
+            pair = (score + item.bonus, item.num)
+            if len(scored) < limit:
+                heapq.heappush(scored, pair)
+            elif pair > scored[0]:
+                heapq.heapreplace(scored, pair)
+
+        if len(candidates) <= _DIRECT_SCORE_LIMIT:
+            for num in candidates:
+                item = self._by_num[num]
+                if accept(item):
+                    score = item.score(text)
+                    if score:
+                        push(score, item)
+        else:
+            # 沿首字排序列表查找，剩余条目的分数上限不超过当前第limit名时结束
+            for key in ranked:
+                if len(scored) >= limit and _key_upper(key) <= scored[0][0]:
+                    break
+                num = key & _NUM_MASK
+                if num in candidates:
+                    item = self._by_num[num]
+                    if accept(item):
+                        score = item.score(text)
+                        if score:
+                            push(score, item)
+
+        # 子串和首字母匹配不够时再做模糊匹配，凑够limit个即止
+        if len(scored) < limit:
+            matched = {num for _, num in scored}
+            fuzzy_candidates = self._intersect(set(text))
+            pattern = re.compile(".*?".join(map(re.escape, text)))
+            checked = 0
+            for key in ranked:
+                num = key & _NUM_MASK
+                if num not in fuzzy_candidates or num in matched:
+                    continue
+                checked += 1
+                if checked > _FUZZY_SCAN_LIMIT:
+                    break
+                item = self._by_num[num]
+                if accept(item):
+                    score = item.fuzzy_score(text, pattern)
+                    if score:
+                        push(score, item)
+                        if len(scored) >= limit:
+                            break
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [self._by_num[num].entry for _, num in scored]
+
+    def _rank_without_text(self, limit: int, accept) -> List[SwitcherEntry]:
+        """没有检索文本时，先列出未读、已打开的店铺"""
+        flagged = [self._by_num[num] for num in self._flagged]
+        flagged = heapq.nsmallest(limit, (item for item in flagged if accept(item)),
+                                  key=lambda item: (-item.bonus, item.num))
+        result = [item.entry for item in flagged]
+        for item in self._items.values():
+            if len(result) >= limit:
+                break
+            if not item.bonus and accept(item):
+                result.append(item.entry)
+        return result
+
+
+def run_benchmark(entries: int = 10000, seed: int = 1):
+    """模拟逐字输入查询，统计每次按键的检索耗时"""
+    from .stub_server import _WORDS
+
+    rng = random.Random(seed)
+    surnames = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗"
+    index = SwitcherIndex()
+    shops = []
+    build_start = time.perf_counter()
+    for i in range(entries):
+        entry = SwitcherEntry(
+            platform=rng.choice(list(PLATFORM_NAMES)),
+            webview_id=f"{i:032x}",
+            user_name=f"{rng.choice(surnames)}{rng.choice(_WORDS)}:{rng.randint(1, 99)}",
+            mall_name=f"{rng.choice(_WORDS)}{rng.choice(_WORDS)}旗舰店",
+            unread=rng.choice([0] * 20 + [1, 5]),
+            is_open=rng.random() < 0.01,
+        )
+        shops.append(entry)
+        index.upsert(entry)
+    index.warm()
+    build_time = time.perf_counter() - build_start
+
+    queries = ["王纯棉", "wcm", "pdd 王", "未读", "蓝牙耳机旗舰", "ljej", "旗舰店", "z7", "xyzq", "jd 数据线"]
+    timings: List[float] = []
+    update_timings: List[float] = []
+    for _ in range(20):
+        for query in queries:
+            # 两次查询之间有未读数变化
+            for shop in rng.sample(shops, 5):
+                shop.unread = rng.choice([0, 0, 1, 3])
+                start = time.perf_counter()
+                index.upsert(shop)
+                update_timings.append(time.perf_counter() - start)
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                index.search(query[:end])
+                timings.append(time.perf_counter() - start)
+
+    def summary(samples: List[float]) -> str:
+        samples.sort()
+        return (f"平均 {sum(samples) / len(samples) * 1000:.3f} ms，p50 {samples[len(samples) // 2] * 1000:.3f} ms，"
+                f"p99 {samples[int(len(samples) * 0.99)] * 1000:.3f} ms，最大 {samples[-1] * 1000:.3f} ms")
+
+    print(f"{entries} 个店铺，建立索引 {build_time * 1000:.0f} ms")
+    print(f"按键检索 {len(timings)} 次，{summary(timings)}")
+    print(f"增量更新 {len(update_timings)} 次，{summary(update_timings)}")
+    for query in ["王纯棉", "wcm", "pdd 王", "未读"]:
+        print(f"  {query}: {[entry.title for entry in index.search(query, 3)]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="快速切换索引测试")
+    parser.add_argument("--entries", type=int, default=10000)
+    args = parser.parse_args()
+    run_benchmark(args.entries)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+中英文混合分词：中日韩文字按单字和相邻双字切分，其余按字母数字词切分
+"""
+
+import re
+import unicodedata
+from typing import List
+
+# 中日韩统一表意文字、假名、谚文
+_TOKEN_PATTERN = re.compile(
+    r"([぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+)|([0-9a-z]+)"
+)
+
+
+def normalize(text: str) -> str:
+    """全角转半角并转为小写"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: str, unigrams: bool = True) -> List[str]:
+    """分词，中日韩文字输出双字词（unigrams为True时同时输出单字），字母数字输出整词
+
+    不输出单字时，孤立的单个汉字仍作为一个词输出。
+    """
+    tokens = []
+    for cjk, word in _TOKEN_PATTERN.findall(normalize(text)):
+        if word:
+            tokens.append(word)
+            continue
+        if unigrams or len(cjk) == 1:
+            tokens.extend(cjk)
+        tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+客服转接路由
+
+跟踪每个客服账号（店铺WebView）的未读消息数和进行中的会话数，转接时选择
+工作量最少、且平台和技能符合要求的客服。每个 (平台, 技能) 维护一个最小堆，
+客服负载变化时压入新记录，旧记录按版本号惰性删除，选择目标为 O(log n)。
+"""
+
+import argparse
+import heapq
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 会话无新消息超过该时间(秒)视为结束
+CONVERSATION_IDLE_SECONDS = 600
+# 堆中过期记录超过有效记录的倍数时重建
+COMPACT_FACTOR = 2
+
+HeapKey = Tuple[str, Optional[str]]
+
+
+@dataclass
+class AgentState:
+    """客服状态"""
+    agent_id: str
+    platform: str
+    name: str = ""
+    skills: Set[str] = field(default_factory=set)
+    max_conversations: int = 0  # 0表示不限
+    online: bool = True
+    unread: int = 0
+    conversations: Dict[str, float] = field(default_factory=dict)  # 买家ID -> 最后消息时间
+    version: int = 0
+
+    @property
+    def load(self) -> int:
+        """待处理工作量：未读消息数 + 进行中的会话数"""
+        return self.unread + len(self.conversations)
+
+    @property
+    def available(self) -> bool:
+        return self.online and (not self.max_conversations or len(self.conversations) < self.max_conversations)
+
+
+class TransferRouter:
+    """按最少待处理工作量选择转接目标"""
+
+    def __init__(self, idle_seconds: float = CONVERSATION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.agents: Dict[str, AgentState] = {}
+        self._heaps: Dict[HeapKey, List[Tuple[int, int, str, int]]] = {}
+        self._expiry: List[Tuple[float, str, str]] = []  # (最后消息时间, 客服ID, 买家ID)
+        # 过期队列超过该长度时清理已被新消息取代的记录
+        self._expiry_limit = 64
+        self._seq = itertools.count()
+
+    def _heap_keys(self, agent: AgentState) -> List[HeapKey]:
+        return [(agent.platform, None)] + [(agent.platform, skill) for skill in agent.skills]
+
+    def _publish(self, agent: AgentState):
+        """负载或状态变化后压入新记录，旧记录随版本号失效"""
+        agent.version += 1
+        if not agent.available:
+            return
+        entry = (agent.load, next(self._seq), agent.agent_id, agent.version)
+        for key in self._heap_keys(agent):
+            heap = self._heaps.setdefault(key, [])
+            heapq.heappush(heap, entry)
+            if len(heap) > COMPACT_FACTOR * len(self.agents) + 64:
+                self._compact(key)
+
+    def _compact(self, key: HeapKey):
+        heap = [entry for entry in self._heaps[key] if self._is_current(entry)]
+        heapq.heapify(heap)
+        self._heaps[key] = heap
+
+    def _is_current(self, entry: Tuple[int, int, str, int]) -> bool:
+        agent = self.agents.get(entry[2])
+        return agent is not None and agent.version == entry[3]
+
+    def set_agent(self, agent_id: str, platform: str, name: str = "", skills: Iterable[str] = (),
+                  max_conversations: int = 0):
+        """新增或更新客服"""
+        agent = self.agents.get(agent_id)
+        if agent is None:
+            agent = AgentState(agent_id, platform)
+            self.agents[agent_id] = agent
+        agent.platform = platform
+        agent.name = name or agent.name
+        agent.skills = set(skills)
+        agent.max_conversations = max_conversations
+        self._publish(agent)
+
+    def remove_agent(self, agent_id: str):
+        """移除客服，堆中的记录惰性删除"""
+        self.agents.pop(agent_id, None)
+
+    def set_online(self, agent_id: str, online: bool):
+        agent = self.agents.get(agent_id)
+        if agent is not None and agent.online != online:
+            agent.online = online
+            self._publish(agent)
+
+    def update_unread(self, agent_id: str, unread: int):
+        """更新客服的未读消息数"""
+        agent = self.agents.get(agent_id)
+        if agent is not None and agent.unread != unread:
+            agent.unread = unread
+            self._publish(agent)
+
+    def touch_conversation(self, agent_id: str, buyer_id: str, now: float = None):
+        """记录会话有新消息，新会话计入工作量"""
+        agent = self.agents.get(agent_id)
+        if agent is None or not buyer_id:
+            return
+        now = time.time() if now is None else now
+        # 没有转接时不会调用 pick()，在这里顺带结束超时会话，过期队列不会无限增长
+        self.expire(now)
+        is_new = buyer_id not in agent.conversations
+        agent.conversations[buyer_id] = now
+        heapq.heappush(self._expiry, (now, agent_id, buyer_id))
+        if len(self._expiry) > self._expiry_limit:
+            self._compact_expiry()
+        if is_new:
+            self._publish(agent)
+
+    def _compact_expiry(self):
+        """同一会话多次有新消息时只有最新一条记录有效，丢弃其余记录"""
+        expiry = [item for item in self._expiry if self._is_latest(item)]
+        heapq.heapify(expiry)
+        self._expiry = expiry
+        self._expiry_limit = max(64, COMPACT_FACTOR * len(expiry))
+
+    def _is_latest(self, item: Tuple[float, str, str]) -> bool:
+        agent = self.agents.get(item[1])
+        return agent is not None and agent.conversations.get(item[2]) == item[0]
+
+    def end_conversation(self, agent_id: str, buyer_id: str):
+        """会话结束（已转出或已完结）"""
+        agent = self.agents.get(agent_id)
+        if agent is not None and agent.conversations.pop(buyer_id, None) is not None:
+            self._publish(agent)
+
+    def expire(self, now: float = None):
+        """结束空闲超时的会话"""
+        deadline = (time.time() if now is None else now) - self.idle_seconds
+        while self._expiry and self._expiry[0][0] <= deadline:
+            item = heapq.heappop(self._expiry)
+            # 会话之后有新消息时，以最新时间为准
+            if self._is_latest(item):
+                self.end_conversation(item[1], item[2])
+
+    def pick(self, platform: str, skill: str = None, exclude: Iterable[str] = (),
+             now: float = None) -> Optional[AgentState]:
+        """选择工作量最少的可用客服，没有符合条件的客服时返回None"""
+        self.expire(now)
+        heap = self._heaps.get((platform, skill))
+        if not heap:
+            return None
+
+        exclude = set(exclude)
+        skipped = []
+        result = None
+        while heap:
+            entry = heap[0]
+            if not self._is_current(entry):
+                heapq.heappop(heap)
+                continue
+            if entry[2] in exclude:
+                skipped.append(heapq.heappop(heap))
+                continue
+            result = self.agents[entry[2]]
+            break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return result
+
+    def assign(self, platform: str, buyer_id: str, skill: str = None, exclude: Iterable[str] = (),
+               now: float = None) -> Optional[AgentState]:
+        """选择转接目标并将会话计入其工作量"""
+        agent = self.pick(platform, skill, exclude, now)
+        if agent is not None:
+            self.touch_conversation(agent.agent_id, buyer_id, now)
+        return agent
+
+
+def _brute_force_pick(router: TransferRouter, platform: str, skill: Optional[str],
+                      exclude: Set[str]) -> Optional[int]:
+    loads = [a.load for a in router.agents.values()
+             if a.platform == platform and a.available and a.agent_id not in exclude
+             and (skill is None or skill in a.skills)]
+    return min(loads) if loads else None
+
+
+def run_benchmark(agents: int = 500, events: int = 200000, seed: int = 1):
+    """模拟客服负载变化与转接，校验选择结果并统计耗时"""
+    rng = random.Random(seed)
+    platforms = ["pdd", "doudian", "kuaishou", "jd"]
+    skills = ["售前", "售后", "物流", "退款", "大客户"]
+
+    router = TransferRouter(idle_seconds=300)
+    for i in range(agents):
+        router.set_agent(f"agent{i}", rng.choice(platforms), skills=rng.sample(skills, rng.randint(1, 3)),
+                         max_conversations=rng.choice([0, 10, 20]))
+
+    now = 0.0
+    pick_times: List[float] = []
+    update_times: List[float] = []
+    mismatches = 0
+    for step in range(events):
+        now += 0.05
+        agent_id = f"agent{rng.randrange(agents)}"
+        kind = rng.random()
+        start = time.perf_counter()
+        if kind < 0.5:
+            router.update_unread(agent_id, rng.randint(0, 30))
+            update_times.append(time.perf_counter() - start)
+        elif kind < 0.8:
+            router.touch_conversation(agent_id, f"buyer{rng.randrange(20000)}", now)
+            update_times.append(time.perf_counter() - start)
+        elif kind < 0.85:
+            router.set_online(agent_id, rng.random() < 0.9)
+            update_times.append(time.perf_counter() - start)
+        else:
+            platform = rng.choice(platforms)
+            skill = rng.choice([None] + skills)
+            exclude = {agent_id}
+            agent = router.pick(platform, skill, exclude, now)
+            pick_times.append(time.perf_counter() - start)
+            if step % 10 == 0:
+                expected = _brute_force_pick(router, platform, skill, exclude)
+                if (agent.load if agent else None) != expected:
+                    mismatches += 1
+            if agent is not None:
+                router.touch_conversation(agent.agent_id, f"buyer{rng.randrange(20000)}", now)
+
+    def summary(samples: List[float]) -> str:
+        samples.sort()
+        return (f"平均 {sum(samples) / len(samples) * 1e6:.1f} µs, "
+                f"p99 {samples[int(len(samples) * 0.99)] * 1e6:.1f} µs")
+
+    loads = [a.load for a in router.agents.values()]
+    heap_size = sum(len(h) for h in router._heaps.values())
+    conversations = sum(len(a.conversations) for a in router.agents.values())
+    print(f"{agents} 个客服，{events} 个事件")
+    print(f"选择转接目标: {len(pick_times)} 次，{summary(pick_times)}，与全量扫描结果不一致 {mismatches} 次")
+    print(f"负载更新: {len(update_times)} 次，{summary(update_times)}")
+    print(f"最终负载 最小 {min(loads)} / 平均 {sum(loads) / len(loads):.1f} / 最大 {max(loads)}，"
+          f"堆记录总数 {heap_size}，进行中会话 {conversations}，过期队列 {len(router._expiry)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="客服转接路由模拟")
+    parser.add_argument("--agents", type=int, default=500)
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+    run_benchmark(args.agents, args.events)
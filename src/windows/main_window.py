@@ -3,32 +3,68 @@
 主窗口
 """
 
+import logging
+import secrets
 import sys
+import threading
+import time
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Dict, Optional
 
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                            QTabWidget, QSplitter, QTreeWidget, QTreeWidgetItem,
                            QSystemTrayIcon, QMenu, QMessageBox, QStatusBar,
-                           QPushButton, QLabel, QFrame)
+                           QPushButton, QLabel, QFrame, QInputDialog, QComboBox)
 from PyQt6.QtCore import Qt, pyqtSignal, QTimer
-from PyQt6.QtGui import QIcon, QAction, QPixmap, QFont
+from PyQt6.QtGui import QIcon, QAction, QPixmap, QFont, QShortcut, QKeySequence
 
 from ..core.application import PdkBotApplication
+from ..core.renderer_watchdog import RendererWatchdog
+from ..core.tab_restorer import TabRestorer
+from ..core.profile_janitor import ProfileJanitor
+from ..core.event_bus import ChatMessageEvent, NewMessageEvent, DROP_NEWEST
+from ..core.bridge_recorder import BridgeRecorder
+from ..core.poll_scheduler import PollScheduler
+from ..core.resource_mode import DEFAULT_MODE, RESOURCE_MODES, ResourceSampler, http_cache_bytes
+from ..services.auto_reply import AutoReplyEngine
+from ..services.knowledge_base import KnowledgeBase
+from ..services.send_queue import OutboundSendQueue
+from ..services.media_pipeline import MediaPipeline
+from ..services.session_pool import SessionPool
+from ..services.order_lookup import OrderLookupService, OrderLookupResult
+from ..services.catalog_sync import CatalogSync
+from ..services.transfer_router import TransferRouter
+from ..services.conversation_queue import ConversationQueue
+from ..services.local_api import GuiDispatcher, LocalApiServer
+from ..services.switcher_index import SwitcherEntry, SwitcherIndex
+from ..services.response_analytics import DIMENSION_NAMES, ResponseAnalytics
+from ..services.compliance_filter import ComplianceFilter
+from ..services.quick_replies import QuickReplyStore
 from ..pages.platform_page import PlatformPage
+from ..controls.webview_widget import PlatformWebView
+from ..controls.quick_switcher import QuickSwitcher
+from ..controls.response_report import ResponseReportDialog
+from ..controls.export_dialog import ExportDialog
+from ..controls.log_viewer import LogViewerDialog
 from ..db.shop_manager import ShopManager
-from ..db.entities import NewMessage, PlatformShop
+from ..db.message_store import MessageStore
+from ..db.session_store import SessionStore
+from ..db.entities import NewMessage, PlatformShop, ChatMessage
 from .tray_notification import NotificationManager
 
+logger = logging.getLogger(__name__)
+
 
 class NavigationTree(QTreeWidget):
     """导航树控件"""
     
     platform_selected = pyqtSignal(str)  # 平台名
     
-    def __init__(self, parent=None):
+    def __init__(self, platforms: Dict[str, dict], parent=None):
         super().__init__(parent)
         
+        self.platforms = platforms
         self.setHeaderHidden(True)
         self.setRootIsDecorated(True)
         self.setIndentation(20)
@@ -79,17 +115,11 @@ class NavigationTree(QTreeWidget):
         home_item.setData(0, Qt.ItemDataRole.UserRole, "home")
         self.addTopLevelItem(home_item)
         
-        # 平台列表
-        platforms = [
-            ("pdd", "拼多多", "🛍️"),
-            ("doudian", "抖店", "📱"),
-            ("kuaishou", "快手", "⚡"),
-            ("jd", "京东", "🛒")
-        ]
-        
-        for platform_id, platform_name, icon in platforms:
-            item = QTreeWidgetItem([f"{icon} {platform_name}"])
+        # 平台列表，停用的平台隐藏
+        for platform_id, config in self.platforms.items():
+            item = QTreeWidgetItem([f"{config['icon']} {config['name']}"])
             item.setData(0, Qt.ItemDataRole.UserRole, platform_id)
+            item.setHidden(not config["enabled"])
             self.addTopLevelItem(item)
             
         # 设置
@@ -111,6 +141,23 @@ class NavigationTree(QTreeWidget):
         if item_type:
             self.platform_selected.emit(item_type)
             
+    def find_item(self, item_type: str) -> Optional[QTreeWidgetItem]:
+        """按导航项类型查找"""
+        for i in range(self.topLevelItemCount()):
+            item = self.topLevelItem(i)
+            if item.data(0, Qt.ItemDataRole.UserRole) == item_type:
+                return item
+        return None
+        
+    def update_platform(self, platform: str, config: dict, count: int = 0):
+        """平台配置变化后更新名称、图标和是否显示"""
+        item = self.find_item(platform)
+        if item is None:
+            return
+        item.setText(0, f"{config['icon']} {config['name']}")
+        item.setHidden(not config["enabled"])
+        self.update_badge(platform, count)
+        
     def update_badge(self, platform: str, count: int):
         """更新消息徽章"""
         for i in range(self.topLevelItemCount()):
@@ -132,14 +179,81 @@ class NavigationTree(QTreeWidget):
 class MainWindow(QMainWindow):
     """主窗口"""
     
-    def __init__(self):
+    def __init__(self, app: Optional[PdkBotApplication] = None):
         super().__init__()
         
-        self.app = PdkBotApplication()
+        self.app = app or PdkBotApplication()
         self.shop_manager = ShopManager(self.app.data_dir)
+        self.message_store = MessageStore(self.app.data_dir)
+        self.session_store = SessionStore(self.app.data_dir)
         self.notification_manager = NotificationManager()
+        self.watchdog = RendererWatchdog(self.app.config.get("watchdog", {}), self)
+        self.auto_reply_engine = AutoReplyEngine(
+            self.app.data_dir / "auto_reply_rules.json",
+            self.app.config.get("auto_reply_cooldown", 60)
+        )
+        self.send_queue = OutboundSendQueue(
+            self.find_webview, self.app.config.get("send_rate_limits", {}), self)
+        # 发送前违禁词检查：程序发送的消息在发送队列中检查，客服输入的消息由页面请求检查
+        self.compliance_filter = ComplianceFilter(
+            self.app.data_dir / "compliance", self.app.config.get("compliance", {}))
+        self.send_queue.text_filter = self.compliance_filter.reject_reason
+        PlatformWebView.compliance_enabled = self.compliance_filter.config["enabled"]
+        # 快捷回复模板，客服在输入框中输入“/”检索
+        self.quick_replies = QuickReplyStore(self.app.data_dir)
+        # 各店铺最近发来消息的买家，页面未提供当前会话时用于替换模板变量
+        self.last_buyers: Dict[str, ChatMessage] = {}
+        self.media_pipeline = MediaPipeline(self.app.data_dir, self.send_queue, parent=self)
+        self.knowledge_base = KnowledgeBase(self.app.data_dir)
+        self.knowledge_base.load_in_background()
+        order_config = self.app.config.get("order_lookup", {})
+        self.session_pool = SessionPool()
+        self.order_lookup = OrderLookupService(
+            self.session_pool, order_config.get("apis", {}), order_config.get("ttl", 300), parent=self)
+        catalog_config = self.app.config.get("catalog_sync", {})
+        self.catalog_sync = CatalogSync(
+            self.app.data_dir, self.session_pool, catalog_config.get("apis", {}),
+            catalog_config.get("interval", 600), parent=self)
+        self.transfer_router = TransferRouter(
+            self.app.config.get("transfer_router", {}).get("idle_seconds", 600))
+        self.conversation_queue = ConversationQueue(
+            self.app.config.get("conversation_queue", {}).get("sla_seconds", {}), self)
+        self.profile_janitor = ProfileJanitor(
+            self.app.profiles_dir, self.known_profile_ids, self.open_profile_ids,
+            self.app.config.get("profile_janitor", {}), self)
+        # 资源模式：Chromium参数在启动时按配置生效，页面设置和缓存上限可随时切换
+        resource_config = self.app.config.get("resource_mode", {})
+        self.resource_sampler = ResourceSampler(
+            self.app.data_dir, resource_config.get("mode", DEFAULT_MODE), self.open_webview_count,
+            resource_config, self)
+        PlatformWebView.profiles_dir = self.app.profiles_dir
+        PlatformWebView.resource_mode = self.resource_sampler.mode
+        PlatformWebView.http_cache_max_bytes = http_cache_bytes(
+            self.resource_sampler.mode, self.profile_janitor.http_cache_bytes)
+        # 各店铺的未读检测由调度器统一触发
+        self.poll_scheduler = PollScheduler(
+            self.focused_webview_id, self.app.config.get("poll_scheduler", {}), self)
+        # 快速切换：所有店铺和已打开标签页的检索索引
+        self.switcher_index = SwitcherIndex()
+        self.quick_switcher = None
+        # 回复时效统计：启动时补算上次保存之后的历史消息，之后从事件总线实时统计
+        self.analytics_config = self.app.config.get("response_analytics", {})
+        self.analytics_path = self.app.data_dir / "analytics" / "response_times.json"
+        self.response_analytics = ResponseAnalytics.load(
+            self.analytics_path, self.analytics_shop_key, self.analytics_config)
+        self.response_analytics.hold_live()
+        self.response_report = None
+        self.export_dialog = None
+        self.log_viewer = None
+        # 连续按“下一个最紧急会话”快捷键时依次切换
+        self._urgent_skip = 0
+        self._urgent_pressed_at = 0.0
         
-        # 平台页面
+        # 最近一次知识库建议: (平台, webview_id) -> 建议回答列表
+        self.suggestions: Dict[tuple, list] = {}
+        
+        # 平台页面，停用的平台也创建页面，只隐藏导航并关闭其WebView
+        self.platform_configs = self.app.platform_configs()
         self.platform_pages: Dict[str, PlatformPage] = {}
         
         # 消息计数
@@ -153,6 +267,52 @@ class MainWindow(QMainWindow):
         # 应用全局样式
         self.apply_styles()
         
+        # 恢复上次打开的店铺标签页
+        self.tab_restorer = TabRestorer(self.enabled_pages,
+                                        self.app.config.get("session_restore", {}), self)
+        self.restore_session()
+        self.rebuild_switcher_index()
+        self.session_timer = QTimer(self)
+        self.session_timer.timeout.connect(self.save_session)
+        self.session_timer.timeout.connect(self.quick_replies.save_usage)
+        self.session_timer.start(60 * 1000)
+        
+        # 启动渲染进程看门狗
+        self.watchdog.start()
+        
+        # 启动配置文件清理
+        self.profile_janitor.start()
+        
+        # 统计当前资源模式下的内存和CPU占用
+        self.resource_sampler.start()
+        
+        # 启动未读检测调度
+        self.poll_scheduler.start()
+        
+        # 加载违禁词表，词表文件变化后自动重新编译
+        self.compliance_filter.reload_if_changed()
+        self.compliance_timer = QTimer(self)
+        self.compliance_timer.timeout.connect(self.compliance_filter.reload_if_changed)
+        self.compliance_timer.timeout.connect(self.quick_replies.reload_if_changed)
+        self.quick_replies.reload_if_changed()
+        self.compliance_timer.start(int(self.compliance_filter.config["reload_interval"] * 1000))
+        
+        # 补算回复时效并定期保存
+        threading.Thread(target=self.response_analytics.catch_up, args=(self.message_store,),
+                         name="response_catch_up", daemon=True).start()
+        self.analytics_timer = QTimer(self)
+        self.analytics_timer.timeout.connect(self.save_response_analytics)
+        self.analytics_timer.start(int(self.response_analytics.config["save_interval"] * 1000))
+        
+        # 启动本地接口
+        self.local_api = None
+        self.start_local_api()
+        
+        # 录制平台消息，用于回放测试
+        self.bridge_recorder = None
+        if self.app.config.get("bridge_recorder", {}).get("enabled", False):
+            self.start_bridge_recording()
+        
     def setup_ui(self):
         """设置UI"""
         self.setWindowTitle("PdkBot - 电商客服聚合接待工具")
@@ -171,7 +331,7 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(splitter)
         
         # 左侧导航
-        self.navigation_tree = NavigationTree()
+        self.navigation_tree = NavigationTree(self.platform_configs)
         self.navigation_tree.setMaximumWidth(200)
         splitter.addWidget(self.navigation_tree)
         
@@ -191,6 +351,23 @@ class MainWindow(QMainWindow):
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("就绪", 2000)
         
+        # 待回复会话数与超时次数
+        self.queue_label = QLabel()
+        self.queue_label.setStyleSheet("color: #1d1d1f; padding: 0 8px;")
+        self.status_bar.addPermanentWidget(self.queue_label)
+        
+        # 跳转到等待最久的会话
+        hotkey = self.app.config.get("conversation_queue", {}).get("hotkey", "Ctrl+J")
+        self.next_urgent_shortcut = QShortcut(QKeySequence(hotkey), self)
+        self.next_urgent_shortcut.setContext(Qt.ShortcutContext.ApplicationShortcut)
+        self.next_urgent_shortcut.activated.connect(self.jump_to_most_urgent)
+        
+        # 快速切换店铺
+        hotkey = self.app.config.get("quick_switcher", {}).get("hotkey", "Ctrl+K")
+        self.quick_switcher_shortcut = QShortcut(QKeySequence(hotkey), self)
+        self.quick_switcher_shortcut.setContext(Qt.ShortcutContext.ApplicationShortcut)
+        self.quick_switcher_shortcut.activated.connect(self.show_quick_switcher)
+        
     def setup_system_tray(self):
         """设置系统托盘"""
         if not QSystemTrayIcon.isSystemTrayAvailable():
@@ -220,6 +397,30 @@ class MainWindow(QMainWindow):
         hide_action.triggered.connect(self.hide)
         tray_menu.addAction(hide_action)
         
+        disk_action = QAction("磁盘占用", self)
+        disk_action.triggered.connect(self.show_disk_usage)
+        tray_menu.addAction(disk_action)
+        
+        resource_action = QAction("资源占用", self)
+        resource_action.triggered.connect(self.show_resource_usage)
+        tray_menu.addAction(resource_action)
+        
+        poll_action = QAction("轮询开销", self)
+        poll_action.triggered.connect(self.show_poll_report)
+        tray_menu.addAction(poll_action)
+        
+        analytics_action = QAction("回复时效", self)
+        analytics_action.triggered.connect(self.show_response_report)
+        tray_menu.addAction(analytics_action)
+        
+        export_action = QAction("导出聊天记录", self)
+        export_action.triggered.connect(self.show_export_dialog)
+        tray_menu.addAction(export_action)
+        
+        log_action = QAction("查看日志", self)
+        log_action.triggered.connect(self.show_log_viewer)
+        tray_menu.addAction(log_action)
+        
         tray_menu.addSeparator()
         
         # 退出
@@ -237,37 +438,18 @@ class MainWindow(QMainWindow):
         
     def setup_platform_pages(self):
         """设置平台页面"""
-        # 平台配置
-        platforms_config = {
-            "pdd": {
-                "name": "拼多多",
-                "url": "https://mms.pinduoduo.com/chat-merchant/index.html#/"
-            },
-            "doudian": {
-                "name": "抖店", 
-                "url": "https://fxg.jinritemai.com/ffa/mshop/shopIndex"
-            },
-            "kuaishou": {
-                "name": "快手",
-                "url": "https://s.kwaixiaodian.com/zone/settles/chat"
-            },
-            "jd": {
-                "name": "京东",
-                "url": "https://dongdong.jd.com/"
-            }
-        }
-        
         # 添加首页
         home_page = self.create_home_page()
         self.content_widget.addTab(home_page, "首页")
         
         # 创建平台页面
-        for platform_id, config in platforms_config.items():
+        for platform_id, config in self.platform_configs.items():
             page = PlatformPage(
                 platform=platform_id,
                 platform_name=config["name"],
                 chat_url=config["url"],
-                shop_manager=self.shop_manager
+                shop_manager=self.shop_manager,
+                event_bus=self.app.event_bus
             )
             
             self.platform_pages[platform_id] = page
@@ -290,7 +472,79 @@ class MainWindow(QMainWindow):
         for platform_id, page in self.platform_pages.items():
             page.new_message_received.connect(self.on_new_message_received)
             page.shop_updated.connect(self.on_shop_updated)
+            page.new_message_received.connect(
+                lambda platform, new_msg: self.app.emit_new_message(platform, new_msg.to_dict()))
+            page.shop_updated.connect(lambda platform, shop: self.app.emit_shop_updated(platform, shop.to_dict()))
             page.tab_changed.connect(self.on_tab_changed)
+            page.shop_ready.connect(self.on_shop_ready)
+            page.chat_message_received.connect(self.on_chat_message_received)
+            page.send_ack_received.connect(self.send_queue.on_ack)
+            page.media_send_requested.connect(self.media_pipeline.send_media)
+            page.product_search_requested.connect(self.on_product_search_requested)
+            page.compliance_check_requested.connect(self.on_compliance_check_requested)
+            page.quick_reply_query_requested.connect(self.on_quick_reply_query_requested)
+            page.quick_reply_selected.connect(self.on_quick_reply_selected)
+            page.transfer_requested.connect(self.on_transfer_requested)
+            page.conversations_changed.connect(self.conversation_queue.apply_diff)
+            page.unread_changed.connect(
+                lambda platform, webview_id, count: self.transfer_router.update_unread(webview_id, count))
+            page.shop_updated.connect(lambda platform, shop: self.register_transfer_agent(
+                platform, self.find_webview(platform, shop.webview_id)))
+            
+            page.webview_created.connect(self.watchdog.watch)
+            page.webview_created.connect(self.poll_scheduler.register)
+            page.webview_closed.connect(lambda platform, webview_id: self.poll_scheduler.unregister(webview_id))
+            page.chat_message_received.connect(lambda message: self.poll_scheduler.poke(message.webview_id))
+            page.webview_created.connect(lambda platform, webview: self.session_pool.attach(webview))
+            page.webview_created.connect(
+                lambda platform, webview: self.catalog_sync.watch(platform, webview.webview_id))
+            page.webview_created.connect(self.register_transfer_agent)
+            page.webview_closed.connect(lambda platform, webview_id: self.watchdog.unwatch(webview_id))
+            page.webview_closed.connect(lambda platform, webview_id: self.session_pool.release(webview_id))
+            # 重建页面时也会先关闭，保留客服的会话记录，只标记为离线
+            page.webview_closed.connect(
+                lambda platform, webview_id: self.transfer_router.set_online(webview_id, False))
+            page.webview_closed.connect(
+                lambda platform, webview_id: self.conversation_queue.remove_shop(webview_id))
+            
+            # 快速切换索引增量更新
+            page.shop_updated.connect(lambda platform, shop: self.update_switcher_entry(platform, shop.webview_id))
+            page.unread_changed.connect(self.update_switcher_entry)
+            page.webview_created.connect(
+                lambda platform, webview: self.update_switcher_entry(platform, webview.webview_id))
+            page.webview_closed.connect(self.update_switcher_entry)
+        
+        # 聊天消息在事件总线的后台线程中写入磁盘和统计。事件由界面线程发布，不能等待队列腾出空间；
+        # 队列较大，正常不会写满，写满时丢弃新事件（总线会记录警告），已入队的事件保持先后顺序
+        self.app.event_bus.subscribe(lambda event: self.message_store.append(event.message),
+                                     [ChatMessageEvent], name="message_store", max_queue=10000, policy=DROP_NEWEST)
+        self.app.event_bus.subscribe(self.on_analytics_event, [ChatMessageEvent, NewMessageEvent],
+                                     name="response_analytics", max_queue=10000, policy=DROP_NEWEST)
+        
+        # 配置文件热加载
+        self.app.config_reloaded.connect(self.on_config_reloaded)
+        self.app.config_rejected.connect(
+            lambda error: self.status_bar.showMessage(f"配置未应用：{error}", 10000))
+        
+        # 看门狗信号
+        self.watchdog.recreate_requested.connect(self.on_recreate_requested)
+        
+        # 待回复会话队列
+        self.conversation_queue.queue_changed.connect(self.update_queue_label)
+        self.conversation_queue.sla_breached.connect(lambda conversation: self.update_queue_label())
+        
+        # 素材预处理失败
+        self.media_pipeline.media_failed.connect(
+            lambda path, error: self.status_bar.showMessage(f"发送失败：{Path(path).name}，{error}", 5000))
+        
+        # 买家订单查询结果
+        self.order_lookup.orders_ready.connect(self.on_orders_ready)
+        
+        # 商品目录同步结果
+        self.catalog_sync.sync_finished.connect(self.on_catalog_synced)
+        
+        # 配置文件清理结果
+        self.profile_janitor.scan_finished.connect(self.on_profile_scan_finished)
             
     def create_home_page(self) -> QWidget:
         """创建首页"""
@@ -351,11 +605,29 @@ class MainWindow(QMainWindow):
         title = QLabel("设置")
         title.setStyleSheet("font-size: 20px; font-weight: bold; margin: 15px; color: #1d1d1f;")
         
-        content = QLabel("设置功能开发中...")
-        content.setStyleSheet("font-size: 16px; color: #86868b; margin: 15px;")
+        # 资源模式
+        mode_row = QHBoxLayout()
+        mode_label = QLabel("资源模式")
+        mode_label.setStyleSheet("font-size: 14px; color: #1d1d1f; margin-left: 15px;")
+        self.resource_mode_combo = QComboBox()
+        for name, mode in RESOURCE_MODES.items():
+            self.resource_mode_combo.addItem(mode["name"], name)
+        current = self.app.config.get("resource_mode", {}).get("mode", DEFAULT_MODE)
+        self.resource_mode_combo.setCurrentIndex(max(self.resource_mode_combo.findData(current), 0))
+        self.resource_mode_combo.currentIndexChanged.connect(
+            lambda index: self.set_resource_mode(self.resource_mode_combo.itemData(index)))
+        mode_row.addWidget(mode_label)
+        mode_row.addWidget(self.resource_mode_combo)
+        mode_row.addStretch()
+        
+        mode_hint = QLabel("低资源模式关闭WebGL、插件、自动播放和平滑滚动，减小缓存，并限制后台页面的定时器；"
+                           "极简模式另外不加载图片。页面设置立即生效，Chromium参数在重启后生效。")
+        mode_hint.setWordWrap(True)
+        mode_hint.setStyleSheet("font-size: 13px; color: #86868b; margin: 0 15px;")
         
         layout.addWidget(title)
-        layout.addWidget(content)
+        layout.addLayout(mode_row)
+        layout.addWidget(mode_hint)
         layout.addStretch()
         
         return page
@@ -430,6 +702,45 @@ class MainWindow(QMainWindow):
             }
         """)
         
+    def restore_session(self):
+        """以占位标签页恢复上次的店铺标签页，并立即显示上次的未读数"""
+        if not self.tab_restorer.config["enabled"]:
+            return
+        session = self.session_store.load()
+        for platform_id, state in session.get("platforms", {}).items():
+            page = self.platform_pages.get(platform_id)
+            if page is None or not state.get("tabs"):
+                continue
+            page.restore_tabs(state["tabs"], state.get("current", 0), state.get("visible", True))
+            unread = sum(tab.unread for tab in state["tabs"])
+            if unread:
+                self.message_counts[platform_id] = unread
+                self.navigation_tree.update_badge(platform_id, unread)
+        
+        current_platform = session.get("current_platform", "")
+        if current_platform in self.enabled_pages():
+            self.on_navigation_selected(current_platform)
+            for i in range(self.navigation_tree.topLevelItemCount()):
+                item = self.navigation_tree.topLevelItem(i)
+                if item.data(0, Qt.ItemDataRole.UserRole) == current_platform:
+                    self.navigation_tree.setCurrentItem(item)
+        self.tab_restorer.start()
+        
+    def save_session(self):
+        """保存当前打开的店铺标签页"""
+        current_widget = self.content_widget.currentWidget()
+        current_platform = ""
+        platforms = {}
+        for platform_id, page in self.platform_pages.items():
+            if page is current_widget:
+                current_platform = platform_id
+            platforms[platform_id] = {
+                "tabs": page.snapshot_tabs(),
+                "current": page.tab_widget.currentIndex(),
+                "visible": page.stacked_widget.currentIndex() == 1,
+            }
+        self.session_store.save(current_platform, platforms)
+        
     def on_navigation_selected(self, item_type: str):
         """导航选择事件"""
         if item_type == "home":
@@ -456,13 +767,10 @@ class MainWindow(QMainWindow):
             self.navigation_tree.update_badge(platform, new_msg.new_message_count)
             
             # 显示系统通知
-            platform_names = {
-                "pdd": "拼多多",
-                "doudian": "抖店", 
-                "kuaishou": "快手",
-                "jd": "京东"
-            }
-            platform_name = platform_names.get(platform, platform)
+            if not self.app.config.get("notification", True):
+                return
+            page = self.platform_pages.get(platform)
+            platform_name = page.platform_name if page is not None else platform
             
             notification = self.notification_manager.show_notification(
                 f"{platform_name} 新消息",
@@ -476,6 +784,464 @@ class MainWindow(QMainWindow):
             self.message_counts.pop(platform, None)
             self.navigation_tree.update_badge(platform, 0)
             
+    def on_chat_message_received(self, message: ChatMessage):
+        """处理聊天消息"""
+        if message.from_buyer:
+            self.transfer_router.touch_conversation(message.webview_id, message.buyer_id)
+            self.last_buyers[message.webview_id] = message
+        
+        if message.from_buyer and message.content:
+            top_k = self.app.config.get("knowledge_base", {}).get("top_k", 3)
+            suggestions = self.knowledge_base.suggest(message.content, top_k, message.platform)
+            self.suggestions[(message.platform, message.webview_id)] = suggestions
+            if suggestions:
+                self.status_bar.showMessage(f"知识库建议：{suggestions[0]}", 10000)
+            
+            # 预取买家订单，客服切换到该会话时直接使用缓存
+            if self.app.config.get("order_lookup", {}).get("enabled", False) and message.buyer_id:
+                self.order_lookup.lookup(message.platform, message.webview_id, message.buyer_id)
+        
+        if not self.app.config.get("auto_reply", False):
+            return
+        
+        rule = self.auto_reply_engine.match(message)
+        if rule is None:
+            return
+        
+        idempotency_key = f"auto:{message.webview_id}:{message.msg_id}" if message.msg_id else None
+        self.send_queue.send_text(message.platform, message.webview_id, rule.reply,
+                                  message.buyer_id, idempotency_key)
+        
+    def on_orders_ready(self, result: OrderLookupResult):
+        """买家订单查询完成"""
+        if not result.orders:
+            return
+        latest = result.orders[0]
+        self.status_bar.showMessage(
+            f"买家 {result.buyer_id} 共 {len(result.orders)} 个订单，"
+            f"最近：{latest.get('goods_name', '')} {latest.get('status', '')}", 10000)
+        
+    def update_queue_label(self, *args):
+        """更新状态栏的待回复会话数与超时次数"""
+        waiting = len(self.conversation_queue)
+        breaches = self.conversation_queue.total_breaches()
+        self.queue_label.setText(f"待回复 {waiting}  超时 {breaches}")
+        
+    def jump_to_most_urgent(self):
+        """切换到等待最久的待回复会话"""
+        now = time.monotonic()
+        self._urgent_skip = self._urgent_skip + 1 if now - self._urgent_pressed_at < 5 else 0
+        self._urgent_pressed_at = now
+        
+        conversation = self.conversation_queue.peek(self._urgent_skip)
+        if conversation is None and self._urgent_skip:
+            self._urgent_skip = 0
+            conversation = self.conversation_queue.peek()
+        if conversation is None:
+            self.status_bar.showMessage("没有待回复的会话", 3000)
+            return
+        
+        page = self.platform_pages.get(conversation.platform)
+        if page is None:
+            return
+        self.show_window()
+        self.on_navigation_selected(conversation.platform)
+        webview = page.focus_webview(conversation.webview_id)
+        if webview is not None:
+            webview.open_conversation(conversation.conversation_id)
+        self.status_bar.showMessage(
+            f"{conversation.name or conversation.conversation_id} 已等待 {conversation.waited() / 60:.0f} 分钟", 5000)
+        
+    def rebuild_switcher_index(self):
+        """用已保存的店铺和已打开（含占位）的标签页建立快速切换索引"""
+        for platform, shops in self.shop_manager.get_all_shops().items():
+            for shop in shops:
+                self.update_switcher_entry(platform, shop.webview_id)
+        for platform, page in self.platform_pages.items():
+            for tab in page.snapshot_tabs():
+                self.update_switcher_entry(platform, tab.webview_id, tab.unread)
+        
+    def update_switcher_entry(self, platform: str, webview_id: str, unread: Optional[int] = None):
+        """店铺信息、未读数或标签页变化时更新快速切换索引"""
+        page = self.platform_pages.get(platform)
+        shop = self.shop_manager.find_shop(platform, webview_id)
+        is_open = page is not None and (webview_id in page.webviews or webview_id in page.placeholders)
+        if (shop is None and not is_open) or not self.platform_configs.get(platform, {}).get("enabled", True):
+            self.switcher_index.remove(webview_id)
+            return
+        old = self.switcher_index.get(webview_id)
+        if unread is None:
+            unread = old.unread if old and is_open else 0
+        self.switcher_index.upsert(SwitcherEntry(
+            platform=platform,
+            webview_id=webview_id,
+            user_name=shop.user_name if shop else f"新{page.platform_name}账号",
+            mall_name=shop.mall_name if shop else "",
+            unread=unread if is_open else 0,
+            is_open=is_open,
+        ))
+        
+    def show_quick_switcher(self):
+        """弹出快速切换面板"""
+        if self.quick_switcher is None:
+            limit = self.app.config.get("quick_switcher", {}).get("limit", 20)
+            self.quick_switcher = QuickSwitcher(self.switcher_index, limit, self)
+            self.quick_switcher.entry_selected.connect(self.switch_to_shop)
+        self.show_window()
+        self.quick_switcher.popup()
+        
+    def switch_to_shop(self, entry: SwitcherEntry):
+        """切换到店铺标签页，未打开时打开"""
+        page = self.platform_pages.get(entry.platform)
+        if page is None:
+            return
+        self.on_navigation_selected(entry.platform)
+        for i in range(self.navigation_tree.topLevelItemCount()):
+            item = self.navigation_tree.topLevelItem(i)
+            if item.data(0, Qt.ItemDataRole.UserRole) == entry.platform:
+                self.navigation_tree.setCurrentItem(item)
+        if page.focus_webview(entry.webview_id) is None:
+            shop = self.shop_manager.find_shop(entry.platform, entry.webview_id)
+            if shop is not None:
+                page.load_shop(shop)
+        
+    def register_transfer_agent(self, platform: str, webview):
+        """将店铺客服账号登记到转接路由"""
+        if webview is None:
+            return
+        shop = self.shop_manager.find_shop(platform, webview.webview_id)
+        agent_config = self.app.config.get("transfer_router", {}).get("agents", {}).get(webview.webview_id, {})
+        self.transfer_router.set_agent(
+            webview.webview_id, platform,
+            name=shop.user_name if shop else "",
+            skills=agent_config.get("skills", []),
+            max_conversations=agent_config.get("max_conversations", 0)
+        )
+        self.transfer_router.set_online(webview.webview_id, True)
+        
+    def on_transfer_requested(self, platform: str, webview_id: str):
+        """为当前店铺最近的会话推荐转接目标"""
+        source = self.transfer_router.agents.get(webview_id)
+        buyer_id = max(source.conversations, key=source.conversations.get) if source and source.conversations else ""
+        
+        skills = sorted({skill for agent in self.transfer_router.agents.values()
+                         if agent.platform == platform for skill in agent.skills})
+        skill = None
+        if skills:
+            choice, ok = QInputDialog.getItem(self, "转接", "需要的技能：", ["不限"] + skills, 0, False)
+            if not ok:
+                return
+            skill = None if choice == "不限" else choice
+        
+        target = self.transfer_router.pick(platform, skill, exclude={webview_id})
+        if target is None:
+            QMessageBox.information(self, "转接", "没有可接待的客服")
+            return
+        
+        buyer_text = f"买家 {buyer_id} " if buyer_id else ""
+        reply = QMessageBox.question(
+            self, "转接",
+            f"建议将{buyer_text}转接给：{target.name or target.agent_id}\n"
+            f"当前未读 {target.unread} 条，进行中会话 {len(target.conversations)} 个\n\n"
+            f"在平台页面完成转接后点击“是”更新接待记录。")
+        if reply == QMessageBox.StandardButton.Yes and buyer_id:
+            self.transfer_router.end_conversation(webview_id, buyer_id)
+            self.transfer_router.touch_conversation(target.agent_id, buyer_id)
+        
+    def on_catalog_synced(self, platform: str, webview_id: str, changed: int):
+        """店铺商品目录同步完成"""
+        if changed:
+            self.status_bar.showMessage(f"{platform} 商品目录已同步，更新 {changed} 个商品", 3000)
+        
+    def on_product_search_requested(self, platform: str, webview_id: str, text: str):
+        """在店铺商品目录中查询商品"""
+        page = self.platform_pages.get(platform)
+        if page:
+            page.show_product_results(self.catalog_sync.search(webview_id, text))
+        
+    def on_compliance_check_requested(self, platform: str, webview_id: str, seq: int, text: str):
+        """检查客服在页面输入框中的内容，结果交给页面提示和拦截"""
+        webview = self.find_webview(platform, webview_id)
+        if webview is None:
+            return
+        hits = self.compliance_filter.check(platform, text)
+        webview.show_compliance(seq, [hit.to_dict() for hit in hits], self.compliance_filter.config["block_send"])
+        
+    def on_quick_reply_query_requested(self, platform: str, webview_id: str, seq: int, query: str):
+        """检索快捷回复，结果交给页面列出"""
+        webview = self.find_webview(platform, webview_id)
+        if webview is None:
+            return
+        limit = self.app.config.get("quick_replies", {}).get("limit", 8)
+        items = [{
+            "id": reply.reply_id,
+            "shortcut": reply.shortcut,
+            "title": reply.title,
+            "preview": reply.content[:60],
+        } for reply in self.quick_replies.search(query, platform, webview_id, limit)]
+        webview.show_quick_replies(seq, items)
+        
+    def on_quick_reply_selected(self, platform: str, webview_id: str, reply_id: str, buyer: dict):
+        """替换模板变量后写入输入框"""
+        webview = self.find_webview(platform, webview_id)
+        if webview is None:
+            return
+        last = self.last_buyers.get(webview_id)
+        buyer_id = str(buyer.get("id") or (last.buyer_id if last else ""))
+        buyer_name = str(buyer.get("name") or (last.buyer_name if last and last.buyer_id == buyer_id else ""))
+        # 订单号取订单查询缓存中该买家最近的订单
+        order_sn = ""
+        cached = self.order_lookup.cache.get((platform, webview_id, buyer_id)) if buyer_id else None
+        if cached is not None and cached.orders:
+            order_sn = str(cached.orders[0].get("order_sn") or cached.orders[0].get("order_id") or "")
+        shop = self.shop_manager.find_shop(platform, webview_id)
+        text = self.quick_replies.use(reply_id, {
+            "买家": buyer_name,
+            "订单号": order_sn,
+            "店铺": shop.mall_name if shop else "",
+            "客服": shop.user_name if shop else "",
+        })
+        if text is not None:
+            webview.insert_text(text)
+        
+    def known_profile_ids(self) -> Optional[set]:
+        """有店铺记录的配置文件；店铺文件读取失败或没有任何店铺时返回None，不清理孤立配置文件"""
+        if self.shop_manager.load_failed:
+            return None
+        ids = {shop.webview_id for shops in self.shop_manager.get_all_shops().values() for shop in shops}
+        return ids or None
+        
+    def open_profile_ids(self) -> set:
+        """已打开（含占位）的店铺标签页使用的配置文件"""
+        ids = set()
+        for page in self.platform_pages.values():
+            ids.update(page.webviews)
+            ids.update(page.placeholders)
+        return ids
+        
+    def on_profile_scan_finished(self, usage: list):
+        """配置文件扫描完成"""
+        total = sum(item.total_bytes for item in usage) / (1024 * 1024)
+        freed = sum(item.freed_bytes for item in usage) / (1024 * 1024)
+        message = f"店铺配置文件共占用 {total:.0f} MB"
+        if freed:
+            message += f"，已清理 {freed:.0f} MB"
+        self.status_bar.showMessage(message, 5000)
+        
+    def show_disk_usage(self):
+        """显示各店铺配置文件的磁盘占用"""
+        if self.profile_janitor.last_scan_at is None:
+            self.profile_janitor.scan_now()
+            QMessageBox.information(self, "磁盘占用", "正在统计，稍后再查看")
+            return
+        shop_names = {shop.webview_id: f"{platform} - {shop.user_name or shop.mall_name}"
+                      for platform, shops in self.shop_manager.get_all_shops().items() for shop in shops}
+        lines = self.profile_janitor.report(shop_names) or ["没有店铺配置文件"]
+        scanned_at = time.strftime("%H:%M", time.localtime(self.profile_janitor.last_scan_at))
+        QMessageBox.information(self, "磁盘占用", f"统计时间：{scanned_at}\n\n" + "\n".join(lines))
+        
+    def focused_webview_id(self) -> Optional[str]:
+        """客服正在查看的店铺页面，窗口隐藏或最小化时为None"""
+        if not self.isVisible() or self.isMinimized():
+            return None
+        page = self.content_widget.currentWidget()
+        if not isinstance(page, PlatformPage) or page.stacked_widget.currentIndex() != 1:
+            return None
+        webview = page.get_current_webview()
+        return webview.webview_id if webview else None
+        
+    def show_poll_report(self):
+        """显示各店铺未读检测的间隔和开销"""
+        shop_names = {shop.webview_id: f"{platform} - {shop.user_name or shop.mall_name}"
+                      for platform, shops in self.shop_manager.get_all_shops().items() for shop in shops}
+        QMessageBox.information(self, "轮询开销", "\n".join(self.poll_scheduler.report(shop_names)))
+        
+    def analytics_shop_key(self, platform: str, webview_id: str) -> str:
+        """回复时效按店铺统计时使用的键：同一店铺的多个客服账号共用 mall_id"""
+        shop = self.shop_manager.find_shop(platform, webview_id)
+        return (shop.mall_id if shop else "") or webview_id
+        
+    def on_analytics_event(self, event):
+        """事件总线后台线程中更新回复时效统计"""
+        if isinstance(event, ChatMessageEvent):
+            self.response_analytics.add_message(event.message)
+        else:
+            self.response_analytics.add_unread(event.platform, event.webview_id, event.count, event.timestamp)
+        
+    def save_response_analytics(self):
+        try:
+            self.response_analytics.save(self.analytics_path)
+        except Exception as e:
+            logger.error("保存回复时效统计失败: %s", e)
+        
+    def rebuild_response_analytics(self):
+        """从消息存储中的全部历史重新统计（在后台线程中调用）"""
+        previous = self.response_analytics
+        analytics = ResponseAnalytics(self.analytics_shop_key, self.analytics_config)
+        analytics.adopt_live_series(previous)
+        analytics.hold_live()
+        self.response_analytics = analytics
+        analytics.catch_up(self.message_store)
+        self.save_response_analytics()
+        
+    def analytics_label(self, dimension: str, key: str) -> str:
+        """回复时效报表中各行显示的名称"""
+        if dimension == "all":
+            return DIMENSION_NAMES["all"]
+        if dimension == "platform":
+            page = self.platform_pages.get(key)
+            return page.platform_name if page else key
+        for platform, shops in self.shop_manager.get_all_shops().items():
+            for shop in shops:
+                if dimension == "agent" and shop.webview_id == key:
+                    return f"{platform} - {shop.user_name or shop.mall_name}"
+                if dimension == "shop" and (shop.mall_id or shop.webview_id) == key:
+                    return f"{platform} - {shop.mall_name or shop.user_name}"
+        return key[:8]
+        
+    def show_response_report(self):
+        """显示回复时效报表"""
+        if self.response_report is None:
+            self.response_report = ResponseReportDialog(
+                lambda: self.response_analytics, self.analytics_label, self.rebuild_response_analytics, self)
+        else:
+            self.response_report.refresh()
+        self.show_window()
+        self.response_report.show()
+        self.response_report.raise_()
+        
+    def show_log_viewer(self):
+        """显示日志窗口"""
+        if self.log_viewer is None:
+            self.log_viewer = LogViewerDialog(self.app.log_service, self)
+        self.show_window()
+        self.log_viewer.show()
+        self.log_viewer.raise_()
+        
+    def show_export_dialog(self):
+        """显示聊天记录导出窗口"""
+        if self.export_dialog is None:
+            platform_names = {platform: page.platform_name for platform, page in self.platform_pages.items()}
+            self.export_dialog = ExportDialog(self.message_store, platform_names, self.shop_manager.get_all_shops(),
+                                              self.shop_manager.find_shop, self)
+        self.show_window()
+        self.export_dialog.show()
+        self.export_dialog.raise_()
+        
+    def open_webview_count(self) -> int:
+        """已创建WebView的店铺数"""
+        return sum(len(page.webviews) for page in self.platform_pages.values())
+        
+    def set_resource_mode(self, name: str):
+        """切换资源模式，立即应用到已打开的页面"""
+        resource_config = self.app.config.get("resource_mode", {})
+        if resource_config.get("mode", DEFAULT_MODE) == name:
+            return
+        resource_config["mode"] = name
+        self.app.config["resource_mode"] = resource_config
+        self.app.save_config()
+        self.apply_resource_mode(name)
+        self.status_bar.showMessage(f"已切换为{RESOURCE_MODES[name]['name']}模式，Chromium参数在重启后生效", 5000)
+        
+    def apply_resource_mode(self, name: str):
+        """将资源模式和HTTP缓存上限应用到已打开的页面"""
+        PlatformWebView.resource_mode = name
+        PlatformWebView.http_cache_max_bytes = http_cache_bytes(name, self.profile_janitor.http_cache_bytes)
+        for page in self.platform_pages.values():
+            for webview in page.webviews.values():
+                webview.apply_resource_mode()
+        
+    def show_resource_usage(self):
+        """显示各资源模式下的内存和CPU占用对比"""
+        QMessageBox.information(self, "资源占用", "\n\n".join(self.resource_sampler.report()))
+        
+    def start_local_api(self):
+        """按配置启动本地HTTP/WebSocket接口，首次启用时生成访问令牌"""
+        api_config = self.app.config.get("local_api", {})
+        if not api_config.get("enabled", False):
+            return
+        if not api_config.get("token"):
+            api_config["token"] = secrets.token_urlsafe(24)
+            self.app.config["local_api"] = api_config
+            self.app.save_config()
+        self.gui_dispatcher = GuiDispatcher(self)
+        self.local_api = LocalApiServer(
+            self.app.event_bus, self.api_shops, self.api_unread, self.api_send,
+            dispatch=self.gui_dispatcher.submit, config=api_config)
+        try:
+            self.local_api.start()
+        except Exception as e:
+            logger.error("启动本地接口失败: %s", e)
+            self.local_api = None
+        
+    def start_bridge_recording(self):
+        """开始录制平台消息"""
+        if self.bridge_recorder is not None:
+            return
+        self.bridge_recorder = BridgeRecorder(BridgeRecorder.default_path(self.app.data_dir))
+        PlatformWebView.recorder = self.bridge_recorder
+        logger.info("正在录制平台消息: %s", self.bridge_recorder.path)
+        
+    def stop_bridge_recording(self):
+        """停止录制平台消息"""
+        if self.bridge_recorder is None:
+            return
+        PlatformWebView.recorder = None
+        self.bridge_recorder.close()
+        logger.info("已录制 %s 条平台消息: %s", self.bridge_recorder.count, self.bridge_recorder.path)
+        self.bridge_recorder = None
+        
+    def api_shops(self) -> list:
+        """本地接口：店铺列表"""
+        unread = {}
+        for page in self.platform_pages.values():
+            unread.update({tab.webview_id: tab.unread for tab in page.snapshot_tabs()})
+        shops = []
+        for platform, platform_shops in self.shop_manager.get_all_shops().items():
+            page = self.platform_pages.get(platform)
+            for shop in platform_shops:
+                webview = page.webviews.get(shop.webview_id) if page else None
+                shops.append(dict(shop.to_dict(), platform=platform, open=shop.webview_id in unread,
+                                  ready=bool(webview and webview.is_ready),
+                                  unread=unread.get(shop.webview_id, 0)))
+        return shops
+        
+    def api_unread(self) -> dict:
+        """本地接口：未读消息数合计"""
+        platforms, shops = {}, {}
+        for platform, page in self.platform_pages.items():
+            for tab in page.snapshot_tabs():
+                shops[tab.webview_id] = tab.unread
+                platforms[platform] = platforms.get(platform, 0) + tab.unread
+        return {"total": sum(platforms.values()), "platforms": platforms, "shops": shops}
+        
+    def api_send(self, body: dict) -> Future:
+        """本地接口：通过店铺WebView发送文字消息，返回发送完成时得到结果的Future"""
+        webview_id = body["webview_id"]
+        platform = body.get("platform") or next(
+            (p for p, page in self.platform_pages.items() if webview_id in page.webviews), "")
+        if self.find_webview(platform, webview_id) is None:
+            raise KeyError(webview_id)
+        ticket = self.send_queue.send_text(platform, webview_id, str(body["text"]),
+                                           body.get("conversation_id", ""), body.get("idempotency_key"))
+        future = Future()
+        
+        def resolve(*args):
+            if not future.done():
+                future.set_result({"ok": ticket.ok, "error": ticket.error, "request_id": ticket.request_id})
+        
+        if ticket.done:
+            resolve()
+        else:
+            ticket.delivered.connect(resolve)
+            ticket.failed.connect(resolve)
+        return future
+        
+    def find_webview(self, platform: str, webview_id: str):
+        """查找已打开的店铺WebView"""
+        page = self.platform_pages.get(platform)
+        return page.webviews.get(webview_id) if page else None
+            
     def on_notification_clicked(self, platform: str):
         """通知点击事件"""
         # 显示窗口并切换到对应平台
@@ -486,10 +1252,133 @@ class MainWindow(QMainWindow):
         """店铺更新事件"""
         self.status_bar.showMessage(f"{platform} 店铺信息已更新：{shop.user_name}", 3000)
         
+    def on_shop_ready(self, platform: str, webview_id: str, elapsed_ms: float):
+        """店铺页面就绪事件"""
+        shop = self.shop_manager.find_shop(platform, webview_id)
+        shop_name = shop.user_name if shop else webview_id
+        self.status_bar.showMessage(f"{platform} - {shop_name} 已就绪，耗时 {elapsed_ms / 1000:.1f} 秒", 3000)
+        
+    def on_recreate_requested(self, platform: str, webview_id: str):
+        """看门狗请求重建店铺页面"""
+        page = self.platform_pages.get(platform)
+        if page:
+            page.recreate_webview(webview_id)
+        
     def on_tab_changed(self, platform: str, tab_title: str):
         """标签页改变事件"""
         self.status_bar.showMessage(f"当前：{platform} - {tab_title}", 5000)
         
+    def enabled_pages(self) -> Dict[str, PlatformPage]:
+        """未停用平台的页面"""
+        return {platform_id: page for platform_id, page in self.platform_pages.items()
+                if self.platform_configs[platform_id]["enabled"]}
+        
+    def on_config_reloaded(self, old_config: dict, sections: list):
+        """配置文件修改后只应用变化的配置项，无法立即生效的提示重启"""
+        config = self.app.config
+        handlers = {
+            "platforms": self.apply_platform_configs,
+            "auto_reply_cooldown": lambda: self.set_auto_reply_cooldown(config.get("auto_reply_cooldown", 60)),
+            "conversation_queue": self.apply_queue_config,
+            "quick_switcher": self.apply_switcher_config,
+            "transfer_router": lambda: setattr(self.transfer_router, "idle_seconds",
+                                               config.get("transfer_router", {}).get("idle_seconds", 600)),
+            "send_rate_limits": lambda: self.send_queue.set_rate_limits(config.get("send_rate_limits", {})),
+            "compliance": self.apply_compliance_config,
+            "poll_scheduler": lambda: self.poll_scheduler.update_config(config.get("poll_scheduler", {})),
+            "watchdog": lambda: self.watchdog.update_config(config.get("watchdog", {})),
+            "profile_janitor": self.apply_janitor_config,
+            "resource_mode": self.apply_resource_config,
+            "logging": lambda: self.app.log_service.update_config(config.get("logging", {})),
+        }
+        # 使用时才读取的配置项，替换配置后自动生效
+        live_sections = {"auto_reply", "notification", "knowledge_base", "quick_replies"}
+        
+        restart = []
+        for section in sections:
+            if section in handlers:
+                handlers[section]()
+            elif section == "order_lookup" and all(
+                    config.get(section, {}).get(key) == old_config.get(section, {}).get(key)
+                    for key in ("apis", "ttl")):
+                # 只修改了是否预取订单
+                continue
+            elif section not in live_sections:
+                restart.append(section)
+        if not config.get("notification", True):
+            self.notification_manager.clear_all()
+        
+        message = f"已应用配置：{'、'.join(sections)}"
+        if restart:
+            message += f"；重启后生效：{'、'.join(restart)}"
+        self.status_bar.showMessage(message, 10000)
+        
+    def apply_platform_configs(self):
+        """启用/停用平台、修改名称和地址；新地址只用于之后新建的标签页"""
+        configs = self.app.platform_configs()
+        current_widget = self.content_widget.currentWidget()
+        for platform_id, config in configs.items():
+            page = self.platform_pages.get(platform_id)
+            if page is None:
+                # 新增的平台需要重启后才会创建页面
+                continue
+            was_enabled = self.platform_configs[platform_id]["enabled"]
+            self.platform_configs[platform_id] = config
+            page.platform_name = config["name"]
+            page.chat_url = config["url"]
+            self.content_widget.setTabText(self.content_widget.indexOf(page), config["name"])
+            self.navigation_tree.update_platform(platform_id, config, self.message_counts.get(platform_id, 0))
+            if was_enabled and not config["enabled"]:
+                if page is current_widget:
+                    self.on_navigation_selected("home")
+                    self.navigation_tree.setCurrentItem(self.navigation_tree.find_item("home"))
+                # 关闭该平台的WebView，标签页换回占位页，重新启用后再加载
+                page.suspend()
+        self.rebuild_switcher_index()
+        
+    def set_auto_reply_cooldown(self, cooldown: float):
+        """修改默认冷却时间，重新编译规则"""
+        self.auto_reply_engine.default_cooldown = cooldown
+        self.auto_reply_engine.set_rules(self.auto_reply_engine.rules)
+        
+    def apply_queue_config(self):
+        """待回复会话的快捷键和超时时间"""
+        queue_config = self.app.config.get("conversation_queue", {})
+        self.next_urgent_shortcut.setKey(QKeySequence(queue_config.get("hotkey", "Ctrl+J")))
+        self.conversation_queue.set_sla_seconds(queue_config.get("sla_seconds", {}))
+        
+    def apply_switcher_config(self):
+        """快速切换的快捷键和显示条数"""
+        switcher_config = self.app.config.get("quick_switcher", {})
+        self.quick_switcher_shortcut.setKey(QKeySequence(switcher_config.get("hotkey", "Ctrl+K")))
+        if self.quick_switcher is not None:
+            self.quick_switcher.limit = switcher_config.get("limit", 20)
+        
+    def apply_compliance_config(self):
+        """违禁词检查开关和词表检查间隔"""
+        self.compliance_filter.update_config(self.app.config.get("compliance", {}))
+        enabled = self.compliance_filter.config["enabled"]
+        PlatformWebView.compliance_enabled = enabled
+        for page in self.platform_pages.values():
+            for webview in page.webviews.values():
+                webview.execute_script(
+                    f"window.pywebview && window.pywebview.setCompliance({'true' if enabled else 'false'});")
+        self.compliance_timer.start(int(self.compliance_filter.config["reload_interval"] * 1000))
+        
+    def apply_janitor_config(self):
+        """配置文件清理的配额和HTTP缓存上限"""
+        self.profile_janitor.update_config(self.app.config.get("profile_janitor", {}))
+        self.apply_resource_mode(PlatformWebView.resource_mode)
+        
+    def apply_resource_config(self):
+        """资源模式的页面设置立即生效，Chromium参数仍需重启"""
+        resource_config = self.app.config.get("resource_mode", {})
+        self.resource_sampler.update_config(resource_config)
+        name = resource_config.get("mode", DEFAULT_MODE)
+        if name != PlatformWebView.resource_mode:
+            self.apply_resource_mode(name)
+            self.resource_mode_combo.setCurrentIndex(max(self.resource_mode_combo.findData(name), 0))
+        
     def show_window(self):
         """显示窗口"""
         self.show()
@@ -514,6 +1403,25 @@ class MainWindow(QMainWindow):
             
     def quit_application(self):
         """退出应用程序"""
+        self.save_session()
+        self.stop_bridge_recording()
+        if self.export_dialog is not None:
+            self.export_dialog.shutdown()
+        self.profile_janitor.stop()
+        self.resource_sampler.stop()
+        self.poll_scheduler.stop()
         self.notification_manager.clear_all()
+        if self.local_api is not None:
+            self.local_api.stop()
+        self.app.event_bus.shutdown()
+        self.message_store.close()
+        self.analytics_timer.stop()
+        self.save_response_analytics()
+        self.quick_replies.save_usage()
+        self.media_pipeline.shutdown()
+        self.order_lookup.shutdown()
+        self.catalog_sync.shutdown()
+        self.session_pool.close_all()
         self.app.save_config()
+        self.app.log_service.stop()
         sys.exit(0) 
\ No newline at end of file